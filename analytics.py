@@ -0,0 +1,190 @@
+"""
+Learning Analytics
+==================
+
+Ties learning resources to test scores. For every test, and the resource
+linked to it (Test.learning_resource_id):
+
+- the score distribution of students who completed the resource and of
+  everybody else, including how many never opened it,
+- quantiles of the time students spent on the resource, and how strongly
+  that time correlates with their score,
+- the at-risk students: those who scored below ANALYTICS_AT_RISK_SCORE
+  without completing the resource (for a test without a linked resource,
+  everybody below it).
+
+All of this is precomputed into test_analytics and at_risk_student. The
+events that change it only mark the affected tests stale:
+
+- a submitted result (finalize_attempt) marks its test,
+- progress on a resource (view_resource, update_progress) marks the tests
+  linked to it,
+- relinking a test, deleting a user or resource and archiving results mark
+  what they touch.
+
+refresh_analytics() then recomputes only the stale tests, in bulk: three
+grouped queries per ANALYTICS_BATCH_TESTS tests. It runs when the analytics
+page is opened and from `python db_manage.py analytics`. Each row is marked
+fresh *before* its test is recomputed, so an event arriving mid-way marks
+it stale again instead of being lost. Marking is an UPDATE that matches
+nothing once the test is already stale, so submits and progress heartbeats
+do not contend for the row.
+
+Only current results count; archived results belong to earlier terms.
+"""
+
+import json
+import statistics
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select, update
+
+from backends import upsert
+from models import db, Result, Test, StudentProgress, TestAnalytics, AtRiskStudent
+
+QUANTILES = (25, 50, 75, 90)
+
+# Same ten score ranges as the dashboard chart (0-10, ..., 90-100)
+score_range = case(*[(Result.score >= bucket * 10, bucket) for bucket in range(9, 0, -1)], else_=0)
+
+# 2: completed the linked resource, 1: opened it, 0: never opened it (or no resource is linked)
+resource_status = case((StudentProgress.completed.is_(True), 2), (StudentProgress.id.isnot(None), 1), else_=0)
+
+
+def mark_tests_stale(test_ids):
+    """Flag tests for recomputation; part of the caller's transaction"""
+    test_ids = list(test_ids)
+    if test_ids:
+        db.session.execute(update(TestAnalytics)
+                           .where(TestAnalytics.test_id.in_(test_ids), TestAnalytics.stale.is_(False))
+                           .values(stale=True)
+                           .execution_options(synchronize_session=False))
+
+
+def mark_resource_stale(resource_id):
+    """Flag the tests linked to a resource (now, or when last computed)"""
+    linked = select(Test.id).where(Test.learning_resource_id == resource_id)
+    db.session.execute(update(TestAnalytics)
+                       .where(or_(TestAnalytics.test_id.in_(linked), TestAnalytics.resource_id == resource_id),
+                              TestAnalytics.stale.is_(False))
+                       .values(stale=True)
+                       .execution_options(synchronize_session=False))
+
+
+def mark_all_stale():
+    db.session.execute(update(TestAnalytics).where(TestAnalytics.stale.is_(False)).values(stale=True)
+                       .execution_options(synchronize_session=False))
+
+
+def stale_test_ids():
+    """Tests whose analytics are stale or were never computed"""
+    never = db.session.query(Test.id).outerjoin(TestAnalytics, TestAnalytics.test_id == Test.id) \
+        .filter(TestAnalytics.test_id.is_(None))
+    stale = db.session.query(TestAnalytics.test_id).filter(TestAnalytics.stale.is_(True))
+    return sorted({test_id for (test_id,) in never.union(stale)})
+
+
+def quantile(ordered, percent):
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, -(-percent * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def _claim(test_ids):
+    """Create missing rows and mark these tests fresh before computing them"""
+    existing = {test_id for (test_id,) in db.session.query(TestAnalytics.test_id)
+                .filter(TestAnalytics.test_id.in_(test_ids))}
+    for test_id in test_ids:
+        if test_id not in existing:
+            db.session.execute(upsert(TestAnalytics, {'test_id': test_id, 'stale': False}, ['test_id']))
+    db.session.execute(update(TestAnalytics).where(TestAnalytics.test_id.in_(test_ids)).values(stale=False)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def _compute(test_ids, at_risk_score):
+    """Recompute the analytics rows and at-risk students of these tests"""
+    def results(*columns):
+        return db.session.query(*columns).select_from(Result) \
+            .join(Test, Test.id == Result.test_id) \
+            .outerjoin(StudentProgress, and_(StudentProgress.user_id == Result.user_id,
+                                             StudentProgress.resource_id == Test.learning_resource_id)) \
+            .filter(Result.test_id.in_(test_ids))
+
+    rows = {test_id: {
+        'test_id': test_id, 'resource_id': resource_id, 'students': 0,
+        'completed_students': 0, 'completed_average': None, 'completed_histogram': [0] * 10,
+        'other_students': 0, 'other_average': None, 'other_histogram': [0] * 10,
+        'not_opened_students': 0, 'time_spent_quantiles': None, 'time_score_correlation': None,
+        'at_risk_students': 0, 'computed_at': datetime.utcnow(),
+    } for test_id, resource_id in db.session.query(Test.id, Test.learning_resource_id).filter(Test.id.in_(test_ids))}
+    totals = {}
+
+    # Score distribution by resource status
+    for test_id, status, bucket, count, score_sum in results(
+            Result.test_id, resource_status, score_range, func.count(Result.id), func.sum(Result.score)) \
+            .group_by(Result.test_id, resource_status, score_range):
+        row = rows[test_id]
+        group = 'completed' if status == 2 else 'other'
+        row['students'] += count
+        row[f'{group}_students'] += count
+        row[f'{group}_histogram'][bucket] += count
+        if status == 0:
+            row['not_opened_students'] += count
+        totals[test_id, group] = totals.get((test_id, group), 0) + score_sum
+
+    # Time spent on the resource, in order, with the score it led to
+    samples = {}
+    for test_id, time_spent, score in results(Result.test_id, StudentProgress.time_spent, Result.score) \
+            .filter(StudentProgress.id.isnot(None)).order_by(Result.test_id, StudentProgress.time_spent):
+        samples.setdefault(test_id, []).append((time_spent or 0, score))
+
+    for test_id, row in rows.items():
+        for group in ('completed', 'other'):
+            if row[f'{group}_students']:
+                row[f'{group}_average'] = totals[test_id, group] / row[f'{group}_students']
+            row[f'{group}_histogram'] = json.dumps(row[f'{group}_histogram'])
+        if test_id in samples:
+            times = [time_spent for time_spent, _ in samples[test_id]]
+            row['time_spent_quantiles'] = json.dumps({f'p{percent}': quantile(times, percent) for percent in QUANTILES})
+            try:
+                row['time_score_correlation'] = statistics.correlation(times, [score for _, score in samples[test_id]])
+            except statistics.StatisticsError:
+                pass  # Fewer than two students, or everybody spent the same time
+
+    # Failed without completing the resource
+    db.session.query(AtRiskStudent).filter(AtRiskStudent.test_id.in_(test_ids)).delete(synchronize_session=False)
+    at_risk = [{'test_id': test_id, 'user_id': user_id, 'score': score,
+                'progress_percentage': progress_percentage, 'time_spent': time_spent}
+               for test_id, user_id, score, progress_percentage, time_spent in results(
+                   Result.test_id, Result.user_id, Result.score,
+                   StudentProgress.progress_percentage, StudentProgress.time_spent)
+               .filter(Result.score < at_risk_score, StudentProgress.completed.isnot(True))]
+    if at_risk:
+        db.session.execute(AtRiskStudent.__table__.insert(), at_risk)
+    for entry in at_risk:
+        rows[entry['test_id']]['at_risk_students'] += 1
+
+    if rows:
+        db.session.execute(update(TestAnalytics), list(rows.values()))
+
+
+def refresh_analytics(full=False):
+    """Recompute stale tests (every test with full); returns how many were computed"""
+    batch_size = current_app.config.get('ANALYTICS_BATCH_TESTS', 50)
+    at_risk_score = current_app.config.get('ANALYTICS_AT_RISK_SCORE', 50)
+    test_ids = [test_id for (test_id,) in db.session.query(Test.id).order_by(Test.id)] if full else stale_test_ids()
+
+    for start in range(0, len(test_ids), batch_size):
+        batch = test_ids[start:start + batch_size]
+        _claim(batch)
+        try:
+            _compute(batch, at_risk_score)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            mark_tests_stale(batch)  # Try again on the next refresh
+            db.session.commit()
+            raise
+    return len(test_ids)
@@ -18,80 +18,131 @@ Test Security Flow:
 - Student can access resources again after test completion
 """
 
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, make_response, send_from_directory, session
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, make_response, send_from_directory, session, current_app
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_migrate import Migrate
-from flask_session import Session
 from functools import wraps
-from models import db, User, Result, Question, Test, LearningResource, StudentProgress, ResourceFile
+from models import db, User, Result, Question, Test, LearningResource, StudentProgress, ResourceFile, TestAttempt, SecurityEvent, TestAnalytics, AtRiskStudent, Section, SectionMembership, SectionTest, SectionResource
+from archive import get_result_or_404, student_results, student_results_page, has_taken_test
+from student_summary import summaries, summary_statistics, mark_test_students_stale
+from sections import (visible_tests, visible_resource_filter, visible_test_counts, can_take_test, can_view_resource,
+                      can_view_resource_file, can_view_stream,
+                      scope_users, scope_tests, scope_results, section_counts, add_members, remove_member, assign, unassign, touch)
+from analytics import mark_tests_stale, mark_resource_stale, refresh_analytics, QUANTILES as ANALYTICS_QUANTILES
+from attempts import (start_attempt, get_active_attempt, load_answers, save_answers, is_past_deadline, finalize_attempt,
+                      extend_attempts, end_attempts, start_attempt_sweeper)
+from exam_channel import init_exam_channel, exam_hub, serve_channel
+from telemetry import init_telemetry, telemetry, start_telemetry_writer, heartbeat_counters, progress_values
+from security_events import init_security_events, event_query, result_timeline, test_event_counts
+from availability import (init_availability, opening_soon, start_opening_soon_scheduler, student_windows, test_window,
+                          cap_deadlines, parse_local, to_local, to_utc, status as availability_status, OPEN, UPCOMING)
+from maintenance import init_maintenance, start_maintenance_scheduler
+from session_store import init_session_store
+from structured_logging import init_structured_logging
 from config import config
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
+from sqlalchemy import func, case, and_, or_, inspect, text
+from sqlalchemy.orm import joinedload, selectinload
+from pagination import keyset_paginate, page_args, InvalidCursor
+from search import install_search_index, search_questions, search_resources, index_resource_text
+from fragment_cache import init_fragment_cache, lazy
+from assets import init_assets
+from compression import init_compression
+from backends import init_backend, database_exists, upsert
+from file_cleanup import test_files, question_files, resource_files, remove_unreferenced_files
+from transcoding import (start_transcode_worker, wake_transcoder, queue_again, streams_folder, stream_owner, PENDING,
+                         MIMETYPES as STREAM_MIMETYPES)
 from concurrent.futures import ThreadPoolExecutor
 import os
+import re
+import sys
 import json
 import csv
 import io
+import time
 
-# Get environment configuration
-config_name = os.environ.get('FLASK_ENV', 'default')
-app = Flask(__name__)
-app.config.from_object(config[config_name])
-
-# Configure session for better persistence
-app.config['SESSION_PERMANENT'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 hours in seconds
-app.config['SESSION_USE_SIGNER'] = True
-app.config['SESSION_KEY_PREFIX'] = 'smartexam:'
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_NAME'] = 'smartexam_session'
-
-# Configure threading for concurrent access
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300
-app.config['THREADED'] = True
+# Printed once the server is accepting connections; the launchers wait for it
+READY_MARKER = 'SMARTEXAM_READY'
 
 # Initialize thread pool for handling concurrent requests - increased for more students
 executor = ThreadPoolExecutor(max_workers=25)
 
-# Configure SQLite for better concurrent access
-if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
-    from sqlalchemy import event
-    from sqlalchemy.engine import Engine
-    import sqlite3
-    
-    @event.listens_for(Engine, "connect")
-    def set_sqlite_pragma(dbapi_connection, connection_record):
-        if isinstance(dbapi_connection, sqlite3.Connection):
-            cursor = dbapi_connection.cursor()
-            # Enable WAL mode for better concurrent access
-            cursor.execute("PRAGMA journal_mode=WAL")
-            # Increase timeout for concurrent access
-            cursor.execute("PRAGMA busy_timeout=30000")
-            # Optimize for concurrent reads
-            cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.execute("PRAGMA cache_size=10000")
-            cursor.execute("PRAGMA temp_store=MEMORY")
-            cursor.close()
-
-# Initialize database
-db.init_app(app)
-
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
-
 # Initialize login manager with better session protection
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.session_protection = "basic"  # Changed from "strong" to "basic"
 login_manager.remember_cookie_duration = None
 login_manager.login_message = "Please log in to access this page"
 login_manager.login_message_category = "info"
 
-# Initialize Flask-Session after app configuration
-Session(app)
+# Views are collected here and registered on each app by create_app, so
+# endpoint names stay unprefixed (url_for('login'), not url_for('main.login'))
+routes = []
+
+def route(rule, **options):
+    def decorator(f):
+        routes.append((rule, options, f))
+        return f
+    return decorator
+
+def create_app(config_name=None, with_migrations=True):
+    """Build and configure the Flask application.
+
+    with_migrations=False skips Flask-Migrate (and the Alembic import behind
+    it) so the desktop launchers start faster; init_migrate attaches it later
+    if the database actually needs upgrading.
+    """
+    # Get environment configuration
+    config_name = config_name or os.environ.get('FLASK_ENV', 'default')
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
+    # First, so everything after logs through it and every request has an ID
+    init_structured_logging(app)
+
+    # Configure session for better persistence
+    app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 hours in seconds
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_NAME'] = 'smartexam_session'
+
+    # Configure threading for concurrent access
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300
+    app.config['THREADED'] = True
+
+    # Initialize database (SQLite or PostgreSQL, see backends.py)
+    init_backend(app)
+    if with_migrations:
+        init_migrate(app)
+
+    # Registered first so every request counts as activity
+    init_maintenance(app)
+
+    login_manager.init_app(app)
+
+    # Server-side sessions, after app configuration (see session_store.py)
+    init_session_store(app)
+
+    init_fragment_cache(app)
+    init_assets(app)
+    init_availability(app)
+    init_telemetry(app)
+    init_security_events(app)
+    init_exam_channel(app)
+    init_compression(app)
+    app.add_template_filter(from_json, 'from_json')
+    for rule, options, view in routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+    return app
+
+def init_migrate(app):
+    """Attach Flask-Migrate (batch mode lets SQLite alter existing tables)"""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'), render_as_batch=True)
+    return app.extensions['migrate']
 
 # Security decorator to check if student is currently taking a test
 def check_test_session(f):
@@ -105,12 +156,26 @@ def check_test_session(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def exam_session_required(f):
+    """For the exam telemetry endpoints: the active attempt comes from the session alone.
+
+    Only take_test puts an attempt in the session, and only for a logged-in
+    student, so these frequent requests never load the user.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if '_user_id' not in session:
+            return jsonify({'error': 'Unauthorized'}), 401
+        if 'attempt_id' not in session or 'active_test_id' not in session:
+            return jsonify({'error': 'No active test session'}), 400
+        return f(*args, **kwargs)
+    return decorated_function
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 # Custom Jinja filter to convert JSON strings to Python objects
-@app.template_filter('from_json')
 def from_json(value):
     return json.loads(value) if value else []
 
@@ -124,7 +189,7 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
@@ -137,7 +202,7 @@ def login():
         if user and user.check_password(password):
             # Set session as permanent and login user
             session.permanent = True
-            login_user(user, remember=True, duration=timedelta(seconds=app.config['PERMANENT_SESSION_LIFETIME']))
+            login_user(user, remember=True, duration=timedelta(seconds=current_app.config['PERMANENT_SESSION_LIFETIME']))
             
             # Clear any stale test sessions from previous logins
             session.pop('active_test_id', None)
@@ -148,16 +213,17 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     # Clear any active test session on logout
     session.pop('active_test_id', None)
+    session.pop('attempt_id', None)
     session.pop('test_start_time', None)
     logout_user()
     return redirect(url_for('login'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def register():
@@ -193,59 +259,351 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/dashboard')
+def get_test_statistics(section_id=None):
+    """Aggregate per-test score statistics in SQL instead of loading every result"""
+    score_buckets = [
+        func.count(Result.id),
+        func.avg(Result.score),
+        func.max(Result.score),
+        func.min(Result.score),
+        func.sum(case((Result.score >= 90, 1), else_=0)),
+        func.sum(case((and_(Result.score >= 70, Result.score < 90), 1), else_=0)),
+        func.sum(case((and_(Result.score >= 50, Result.score < 70), 1), else_=0)),
+        func.sum(case((Result.score < 50, 1), else_=0)),
+    ]
+    query = db.session.query(Result.test_id, *score_buckets)
+    if section_id:
+        query = scope_results(query, section_id)
+    rows = query.group_by(Result.test_id).all()
+    
+    test_statistics = {}
+    for test_id, total, average, highest, lowest, excellent, good, fair, poor in rows:
+        test_statistics[test_id] = {
+            'total_students': total,
+            'average_score': average,
+            'highest_score': highest,
+            'lowest_score': lowest,
+            'median_score': get_median_score(test_id, total, section_id),
+            'excellent_count': excellent,
+            'good_count': good,
+            'fair_count': fair,
+            'poor_count': poor,
+            'histogram': [0] * 10
+        }
+    
+    # Ten score ranges for the distribution chart (0-10, ..., 90-100)
+    # Explicit thresholds rather than CAST, which truncates on SQLite but rounds on PostgreSQL
+    decile = case(*[(Result.score >= bucket * 10, bucket) for bucket in range(9, 0, -1)], else_=0)
+    query = db.session.query(Result.test_id, decile, func.count(Result.id))
+    if section_id:
+        query = scope_results(query, section_id)
+    for test_id, bucket, count in query.group_by(Result.test_id, decile).all():
+        if test_id in test_statistics and 0 <= bucket <= 9:
+            test_statistics[test_id]['histogram'][bucket] = count
+    
+    return test_statistics
+
+def get_median_score(test_id, total, section_id=None):
+    """Read the median straight off the (test_id, score) index"""
+    if not total:
+        return 0
+    offset = (total - 1) // 2
+    count = 1 if total % 2 == 1 else 2
+    query = Result.query.with_entities(Result.score).filter(Result.test_id == test_id)
+    if section_id:
+        query = scope_results(query, section_id)
+    scores = [row.score for row in query.order_by(Result.score).offset(offset).limit(count).all()]
+    return sum(scores) / len(scores) if scores else 0
+
+@route('/dashboard')
 @login_required
 def dashboard():
     from datetime import datetime
     now = datetime.now()
     
     if current_user.role == 'admin':
-        users = User.query.all()
-        results = Result.query.all()
-        tests = Test.query.all()
-        
-        # Calculate test statistics for admin overview
-        test_statistics = {}
-        for test in tests:
-            test_results = Result.query.filter_by(test_id=test.id).all()
-            if test_results:
-                scores = [result.score for result in test_results]
-                test_statistics[test.id] = {
-                    'total_students': len(test_results),
-                    'average_score': sum(scores) / len(scores),
-                    'highest_score': max(scores),
-                    'lowest_score': min(scores),
-                    'student_results': [
-                        {
-                            'student_name': result.user.name,
-                            'student_id': result.user.student_id,
-                            'score': result.score,
-                            'date_taken': result.date_taken,
-                            'result_id': result.id
-                        }
-                        for result in sorted(test_results, key=lambda x: x.score, reverse=True)
-                    ]
-                }
-        
-        return render_template('dashboard.html', users=users, results=results, tests=tests, test_statistics=test_statistics, now=now)
+        # Everything below is scoped to the selected section, if any
+        section = selected_section()
+        section_id = section.id if section else None
+        users_query = User.query
+        results_query = Result.query.options(joinedload(Result.user), joinedload(Result.test))
+        if section:
+            users_query = scope_users(users_query, section.id)
+            results_query = scope_results(results_query, section.id)
+        
+        # Only the first page of each list is rendered; the rest is loaded
+        # incrementally through the /api/admin endpoints
+        page_size = current_app.config['ADMIN_PAGE_SIZE']
+        users, users_cursor = keyset_paginate(users_query, User.name, User.id, limit=page_size)
+        results, results_cursor = keyset_paginate(results_query, Result.date_taken, Result.id,
+                                                  descending=True, limit=page_size)
+        
+        # Statistics are only computed when their cached fragments are stale
+        load_test_statistics = lazy(get_test_statistics, section_id)
+        load_tests = lazy(get_tests_with_results, load_test_statistics)
+        
+        return render_template('dashboard.html',
+                              users=users,
+                              users_cursor=users_cursor,
+                              results=results,
+                              results_cursor=results_cursor,
+                              load_tests=load_tests,
+                              load_test_statistics=load_test_statistics,
+                              fragment_cache_stats=current_app.extensions['fragment_cache'].stats(),
+                              section=section,
+                              section_id=section_id,
+                              sections=Section.query.order_by(Section.name).all(),
+                              page_size=page_size,
+                              now=now)
     else:
         # For students, get their results and available tests
-        user_results = Result.query.filter_by(user_id=current_user.id).all()
+        user_results = student_results(current_user.id)
         
         # Get list of completed test IDs
         completed_test_ids = [result.test_id for result in user_results]
         
-        # Count available tests
-        available_tests_count = Test.query.count()
+        # Count the tests open to the student's sections
+        available_tests_count = visible_tests(current_user.id).count()
         completed_tests_count = len(completed_test_ids)
         
+        # Exams opening soon, from the precomputed per-section lists
+        section_ids = [section_id for section_id, in db.session.query(SectionMembership.section_id)
+                       .filter(SectionMembership.user_id == current_user.id)]
+        upcoming_tests = opening_soon().for_sections(section_ids)
+        
         return render_template('dashboard.html', 
                               user_results=user_results, 
                               now=now,
                               available_tests_count=available_tests_count,
-                              completed_tests_count=completed_tests_count)
+                              completed_tests_count=completed_tests_count,
+                              upcoming_tests=upcoming_tests)
+
+def get_tests_with_results(load_test_statistics):
+    test_statistics = load_test_statistics()
+    if not test_statistics:
+        return []
+    return Test.query.filter(Test.id.in_(test_statistics.keys())).order_by(Test.title).all()
+
+def selected_section():
+    """The section the admin is viewing, or None for the whole school.
+
+    Chosen with ?section=<id> (?section= for the whole school) and remembered
+    in the session, so the dashboard and analytics pages stay on it.
+    """
+    if 'section' in request.args:
+        session['section_id'] = request.args.get('section', type=int)
+    section_id = session.get('section_id')
+    section = db.session.get(Section, section_id) if section_id else None
+    if section_id and not section:
+        session.pop('section_id', None)  # Deleted since it was chosen
+    return section
+
+def admin_page_args(sort_options, default_sort, default_order='asc'):
+    return page_args(request, sort_options, default_sort, default_order,
+                     default_limit=current_app.config['ADMIN_PAGE_SIZE'],
+                     max_limit=current_app.config['ADMIN_MAX_PAGE_SIZE'])
+
+def serialize_user(user):
+    return {
+        'id': user.id,
+        'name': user.name,
+        'student_id': user.student_id,
+        'role': user.role,
+        'edit_url': url_for('edit_user', user_id=user.id),
+        'records_url': url_for('view_student_records', user_id=user.id) if user.role == 'student' else None,
+        'delete_url': url_for('delete_user', user_id=user.id)
+    }
+
+def serialize_result(result, student_name, student_id, test_title):
+    return {
+        'id': result.id,
+        'user_id': result.user_id,
+        'test_id': result.test_id,
+        'student_name': student_name,
+        'student_id': student_id,
+        'test_title': test_title,
+        'score': result.score,
+        'date_taken': result.date_taken.isoformat(),
+        'date_display': result.date_taken.strftime('%m/%d/%Y'),
+        'view_url': url_for('view_result', result_id=result.id)
+    }
+
+@route('/api/admin/users')
+@login_required
+@admin_required
+def api_admin_users():
+    """Keyset-paginated user list. Filters: q (name or student ID prefix), role, section_id"""
+    sort_columns = {'name': User.name, 'student_id': User.student_id, 'id': User.id}
+    sort, descending, cursor, limit = admin_page_args(sort_columns, 'name')
+    
+    query = User.query
+    section_id = request.args.get('section_id', type=int)
+    if section_id:
+        query = scope_users(query, section_id)
+    role = request.args.get('role')
+    if role in ('admin', 'student'):
+        query = query.filter(User.role == role)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(or_(User.name.ilike(f'{search}%'), User.student_id.ilike(f'{search}%')))
+    
+    try:
+        users, next_cursor = keyset_paginate(query, sort_columns[sort], User.id, descending, cursor, limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [serialize_user(user) for user in users], 'next_cursor': next_cursor})
+
+@route('/api/admin/results')
+@login_required
+@admin_required
+def api_admin_results():
+    """Keyset-paginated result list. Filters: test_id, user_id, q (student name prefix), section_id"""
+    sort_columns = {'date_taken': Result.date_taken, 'score': Result.score}
+    sort, descending, cursor, limit = admin_page_args(sort_columns, 'date_taken', 'desc')
+    sort_column = sort_columns[sort]
+    
+    query = db.session.query(Result, User.name, User.student_id, Test.title) \
+        .join(User, Result.user_id == User.id) \
+        .join(Test, Result.test_id == Test.id)
+    section_id = request.args.get('section_id', type=int)
+    if section_id:
+        query = scope_results(query, section_id)
+    test_id = request.args.get('test_id', type=int)
+    if test_id:
+        query = query.filter(Result.test_id == test_id)
+    user_id = request.args.get('user_id', type=int)
+    if user_id:
+        query = query.filter(Result.user_id == user_id)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(User.name.ilike(f'{search}%'))
+    
+    try:
+        rows, next_cursor = keyset_paginate(query, sort_column, Result.id, descending, cursor, limit,
+                                            row_key=lambda row: (getattr(row[0], sort), row[0].id))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [serialize_result(*row) for row in rows], 'next_cursor': next_cursor})
+
+@route('/api/admin/tests')
+@login_required
+@admin_required
+def api_admin_tests():
+    """Keyset-paginated test list with question and result counts. Filters: q (title prefix), section_id"""
+    sort_columns = {'title': Test.title, 'created_at': Test.created_at, 'id': Test.id}
+    sort, descending, cursor, limit = admin_page_args(sort_columns, 'title')
+    
+    query = Test.query
+    section_id = request.args.get('section_id', type=int)
+    if section_id:
+        query = scope_tests(query, section_id)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(Test.title.ilike(f'{search}%'))
+    
+    try:
+        tests, next_cursor = keyset_paginate(query, sort_columns[sort], Test.id, descending, cursor, limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Counts for just this page, one grouped query each
+    test_ids = [test.id for test in tests]
+    question_counts = get_question_counts(test_ids)
+    result_query = db.session.query(Result.test_id, func.count(Result.id)).filter(Result.test_id.in_(test_ids))
+    if section_id:
+        result_query = scope_results(result_query, section_id)
+    result_counts = dict(result_query.group_by(Result.test_id).all()) if test_ids else {}
+    
+    return jsonify({
+        'items': [{
+            'id': test.id,
+            'title': test.title,
+            'description': test.description,
+            'time_limit': test.time_limit,
+            'learning_resource_id': test.learning_resource_id,
+            'created_at': test.created_at.isoformat() if test.created_at else None,
+            'question_count': question_counts.get(test.id, 0),
+            'result_count': result_counts.get(test.id, 0)
+        } for test in tests],
+        'next_cursor': next_cursor
+    })
+
+def security_event_filters():
+    """The filters shared by the security event views; raises ValueError for a malformed time"""
+    filters = {
+        'test_id': request.args.get('test_id', type=int),
+        'user_id': request.args.get('user_id', type=int),
+        'attempt_id': request.args.get('attempt_id', type=int),
+        'event_type': request.args.get('type', '').strip() or None,
+    }
+    for name in ('since', 'until'):
+        value = request.args.get(name, '').strip()
+        filters[name] = to_utc(datetime.fromisoformat(value)) if value else None
+    return filters
 
-@app.route('/user/edit/<int:user_id>', methods=['GET', 'POST'])
+def serialize_security_event(event, student_name, student_id):
+    return {
+        'id': event.id,
+        'attempt_id': event.attempt_id,
+        'user_id': event.user_id,
+        'test_id': event.test_id,
+        'student_name': student_name,
+        'student_id': student_id,
+        'type': event.event_type,
+        'occurred_at': event.occurred_at.isoformat(),
+        'client_time': event.client_time,
+        'total_violations': event.total_violations
+    }
+
+@route('/api/admin/security_events')
+@login_required
+@admin_required
+def api_admin_security_events():
+    """Keyset-paginated security events, newest first.
+
+    Filters: test_id, user_id, attempt_id, type, since, until (ISO 8601;
+    without an offset, server local time like the forms).
+    """
+    sort, descending, cursor, limit = admin_page_args({'occurred_at': SecurityEvent.occurred_at}, 'occurred_at', 'desc')
+    try:
+        query = event_query(**security_event_filters())
+    except ValueError:
+        return jsonify({'error': 'since and until must be ISO 8601 times'}), 400
+    
+    try:
+        rows, next_cursor = keyset_paginate(query, SecurityEvent.occurred_at, SecurityEvent.id, descending, cursor, limit,
+                                            row_key=lambda row: (row[0].occurred_at, row[0].id))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [serialize_security_event(*row) for row in rows], 'next_cursor': next_cursor})
+
+@route('/api/admin/fragment_cache')
+@login_required
+@admin_required
+def api_admin_fragment_cache():
+    return jsonify(current_app.extensions['fragment_cache'].stats())
+
+@route('/admin/fragment_cache/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_fragment_cache():
+    current_app.extensions['fragment_cache'].clear()
+    current_app.logger.info(f'Fragment cache cleared by {current_user.username}')
+    flash('Page cache cleared', 'success')
+    return redirect(url_for('dashboard'))
+
+def get_question_counts(test_ids=None):
+    query = db.session.query(Question.test_id, func.count(Question.id)).group_by(Question.test_id)
+    if test_ids is not None:
+        if not test_ids:
+            return {}
+        query = query.filter(Question.test_id.in_(test_ids))
+    return dict(query.all())
+
+@route('/user/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_user(user_id):
@@ -285,7 +643,7 @@ def edit_user(user_id):
     
     return render_template('edit_user.html', user=user)
 
-@app.route('/user/delete/<int:user_id>', methods=['POST'])
+@route('/user/delete/<int:user_id>', methods=['POST'])
 @login_required
 @admin_required
 def delete_user(user_id):
@@ -300,12 +658,13 @@ def delete_user(user_id):
         # Store user name for success message
         user_name = user.name
         
-        # Delete all results associated with this user first
-        results = Result.query.filter_by(user_id=user_id).all()
-        for result in results:
-            db.session.delete(result)
+        # Resources the user uploaded stay in the library under the deleting admin
+        LearningResource.query.filter_by(created_by=user_id).update({'created_by': current_user.id})
         
-        # Then delete the user
+        # The tests the user's results counted towards need their analytics redone
+        mark_tests_stale(test_id for (test_id,) in db.session.query(Result.test_id).filter_by(user_id=user_id))
+        
+        # One DELETE; results, attempts and progress go with it (ON DELETE CASCADE)
         db.session.delete(user)
         db.session.commit()
         
@@ -317,10 +676,10 @@ def delete_user(user_id):
     
     return redirect(url_for('dashboard'))
 
-@app.route('/result/<int:result_id>')
+@route('/result/<int:result_id>')
 @login_required
 def view_result(result_id):
-    result = Result.query.get_or_404(result_id)
+    result = get_result_or_404(result_id)
     
     # Only admin or the owner can view their result
     if current_user.role != 'admin' and result.user_id != current_user.id:
@@ -329,21 +688,31 @@ def view_result(result_id):
     
     # Parse the raw_data JSON to display question details
     result_data = json.loads(result.raw_data) if result.raw_data else {}
+    events, started_at, event_counts = result_timeline(result)
     
-    return render_template('result.html', result=result, result_data=result_data)
+    return render_template('result.html', result=result, result_data=result_data,
+                          security_events=events, attempt_started_at=started_at, event_counts=event_counts)
+
+def question_answers(raw_data):
+    """The per-question entries of a result's raw_data, in order.
 
-@app.route('/export_result_csv/<int:result_id>')
+    raw_data also holds security_info and attempt_info; only the mappings
+    with an is_correct are questions (as in result.html).
+    """
+    return [data for data in json.loads(raw_data).values() if isinstance(data, dict) and 'is_correct' in data]
+
+@route('/export_result_csv/<int:result_id>')
 @login_required
 def export_result_csv(result_id):
-    result = Result.query.get_or_404(result_id)
+    result = get_result_or_404(result_id)
     
     # Only admin or the owner can export their result
     if current_user.role != 'admin' and result.user_id != current_user.id:
         flash('You do not have permission to export this result')
         return redirect(url_for('dashboard'))
     
-    # Get all results for this user
-    user_results = Result.query.filter_by(user_id=result.user_id).order_by(Result.date_taken.desc()).all()
+    # Get all results for this user, including archived terms
+    user_results = student_results(result.user_id, with_raw_data=True)
     
     # Create CSV content
     output = io.StringIO()
@@ -355,7 +724,7 @@ def export_result_csv(result_id):
     
     for user_result in user_results:
         if user_result.raw_data:
-            result_data = json.loads(user_result.raw_data)
+            result_data = question_answers(user_result.raw_data)
             all_test_data[user_result.id] = result_data
             max_questions = max(max_questions, len(result_data))
       # Create header row
@@ -373,8 +742,8 @@ def export_result_csv(result_id):
       # Write data for each test result
     for user_result in user_results:
         if user_result.raw_data:
-            result_data = json.loads(user_result.raw_data)
-            correct_count = sum(1 for data in result_data.values() if data.get('is_correct', False))
+            result_data = all_test_data[user_result.id]
+            correct_count = sum(1 for data in result_data if data.get('is_correct', False))
             total_count = len(result_data)
         else:
             result_data = {}
@@ -395,8 +764,7 @@ def export_result_csv(result_id):
         # Add user answers for each question (fill empty cells for tests with fewer questions)
         for i in range(max_questions):
             if i < len(result_data):
-                question_data = list(result_data.values())[i]
-                row.append(question_data.get('user_answer', ''))
+                row.append(result_data[i].get('user_answer', ''))
             else:
                 row.append('')  # Empty cell for tests with fewer questions
         
@@ -448,7 +816,12 @@ def get_file_size(file_path):
     except:
         return 0
 
-@app.route('/create_test')
+def schedule_file_cleanup(paths):
+    """Remove files of deleted rows in the background (see file_cleanup.py)"""
+    if paths:
+        executor.submit(remove_unreferenced_files, current_app._get_current_object(), paths, time.time())
+
+@route('/create_test')
 @login_required
 @admin_required
 def create_test():
@@ -459,8 +832,14 @@ def create_test():
     if test_id:
         test = Test.query.get_or_404(test_id)
     
-    # Get all tests
-    tests = Test.query.all()
+    # One page of tests by title, with question counts for just that page
+    try:
+        tests, tests_cursor = keyset_paginate(Test.query, Test.title, Test.id,
+                                              cursor=request.args.get('cursor') or None,
+                                              limit=current_app.config['ADMIN_PAGE_SIZE'])
+    except InvalidCursor:
+        return redirect(url_for('create_test'))
+    question_counts = get_question_counts([t.id for t in tests])
     
     # If a test_id is specified for question management
     current_test_id = request.args.get('test_id', None)
@@ -479,11 +858,13 @@ def create_test():
     
     return render_template('create_test.html', 
                           tests=tests, 
+                          tests_cursor=tests_cursor,
+                          question_counts=question_counts,
                           test=test, 
                           current_test=current_test,
                           question=question)
 
-@app.route('/create_test_set', methods=['POST'])
+@route('/create_test_set', methods=['POST'])
 @login_required
 @admin_required
 def create_test_set():
@@ -492,12 +873,20 @@ def create_test_set():
     time_limit = int(request.form.get('time_limit', 30))
     test_id = request.form.get('test_id', '')
     learning_resource_id = request.form.get('learning_resource_id', '') or None
+    window = window_from_form()
+    if window is None:
+        return redirect(url_for('create_test', edit_test=test_id) if test_id else url_for('create_test'))
+    opens_at, closes_at = window
     
     if test_id:  # Update existing test
         test = Test.query.get_or_404(test_id)
         test.title = test_title
         test.description = test_description
         test.time_limit = time_limit
+        test.opens_at = opens_at
+        test.closes_at = closes_at
+        if str(test.learning_resource_id or '') != str(learning_resource_id or ''):
+            mark_tests_stale([test.id])
         test.learning_resource_id = learning_resource_id
         test.updated_at = datetime.utcnow()
         flash('Test updated successfully')
@@ -506,39 +895,133 @@ def create_test_set():
             title=test_title,
             description=test_description,
             time_limit=time_limit,
-            learning_resource_id=learning_resource_id
+            learning_resource_id=learning_resource_id,
+            opens_at=opens_at,
+            closes_at=closes_at
         )
         db.session.add(test)
         flash('Test created successfully')
     
+    # A closing time moved earlier cuts short the attempts already running
+    moved = cap_deadlines(test.id) if test_id else []
     db.session.commit()
+    opening_soon().invalidate()
+    if moved:
+        exam_hub().broadcast({'type': 'sync'}, test.id, moved)
     return redirect(url_for('create_test'))
 
-@app.route('/delete_test', methods=['POST'])
+def window_from_form():
+    """(opens_at, closes_at) in UTC from the form's local times; flashes and returns None when invalid"""
+    try:
+        opens_at = parse_local(request.form.get('opens_at'))
+        closes_at = parse_local(request.form.get('closes_at'))
+    except ValueError:
+        flash('Invalid opening or closing time')
+        return None
+    if opens_at and closes_at and closes_at <= opens_at:
+        flash('The closing time must be after the opening time')
+        return None
+    return opens_at, closes_at
+
+@route('/admin/tests/<int:test_id>/live')
 @login_required
 @admin_required
-def delete_test():
-    test_id = request.form.get('test_id')
+def live_exam(test_id):
+    """The test's running attempts, with the commands sent over their exam channels"""
     test = Test.query.get_or_404(test_id)
+    attempts = db.session.query(TestAttempt, User).join(User, User.id == TestAttempt.user_id) \
+        .filter(TestAttempt.test_id == test_id, TestAttempt.status == 'active') \
+        .order_by(User.name).all()
+    return render_template('admin_live_exam.html',
+                          test=test,
+                          attempts=attempts,
+                          connected=exam_hub().connected_attempts(test_id),
+                          utcnow=datetime.utcnow())
+
+@route('/admin/tests/<int:test_id>/live/<any(extend, end, message):command>', methods=['POST'])
+@login_required
+@admin_required
+def live_exam_command(test_id, command):
+    """Extend or end the running attempts (all, or the ticked ones), or message their students"""
+    Test.query.get_or_404(test_id)
+    attempt_ids = request.form.getlist('attempt_id', type=int) or None
+    text = request.form.get('message', '').strip()
+    minutes = request.form.get('minutes', type=int)
+    if command == 'extend' and not (minutes and 0 < minutes <= 24 * 60):
+        flash('Enter the number of minutes to add')
+        return redirect(url_for('live_exam', test_id=test_id))
+    if command == 'message' and not text:
+        flash('Enter a message to send')
+        return redirect(url_for('live_exam', test_id=test_id))
     
-    # Delete all results associated with this test first
-    results = Result.query.filter_by(test_id=test_id).all()
-    for result in results:
-        db.session.delete(result)
+    try:
+        if command == 'extend':
+            changed = extend_attempts(test_id, minutes, attempt_ids)
+            message = {'type': 'extend', 'minutes': minutes,
+                       'message': text or f'Your time has been extended by {minutes} minutes.'}
+        elif command == 'end':
+            changed = end_attempts(test_id, attempt_ids)
+            message = {'type': 'end', 'message': text or 'The exam has been ended. Your answers are being submitted.'}
+        else:
+            changed = attempt_ids
+            message = {'type': 'message', 'message': text}
+        db.session.commit()
+        
+        # Deadlines are already moved; the channel just tells the students now
+        delivered = exam_hub().broadcast(message, test_id, changed)
+        current_app.logger.info('Live exam command sent', extra={
+            'event': 'live_exam_command', 'command': command, 'test_id': test_id, 'admin': current_user.username,
+            'attempts': len(changed) if changed is not None else None, 'delivered': delivered})
+        flash(f'Sent to {delivered} connected student(s)' if command == 'message' else
+              f'Updated {len(changed)} attempt(s); {delivered} connected student(s) notified')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error sending command: {str(e)}')
+    return redirect(url_for('live_exam', test_id=test_id))
+
+@route('/admin/tests/<int:test_id>/security')
+@login_required
+@admin_required
+def security_events(test_id):
+    """A test's security events, newest first, optionally of one type"""
+    test = Test.query.get_or_404(test_id)
+    event_type = request.args.get('type', '').strip() or None
+    try:
+        events, next_cursor = keyset_paginate(event_query(test_id=test_id, event_type=event_type),
+                                              SecurityEvent.occurred_at, SecurityEvent.id, descending=True,
+                                              cursor=request.args.get('cursor'),
+                                              limit=current_app.config['ADMIN_MAX_PAGE_SIZE'],
+                                              row_key=lambda row: (row[0].occurred_at, row[0].id))
+    except InvalidCursor:
+        return redirect(url_for('security_events', test_id=test_id, type=event_type))
+    return render_template('admin_security_events.html',
+                          test=test,
+                          events=events,
+                          counts=test_event_counts(test_id),
+                          event_type=event_type,
+                          next_cursor=next_cursor)
+
+@route('/delete_test', methods=['POST'])
+@login_required
+@admin_required
+def delete_test():
+    test_id = request.form.get('test_id', type=int)  # PostgreSQL won't compare an integer column to text
+    test = Test.query.get_or_404(test_id)
     
-    # Delete all questions associated with this test
-    questions = Question.query.filter_by(test_id=test_id).all()
-    for question in questions:
-        db.session.delete(question)
+    # Question images are looked up before the rows pointing at them are gone
+    files = test_files(current_app, test_id)
     
-    # Finally, delete the test
+    # One DELETE; questions, results and attempts go with it (ON DELETE CASCADE)
+    mark_test_students_stale(test_id)
     db.session.delete(test)
     db.session.commit()
+    opening_soon().invalidate()
+    schedule_file_cleanup(files)
     
     flash('Test updated successfully')
     return redirect(url_for('create_test'))
 
-@app.route('/manage_questions/<int:test_id>')
+@route('/manage_questions/<int:test_id>')
 @login_required
 @admin_required
 def manage_questions(test_id):
@@ -550,7 +1033,7 @@ def manage_questions(test_id):
     else:
         return redirect(url_for('create_test', test_id=test_id, tab='questions'))
 
-@app.route('/create_question/<int:test_id>', methods=['POST'])
+@route('/create_question/<int:test_id>', methods=['POST'])
 @login_required
 @admin_required
 def create_question(test_id):
@@ -588,7 +1071,7 @@ def create_question(test_id):
                     filename = secure_filename(file.filename)
                     # Create unique filename with question info
                     unique_filename = f"choice_{test_id}_{int(datetime.now().timestamp())}_{i}_{filename}"
-                    upload_folder = os.path.join(app.static_folder, 'uploads')
+                    upload_folder = os.path.join(current_app.static_folder, 'uploads')
                     
                     if not os.path.exists(upload_folder):
                         os.makedirs(upload_folder)
@@ -619,7 +1102,7 @@ def create_question(test_id):
         file = request.files['image_file']
         if file and file.filename and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            upload_folder = os.path.join(app.static_folder, 'uploads')
+            upload_folder = os.path.join(current_app.static_folder, 'uploads')
             
             if not os.path.exists(upload_folder):
                 os.makedirs(upload_folder)
@@ -657,7 +1140,7 @@ def create_question(test_id):
     db.session.commit()
     return redirect(url_for('manage_questions', test_id=test_id))
 
-@app.route('/delete_question', methods=['POST'])
+@route('/delete_question', methods=['POST'])
 @login_required
 @admin_required
 def delete_question():
@@ -665,24 +1148,32 @@ def delete_question():
     test_id = request.form.get('test_id')
     
     question = Question.query.get_or_404(question_id)
+    files = question_files(current_app, [(question.image_path, question.choice_images)])
     db.session.delete(question)
     db.session.commit()
+    schedule_file_cleanup(files)
     
     flash('Question deleted successfully')
     return redirect(url_for('manage_questions', test_id=test_id))
 
-@app.route('/available_tests')
+@route('/available_tests')
 @login_required
 def available_tests():
     if current_user.role == 'admin':
         flash('This page is for students to take tests')
         return redirect(url_for('dashboard'))
     
-    # Get all available tests
-    tests = Test.query.all()
+    # Tests assigned to the student's sections, and those open to everyone
+    tests = visible_tests(current_user.id).all()
+    
+    # Each test's window: the student's sections' overrides, else the test's own
+    section_windows = student_windows(current_user.id)
+    windows = {test.id: section_windows.get(test.id, (test.opens_at, test.closes_at)) for test in tests}
+    utcnow = datetime.utcnow()
+    window_status = {test_id: availability_status(window, utcnow) for test_id, window in windows.items()}
     
     # Get user's results
-    user_results = Result.query.filter_by(user_id=current_user.id).all()
+    user_results = student_results(current_user.id)
     
     # Create a set of completed test IDs
     completed_tests = {result.test_id for result in user_results}
@@ -695,9 +1186,12 @@ def available_tests():
                           user_results=user_results,
                           completed_tests=completed_tests,
                           test_results=test_results,
+                          windows=windows,
+                          window_status=window_status,
+                          question_counts=get_question_counts([test.id for test in tests]),
                           now=datetime.now())
 
-@app.route('/take_test/<int:test_id>')
+@route('/take_test/<int:test_id>')
 @login_required
 def take_test(test_id):
     if current_user.role == 'admin':
@@ -707,9 +1201,13 @@ def take_test(test_id):
     # Check if the test exists
     test = Test.query.get_or_404(test_id)
     
+    # Check if the test is open to the student's sections
+    if not can_take_test(current_user.id, test_id):
+        flash('This test is not assigned to your section')
+        return redirect(url_for('available_tests'))
+    
     # Check if the user has already taken this test
-    existing_result = Result.query.filter_by(user_id=current_user.id, test_id=test_id).first()
-    if existing_result:
+    if has_taken_test(current_user.id, test_id):
         flash('You have already taken this test')
         return redirect(url_for('available_tests'))
     
@@ -718,21 +1216,51 @@ def take_test(test_id):
         flash('This test has no questions')
         return redirect(url_for('available_tests'))
     
+    # New attempts only start inside the student's window; one already running may resume
+    window = test_window(current_user.id, test)
+    window_status = availability_status(window)
+    if window_status != OPEN and not get_active_attempt(current_user.id, test_id):
+        if window_status == UPCOMING:
+            flash(f'This test opens on {to_local(window[0]):%b %d, %Y %I:%M %p}')
+        else:
+            flash(f'This test closed on {to_local(window[1]):%b %d, %Y %I:%M %p}')
+        return redirect(url_for('available_tests'))
+    
+    # Open or resume the server-side attempt; the deadline is fixed on the server
+    attempt, created = start_attempt(current_user.id, test, closes_at=window[1])
+    
+    # An attempt that ran out of time while the student was away is submitted now
+    if is_past_deadline(attempt, current_app.config['EXAM_GRACE_PERIOD_SECONDS']):
+        telemetry().flush()
+        result = finalize_attempt(attempt, auto_submitted=True)
+        db.session.commit()
+        session.pop('active_test_id', None)
+        session.pop('attempt_id', None)
+        session.pop('test_start_time', None)
+        flash('The time limit for this test has passed. Your saved answers were submitted automatically.')
+        if result:
+            return redirect(url_for('view_result', result_id=result.id))
+        return redirect(url_for('available_tests'))
+    
     # Set active test session to prevent access to resources
     session['active_test_id'] = test_id
-    session['test_start_time'] = datetime.utcnow().isoformat()
-    session['security_violations'] = 0
-    session['tab_switches'] = 0
-    session['fullscreen_exits'] = 0
-    session['security_log'] = []
+    session['test_start_time'] = attempt.started_at.isoformat()
+    session['attempt_id'] = attempt.id
     session.permanent = True
     
     # Log test start
-    app.logger.info(f'Test started: User {current_user.id} ({current_user.name}) started test {test_id} ({test.title})')
+    if not created:
+        current_app.logger.info('Test resumed', extra={'event': 'test_resumed', 'test_id': test_id, 'attempt_id': attempt.id})
+    else:
+        current_app.logger.info('Test started', extra={'event': 'test_started', 'test_id': test_id, 'attempt_id': attempt.id})
     
-    return render_template('take_test.html', test=test)
+    return render_template('take_test.html',
+                          test=test,
+                          attempt=attempt,
+                          remaining_seconds=attempt.remaining_seconds(),
+                          saved_answers=load_answers(attempt))
 
-@app.route('/submit_test/<int:test_id>', methods=['POST'])
+@route('/submit_test/<int:test_id>', methods=['POST'])
 @login_required
 def submit_test(test_id):
     if current_user.role == 'admin':
@@ -743,105 +1271,68 @@ def submit_test(test_id):
     test = Test.query.get_or_404(test_id)
     
     # Check if the user has already taken this test
-    existing_result = Result.query.filter_by(user_id=current_user.id, test_id=test_id).first()
-    if existing_result:
+    if has_taken_test(current_user.id, test_id):
         flash('You have already taken this test')
         return redirect(url_for('available_tests'))
     
+    # The attempt, not the browser, decides whether time is up
+    attempt = get_active_attempt(current_user.id, test_id)
+    if not attempt:
+        flash('Invalid test session. Please start the test again.')
+        return redirect(url_for('available_tests'))
+    
     # Verify this matches the active test session
     if session.get('active_test_id') != test_id:
         flash('Invalid test session. Please start the test again.')
         return redirect(url_for('available_tests'))
     
-    # Process the test submission
-    questions = test.questions
-    
-    if not questions:
+    if not test.questions:
         flash('This test has no questions')
         return redirect(url_for('available_tests'))
     
-    # Calculate score
-    total_questions = len(questions)
-    correct_answers = 0
-    result_data = {}
-    
-    for question in questions:
-        # Get the user's answer for this question
-        user_answer = request.form.get(f'answer_{question.id}', '').strip()
-        
-        # Check if the answer is correct
-        is_correct = False
-        if user_answer.lower() == question.correct_answer.lower():
-            correct_answers += 1
-            is_correct = True
-        
-        # Store question data with consistent structure
-        question_data = {
-            'question_text': question.question_text,
-            'question_type': question.question_type,
-            'user_answer': user_answer,
-            'correct_answer': question.correct_answer,
-            'is_correct': is_correct
-        }
-        
-        if question.image_path:
-            question_data['image_path'] = question.image_path
-            
-        if question.question_type == 'multiple_choice':
-            if question.choices:
-                question_data['choices'] = json.loads(question.choices)
-            if question.choice_images:
-                question_data['choice_images'] = json.loads(question.choice_images)
-        
-        # Use string key to ensure consistency
-        result_data[str(question.id)] = question_data
-    
-    # Calculate percentage score
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    
-    # Get security information from session
-    security_violations = session.get('security_violations', 0)
-    tab_switches = session.get('tab_switches', 0)
-    fullscreen_exits = session.get('fullscreen_exits', 0)
-    security_log = session.get('security_log', [])
-    
-    # Add security information to result data
-    result_data['security_info'] = {
-        'violations': security_violations,
-        'tab_switches': tab_switches,
-        'fullscreen_exits': fullscreen_exits,
-        'security_log': security_log[:10]  # Store only last 10 entries
-    }
+    # Late submissions are graded from the answers autosaved before the deadline
+    late_submission = is_past_deadline(attempt, current_app.config['EXAM_GRACE_PERIOD_SECONDS'])
+    if late_submission:
+        answers = load_answers(attempt)
+    else:
+        answers = {str(question.id): request.form.get(f'answer_{question.id}', '') for question in test.questions}
     
-    # Create result record
-    result = Result(
-        user_id=current_user.id,
-        test_id=test_id,
-        score=score,
-        raw_data=json.dumps(result_data)
-    )
+    # Security counters and log come from the attempt, once the buffered telemetry is written
+    telemetry().flush()
+    security_violations = attempt.security_violations or 0
+    tab_switches = attempt.tab_switches or 0
+    fullscreen_exits = attempt.fullscreen_exits or 0
     
-    db.session.add(result)
+    result = finalize_attempt(attempt, answers=answers, auto_submitted=late_submission)
     db.session.commit()
     
+    if result is None:
+        # The sweeper got there first
+        session.pop('active_test_id', None)
+        session.pop('attempt_id', None)
+        flash('You have already taken this test')
+        return redirect(url_for('available_tests'))
+    score = result.score
+    
     # Log test completion with security info
-    app.logger.info(f'Test completed: User {current_user.id} ({current_user.name}) completed test {test_id} with score {score:.1f}%. Security violations: {security_violations}, Tab switches: {tab_switches}, Fullscreen exits: {fullscreen_exits}')
+    current_app.logger.info('Test completed', extra={
+        'event': 'test_completed', 'test_id': test_id, 'result_id': result.id, 'score': round(score, 1),
+        'security_violations': security_violations, 'tab_switches': tab_switches, 'fullscreen_exits': fullscreen_exits})
     
     # Clear active test session after submission
     session.pop('active_test_id', None)
+    session.pop('attempt_id', None)
     session.pop('test_start_time', None)
-    session.pop('last_heartbeat', None)
-    session.pop('security_violations', None)
-    session.pop('tab_switches', None)
-    session.pop('fullscreen_exits', None)
-    session.pop('security_log', None)
     session.permanent = True
     
     # Redirect to result page
-    flash(f'Test submitted successfully. Your score: {score:.1f}%')
+    if late_submission:
+        flash(f'The time limit had passed, so your last saved answers were submitted. Your score: {score:.1f}%')
+    else:
+        flash(f'Test submitted successfully. Your score: {score:.1f}%')
     return redirect(url_for('view_result', result_id=result.id))
 
-@app.route('/student_records/<int:user_id>')
+@route('/student_records/<int:user_id>')
 @login_required
 @admin_required
 def view_student_records(user_id):
@@ -853,61 +1344,344 @@ def view_student_records(user_id):
         flash('Records can only be viewed for student accounts')
         return redirect(url_for('dashboard'))
     
-    # Get all results for this student
-    results = Result.query.filter_by(user_id=user_id).order_by(Result.date_taken.desc()).all()
-    
-    # Calculate statistics
-    total_tests_taken = len(results)
-    if total_tests_taken > 0:
-        average_score = sum(result.score for result in results) / total_tests_taken
-        highest_score = max(result.score for result in results)
-        lowest_score = min(result.score for result in results)
-        
-        # Count scores by grade levels
-        excellent_count = len([r for r in results if r.score >= 90])
-        good_count = len([r for r in results if 70 <= r.score < 90])
-        fair_count = len([r for r in results if 50 <= r.score < 70])
-        poor_count = len([r for r in results if r.score < 50])
-    else:
-        average_score = 0
-        highest_score = 0
-        lowest_score = 0
-        excellent_count = good_count = fair_count = poor_count = 0
-    
-    # Get total available tests
-    total_available_tests = Test.query.count()
-    
-    statistics = {
-        'total_tests_taken': total_tests_taken,
-        'total_available_tests': total_available_tests,
-        'completion_rate': (total_tests_taken / total_available_tests * 100) if total_available_tests > 0 else 0,
-        'average_score': average_score,
-        'highest_score': highest_score,
-        'lowest_score': lowest_score,
-        'excellent_count': excellent_count,
-        'good_count': good_count,
-        'fair_count': fair_count,
-        'poor_count': poor_count
-    }
+    # Statistics come from the cached summary; the history is paged, newest first
+    cursor = request.args.get('cursor') or None
+    try:
+        results, next_cursor = student_results_page(user_id, cursor, limit=current_app.config['ADMIN_PAGE_SIZE'])
+    except InvalidCursor:
+        return redirect(url_for('view_student_records', user_id=user_id))
+    statistics = summary_statistics(summaries([user_id])[user_id], visible_tests(user_id).count())
     
     return render_template('student_records.html', 
                           student=student, 
                           results=results, 
                           statistics=statistics,
+                          cursor=cursor,
+                          next_cursor=next_cursor,
                           now=datetime.now())
 
-@app.route('/learning_resources')
+@route('/api/admin/students/summary')
+@login_required
+@admin_required
+def api_admin_student_summaries():
+    """Record statistics for many students at once: ids=1,2,3 or section_id (at most ADMIN_MAX_PAGE_SIZE)"""
+    try:
+        user_ids = [int(user_id) for user_id in request.args.get('ids', '').split(',') if user_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of user ids'}), 400
+    section_id = request.args.get('section_id', type=int)
+    if section_id and not user_ids:
+        user_ids = [user_id for (user_id,) in db.session.query(SectionMembership.user_id)
+                    .filter(SectionMembership.section_id == section_id, SectionMembership.role == 'student')]
+    if len(user_ids) > current_app.config['ADMIN_MAX_PAGE_SIZE']:
+        return jsonify({'error': f'At most {current_app.config["ADMIN_MAX_PAGE_SIZE"]} students per request'}), 400
+    
+    students = User.query.filter(User.id.in_(user_ids), User.role == 'student').all() if user_ids else []
+    student_summaries = summaries(student.id for student in students)
+    available_tests = visible_test_counts([student.id for student in students])
+    
+    items = []
+    for student in sorted(students, key=lambda student: student.name):
+        statistics = summary_statistics(student_summaries[student.id], available_tests[student.id])
+        statistics['last_taken'] = statistics['last_taken'].isoformat() if statistics['last_taken'] else None
+        items.append(dict(statistics, id=student.id, name=student.name, student_id=student.student_id,
+                          records_url=url_for('view_student_records', user_id=student.id)))
+    found = {student.id for student in students}
+    return jsonify({'items': items, 'not_found': [user_id for user_id in user_ids if user_id not in found]})
+
+def load_analytics(section=None):
+    """Bring stale tests up to date, then read the analytics rows (of the section's tests)"""
+    try:
+        refresh_analytics()
+    except Exception as e:
+        current_app.logger.error(f'Error refreshing analytics: {str(e)}')
+        flash('Some analytics could not be updated and may be out of date')
+    query = TestAnalytics.query.join(Test, Test.id == TestAnalytics.test_id)
+    if section:
+        query = scope_tests(query, section.id)
+    return query.options(joinedload(TestAnalytics.test), joinedload(TestAnalytics.resource)) \
+        .order_by(Test.title).all()
+
+def at_risk_query(section=None):
+    """At-risk students (only the section's members)"""
+    query = AtRiskStudent.query
+    if section:
+        query = query.join(SectionMembership, and_(SectionMembership.user_id == AtRiskStudent.user_id,
+                                                   SectionMembership.section_id == section.id))
+    return query
+
+@route('/admin/analytics')
+@route('/admin/analytics/<int:test_id>')
+@login_required
+@admin_required
+def analytics(test_id=None):
+    section = selected_section()
+    rows = load_analytics(section)
+    
+    # One test's score distributions and at-risk students
+    selected = None
+    at_risk = []
+    if test_id is not None:
+        selected = next((row for row in rows if row.test_id == test_id), None)
+        if selected is None:
+            flash('Test not found')
+            return redirect(url_for('analytics'))
+        at_risk = at_risk_query(section).filter(AtRiskStudent.test_id == test_id) \
+            .options(joinedload(AtRiskStudent.user)).order_by(AtRiskStudent.score).all()
+    
+    return render_template('admin_analytics.html', rows=rows, selected=selected, at_risk=at_risk, section=section,
+                           sections=Section.query.order_by(Section.name).all())
+
+def csv_response(rows, filename):
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    response = make_response(output.getvalue())
+    response.headers['Content-Type'] = 'text/csv'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}_{datetime.now().strftime("%Y%m%d")}.csv'
+    return response
+
+def format_average(value):
+    return f'{value:.1f}' if value is not None else ''
+
+@route('/admin/analytics/export')
+@login_required
+@admin_required
+def export_analytics_csv():
+    rows = [['Test Name', 'Learning Resource', 'Students', 'Completed Resource', 'Completed Average',
+             'Not Completed', 'Not Completed Average', 'Never Opened']
+            + [f'Time Spent P{percent} (min)' for percent in ANALYTICS_QUANTILES]
+            + ['Time/Score Correlation', 'At Risk', 'Computed At']]
+    for row in load_analytics(selected_section()):
+        quantiles = json.loads(row.time_spent_quantiles) if row.time_spent_quantiles else {}
+        rows.append([
+            row.test.title,
+            row.resource.title if row.resource else '',
+            row.students,
+            row.completed_students,
+            format_average(row.completed_average),
+            row.other_students,
+            format_average(row.other_average),
+            row.not_opened_students,
+            *[f'{quantiles[f"p{percent}"] / 60:.1f}' if quantiles else '' for percent in ANALYTICS_QUANTILES],
+            f'{row.time_score_correlation:.2f}' if row.time_score_correlation is not None else '',
+            row.at_risk_students,
+            row.computed_at.strftime('%Y-%m-%d %H:%M') if row.computed_at else ''
+        ])
+    return csv_response(rows, 'Learning_Analytics')
+
+@route('/admin/analytics/export_at_risk')
+@route('/admin/analytics/<int:test_id>/export_at_risk')
+@login_required
+@admin_required
+def export_at_risk_csv(test_id=None):
+    section = selected_section()
+    load_analytics(section)
+    query = at_risk_query(section).with_entities(AtRiskStudent, Test.title, User.name, User.student_id) \
+        .join(Test, Test.id == AtRiskStudent.test_id).join(User, User.id == AtRiskStudent.user_id)
+    if test_id is not None:
+        query = query.filter(AtRiskStudent.test_id == test_id)
+    
+    rows = [['Test Name', 'Student Name', 'Student ID', 'Score', 'Resource Progress', 'Time Spent (min)']]
+    for student, title, name, student_id in query.order_by(Test.title, AtRiskStudent.score):
+        rows.append([
+            title, name, student_id, f'{student.score:.1f}%',
+            f'{student.progress_percentage:.0f}%' if student.progress_percentage is not None else 'Never opened',
+            f'{(student.time_spent or 0) / 60:.1f}' if student.progress_percentage is not None else ''
+        ])
+    return csv_response(rows, 'At_Risk_Students')
+
+@route('/admin/sections', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def manage_sections():
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        if not name:
+            flash('Section name is required')
+            return redirect(url_for('manage_sections'))
+        if Section.query.filter_by(name=name).first():
+            flash(f'A section named "{name}" already exists')
+            return redirect(url_for('manage_sections'))
+        try:
+            section = Section(name=name, description=request.form.get('description', '').strip())
+            db.session.add(section)
+            db.session.commit()
+            current_app.logger.info('Section created', extra={
+                'event': 'section_created', 'section_id': section.id, 'name': name, 'admin': current_user.username})
+            flash('Section created successfully')
+            return redirect(url_for('manage_section', section_id=section.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error creating section: {str(e)}')
+            return redirect(url_for('manage_sections'))
+    
+    return render_template('admin_sections.html',
+                          sections=Section.query.order_by(Section.name).all(),
+                          counts=section_counts())
+
+@route('/admin/sections/<int:section_id>')
+@login_required
+@admin_required
+def manage_section(section_id):
+    section = Section.query.get_or_404(section_id)
+    members = SectionMembership.query.filter_by(section_id=section_id) \
+        .join(User, User.id == SectionMembership.user_id).options(joinedload(SectionMembership.user)) \
+        .order_by(SectionMembership.role.desc(), User.name).all()
+    tests = scope_tests(db.session.query(Test.id, Test.title, Test.opens_at, Test.closes_at,
+                                         SectionTest.opens_at.label('section_opens_at'),
+                                         SectionTest.closes_at.label('section_closes_at')),
+                        section_id).order_by(Test.title).all()
+    resources = db.session.query(LearningResource.id, LearningResource.title) \
+        .join(SectionResource, and_(SectionResource.resource_id == LearningResource.id,
+                                    SectionResource.section_id == section_id)) \
+        .order_by(LearningResource.title).all()
+    
+    # Everything that can still be assigned, for the pickers
+    assigned_tests = {test.id for test in tests}
+    assigned_resources = {resource.id for resource in resources}
+    other_tests = [test for test in db.session.query(Test.id, Test.title).order_by(Test.title)
+                   if test.id not in assigned_tests]
+    other_resources = [resource for resource in db.session.query(LearningResource.id, LearningResource.title)
+                       .filter(LearningResource.is_active.is_(True)).order_by(LearningResource.title)
+                       if resource.id not in assigned_resources]
+    
+    return render_template('admin_section.html',
+                          section=section,
+                          members=members,
+                          tests=tests,
+                          resources=resources,
+                          other_tests=other_tests,
+                          other_resources=other_resources)
+
+@route('/admin/sections/<int:section_id>/edit', methods=['POST'])
+@login_required
+@admin_required
+def edit_section(section_id):
+    section = Section.query.get_or_404(section_id)
+    name = request.form.get('name', '').strip()
+    if not name:
+        flash('Section name is required')
+        return redirect(url_for('manage_section', section_id=section_id))
+    if Section.query.filter(Section.name == name, Section.id != section_id).first():
+        flash(f'A section named "{name}" already exists')
+        return redirect(url_for('manage_section', section_id=section_id))
+    try:
+        section.name = name
+        section.description = request.form.get('description', '').strip()
+        db.session.commit()
+        flash('Section updated successfully')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating section: {str(e)}')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/admin/sections/<int:section_id>/delete', methods=['POST'])
+@login_required
+@admin_required
+def delete_section(section_id):
+    section = Section.query.get_or_404(section_id)
+    try:
+        # Memberships and assignments go with it (ON DELETE CASCADE); tests
+        # assigned to no other section become open to everyone again
+        db.session.delete(section)
+        db.session.commit()
+        opening_soon().invalidate()
+        current_app.logger.info('Section deleted', extra={
+            'event': 'section_deleted', 'section_id': section_id, 'name': section.name, 'admin': current_user.username})
+        flash('Section deleted successfully')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting section: {str(e)}')
+    return redirect(url_for('manage_sections'))
+
+@route('/admin/sections/<int:section_id>/members', methods=['POST'])
+@login_required
+@admin_required
+def add_section_members(section_id):
+    Section.query.get_or_404(section_id)
+    identifiers = re.split(r'[\s,;]+', request.form.get('members', ''))
+    try:
+        added, not_found = add_members(section_id, identifiers)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error adding members: {str(e)}')
+        return redirect(url_for('manage_section', section_id=section_id))
+    
+    flash(f'Added {len(added)} member(s)')
+    if not_found:
+        flash(f'No user found for: {", ".join(not_found)}')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/admin/sections/<int:section_id>/members/<int:user_id>/remove', methods=['POST'])
+@login_required
+@admin_required
+def remove_section_member(section_id, user_id):
+    remove_member(section_id, user_id)
+    db.session.commit()
+    flash('Member removed from the section')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/admin/sections/<int:section_id>/<any(tests, resources):kind>', methods=['POST'])
+@login_required
+@admin_required
+def assign_to_section(section_id, kind):
+    Section.query.get_or_404(section_id)
+    ids = request.form.getlist('ids', type=int)
+    try:
+        assign(kind, section_id, ids)
+        db.session.commit()
+        opening_soon().invalidate()
+        flash(f'Assigned {len(ids)} {kind} to the section')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error assigning {kind}: {str(e)}')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/admin/sections/<int:section_id>/<any(tests, resources):kind>/<int:item_id>/remove', methods=['POST'])
+@login_required
+@admin_required
+def unassign_from_section(section_id, kind, item_id):
+    unassign(kind, section_id, item_id)
+    db.session.commit()
+    opening_soon().invalidate()
+    flash('Removed from the section')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/admin/sections/<int:section_id>/tests/<int:test_id>/window', methods=['POST'])
+@login_required
+@admin_required
+def edit_section_window(section_id, test_id):
+    """Override the test's window for this section; empty fields keep the test's own"""
+    assignment = SectionTest.query.get_or_404((section_id, test_id))
+    window = window_from_form()
+    if window is not None:
+        assignment.opens_at, assignment.closes_at = window
+        touch(section_id)
+        moved = cap_deadlines(test_id)
+        db.session.commit()
+        opening_soon().invalidate()
+        if moved:
+            exam_hub().broadcast({'type': 'sync'}, test_id, moved)
+        flash('Test window updated for this section')
+    return redirect(url_for('manage_section', section_id=section_id))
+
+@route('/learning_resources')
 @login_required
 @check_test_session
 def learning_resources():
     if current_user.role == 'admin':
         # Admin view - manage all resources
-        resources = LearningResource.query.filter_by(is_active=True).order_by(LearningResource.created_at.desc()).all()
-        tests = Test.query.all()  # For linking tests to resources
-        return render_template('admin_learning_resources.html', resources=resources, tests=tests)
+        # Loaded only when the cached resource fragments are stale
+        load_resources = lazy(lambda: LearningResource.query.filter_by(is_active=True)
+                              .options(selectinload(LearningResource.files), selectinload(LearningResource.linked_tests))
+                              .order_by(LearningResource.created_at.desc()).all())
+        load_tests = lazy(lambda: db.session.query(Test.id, Test.title).order_by(Test.title).all())  # For linking tests to resources
+        return render_template('admin_learning_resources.html', load_resources=load_resources, load_tests=load_tests)
     else:
         # Student view - view available resources
-        resources = LearningResource.query.filter_by(is_active=True).order_by(LearningResource.created_at.desc()).all()
+        resources = LearningResource.query.filter(LearningResource.is_active.is_(True), visible_resource_filter(current_user.id)) \
+            .order_by(LearningResource.created_at.desc()).all()
         
         # Get student progress for each resource
         progress_data = {}
@@ -922,7 +1696,37 @@ def learning_resources():
                              resources=resources, 
                              progress_data=progress_data)
 
-@app.route('/upload_learning_resource', methods=['POST'])
+def search_page_args():
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 50))
+    return query, page, per_page
+
+@route('/api/search/questions')
+@login_required
+@admin_required
+def api_search_questions():
+    """Ranked full-text search over the question bank"""
+    query, page, per_page = search_page_args()
+    items, has_more = search_questions(query, page, per_page)
+    for item in items:
+        item['edit_url'] = url_for('manage_questions', test_id=item['test_id'], edit=item['id'])
+    return jsonify({'items': items, 'page': page, 'has_more': has_more})
+
+@route('/api/search/resources')
+@login_required
+@check_test_session
+def api_search_resources():
+    """Ranked full-text search over learning resources (students see active ones only)"""
+    query, page, per_page = search_page_args()
+    active_only = current_user.role != 'admin' or request.args.get('include_inactive') != '1'
+    visible_to = current_user.id if current_user.role != 'admin' else None
+    items, has_more = search_resources(query, page, per_page, active_only=active_only, visible_to=visible_to)
+    for item in items:
+        item['view_url'] = url_for('view_resource', resource_id=item['id'])
+    return jsonify({'items': items, 'page': page, 'has_more': has_more})
+
+@route('/upload_learning_resource', methods=['POST'])
 @login_required
 @admin_required
 def upload_learning_resource():
@@ -987,7 +1791,7 @@ def upload_learning_resource():
             if file and file.filename:
                 filename = secure_filename(file.filename)
                 unique_filename = f"{resource.id}_{index}_{filename}"
-                file_path = os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], unique_filename)
+                file_path = os.path.join(current_app.config['LEARNING_RESOURCES_FOLDER'], unique_filename)
                 
                 # Save file
                 file.save(file_path)
@@ -1006,7 +1810,9 @@ def upload_learning_resource():
                     file_type=file_type,
                     file_size=file_size,
                     upload_order=index,
-                    mime_type=file.content_type or 'application/octet-stream'
+                    mime_type=file.content_type or 'application/octet-stream',
+                    # Transcoded into an adaptive stream in the background (see transcoding.py)
+                    stream_status=PENDING if file_type == 'video' and current_app.config['TRANSCODE_ENABLED'] else None
                 )
                 
                 db.session.add(resource_file)
@@ -1021,6 +1827,11 @@ def upload_learning_resource():
             resource.file_path = f"learning_resources/{resource.id}_0_{first_filename}"
         
         db.session.commit()
+        
+        # Extract document text for search without holding up the upload
+        executor.submit(index_resource_text, current_app._get_current_object(), resource.id)
+        wake_transcoder()
+        
         flash(f'Learning resource uploaded successfully with {len(valid_files)} file(s)!', 'success')
         
     except Exception as e:
@@ -1029,7 +1840,7 @@ def upload_learning_resource():
     
     return redirect(url_for('learning_resources'))
 
-@app.route('/edit_learning_resource/<int:resource_id>', methods=['POST'])
+@route('/edit_learning_resource/<int:resource_id>', methods=['POST'])
 @login_required
 @admin_required
 def edit_learning_resource(resource_id):
@@ -1049,29 +1860,23 @@ def edit_learning_resource(resource_id):
     
     return redirect(url_for('learning_resources'))
 
-@app.route('/delete_learning_resource/<int:resource_id>', methods=['POST'])
+@route('/delete_learning_resource/<int:resource_id>', methods=['POST'])
 @login_required
 @admin_required
 def delete_learning_resource(resource_id):
     try:
         resource = LearningResource.query.get_or_404(resource_id)
+        files = resource_files(current_app, resource)
         
-        # Delete the actual file
-        file_path = os.path.join(app.static_folder, 'uploads', resource.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Delete progress records
-        StudentProgress.query.filter_by(resource_id=resource_id).delete()
-        
-        # Unlink any tests associated with this resource
-        tests = Test.query.filter_by(learning_resource_id=resource_id).all()
-        for test in tests:
-            test.learning_resource_id = None
-        
+        # One DELETE; files and progress rows go with it and linked tests are
+        # unlinked (ON DELETE CASCADE / SET NULL)
+        mark_resource_stale(resource_id)
         db.session.delete(resource)
         db.session.commit()
         
+        # Every uploaded file of the resource is removed in the background
+        schedule_file_cleanup(files)
+        
         flash('Learning resource deleted successfully!')
     
     except Exception as e:
@@ -1080,12 +1885,16 @@ def delete_learning_resource(resource_id):
     
     return redirect(url_for('learning_resources'))
 
-@app.route('/view_resource/<int:resource_id>')
+@route('/view_resource/<int:resource_id>')
 @login_required
 @check_test_session  # Add this decorator to prevent access during tests
 def view_resource(resource_id):
     resource = LearningResource.query.get_or_404(resource_id)
     
+    if current_user.role == 'student' and not can_view_resource(current_user.id, resource_id):
+        flash('This resource is not assigned to your section')
+        return redirect(url_for('learning_resources'))
+    
     # Get or create progress record for students
     progress = None
     if current_user.role == 'student':
@@ -1095,13 +1904,15 @@ def view_resource(resource_id):
         ).first()
         
         if not progress:
-            progress = StudentProgress(
-                user_id=current_user.id,
-                resource_id=resource_id,
-                progress_percentage=0.0
-            )
-            db.session.add(progress)
+            # ON CONFLICT DO NOTHING: a second tab opening the resource at the same time is harmless
+            db.session.execute(upsert(StudentProgress, {
+                'user_id': current_user.id,
+                'resource_id': resource_id,
+                'progress_percentage': 0.0
+            }, ['user_id', 'resource_id']))
+            mark_resource_stale(resource_id)
             db.session.commit()
+            progress = StudentProgress.query.filter_by(user_id=current_user.id, resource_id=resource_id).first()
     
     # For PDF and non-video resources, check if it's a direct file access request
     if request.args.get('direct') == '1':
@@ -1122,51 +1933,41 @@ def view_resource(resource_id):
                 target_file = resource.files[0]
             
             return send_from_directory(
-                app.config['LEARNING_RESOURCES_FOLDER'], 
+                current_app.config['LEARNING_RESOURCES_FOLDER'], 
                 target_file.filename
             )
         else:
             # Fallback to old single file system
             if resource.file_path:
                 filename = resource.file_path.split('/')[-1]
-                return send_from_directory(app.config['LEARNING_RESOURCES_FOLDER'], filename)
+                return send_from_directory(current_app.config['LEARNING_RESOURCES_FOLDER'], filename)
     
-    # Get all files for the resource, ordered by upload_order
-    resource_files = ResourceFile.query.filter_by(resource_id=resource_id).order_by(ResourceFile.upload_order).all()
+    # Get all files for the resource, ordered by upload_order (only on a cache miss)
+    load_resource_files = lazy(lambda: ResourceFile.query.filter_by(resource_id=resource_id).order_by(ResourceFile.upload_order).all())
     
     return render_template('view_resource.html', 
                          resource=resource, 
                          progress=progress, 
-                         resource_files=resource_files)
+                         load_resource_files=load_resource_files)
 
-@app.route('/update_progress/<int:resource_id>', methods=['POST'])
+@route('/update_progress/<int:resource_id>', methods=['POST'])
 @login_required
 @check_test_session  # Add this decorator to prevent progress updates during tests
 def update_progress(resource_id):
     if current_user.role != 'student':
         return jsonify({'success': False, 'message': 'Only students can update progress'})
+    if not can_view_resource(current_user.id, resource_id):
+        return jsonify({'success': False, 'message': 'This resource is not assigned to your section'}), 403
     
     try:
-        progress = StudentProgress.query.filter_by(
-            user_id=current_user.id,
-            resource_id=resource_id
-        ).first()
-        
-        if not progress:
-            progress = StudentProgress(
-                user_id=current_user.id,
-                resource_id=resource_id
-            )
-            db.session.add(progress)
-        
         data = request.get_json()
-        progress.progress_percentage = data.get('progress', 0)
-        progress.last_position = data.get('position', 0)
-        progress.time_spent = data.get('time_spent', 0)
-        progress.completed = data.get('completed', False)
-        progress.last_accessed = datetime.utcnow()
+        try:
+            values = progress_values(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        db.session.commit();
+        # Upserted with the next telemetry batch; only the latest update per resource is written
+        telemetry().progress(current_user.id, resource_id, values)
         
         return jsonify({'success': True})
     
@@ -1174,7 +1975,7 @@ def update_progress(resource_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/link_test_to_resource', methods=['POST'])
+@route('/link_test_to_resource', methods=['POST'])
 @login_required
 @admin_required
 def link_test_to_resource():
@@ -1186,6 +1987,7 @@ def link_test_to_resource():
         resource = LearningResource.query.get_or_404(resource_id)
         
         test.learning_resource_id = resource_id
+        mark_tests_stale([test.id])
         db.session.commit()
         
         flash(f'Test "{test.title}" linked to resource "{resource.title}" successfully!')
@@ -1196,13 +1998,14 @@ def link_test_to_resource():
     
     return redirect(url_for('learning_resources'))
 
-@app.route('/unlink_test_from_resource/<int:test_id>', methods=['POST'])
+@route('/unlink_test_from_resource/<int:test_id>', methods=['POST'])
 @login_required
 @admin_required
 def unlink_test_from_resource(test_id):
     try:
         test = Test.query.get_or_404(test_id)
         test.learning_resource_id = None
+        mark_tests_stale([test.id])
         db.session.commit()
         
         flash(f'Test "{test.title}" unlinked from resource successfully!')
@@ -1213,26 +2016,83 @@ def unlink_test_from_resource(test_id):
     
     return redirect(url_for('learning_resources'))
 
-@app.route('/resource_file/<path:filename>')
+@route('/resource_file/<path:filename>')
 @login_required
 @check_test_session  # Add this decorator to prevent direct file access during tests
 def resource_file(filename):
+    if current_user.role == 'student' and not can_view_resource_file(current_user.id, filename):
+        flash('This resource is not assigned to your section')
+        return redirect(url_for('learning_resources'))
+    
     # Serve files from the learning resources folder
-    return send_from_directory(app.config['LEARNING_RESOURCES_FOLDER'], filename)
+    return send_from_directory(current_app.config['LEARNING_RESOURCES_FOLDER'], filename)
+
+@route('/resource_stream/<path:filename>')
+def resource_stream(filename):
+    """Playlists and segments of the transcoded videos (see transcoding.py).
+
+    A player fetches a segment every few seconds, so like the exam telemetry
+    this reads the user from the session instead of loading it; students
+    get the same section check as view_resource. Every stream directory is
+    new and never rewritten, so browsers may keep its files.
+    """
+    if '_user_id' not in session:
+        return '', 401
+    if 'active_test_id' in session:
+        return '', 403
+    mimetype = STREAM_MIMETYPES.get(os.path.splitext(filename)[1])
+    owner = stream_owner(filename)
+    if mimetype is None or owner is None:
+        return '', 404
+    user_id = int(session['_user_id'])
+    if db.session.query(User.role).filter_by(id=user_id).scalar() != 'admin' and not can_view_stream(user_id, *owner):
+        return '', 403
+    response = send_from_directory(streams_folder(current_app), filename, mimetype=mimetype,
+                                   max_age=current_app.config['STREAM_MAX_AGE'])
+    response.cache_control.public = False
+    response.cache_control.private = True  # Behind the login, so not for shared caches
+    response.cache_control.immutable = True
+    return response
+
+@route('/admin/resource_files/<int:file_id>/transcode', methods=['POST'])
+@login_required
+@admin_required
+def retranscode_resource_file(file_id):
+    """Queue a video whose transcoding failed again"""
+    try:
+        if queue_again(file_id):
+            db.session.commit()
+            wake_transcoder()
+            flash('The video was queued for transcoding again')
+        else:
+            flash('Only videos whose transcoding failed can be queued again', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error queueing video: {str(e)}', 'error')
+    
+    return redirect(url_for('learning_resources'))
 
-@app.route('/')
+@route('/')
 def index():
     return redirect(url_for('login'))
 
-def init_db():
+@route('/healthz')
+def healthz():
+    """Readiness probe: the server is up and the database answers"""
+    try:
+        db.session.execute(text('SELECT 1'))
+        return jsonify({'status': 'ok'})
+    except Exception as e:
+        current_app.logger.error(f'Health check failed: {str(e)}')
+        return jsonify({'status': 'unavailable'}), 503
+
+def init_db(app):
     with app.app_context():
         # Check if database needs to be initialized
-        db_file = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
-        initialize_db = not os.path.exists(db_file) or os.environ.get('REINIT_DB') == '1'
+        initialize_db = not database_exists(db.engine) or os.environ.get('REINIT_DB') == '1'
         
         if initialize_db:
-            # Create all tables
-            db.create_all()
+            create_schema()
             
             # Only create admin user if no users exist
             if User.query.count() == 0:
@@ -1243,14 +2103,100 @@ def init_db():
                 print('Admin user created with username: admin, password: admin')
         else:
             print('Database already exists. Skipping initialization.')
+            upgrade_database()
 
-if __name__ == '__main__':
-    init_db()
-    # Enable multiple device access on same network with proper threading
-    app.run(host='0.0.0.0', debug=True, port=5000, threaded=True, processes=1, use_reloader=False)
+def create_schema():
+    """Create all tables and search indexes and record them as fully migrated"""
+    db.create_all()
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+
+    head = migrations_head()
+    if head is None:
+        from flask_migrate import stamp
+        init_migrate(current_app._get_current_object())
+        stamp()
+        return
+    # Same bookkeeping as `flask db stamp head`, without loading Alembic
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS alembic_version ('
+            'version_num VARCHAR(32) NOT NULL, '
+            'CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))'
+        ))
+        connection.execute(text('DELETE FROM alembic_version'))
+        connection.execute(text('INSERT INTO alembic_version (version_num) VALUES (:head)'), {'head': head})
+
+def migrations_head():
+    """Latest revision, read from the version files without importing Alembic"""
+    versions_dir = os.path.join(current_app.root_path, 'migrations', 'versions')
+    revisions, parents = set(), set()
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith('.py'):
+            continue
+        with open(os.path.join(versions_dir, filename), encoding='utf-8') as f:
+            source = f.read()
+        revision = re.search(r"^revision = '([^']+)'", source, re.M)
+        down_revision = re.search(r"^down_revision = '([^']+)'", source, re.M)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            parents.add(down_revision.group(1))
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+def upgrade_database():
+    """Bring an existing database up to the latest migration"""
+    inspector = inspect(db.engine)
+    if inspector.has_table('alembic_version'):
+        current = db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+        db.session.commit()
+        if current is not None and current == migrations_head():
+            return  # Already current; don't pay for loading Alembic
+
+    from flask_migrate import stamp, upgrade
+    init_migrate(current_app._get_current_object())
+    if not inspector.has_table('alembic_version') and inspector.has_table('user'):
+        # Created by create_all before migrations existed
+        stamp(revision='0001')
+    upgrade()
+
+def start_background_workers(app):
+    """Start the background threads every entry point that serves the app needs"""
+    # Auto-submit attempts that run past their deadline
+    start_attempt_sweeper(app)
+    # Checkpoint, optimize and back up the SQLite database when quiet
+    start_maintenance_scheduler(app)
+    # Keep the student dashboard's exams opening soon up to date
+    start_opening_soon_scheduler(app)
+    # Write heartbeats, security violations and progress in batches
+    start_telemetry_writer(app)
+    # Transcode uploaded videos into adaptive streams
+    start_transcode_worker(app)
+
+def serve(app, host='0.0.0.0', port=5000, debug=False, on_ready=None):
+    """Run the threaded development server and announce when it is ready.
+
+    READY_MARKER is printed (and on_ready called) only after the socket is
+    listening, so launchers can open the UI immediately instead of guessing.
+    """
+    from werkzeug.serving import make_server
+    application = app
+    if debug:
+        from werkzeug.debug import DebuggedApplication
+        app.debug = True
+        application = DebuggedApplication(app, evalex=True)
+
+    server = make_server(host, port, application, threaded=True)
+    url = f'http://127.0.0.1:{server.port}/'
+    if sys.stdout is not None:  # No console in the windowed PyInstaller build
+        print(f'{READY_MARKER} {url}', flush=True)
+    if on_ready is not None:
+        on_ready(url)
+    server.serve_forever()
 
 # Test security routes (for debugging - remove in production)
-@app.route('/debug/session')
+@route('/debug/session')
 @login_required
 def debug_session():
     """Debug route to check session state"""
@@ -1268,122 +2214,195 @@ def debug_session():
         'session_keys': list(session.keys())
     }
 
-@app.route('/test_heartbeat', methods=['POST'])
-@login_required
+@route('/test_heartbeat', methods=['POST'])
+@exam_session_required
 def test_heartbeat():
     """Handle test session heartbeat to monitor if student is still active"""
-    if current_user.role != 'student':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
-    # Check if student has an active test session
-    if 'active_test_id' not in session:
-        return jsonify({'error': 'No active test session'}), 400
-    
     try:
         data = request.get_json()
         test_id = data.get('test_id')
         timestamp = data.get('timestamp')
-        security_violations = data.get('security_violations', 0)
-        tab_switches = data.get('tab_switches', 0)
-        fullscreen_exits = data.get('fullscreen_exits', 0)
         
         # Verify the test_id matches the active session
         if test_id != session['active_test_id']:
             return jsonify({'error': 'Test ID mismatch'}), 400
+        try:
+            counters = heartbeat_counters(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Update session with latest heartbeat
-        session['last_heartbeat'] = timestamp
-        session['security_violations'] = security_violations
-        session['tab_switches'] = tab_switches
-        session['fullscreen_exits'] = fullscreen_exits
-        session.permanent = True
+        # Buffered and written onto the attempt in batches, so an auto-submitted result keeps them
+        telemetry().heartbeat(session['attempt_id'], *counters)
         
-        # Log security issues if any
-        if security_violations > 0:
-            app.logger.warning(f'Security violations detected for user {current_user.id} in test {test_id}: {security_violations} violations, {tab_switches} tab switches, {fullscreen_exits} fullscreen exits')
+        # Admins can move the deadline, so it is read back (by primary key) every time
+        deadline = db.session.query(TestAttempt.deadline).filter_by(id=session['attempt_id']).scalar()
+        remaining_seconds = max(0, int((deadline - datetime.utcnow()).total_seconds())) if deadline else None
         
-        return jsonify({'status': 'success', 'timestamp': timestamp})
+        return jsonify({'status': 'success', 'timestamp': timestamp, 'remaining_seconds': remaining_seconds})
         
     except Exception as e:
-        app.logger.error(f'Heartbeat error for user {current_user.id}: {str(e)}')
+        current_app.logger.error('Heartbeat failed', extra={'event': 'heartbeat_error', 'error': str(e)})
         return jsonify({'error': 'Server error'}), 500
 
-@app.route('/record_security_violation', methods=['POST'])
+@route('/exam_channel', websocket=True)
+@exam_session_required
+def exam_channel():
+    """The student's WebSocket for the active attempt (see exam_channel.py)"""
+    return serve_channel(session['attempt_id'], session['active_test_id'], int(session['_user_id']),
+                         handle_channel_message)
+
+def channel_time(attempt, message):
+    """The remaining time for the student's page; sent_at lets it allow for the round trip"""
+    if attempt is None or attempt.status != 'active':
+        return {'type': 'ended'}
+    return {'type': 'time', 'remaining_seconds': attempt.remaining_seconds(), 'sent_at': message.get('sent_at')}
+
+def handle_channel_message(connection, message):
+    """Answer one message from a student's exam channel, as the HTTP endpoints would"""
+    kind = message.get('type')
+    reply = None
+    try:
+        if kind == 'heartbeat':
+            try:
+                counters = heartbeat_counters(message)
+            except ValueError as e:
+                reply = {'type': 'error', 'error': str(e)}
+            else:
+                telemetry().heartbeat(connection.attempt_id, *counters)
+                reply = channel_time(db.session.get(TestAttempt, connection.attempt_id), message)
+        elif kind == 'autosave':
+            answers = message.get('answers')
+            attempt = db.session.get(TestAttempt, connection.attempt_id)
+            if not isinstance(answers, dict):
+                reply = {'type': 'error', 'error': 'Invalid answers'}
+            elif attempt is None or attempt.status != 'active':
+                reply = {'type': 'ended'}
+            elif is_past_deadline(attempt, current_app.config['EXAM_GRACE_PERIOD_SECONDS']):
+                # Answers arriving after the deadline are ignored
+                reply = {'type': 'error', 'error': 'Time limit exceeded', 'remaining_seconds': 0}
+            else:
+                save_answers(attempt, answers)
+                db.session.commit()
+                reply = dict(channel_time(attempt, message), type='saved', seq=message.get('seq'))
+        elif kind == 'violation':
+            telemetry().violation(connection.attempt_id, connection.user_id, connection.test_id,
+                                  message.get('violation_type'), message.get('timestamp'),
+                                  message.get('total_violations'))
+        else:
+            reply = {'type': 'error', 'error': f'Unknown message type: {kind}'}
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Exam channel message failed', extra={
+            'event': 'exam_channel_error', 'user_id': connection.user_id, 'test_id': connection.test_id,
+            'attempt_id': connection.attempt_id, 'error': str(e)})
+        reply = {'type': 'error', 'error': 'Server error'}
+    finally:
+        db.session.remove()  # The channel's request lasts the whole exam; never hold a connection
+    if reply:
+        connection.send(reply)
+
+@route('/autosave_answers', methods=['POST'])
 @login_required
-def record_security_violation():
-    """Record security violations during test"""
+def autosave_answers():
+    """Store in-progress answers on the active attempt so they survive a timeout"""
     if current_user.role != 'student':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Check if student has an active test session
     if 'active_test_id' not in session:
         return jsonify({'error': 'No active test session'}), 400
     
+    try:
+        data = request.get_json() or {}
+        test_id = data.get('test_id')
+        answers = data.get('answers', {})
+        
+        if test_id != session['active_test_id'] or not isinstance(answers, dict):
+            return jsonify({'error': 'Test ID mismatch'}), 400
+        
+        attempt = get_active_attempt(current_user.id, test_id)
+        if not attempt:
+            return jsonify({'error': 'No active attempt'}), 400
+        
+        # Answers arriving after the deadline are ignored
+        if is_past_deadline(attempt, current_app.config['EXAM_GRACE_PERIOD_SECONDS']):
+            return jsonify({'error': 'Time limit exceeded', 'remaining_seconds': 0}), 409
+        
+        save_answers(attempt, answers)
+        db.session.commit()
+        
+        return jsonify({'status': 'saved', 'remaining_seconds': attempt.remaining_seconds()})
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Autosave failed', extra={'event': 'autosave_error', 'error': str(e)})
+        return jsonify({'error': 'Server error'}), 500
+
+@route('/record_security_violation', methods=['POST'])
+@exam_session_required
+def record_security_violation():
+    """Record security violations during test"""
     try:
         data = request.get_json()
         test_id = data.get('test_id')
         violation_type = data.get('violation_type')
         timestamp = data.get('timestamp')
-        total_violations = data.get('total_violations', 0)
+        total_violations = data.get('total_violations')
         
         # Verify the test_id matches the active session
         if test_id != session['active_test_id']:
             return jsonify({'error': 'Test ID mismatch'}), 400
         
-        # Log the violation
-        app.logger.warning(f'Security violation: User {current_user.id} ({current_user.name}) in test {test_id} - {violation_type} at {timestamp}. Total violations: {total_violations}')
-        
-        # Store violations in session
-        if 'security_log' not in session:
-            session['security_log'] = []
-        
-        session['security_log'].append({
-            'type': violation_type,
-            'timestamp': timestamp,
-            'test_id': test_id
-        })
-        
-        # Limit log size to prevent session bloat
-        if len(session['security_log']) > 100:
-            session['security_log'] = session['security_log'][-100:]
-        
-        session.permanent = True
+        # Stored as a SecurityEvent with the next batch
+        telemetry().violation(session['attempt_id'], int(session['_user_id']), test_id,
+                              violation_type, timestamp, total_violations)
         
         return jsonify({'status': 'recorded'})
         
     except Exception as e:
-        app.logger.error(f'Security violation recording error for user {current_user.id}: {str(e)}')
+        current_app.logger.error('Security violation not recorded', extra={
+            'event': 'security_violation_error', 'error': str(e)})
         return jsonify({'error': 'Server error'}), 500
 
-@app.route('/test_abandoned', methods=['POST'])
-@login_required
+@route('/test_abandoned', methods=['POST'])
 def test_abandoned():
     """Handle test abandonment (when student closes browser/tab)"""
-    if current_user.role != 'student':
-        return jsonify({'error': 'Unauthorized'}), 403
+    # Like the other exam telemetry this never loads the user; without an
+    # active test there is nothing to clear
+    if '_user_id' not in session:
+        return '', 401
+    if 'active_test_id' not in session:
+        return '', 204
     
     try:
         # This is called via sendBeacon, so data might be in request.data
-        data = request.get_json() or {}
+        data = request.get_json(force=True, silent=True) or {}
         test_id = data.get('test_id')
         timestamp = data.get('timestamp')
         violations = data.get('violations', 0)
         
         # Log the abandonment
-        app.logger.warning(f'TEST ABANDONED: User {current_user.id} ({current_user.name}) abandoned test {test_id} at {timestamp} with {violations} security violations')
-        
-        # Clear the test session
+        current_app.logger.warning('Test abandoned', extra={
+            'event': 'test_abandoned', 'client_test_id': test_id, 'client_time': timestamp, 'security_violations': violations})
+        if 'attempt_id' in session:
+            telemetry().violation(session['attempt_id'], int(session['_user_id']), session['active_test_id'],
+                                  'test_abandoned', timestamp)
+        
+        # Clear the test session. The attempt itself stays active: the student
+        # can resume it before the deadline, otherwise the sweeper submits it.
         session.pop('active_test_id', None)
+        session.pop('attempt_id', None)
         session.pop('test_start_time', None)
-        session.pop('last_heartbeat', None)
-        session.pop('security_violations', None)
-        session.pop('security_log', None)
         session.permanent = True
         
         return '', 204  # No content response for sendBeacon
         
     except Exception as e:
-        app.logger.error(f'Test abandonment handling error: {str(e)}')
-        return '', 500
-        app.logger.error(f'Test abandonment handling error: {str(e)}')
+        current_app.logger.error(f'Test abandonment handling error: {str(e)}')
         return '', 500
+
+if __name__ == '__main__':
+    app = create_app(with_migrations=False)
+    init_db(app)
+    start_background_workers(app)
+    # Enable multiple device access on same network with proper threading
+    serve(app, host='0.0.0.0', port=app.config['PORT'], debug=True)
@@ -0,0 +1,96 @@
+"""
+Result Archive
+==============
+
+Results pile up term after term, and the admin pages aggregate over all of
+them. `python db_manage.py archive --before DATE` moves results taken before
+DATE out of the hot result table into archived_result, keeping their ids.
+raw_data is copied as stored, still compressed (see compressed_columns).
+Admin statistics then only cover the current results.
+
+Students and admins can still open an archived result: view_result, the CSV
+export and the student record pages go through the helpers below, which look
+in the result table first and fall back to the archive.
+"""
+
+from flask import abort
+from sqlalchemy import insert, delete, select
+from sqlalchemy.orm import joinedload, undefer
+
+from analytics import mark_tests_stale
+from models import db, Result, ArchivedResult
+from pagination import keyset_paginate, encode_cursor
+
+
+def archive_results(before, batch_size=500):
+    """Move results taken before the given datetime into the archive.
+
+    Works in batches, each committed on its own, so a large archive run
+    never holds the write lock for long. Returns the number archived.
+    """
+    columns = ['id', 'user_id', 'test_id', 'score', 'date_taken', 'raw_data']
+    archived = 0
+    while True:
+        ids = [result_id for (result_id,) in db.session.query(Result.id)
+               .filter(Result.date_taken < before).order_by(Result.id).limit(batch_size)]
+        if not ids:
+            return archived
+        try:
+            # INSERT ... SELECT copies raw_data without decompressing it
+            db.session.execute(insert(ArchivedResult).from_select(
+                columns, select(*[getattr(Result, column) for column in columns]).where(Result.id.in_(ids))))
+            mark_tests_stale(test_id for (test_id,) in db.session.query(Result.test_id)
+                             .filter(Result.id.in_(ids)).distinct())
+            db.session.execute(delete(Result).where(Result.id.in_(ids)),
+                               execution_options={'synchronize_session': False})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        archived += len(ids)
+
+
+def count_archivable(before):
+    return Result.query.filter(Result.date_taken < before).count()
+
+
+def get_result_or_404(result_id):
+    """A result by id, current or archived"""
+    result = db.session.get(Result, result_id) or db.session.get(ArchivedResult, result_id)
+    if result is None:
+        abort(404)
+    return result
+
+
+def student_results(user_id, with_raw_data=False):
+    """All of a student's results, current and archived, newest first"""
+    current = Result.query.filter_by(user_id=user_id)
+    archived = ArchivedResult.query.filter_by(user_id=user_id)
+    if with_raw_data:
+        current = current.options(undefer(Result.raw_data))
+        archived = archived.options(undefer(ArchivedResult.raw_data))
+    results = current.all() + archived.all()
+    return sorted(results, key=lambda result: result.date_taken, reverse=True)
+
+
+def student_results_page(user_id, cursor=None, limit=25):
+    """One page of a student's results, current and archived, newest first.
+
+    Returns (results, next_cursor) with each result's test loaded. Archived
+    results keep their ids, so (date_taken, id) orders both tables as one
+    and a single keyset cursor pages through them together.
+    """
+    pages = [keyset_paginate(model.query.filter_by(user_id=user_id).options(joinedload(model.test)),
+                             model.date_taken, model.id, descending=True, cursor=cursor, limit=limit)
+             for model in (Result, ArchivedResult)]
+    results = sorted(pages[0][0] + pages[1][0], key=lambda result: (result.date_taken, result.id), reverse=True)
+    if len(results) <= limit and not any(next_cursor for _, next_cursor in pages):
+        return results, None
+    results = results[:limit]
+    return results, encode_cursor(results[-1].date_taken, results[-1].id)
+
+
+def has_taken_test(user_id, test_id):
+    """Whether the student already has a result for the test, archived or not"""
+    return any(db.session.query(model.query.filter_by(user_id=user_id, test_id=test_id).exists()).scalar()
+               for model in (Result, ArchivedResult))
@@ -0,0 +1,146 @@
+"""
+Static Assets
+=============
+
+`python db_manage.py build-assets` copies every stylesheet, script and icon
+under static/ (uploads excluded) to static/dist/ with a content hash in its
+name, writes gzip and, if the brotli package is installed, brotli versions
+next to each text file, and records the mapping in static/dist/manifest.json.
+
+Templates keep calling url_for('static', filename='css/login.css'). Once a
+manifest exists, that returns /assets/css/login.<hash>.css instead, which
+is served precompressed with a one-year immutable Cache-Control: a changed
+file gets a new name, so browsers never need to revalidate.
+
+Without a manifest, or with one whose hashes no longer match the sources,
+plain /static URLs are used, so the app still works if the build step was skipped.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # Only gzip variants are built without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+SKIP_DIRS = {'uploads', DIST_DIR}
+ASSET_EXTENSIONS = {'.css', '.js', '.ico', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.woff', '.woff2'}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.ico'}
+
+
+def iter_sources(static_folder):
+    """Yield (logical path, absolute path) for every asset under static/"""
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() in ASSET_EXTENSIONS:
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def hashed_name(logical, data):
+    """The name a source is built under: its path with a content hash"""
+    stem, ext = os.path.splitext(logical)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def build_assets(static_folder, gzip_level=9, brotli_quality=11):
+    """Rebuild static/dist and return the manifest {logical path: hashed path}"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for logical, source in iter_sources(static_folder):
+        with open(source, 'rb') as f:
+            data = f.read()
+        hashed = hashed_name(logical, data)
+        ext = os.path.splitext(logical)[1]
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+            variants = [('.gz', gzip.compress(data, compresslevel=gzip_level, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=brotli_quality)))
+            for suffix, compressed in variants:
+                # Tiny files can grow when compressed; those are served as is
+                if len(compressed) < len(data):
+                    with open(target + suffix, 'wb') as f:
+                        f.write(compressed)
+        manifest[logical] = hashed
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder, logger=None):
+    """The build manifest, or {} if it is missing or out of date.
+
+    Each source is hashed and compared with the name it was built under;
+    mtimes can't be trusted after a git checkout or a PyInstaller extraction.
+    """
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        manifest = json.load(f)
+    for logical, source in iter_sources(static_folder):
+        with open(source, 'rb') as f:
+            data = f.read()
+        if manifest.get(logical) != hashed_name(logical, data):
+            if logger:
+                logger.warning(f'Static assets changed since the last build ({logical}); '
+                               f'serving unversioned files until build-assets is run again')
+            return {}
+    return manifest
+
+
+def asset_url_for(endpoint, **values):
+    """url_for that points static files at their hashed, precompressed build"""
+    if endpoint == 'static':
+        hashed = current_app.extensions.get('asset_manifest', {}).get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+            endpoint = 'assets'
+    return url_for(endpoint, **values)
+
+
+def serve_asset(filename):
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0]
+    max_age = current_app.config.get('ASSET_MAX_AGE', 31536000)
+
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            encoding = candidate
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if encoding is None:
+        response = send_from_directory(dist, filename, mimetype=mimetype, max_age=max_age)
+
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder, app.logger)
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals['url_for'] = asset_url_for
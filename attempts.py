@@ -0,0 +1,325 @@
+"""
+Server-side exam attempts
+=========================
+
+Every call to take_test opens (or resumes) a TestAttempt whose deadline is
+fixed on the server. Answers are autosaved onto the attempt while the student
+works, so an attempt that is abandoned or runs out of time can still be graded.
+
+A background sweeper periodically auto-submits attempts whose deadline has
+passed. Expired attempts are read through the (status, deadline) index in
+deadline order, so each tick only touches the attempts that actually expired.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from analytics import mark_tests_stale
+from student_summary import mark_students_stale
+from backends import upsert
+from compressed_columns import DictionaryText, train_dictionary
+from models import db, Result, Test, TestAttempt, CompressionDictionary
+
+
+def grade_answers(test, answers):
+    """Grade a mapping of {question_id: answer} against a test.
+
+    Returns (score, result_data) where result_data has the same structure
+    that is stored in Result.raw_data.
+    """
+    questions = test.questions
+    total_questions = len(questions)
+    correct_answers = 0
+    result_data = {}
+
+    for question in questions:
+        user_answer = (answers.get(str(question.id)) or '').strip()
+
+        is_correct = False
+        if user_answer.lower() == question.correct_answer.lower():
+            correct_answers += 1
+            is_correct = True
+
+        # Store question data with consistent structure
+        question_data = {
+            'question_text': question.question_text,
+            'question_type': question.question_type,
+            'user_answer': user_answer,
+            'correct_answer': question.correct_answer,
+            'is_correct': is_correct
+        }
+
+        if question.image_path:
+            question_data['image_path'] = question.image_path
+
+        if question.question_type == 'multiple_choice':
+            if question.choices:
+                question_data['choices'] = json.loads(question.choices)
+            if question.choice_images:
+                question_data['choice_images'] = json.loads(question.choice_images)
+
+        # Use string key to ensure consistency
+        result_data[str(question.id)] = question_data
+
+    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+    return score, result_data
+
+
+def test_dictionary(test):
+    """(id, bytes) of the test's raw_data dictionary, created on first use.
+
+    The dictionary is a blank result for the test: the question texts,
+    choices and keys every student's result repeats.
+    """
+    row = db.session.query(CompressionDictionary.id, CompressionDictionary.data).filter_by(test_id=test.id).first()
+    if row is None:
+        _, sample = grade_answers(test, {})
+        sample['security_info'] = {'violations': 0, 'tab_switches': 0, 'fullscreen_exits': 0}
+        sample['attempt_info'] = {'started_at': '', 'deadline': '', 'submitted_at': '', 'auto_submitted': False}
+        db.session.execute(upsert(CompressionDictionary, {
+            'test_id': test.id,
+            'data': train_dictionary(json.dumps(sample)),
+            'created_at': datetime.utcnow()
+        }, ['test_id']))
+        row = db.session.query(CompressionDictionary.id, CompressionDictionary.data).filter_by(test_id=test.id).one()
+    return row.id, bytes(row.data)
+
+
+def get_active_attempt(user_id, test_id):
+    return TestAttempt.query.filter_by(user_id=user_id, test_id=test_id, status='active') \
+        .order_by(TestAttempt.started_at.desc()).first()
+
+
+def start_attempt(user_id, test, closes_at=None):
+    """Return (attempt, created) for the student's active attempt on a test.
+
+    A new attempt's deadline is cut short by the closing time of the student's
+    window for the test, if any.
+    """
+    attempt = get_active_attempt(user_id, test.id)
+    if attempt:
+        return attempt, False
+
+    now = datetime.utcnow()
+    deadline = now + timedelta(minutes=test.time_limit)
+    if closes_at and closes_at < deadline:
+        deadline = closes_at
+    attempt = TestAttempt(
+        user_id=user_id,
+        test_id=test.id,
+        started_at=now,
+        deadline=deadline,
+        status='active',
+        answers=json.dumps({})
+    )
+    db.session.add(attempt)
+    db.session.commit()
+    return attempt, True
+
+
+def load_answers(attempt):
+    return json.loads(attempt.answers) if attempt.answers else {}
+
+
+def save_answers(attempt, answers):
+    """Merge changed answers into the attempt's autosaved ones; the caller commits"""
+    saved_answers = load_answers(attempt)
+    saved_answers.update({str(key): str(value) for key, value in answers.items()})
+    attempt.answers = json.dumps(saved_answers)
+    attempt.last_saved_at = datetime.utcnow()
+
+
+def move_deadlines(test_id, deadline_for, attempt_ids=None):
+    """Set new deadlines on a test's active attempts (or the given ones among them).
+
+    deadline_for(attempt) returns the new deadline, or None to leave it. One
+    executemany UPDATE; returns the ids of the attempts that changed. The
+    caller commits.
+    """
+    query = TestAttempt.query.filter_by(test_id=test_id, status='active')
+    if attempt_ids is not None:
+        query = query.filter(TestAttempt.id.in_(attempt_ids))
+    rows = []
+    for attempt in query:
+        deadline = deadline_for(attempt)
+        if deadline is not None and deadline != attempt.deadline:
+            rows.append({'id': attempt.id, 'deadline': deadline})
+    if rows:
+        db.session.execute(update(TestAttempt), rows)
+    return [row['id'] for row in rows]
+
+
+def extend_attempts(test_id, minutes, attempt_ids=None):
+    return move_deadlines(test_id, lambda attempt: attempt.deadline + timedelta(minutes=minutes), attempt_ids)
+
+
+def end_attempts(test_id, attempt_ids=None, now=None):
+    """End attempts now: the students' pages submit at once, the sweeper submits the rest after the grace period"""
+    now = now or datetime.utcnow()
+    return move_deadlines(test_id, lambda attempt: min(attempt.deadline, now), attempt_ids)
+
+
+def is_past_deadline(attempt, grace_seconds, now=None):
+    now = now or datetime.utcnow()
+    return now > attempt.deadline + timedelta(seconds=grace_seconds)
+
+
+def finalize_attempt(attempt, answers=None, security_info=None, auto_submitted=False):
+    """Grade an attempt and store its Result.
+
+    The attempt is claimed with a conditional UPDATE first, so a manual submit
+    racing the sweeper can never produce two results. Returns the new Result,
+    or None if the attempt was already finalized elsewhere. The caller commits.
+    """
+    # Committed (or rolled back) together with the result, so 'submitting' is never left behind
+    claimed = TestAttempt.query.filter_by(id=attempt.id, status='active') \
+        .update({'status': 'submitting'}, synchronize_session=False)
+    if not claimed:
+        return None
+
+    now = datetime.utcnow()
+    final_status = 'expired' if auto_submitted else 'submitted'
+
+    test = db.session.get(Test, attempt.test_id)
+    if answers is None:
+        answers = load_answers(attempt)
+
+    score, result_data = grade_answers(test, answers)
+
+    # Only the counters: the events themselves stay in security_event (see security_events.py)
+    if security_info is None:
+        security_info = {
+            'violations': attempt.security_violations or 0,
+            'tab_switches': attempt.tab_switches or 0,
+            'fullscreen_exits': attempt.fullscreen_exits or 0
+        }
+    result_data['security_info'] = security_info
+    result_data['attempt_info'] = {
+        'started_at': attempt.started_at.isoformat(),
+        'deadline': attempt.deadline.isoformat(),
+        'submitted_at': now.isoformat(),
+        'auto_submitted': auto_submitted
+    }
+
+    # ON CONFLICT DO NOTHING: never create a second result if one slipped in
+    # through another path (the unique index on user_id, test_id decides)
+    result_id = db.session.execute(upsert(Result, {
+        'user_id': attempt.user_id,
+        'test_id': attempt.test_id,
+        'score': score,
+        'raw_data': DictionaryText(json.dumps(result_data), *test_dictionary(test))
+    }, ['user_id', 'test_id']).returning(Result.id)).scalar()
+    if result_id is None:
+        TestAttempt.query.filter_by(id=attempt.id) \
+            .update({'status': final_status, 'submitted_at': now}, synchronize_session=False)
+        return None
+    result = db.session.get(Result, result_id)
+    mark_tests_stale([attempt.test_id])
+    mark_students_stale([attempt.user_id])
+
+    TestAttempt.query.filter_by(id=attempt.id).update({
+        'status': final_status,
+        'submitted_at': now,
+        'result_id': result.id
+    }, synchronize_session=False)
+    return result
+
+
+def sweep_expired_attempts(grace_seconds, batch_size, now=None, logger=None):
+    """Auto-submit attempts whose deadline (plus grace) has passed.
+
+    Works in batches of batch_size, committing after each one. Each attempt
+    is finalized in its own savepoint: one that fails is logged and skipped
+    (it is retried on the next sweep) instead of holding up the rest.
+    Returns the number of attempts that were auto-submitted.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=grace_seconds)
+    swept = 0
+    failed = []
+
+    while True:
+        query = TestAttempt.query.filter(TestAttempt.status == 'active', TestAttempt.deadline < cutoff)
+        if failed:
+            query = query.filter(TestAttempt.id.notin_(failed))
+        expired = query.order_by(TestAttempt.deadline).limit(batch_size).all()
+        if not expired:
+            break
+
+        for attempt in expired:
+            try:
+                with db.session.begin_nested():
+                    result = finalize_attempt(attempt, auto_submitted=True)
+            except Exception as e:
+                failed.append(attempt.id)
+                if logger:
+                    logger.error('Auto-submit failed', extra={
+                        'event': 'auto_submit_failed', 'user_id': attempt.user_id, 'test_id': attempt.test_id,
+                        'attempt_id': attempt.id, 'error': str(e)})
+                continue
+            if result is not None:
+                swept += 1
+                if logger:
+                    # The same record as submit_test's, marked as the sweeper's
+                    logger.info('Test completed', extra={
+                        'event': 'test_completed', 'user_id': attempt.user_id, 'test_id': attempt.test_id,
+                        'attempt_id': attempt.id, 'result_id': result.id, 'score': round(result.score, 1),
+                        'security_violations': attempt.security_violations or 0,
+                        'tab_switches': attempt.tab_switches or 0,
+                        'fullscreen_exits': attempt.fullscreen_exits or 0, 'auto_submitted': True})
+        db.session.commit()
+
+        if len(expired) < batch_size:
+            break
+
+    return swept
+
+
+class AttemptSweeper:
+    """Daemon thread that runs sweep_expired_attempts on a fixed interval"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('ATTEMPT_SWEEP_INTERVAL', 15)
+        self.batch_size = app.config.get('ATTEMPT_SWEEP_BATCH_SIZE', 100)
+        self.grace_seconds = app.config.get('EXAM_GRACE_PERIOD_SECONDS', 30)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='attempt-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def tick(self):
+        with self.app.app_context():
+            try:
+                # Results must include the telemetry that is still buffered
+                self.app.extensions['telemetry'].flush()
+                return sweep_expired_attempts(self.grace_seconds, self.batch_size, logger=self.app.logger)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error('Attempt sweeper failed', extra={'event': 'attempt_sweeper_error', 'error': str(e)})
+                return 0
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+
+def start_attempt_sweeper(app):
+    """Start the expired-attempt sweeper once per application"""
+    sweeper = app.extensions.get('attempt_sweeper')
+    if sweeper is None:
+        sweeper = AttemptSweeper(app)
+        app.extensions['attempt_sweeper'] = sweeper
+    sweeper.start()
+    return sweeper
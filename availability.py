@@ -0,0 +1,228 @@
+"""
+Test Availability
+=================
+
+A test can have a window: an opening and a closing time (Test.opens_at and
+Test.closes_at, UTC, either may be left open). A section it is assigned to
+can override either end for its own students (SectionTest.opens_at and
+closes_at). A student in several sections that share a test gets the widest
+of their windows.
+
+take_test refuses to start an attempt outside the student's window, and an
+attempt started inside it gets a deadline no later than the closing time,
+so the attempt sweeper submits it when the window closes. Moving a closing
+time earlier brings the deadlines of the attempts already running forward
+with it (cap_deadlines), so the attempt's deadline stays the only thing
+submit_test and the sweeper need to check.
+
+The student dashboard lists the exams opening soon. OpeningSoon keeps those
+lists precomputed per section (None for tests open to everyone), from two
+range scans of the window indexes. A scheduler thread refreshes them every
+TEST_WINDOW_REFRESH_INTERVAL seconds. Editing a window invalidates them, and
+a request that finds them older than two intervals refreshes them itself,
+so they stay correct without the thread (and in other processes).
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, func
+
+from attempts import move_deadlines
+from models import db, Test, TestAttempt, SectionMembership, SectionTest
+
+OPEN = 'open'
+UPCOMING = 'upcoming'
+CLOSED = 'closed'
+
+
+def to_utc(value):
+    """A naive local time (as typed into a form) as naive UTC"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value else None
+
+
+def to_local(value):
+    """A naive UTC time as naive local time, for display"""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None) if value else None
+
+
+def parse_local(value):
+    """A datetime-local form field as naive UTC; None when empty. Raises ValueError when malformed"""
+    value = (value or '').strip()
+    return to_utc(datetime.fromisoformat(value)) if value else None
+
+
+def widest(windows):
+    """The union of several (opens_at, closes_at) windows; None is unbounded"""
+    opens = [opens_at for opens_at, _ in windows]
+    closes = [closes_at for _, closes_at in windows]
+    return (None if None in opens else min(opens), None if None in closes else max(closes))
+
+
+def status(window, now=None):
+    now = now or datetime.utcnow()
+    opens_at, closes_at = window
+    if opens_at and now < opens_at:
+        return UPCOMING
+    if closes_at and now >= closes_at:
+        return CLOSED
+    return OPEN
+
+
+def student_windows(user_id, test_ids=None):
+    """{test_id: window} of the tests assigned to the student's sections"""
+    query = db.session.query(SectionTest.test_id,
+                             func.coalesce(SectionTest.opens_at, Test.opens_at),
+                             func.coalesce(SectionTest.closes_at, Test.closes_at)) \
+        .join(Test, Test.id == SectionTest.test_id) \
+        .join(SectionMembership, SectionMembership.section_id == SectionTest.section_id) \
+        .filter(SectionMembership.user_id == user_id)
+    if test_ids is not None:
+        query = query.filter(SectionTest.test_id.in_(test_ids))
+    by_test = {}
+    for test_id, opens_at, closes_at in query:
+        by_test.setdefault(test_id, []).append((opens_at, closes_at))
+    return {test_id: widest(windows) for test_id, windows in by_test.items()}
+
+
+def test_window(user_id, test):
+    """The window a student has for a test"""
+    return student_windows(user_id, [test.id]).get(test.id, (test.opens_at, test.closes_at))
+
+
+def cap_deadlines(test_id):
+    """Bring running attempts' deadlines forward to their students' closing times.
+
+    Returns the ids of the attempts that changed; the caller commits.
+    """
+    test = db.session.get(Test, test_id)
+    windows = {}
+    for user_id, opens_at, closes_at in db.session.query(SectionMembership.user_id,
+                                                         func.coalesce(SectionTest.opens_at, Test.opens_at),
+                                                         func.coalesce(SectionTest.closes_at, Test.closes_at)) \
+            .join(SectionTest, SectionTest.section_id == SectionMembership.section_id) \
+            .join(Test, Test.id == SectionTest.test_id) \
+            .join(TestAttempt, and_(TestAttempt.user_id == SectionMembership.user_id,
+                                    TestAttempt.test_id == test_id, TestAttempt.status == 'active')) \
+            .filter(SectionTest.test_id == test_id):
+        windows.setdefault(user_id, []).append((opens_at, closes_at))
+
+    def deadline_for(attempt):
+        closes_at = widest(windows[attempt.user_id])[1] if attempt.user_id in windows else test.closes_at
+        if closes_at and closes_at < attempt.deadline:
+            return max(closes_at, attempt.started_at)
+        return None
+
+    return move_deadlines(test_id, deadline_for)
+
+
+class OpeningSoon:
+    """Tests opening within the next TEST_WINDOW_UPCOMING_DAYS, by section"""
+
+    def __init__(self, app):
+        self.app = app
+        self.horizon = timedelta(days=app.config.get('TEST_WINDOW_UPCOMING_DAYS', 7))
+        self.max_age = 2 * app.config.get('TEST_WINDOW_REFRESH_INTERVAL', 60)
+        self._lock = threading.Lock()
+        self._lists = {}  # section_id (None: open to everyone) -> [(opens_at, test_id, title)]
+        self._refreshed = None  # time.monotonic() of the last refresh; None forces the next read to refresh
+
+    def invalidate(self):
+        self._refreshed = None
+
+    def refresh(self, now=None):
+        """Recompute every list; needs an application context"""
+        now = now or datetime.utcnow()
+        horizon = now + self.horizon
+        lists = {}
+
+        # Tests whose own opening time is coming up, wherever no section overrides it
+        for test_id, title, opens_at, section_id, section_opens_at in db.session.query(
+                Test.id, Test.title, Test.opens_at, SectionTest.section_id, SectionTest.opens_at) \
+                .outerjoin(SectionTest, SectionTest.test_id == Test.id) \
+                .filter(Test.opens_at > now, Test.opens_at <= horizon):
+            if section_opens_at is None:
+                lists.setdefault(section_id, []).append((opens_at, test_id, title))
+
+        # Section overrides that are coming up
+        for test_id, title, opens_at, section_id in db.session.query(
+                Test.id, Test.title, SectionTest.opens_at, SectionTest.section_id) \
+                .join(Test, Test.id == SectionTest.test_id) \
+                .filter(SectionTest.opens_at > now, SectionTest.opens_at <= horizon):
+            lists.setdefault(section_id, []).append((opens_at, test_id, title))
+
+        for entries in lists.values():
+            entries.sort()
+        with self._lock:
+            self._lists = lists
+            self._refreshed = time.monotonic()
+
+    def for_sections(self, section_ids, limit=5, now=None):
+        """[(opens_at, test_id, title)] opening soon for a student in these sections, soonest first"""
+        refreshed = self._refreshed
+        if refreshed is None or time.monotonic() - refreshed > self.max_age:
+            self.refresh()
+        now = now or datetime.utcnow()
+        with self._lock:
+            lists = [self._lists.get(section_id, []) for section_id in [None, *section_ids]]
+        soonest = {}
+        for entries in lists:
+            for opens_at, test_id, title in entries:
+                if opens_at > now and (test_id not in soonest or opens_at < soonest[test_id][0]):
+                    soonest[test_id] = (opens_at, test_id, title)
+        return sorted(soonest.values())[:limit]
+
+
+def init_availability(app):
+    app.extensions['opening_soon'] = OpeningSoon(app)
+    app.add_template_filter(to_local, 'local_time')
+
+
+def opening_soon():
+    return current_app.extensions['opening_soon']
+
+
+class OpeningSoonScheduler:
+    """Daemon thread that refreshes the opening-soon lists on a fixed interval"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('TEST_WINDOW_REFRESH_INTERVAL', 60)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='opening-soon', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def tick(self):
+        with self.app.app_context():
+            try:
+                self.app.extensions['opening_soon'].refresh()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f'Opening soon refresh error: {str(e)}')
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        self.tick()
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+
+def start_opening_soon_scheduler(app):
+    """Start the opening-soon scheduler once per application"""
+    scheduler = app.extensions.get('opening_soon_scheduler')
+    if scheduler is None:
+        scheduler = OpeningSoonScheduler(app)
+        app.extensions['opening_soon_scheduler'] = scheduler
+    scheduler.start()
+    return scheduler
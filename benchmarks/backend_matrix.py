@@ -0,0 +1,237 @@
+"""
+Backend matrix
+==============
+
+Runs the same exam-day workload against SQLite and PostgreSQL through the
+Flask test client, checks that both backends end up in the same state, and
+reports how long each phase took:
+
+- concurrent submissions: every student starts and submits a test at once
+  (SQLite serializes the writes, PostgreSQL does not),
+- duplicate submissions: a second attempt racing the first never creates a
+  second result (INSERT ... ON CONFLICT DO NOTHING),
+- concurrent progress updates from several tabs leave one progress row
+  (INSERT ... ON CONFLICT DO UPDATE),
+- deleting a user, a learning resource and a test cascades in the database.
+
+PostgreSQL comes from --postgres (an existing, empty database), or, if
+initdb and pg_ctl are found on PATH or in --pg-bin, from a throwaway cluster
+created in a temporary directory and removed afterwards. Without either the
+PostgreSQL column is skipped. Exits non-zero if any check fails.
+
+Usage:
+    python benchmarks/backend_matrix.py
+    python benchmarks/backend_matrix.py --students 200 --pg-bin /usr/lib/postgresql/16/bin
+    python benchmarks/backend_matrix.py --postgres postgresql://smartexam@localhost/smartexam_bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def throwaway_postgres(pg_bin, workdir):
+    """Start a private cluster; return (url, stop callback) or (None, None)"""
+    initdb = shutil.which('initdb', path=pg_bin)
+    pg_ctl = shutil.which('pg_ctl', path=pg_bin)
+    if not initdb or not pg_ctl:
+        return None, None
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        print('initdb refuses to run as root; pass --postgres instead')
+        return None, None
+
+    data = os.path.join(workdir, 'pgdata')
+    subprocess.run([initdb, '-D', data, '-U', 'postgres', '--auth=trust'], check=True, capture_output=True)
+    # Unix socket only, inside the data directory: nothing listens on the network
+    subprocess.run([pg_ctl, '-D', data, '-o', f"-k {data} -h ''", '-l', os.path.join(workdir, 'pg.log'),
+                    '-w', 'start'], check=True, capture_output=True)
+
+    def stop():
+        subprocess.run([pg_ctl, '-D', data, '-m', 'immediate', 'stop'], capture_output=True)
+
+    return f'postgresql://postgres@/postgres?host={data}', stop
+
+
+def seed(db, models, students, tests):
+    User, Test, Question, LearningResource = models
+    # A cheap hash: every student logs in, and full-strength checks would dominate the run
+    password_hash = generate_password_hash('admin', method='pbkdf2:sha256:1000')
+    admin = User(name='Admin', username='admin', student_id='admin', role='admin', password_hash=password_hash)
+    db.session.add(admin)
+    for i in range(students):
+        db.session.add(User(name=f'Student {i:04d}', username=f's{i}', student_id=f's{i}', role='student',
+                            password_hash=password_hash))
+    db.session.flush()
+    resource = LearningResource(title='Unit reading', description='Chapter one', resource_type='pdf',
+                                file_path='learning_resources/missing.pdf', file_size=1024, created_by=admin.id)
+    db.session.add(resource)
+    db.session.flush()
+    for t in range(tests):
+        test = Test(title=f'Unit {t} quiz', description='Weekly quiz', time_limit=30,
+                    learning_resource_id=resource.id)
+        db.session.add(test)
+        db.session.flush()
+        for q in range(10):
+            db.session.add(Question(test_id=test.id, question_text=f'Question {q}', question_type='identification',
+                                    correct_answer='yes'))
+    db.session.commit()
+
+
+def run_backend(url, args):
+    """Run the workload against one database; return {check: (passed, seconds)}"""
+    os.environ['DATABASE_URL'] = url
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    from app import create_app, create_schema, db
+    from attempts import finalize_attempt
+    from models import User, Test, Question, Result, LearningResource, StudentProgress, TestAttempt
+
+    app = create_app(with_migrations=False)
+    app.logger.setLevel(logging.WARNING)
+
+    outcomes = {}
+
+    def check(name, started, passed):
+        outcomes[name] = (bool(passed), time.perf_counter() - started)
+
+    with app.app_context():
+        db.drop_all()
+        create_schema()
+        seed(db, (User, Test, Question, LearningResource), args.students, args.tests)
+        test_ids = [test.id for test in Test.query.order_by(Test.id)]
+        resource_id = LearningResource.query.first().id
+        question_ids = [question.id for question in Question.query.filter_by(test_id=test_ids[0])]
+
+    def client_for(username):
+        client = app.test_client()
+        client.post('/login', data={'username': username, 'password': 'admin'})
+        return client
+
+    clients = [client_for(f's{i}') for i in range(args.students)]
+    answers = {f'answer_{question_id}': 'yes' for question_id in question_ids}
+
+    def take_and_submit(client):
+        client.get(f'/take_test/{test_ids[0]}')
+        return client.post(f'/submit_test/{test_ids[0]}', data=answers).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        statuses = list(pool.map(take_and_submit, clients))
+    with app.app_context():
+        scores = [score for (score,) in db.session.query(Result.score).filter_by(test_id=test_ids[0])]
+    check('concurrent submissions', started,
+          all(status == 302 for status in statuses) and len(scores) == args.students and set(scores) == {100})
+
+    started = time.perf_counter()
+    with app.app_context():
+        student = User.query.filter_by(username='s0').one()
+        now = datetime.utcnow()
+        racing = TestAttempt(user_id=student.id, test_id=test_ids[0], started_at=now, deadline=now,
+                             status='active', answers=json.dumps({}))
+        db.session.add(racing)
+        db.session.commit()
+        duplicate = finalize_attempt(racing)
+        db.session.commit()
+        check('duplicate submission ignored', started,
+              duplicate is None and Result.query.filter_by(user_id=student.id, test_id=test_ids[0]).count() == 1)
+        student_id = student.id
+
+    def save_progress(tick):
+        return clients[0].post(f'/update_progress/{resource_id}',
+                               json={'progress': tick, 'position': tick, 'time_spent': tick}).get_json()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        replies = list(pool.map(save_progress, range(1, 41)))
+    with app.app_context():
+        rows = StudentProgress.query.filter_by(user_id=student_id, resource_id=resource_id).all()
+    check('concurrent progress upserts', started,
+          all(reply['success'] for reply in replies) and len(rows) == 1 and 1 <= rows[0].progress_percentage <= 40)
+
+    admin = client_for('admin')
+    started = time.perf_counter()
+    admin.post(f'/user/delete/{student_id}')
+    with app.app_context():
+        leftovers = (Result.query.filter_by(user_id=student_id).count()
+                     + TestAttempt.query.filter_by(user_id=student_id).count()
+                     + StudentProgress.query.filter_by(user_id=student_id).count())
+        check('delete user cascades', started, db.session.get(User, student_id) is None and leftovers == 0)
+
+    started = time.perf_counter()
+    admin.post(f'/delete_learning_resource/{resource_id}')
+    with app.app_context():
+        check('delete resource unlinks tests', started,
+              db.session.get(LearningResource, resource_id) is None
+              and Test.query.filter(Test.learning_resource_id.isnot(None)).count() == 0)
+
+    started = time.perf_counter()
+    admin.post('/delete_test', data={'test_id': test_ids[0]})
+    with app.app_context():
+        check('delete test cascades', started,
+              db.session.get(Test, test_ids[0]) is None
+              and Question.query.filter_by(test_id=test_ids[0]).count() == 0
+              and Result.query.filter_by(test_id=test_ids[0]).count() == 0
+              and TestAttempt.query.filter_by(test_id=test_ids[0]).count() == 0)
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--tests', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--postgres', help='URL of an existing, empty PostgreSQL database')
+    parser.add_argument('--pg-bin', default=None, help='Directory containing initdb and pg_ctl')
+    args = parser.parse_args()
+
+    args.workdir = tempfile.mkdtemp(prefix='smartexam-backends-')
+    sys.path.insert(0, ROOT)
+    stop_postgres = None
+    try:
+        backends = [('sqlite', f'sqlite:///{os.path.join(args.workdir, "bench.db")}')]
+        postgres_url = args.postgres
+        if postgres_url is None:
+            postgres_url, stop_postgres = throwaway_postgres(args.pg_bin, args.workdir)
+        if postgres_url:
+            backends.append(('postgresql', postgres_url))
+        else:
+            print('No PostgreSQL available; running SQLite only\n')
+
+        results = {name: run_backend(url, args) for name, url in backends}
+
+        names = [name for name, _ in backends]
+        checks = list(results[names[0]])
+        print(f'{args.students} students, {args.threads} threads\n')
+        print(f'{"check":<32}' + ''.join(f'{name:>20}' for name in names))
+        failed = False
+        for check in checks:
+            row = f'{check:<32}'
+            for name in names:
+                passed, seconds = results[name][check]
+                failed = failed or not passed
+                row += f'{("ok" if passed else "FAIL") + f" {seconds * 1000:8.1f} ms":>20}'
+            print(row)
+        sys.exit(1 if failed else 0)
+    finally:
+        if stop_postgres:
+            stop_postgres()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
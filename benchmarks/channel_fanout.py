@@ -0,0 +1,247 @@
+"""
+Exam channel fan-out
+====================
+
+How long an admin's broadcast takes to reach a classroom over the exam
+channel. Seeds --students students (as exam_day.py does), logs each in,
+opens the test for them and connects their /exam_channel WebSocket, then
+sends --rounds messages from the Live Exam page and times each from the
+admin's POST until the last socket has received it.
+
+The student sockets are read by one selector thread here, so the numbers
+are the server's: the POST, the broadcast, and each connection's thread
+finishing whatever its socket could not take at once. Also reports a
+heartbeat round trip over the channel against the HTTP heartbeat.
+
+Usage:
+    python benchmarks/channel_fanout.py
+    python benchmarks/channel_fanout.py --students 1000 --rounds 5
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import logging
+import os
+import re
+import selectors
+import shutil
+import socket
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from exam_day import PASSWORD, ROOT, seed
+
+
+def client_frame(message):
+    """A masked text frame, as browsers send them"""
+    payload = json.dumps(message).encode('utf-8')
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x81, 0x80 | length)
+    else:
+        header = struct.pack('!BBH', 0x81, 0x80 | 126, length)
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return header + mask + masked
+
+
+def read_frames(buffer):
+    """Split complete server frames off the buffer; returns [(opcode, payload)]"""
+    frames = []
+    while len(buffer) >= 2:
+        opcode, length, offset = buffer[0] & 0x0F, buffer[1] & 0x7F, 2
+        if length == 126:
+            if len(buffer) < 4:
+                break
+            length, offset = struct.unpack('!H', buffer[2:4])[0], 4
+        elif length == 127:
+            if len(buffer) < 10:
+                break
+            length, offset = struct.unpack('!Q', buffer[2:10])[0], 10
+        if len(buffer) < offset + length:
+            break
+        frames.append((opcode, bytes(buffer[offset:offset + length])))
+        del buffer[:offset + length]
+    return frames
+
+
+class Browser:
+    """One student's cookie jar, for the HTTP requests before the socket opens"""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+
+    def request(self, method, path, form=None, payload=None):
+        headers = {'Cookie': '; '.join(f'{key}={value}' for key, value in self.cookies.items())}
+        body = None
+        if form is not None:
+            body = urlencode(form, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        content = response.read()
+        connection.close()
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                key, _, rest = value.partition('=')
+                self.cookies[key] = rest.split(';', 1)[0]
+        return response.status, content
+
+    def open_channel(self):
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=60)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        cookies = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        sock.sendall((f'GET /exam_channel HTTP/1.1\r\nHost: 127.0.0.1:{self.port}\r\n'
+                      f'Origin: http://127.0.0.1:{self.port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\nCookie: {cookies}\r\n\r\n')
+                     .encode('ascii'))
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError('Closed during the handshake')
+            response += chunk
+        if not response.startswith(b'HTTP/1.1 101'):
+            raise ConnectionError(response.decode(errors="replace"))
+        return sock
+
+
+def join_exam(port, index, test_id):
+    browser = Browser(port)
+    status, _ = browser.request('POST', '/login', form={'username': f's{index}', 'password': PASSWORD})
+    if status != 302:
+        raise RuntimeError(f's{index} could not log in: HTTP {status}')
+    browser.request('GET', f'/take_test/{test_id}')
+    return browser, browser.open_channel()
+
+
+def start_server(args):
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(args.workdir, "exam.db")}'
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(args.workdir, 'sessions.db')
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+    from app import create_app, create_schema, db
+    from models import User, Test, Question, LearningResource
+    from telemetry import start_telemetry_writer
+
+    app = create_app(with_migrations=False)
+    start_telemetry_writer(app)
+    app.logger.setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        create_schema()
+        seed(db, (User, Test, Question, LearningResource), args.students, 0, 1, args.questions)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.socket.listen(1024)  # A classroom connecting at once
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def broadcast_round(admin, sockets, buffers, selector, text):
+    """Seconds from the admin's POST until every socket had the message, and the POST alone"""
+    pending = set(sockets)
+    started = time.perf_counter()
+    status, _ = admin.request('POST', '/admin/tests/1/live/message', form={'message': text})
+    posted = time.perf_counter() - started
+    if status != 302:
+        raise RuntimeError(f'Broadcast failed: HTTP {status}')
+    deadline = started + 60
+    while pending and time.perf_counter() < deadline:
+        for key, _ in selector.select(timeout=1):
+            sock = key.fileobj
+            data = sock.recv(65536)
+            buffers[sock] += data
+            for opcode, payload in read_frames(buffers[sock]):
+                if opcode == 0x1 and json.loads(payload).get('message') == text:
+                    pending.discard(sock)
+    if pending:
+        raise RuntimeError(f'{len(pending)} sockets never received the broadcast')
+    return time.perf_counter() - started, posted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--heartbeats', type=int, default=50, help='Round trips timed per transport')
+    args = parser.parse_args()
+
+    args.workdir = tempfile.mkdtemp(prefix='smartexam-exam-channel-')
+    server = None
+    sockets = []
+    try:
+        server = start_server(args)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(8) as pool:
+            joined = list(pool.map(lambda index: join_exam(server.port, index, 1), range(args.students)))
+        sockets = [sock for _, sock in joined]
+        print(f'{len(sockets)} students joined in {time.perf_counter() - started:.1f} s')
+
+        admin = Browser(server.port)
+        admin.request('POST', '/login', form={'username': 'admin', 'password': PASSWORD})
+        status, page = admin.request('GET', '/admin/tests/1/live')
+        connected = re.search(rb'(\d+) connected', page)
+        print(f'Live Exam page: HTTP {status}, {connected.group(1).decode() if connected else "?"} connected')
+
+        # Heartbeat round trips: over the channel, then over HTTP
+        browser, sock = joined[0]
+        channel_times = []
+        buffer = bytearray()
+        for _ in range(args.heartbeats):
+            sent = time.perf_counter()
+            sock.sendall(client_frame({'type': 'heartbeat', 'sent_at': 0}))
+            frames = []
+            while not frames:
+                buffer += sock.recv(65536)
+                frames = read_frames(buffer)
+            channel_times.append(time.perf_counter() - sent)
+        http_times = []
+        for _ in range(args.heartbeats):
+            sent = time.perf_counter()
+            browser.request('POST', '/test_heartbeat', payload={'test_id': 1, 'timestamp': 0})
+            http_times.append(time.perf_counter() - sent)
+        print(f'Heartbeat round trip, median: channel {statistics.median(channel_times) * 1000:.1f} ms, '
+              f'HTTP {statistics.median(http_times) * 1000:.1f} ms')
+
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        for sock in sockets:
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            buffers[sock] = bytearray()
+        totals, posts = [], []
+        for round_number in range(args.rounds):
+            total, posted = broadcast_round(admin, sockets, buffers, selector, f'Announcement {round_number}')
+            totals.append(total)
+            posts.append(posted)
+            print(f'Round {round_number + 1}: all {len(sockets)} received in {total * 1000:.0f} ms '
+                  f'(POST answered in {posted * 1000:.0f} ms)')
+        print(f'Broadcast to {len(sockets)} sockets: median {statistics.median(totals) * 1000:.0f} ms, '
+              f'max {max(totals) * 1000:.0f} ms')
+        failed = max(totals) >= 1
+    finally:
+        for sock in sockets:
+            sock.close()
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Response compression benchmark
+==============================
+
+Renders the main pages through the Flask test client against a synthetic
+database and reports, per page, the bytes on the wire without compression,
+with gzip and with brotli. CPU cost is reported as the median process time
+of rendering the uncompressed page and of compressing its body at the
+configured level, so the compression overhead can be compared directly.
+
+Usage:
+    python benchmarks/compression.py
+    python benchmarks/compression.py --repeat 50 --gzip-level 9 --brotli-quality 5
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db, models, students, tests, questions_per_test):
+    User, Test, Question, Result, LearningResource = models
+    admin = User(name='Admin', username='admin', student_id='admin', role='admin')
+    admin.set_password('admin')
+    db.session.add(admin)
+    for i in range(students):
+        user = User(name=f'Student {i:04d}', username=f's{i}', student_id=f's{i}', role='student')
+        user.password_hash = admin.password_hash  # Hashing thousands of passwords would dominate the run
+        db.session.add(user)
+    db.session.flush()
+    student_ids = [u.id for u in User.query.filter_by(role='student')]
+
+    for t in range(tests):
+        test = Test(title=f'Unit {t} assessment', description='Covers the unit reading and exercises', time_limit=30)
+        db.session.add(test)
+        db.session.flush()
+        answers = {}
+        for q in range(questions_per_test):
+            question = Question(test_id=test.id, question_text=f'Question {q}: which option best describes concept {q}?',
+                                question_type='multiple_choice',
+                                choices=json.dumps([f'Option {c}' for c in 'ABCD']), correct_answer='Option A')
+            db.session.add(question)
+            db.session.flush()
+            answers[str(question.id)] = {'question_text': question.question_text, 'question_type': 'multiple_choice',
+                                         'user_answer': 'Option A', 'correct_answer': 'Option A', 'is_correct': True,
+                                         'choices': [f'Option {c}' for c in 'ABCD']}
+        for user_id in student_ids[1:]:  # Student 0 keeps every test open to take
+            db.session.add(Result(user_id=user_id, test_id=test.id, score=random.choice((40, 60, 75, 90, 100)),
+                                  raw_data=json.dumps(answers)))
+    for r in range(12):
+        db.session.add(LearningResource(title=f'Resource {r}', description='Slides and a recorded lecture',
+                                        resource_type='mixed', created_by=1, file_size=1024 * 1024))
+    db.session.commit()
+
+
+def measure(client, url, encoding, repeat):
+    """(bytes on the wire, median CPU ms per request)"""
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        response = client.get(url, headers=headers)
+        cpu.append((time.process_time() - started) * 1000)
+    return len(response.data), response.get_data(), statistics.median(cpu)
+
+
+def compression_cpu(body, encoding, config, repeat):
+    """Median CPU ms to compress body with the app's settings"""
+    from compression import compress
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        compress(body, encoding, gzip_level=config['COMPRESS_LEVEL'], brotli_quality=config['COMPRESS_BROTLI_QUALITY'])
+        cpu.append((time.process_time() - started) * 1000)
+    return statistics.median(cpu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--tests', type=int, default=20)
+    parser.add_argument('--questions-per-test', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--gzip-level', type=int, default=None)
+    parser.add_argument('--brotli-quality', type=int, default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-compress-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    sys.path.insert(0, ROOT)
+    from app import create_app, create_schema, db
+    from compression import brotli
+    from models import User, Test, Question, Result, LearningResource
+
+    app = create_app(with_migrations=False)
+    app.config['FRAGMENT_CACHE_ENABLED'] = False  # Measure full renders
+    if args.gzip_level is not None:
+        app.config['COMPRESS_LEVEL'] = args.gzip_level
+    if args.brotli_quality is not None:
+        app.config['COMPRESS_BROTLI_QUALITY'] = args.brotli_quality
+
+    try:
+        with app.app_context():
+            create_schema()
+            seed(db, (User, Test, Question, Result, LearningResource), args.students, args.tests, args.questions_per_test)
+            first_test = Test.query.order_by(Test.id).first().id
+            sample_result = Result.query.order_by(Result.id).first().id
+
+        admin = app.test_client()
+        admin.post('/login', data={'username': 'admin', 'password': 'admin'})
+        student = app.test_client()
+        student.post('/login', data={'username': 's0', 'password': 'admin'})
+
+        pages = [
+            ('login', app.test_client(), '/login'),
+            ('admin dashboard', admin, '/dashboard'),
+            ('admin resources', admin, '/learning_resources'),
+            ('admin results api', admin, '/api/admin/results?limit=100'),
+            ('view result', admin, f'/result/{sample_result}'),
+            ('available tests', student, '/available_tests'),
+            ('take test', student, f'/take_test/{first_test}'),
+        ]
+        encodings = ['gzip', 'br'] if brotli is not None else ['gzip']
+
+        print(f'gzip level {app.config["COMPRESS_LEVEL"]}, brotli quality {app.config["COMPRESS_BROTLI_QUALITY"]}; '
+              f'median CPU ms per request (render) and per body (compress)\n')
+        print(f'{"page":<20}{"identity B":>12}{"render ms":>11}'
+              + ''.join(f'{name + " B":>10}{name + " ms":>9}' for name in encodings))
+        totals = dict.fromkeys(['identity'] + encodings, 0)
+        for label, client, url in pages:
+            size, body, render_ms = measure(client, url, '', args.repeat)
+            totals['identity'] += size
+            row = f'{label:<20}{size:>12,}{render_ms:>11.2f}'
+            for encoding in encodings:
+                wire_size, _, _ = measure(client, url, encoding, 1)
+                totals[encoding] += wire_size
+                row += f'{wire_size:>10,}{compression_cpu(body, encoding, app.config, args.repeat):>9.2f}'
+            print(row)
+        print('\n' + ', '.join(f'{name}: {total:,} B ({total / totals["identity"] * 100:.0f}%)'
+                               for name, total in totals.items()))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
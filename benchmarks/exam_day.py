@@ -0,0 +1,338 @@
+"""
+Exam-day load test
+==================
+
+Simulates a full classroom over real HTTP, with one thread per student:
+
+1. login storm: every student logs in at the same moment,
+2. take_test: every test taker opens the exam,
+3. exam phase (--duration seconds): a test_heartbeat every --heartbeat
+   seconds, an autosave_answers after each answer changes, and now and then a
+   burst of record_security_violation calls (a student tabbing away),
+4. submit wave: everybody submits at the same moment, as when the timer
+   runs out.
+
+Meanwhile --readers students study a learning resource and send
+update_progress ticks.
+
+By default the app runs in this process against a synthetic SQLite database
+(--students, --tests, --questions) served by the same threaded server the
+launchers use. Statement timings are then recorded too: a write that took
+longer than --lock-threshold ms was waiting for SQLite's write lock.
+
+To load a real host, seed a database first, serve it, and point --url at it:
+
+    python benchmarks/exam_day.py --seed /tmp/exam.db --students 300
+    DATABASE_URL=sqlite:////tmp/exam.db python app.py
+    python benchmarks/exam_day.py --url http://192.168.1.10:5000 --students 300
+
+Students log in as s0, s1, ... with the password "student". Reports
+p50/p95/p99 latency and the error rate per endpoint. Exits non-zero if any
+request failed.
+
+Usage:
+    python benchmarks/exam_day.py
+    python benchmarks/exam_day.py --students 500 --readers 50 --duration 120
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'student'
+
+
+def seed(db, models, students, readers, tests, questions):
+    """Students s0.. (test takers first, then readers), tests and one resource"""
+    User, Test, Question, LearningResource = models
+    # A cheap hash: every student logs in, and full-strength checks would dominate the storm
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    admin = User(name='Admin', username='admin', student_id='admin', role='admin', password_hash=password_hash)
+    db.session.add(admin)
+    for i in range(students + readers):
+        db.session.add(User(name=f'Student {i:04d}', username=f's{i}', student_id=f's{i}', role='student',
+                            password_hash=password_hash))
+    db.session.flush()
+    db.session.add(LearningResource(title='Unit reading', description='Chapter one', resource_type='document',
+                                    created_by=admin.id, file_size=0))
+    for t in range(tests):
+        test = Test(title=f'Unit {t} exam', description='End of unit exam', time_limit=120)
+        db.session.add(test)
+        db.session.flush()
+        for q in range(questions):
+            choices = [f'Option {c} for question {q}' for c in 'ABCD']
+            db.session.add(Question(test_id=test.id, question_text=f'Question {q}: which option is correct?',
+                                    question_type='multiple_choice', choices=json.dumps(choices),
+                                    correct_answer=choices[0]))
+    db.session.commit()
+
+
+class Recorder:
+    """Latencies and failures per endpoint, shared by all student threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    def add(self, name, seconds, error=None):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if error:
+                self.errors[name] += 1
+                self.error_samples.setdefault(name, error)
+
+
+class Student:
+    """A browser: one cookie jar, a fresh connection per request"""
+
+    def __init__(self, base_url, recorder, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+        self.timeout = timeout
+        self.cookies = {}
+
+    def request(self, name, method, path, form=None, payload=None, expect=(200,)):
+        headers = {'Cookie': '; '.join(f'{key}={value}' for key, value in self.cookies.items())}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+            connection.close()
+        except (OSError, http.client.HTTPException) as e:
+            self.recorder.add(name, time.perf_counter() - started, f'{type(e).__name__}: {e}')
+            return None
+        self.recorder.add(name, time.perf_counter() - started,
+                          None if response.status in expect else f'HTTP {response.status} {path}')
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                key, _, rest = value.partition('=')
+                self.cookies[key] = rest.split(';', 1)[0]
+        return content
+
+
+def take_exam(student, index, test_id, args, start_exam, submit_wave):
+    student.request('login', 'POST', '/login', form={'username': f's{index}', 'password': PASSWORD}, expect=(302,))
+    start_exam.wait()
+    page = student.request('take_test', 'GET', f'/take_test/{test_id}')
+    question_ids = re.findall(rb'name="answer_(\d+)"', page or b'')
+    answers = {}
+    violations = 0
+    deadline = time.monotonic() + args.duration
+    next_heartbeat = time.monotonic() + random.uniform(0, args.heartbeat)  # Students did not open the page in step
+    while question_ids:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        # Answer a question every few seconds; the page autosaves 1.5 s later
+        question_id = random.choice(question_ids).decode()
+        answers[question_id] = f'Option {random.choice("ABCD")} for question'
+        time.sleep(min(1.5, max(0, deadline - now)))
+        student.request('autosave_answers', 'POST', '/autosave_answers',
+                        payload={'test_id': test_id, 'answers': answers})
+        if time.monotonic() >= next_heartbeat:
+            if random.random() < args.violation_rate:
+                for _ in range(args.burst):
+                    violations += 1
+                    student.request('record_security_violation', 'POST', '/record_security_violation', payload={
+                        'test_id': test_id, 'violation_type': 'tab_switch',
+                        'timestamp': datetime.utcnow().isoformat(), 'total_violations': violations})
+            student.request('test_heartbeat', 'POST', '/test_heartbeat', payload={
+                'test_id': test_id, 'timestamp': datetime.utcnow().isoformat(),
+                'security_violations': violations, 'tab_switches': violations, 'fullscreen_exits': 0})
+            next_heartbeat += args.heartbeat
+        time.sleep(random.uniform(0, args.think_time))
+    submit_wave.wait()
+    student.request('submit_test', 'POST', f'/submit_test/{test_id}',
+                    form={f'answer_{question_id}': answer for question_id, answer in answers.items()}, expect=(302,))
+
+
+def read_resource(student, index, resource_id, args, start_exam, submit_wave):
+    student.request('login', 'POST', '/login', form={'username': f's{index}', 'password': PASSWORD}, expect=(302,))
+    start_exam.wait()
+    student.request('view_resource', 'GET', f'/view_resource/{resource_id}')
+    deadline = time.monotonic() + args.duration
+    tick = 0
+    while time.monotonic() < deadline:
+        time.sleep(min(args.progress_interval, max(0, deadline - time.monotonic())))
+        tick += 1
+        student.request('update_progress', 'POST', f'/update_progress/{resource_id}', payload={
+            'progress': min(100, tick * 5), 'position': tick * 30, 'time_spent': tick * args.progress_interval})
+    submit_wave.wait()
+
+
+def watch_statements(engine, threshold):
+    """Record write statements that waited longer than threshold seconds"""
+    from sqlalchemy import event
+    waits = []
+    lock = threading.Lock()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info['statement_started'].pop()
+        if elapsed >= threshold and statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            with lock:
+                waits.append(elapsed)
+
+    return waits
+
+
+def start_server(args):
+    """Seed a temporary database and serve the app on a free local port"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(args.workdir, "exam.db")}'
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(args.workdir, 'sessions.db')
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+    from app import create_app, create_schema, db
+    from models import User, Test, Question, LearningResource
+    from telemetry import start_telemetry_writer
+
+    app = create_app(with_migrations=False)
+    start_telemetry_writer(app)  # As the launchers do
+    app.logger.setLevel(logging.ERROR)  # Every request is logged
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        create_schema()
+        seed(db, (User, Test, Question, LearningResource), args.students, args.readers, args.tests, args.questions)
+        waits = watch_statements(db.engine, args.lock_threshold / 1000)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.port}', server, waits
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def report(recorder, elapsed, waits, args):
+    print(f'{args.students} test takers, {args.readers} readers, {args.tests} tests of {args.questions} questions, '
+          f'{elapsed:.1f} s\n')
+    print(f'{"endpoint":<28}{"requests":>9}{"errors":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+    total = failed = 0
+    for name in ('login', 'take_test', 'autosave_answers', 'test_heartbeat', 'record_security_violation',
+                 'view_resource', 'update_progress', 'submit_test'):
+        values = sorted(recorder.latencies.get(name, []))
+        if not values:
+            continue
+        total += len(values)
+        failed += recorder.errors[name]
+        print(f'{name:<28}{len(values):>9}{recorder.errors[name]:>8}'
+              + ''.join(f'{percentile(values, p) * 1000:>9.1f}' for p in (0.5, 0.95, 0.99))
+              + f'{values[-1] * 1000:>9.1f}')
+    print(f'\n{total} requests, {failed} errors ({failed / max(total, 1) * 100:.2f}%), '
+          f'{total / elapsed:.0f} requests/s')
+    for name, sample in recorder.error_samples.items():
+        print(f'  first {name} error: {sample}')
+    if waits is not None:
+        if waits:
+            print(f'SQLite lock waits (writes over {args.lock_threshold} ms): {len(waits)}, '
+                  f'median {statistics.median(waits) * 1000:.1f} ms, max {max(waits) * 1000:.1f} ms, '
+                  f'total {sum(waits):.2f} s')
+        else:
+            print(f'SQLite lock waits (writes over {args.lock_threshold} ms): none')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100, help='Students taking the exam')
+    parser.add_argument('--readers', type=int, default=20, help='Students studying a resource meanwhile')
+    parser.add_argument('--tests', type=int, default=1)
+    parser.add_argument('--questions', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=60, help='Seconds between opening and submitting')
+    parser.add_argument('--heartbeat', type=float, default=30, help='Seconds between heartbeats (as take_test.js)')
+    parser.add_argument('--think-time', type=float, default=5, help='Most seconds spent on one answer')
+    parser.add_argument('--violation-rate', type=float, default=0.2, help='Chance of a burst per heartbeat')
+    parser.add_argument('--burst', type=int, default=5, help='Violations per burst')
+    parser.add_argument('--progress-interval', type=float, default=15)
+    parser.add_argument('--lock-threshold', type=float, default=20, help='ms; slower writes count as lock waits')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request counts as failed')
+    parser.add_argument('--url', help='Load an already running server instead (seeded with --seed)')
+    parser.add_argument('--seed', metavar='PATH', help='Only write a seeded SQLite database to PATH')
+    args = parser.parse_args()
+
+    if args.seed:
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(args.seed)}'
+        os.environ['SESSION_BACKEND'] = 'memory'
+        sys.path.insert(0, ROOT)
+        from app import create_app, create_schema, db
+        from models import User, Test, Question, LearningResource
+        app = create_app(with_migrations=False)
+        with app.app_context():
+            create_schema()
+            seed(db, (User, Test, Question, LearningResource), args.students, args.readers, args.tests, args.questions)
+        print(f'Seeded {args.seed}: students s0-s{args.students + args.readers - 1}, password "{PASSWORD}"')
+        return
+
+    args.workdir = tempfile.mkdtemp(prefix='smartexam-exam-day-')
+    server = waits = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            base_url, server, waits = start_server(args)
+
+        recorder = Recorder()
+        people = args.students + args.readers
+        # A student thread that dies breaks the barriers instead of hanging everybody
+        patience = args.duration + 10 * args.timeout
+        start_exam = threading.Barrier(people, timeout=patience)  # Logins done: the exam opens
+        submit_wave = threading.Barrier(people, timeout=patience)  # Time is up: everybody submits
+        threads = []
+        for index in range(people):
+            student = Student(base_url, recorder, args.timeout)
+            if index < args.students:
+                target = take_exam
+                argument = 1 + index % args.tests  # Test ids in seeding order
+            else:
+                target, argument = read_resource, 1
+            threads.append(threading.Thread(target=target, daemon=True,
+                                            args=(student, index, argument, args, start_exam, submit_wave)))
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        failed = report(recorder, time.perf_counter() - started, waits, args)
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
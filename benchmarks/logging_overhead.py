@@ -0,0 +1,194 @@
+"""
+Logging overhead
+================
+
+What logging costs the request threads, before and after structured_logging.py:
+
+- before: the f-string messages through Flask's default handler, written to
+  stderr in the request thread, plus the dev server's access log line for
+  every request (werkzeug's own handler, also synchronous)
+- after: JSON records with the request context through the queue handler,
+  a 'request' record per request with heartbeats sampled as configured
+
+Two measurements, each mode in its own process since both configure the
+process-wide 'werkzeug' logger:
+
+- per request: the logging one exam request does (the test_started record
+  and the access line), in --threads request threads at once, timed in the
+  threads themselves
+- end to end: requests per second from the threaded dev server for a page
+  that logs one record and for a heartbeat, with --threads clients
+
+stderr goes to a temporary file in both modes, as it does in a service.
+
+Usage:
+    python benchmarks/logging_overhead.py
+    python benchmarks/logging_overhead.py --threads 16 --requests 20000
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('before', 'after')
+
+
+def make_app(mode):
+    from flask import Flask, current_app, jsonify
+    app = Flask('app')
+    app.secret_key = 'benchmark'
+    if mode == 'after':
+        sys.path.insert(0, ROOT)
+        from config import Config
+        from structured_logging import init_structured_logging
+        app.config.update(LOG_FORMAT='json', LOG_QUEUE_SIZE=Config.LOG_QUEUE_SIZE,
+                          LOG_ACCESS_SAMPLE_RATES=Config.LOG_ACCESS_SAMPLE_RATES)
+        init_structured_logging(app)
+    else:
+        app.logger.setLevel(logging.INFO)
+
+    @app.route('/take_test')
+    def take_test():
+        if mode == 'after':
+            current_app.logger.info('Test started', extra={'event': 'test_started', 'test_id': 3, 'attempt_id': 118})
+        else:
+            current_app.logger.info('Test started: User 42 (Student 42) started test 3 (Midterm), attempt 118')
+        return 'ok'
+
+    @app.route('/test_heartbeat', methods=['POST'])
+    def test_heartbeat():
+        return jsonify({'status': 'ok'})
+
+    return app
+
+
+def dev_server_handler(method, path):
+    """Enough of the dev server's request handler to call its log_request"""
+    from werkzeug.serving import WSGIRequestHandler
+    handler = WSGIRequestHandler.__new__(WSGIRequestHandler)
+    handler.command, handler.path, handler.request_version = method, path, 'HTTP/1.1'
+    handler.client_address = ('127.0.0.1', 50000)
+    return handler
+
+
+def logging_cost(app, mode, path, threads, requests):
+    """(request-thread seconds, process CPU seconds) spent logging, per request.
+
+    The request thread's share is the logging calls a request makes (for
+    'after' also giving it its ID); the CPU time also counts the listener
+    thread, up to the last record being written.
+    """
+    from flask import current_app, session
+    if mode == 'after':
+        from structured_logging import start_request
+        finish = app.after_request_funcs[None][0]
+    method = 'POST' if path == '/test_heartbeat' else 'GET'
+    server_handler = dev_server_handler(method, path)
+    logs_start = path == '/take_test'
+
+    def one_thread(count):
+        times = []
+        with app.test_request_context(path, method=method):
+            session.update({'_user_id': '42', 'active_test_id': 3, 'attempt_id': 118})
+            response = app.make_response('ok')
+            for _ in range(count):
+                started = time.perf_counter()
+                if mode == 'after':
+                    start_request()
+                    if logs_start:
+                        current_app.logger.info('Test started', extra={'event': 'test_started', 'test_id': 3,
+                                                                       'attempt_id': 118})
+                    finish(response)
+                else:
+                    if logs_start:
+                        current_app.logger.info('Test started: User 42 (Student 42) started test 3 (Midterm), attempt 118')
+                    server_handler.log_request(200, 2)  # The access line
+                times.append(time.perf_counter() - started)
+        return times
+
+    cpu_started = time.process_time()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(one_thread, [requests // threads] * threads))
+    if mode == 'after':
+        listener = app.extensions['structured_logging'].listener
+        listener.stop()  # Returns once the listener has written everything
+        listener.start()
+    cpu = time.process_time() - cpu_started
+    times = [t for times in results for t in times]
+    return times, cpu / len(times)
+
+
+def end_to_end(app, threads, requests, path, method):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def client(count):
+        for _ in range(count):
+            connection = http.client.HTTPConnection('127.0.0.1', server.port)
+            connection.request(method, path, body=b'{}' if method == 'POST' else None,
+                               headers={'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(client, [requests // threads] * threads))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    return requests / elapsed
+
+
+def run_mode(mode, threads, requests):
+    """Runs in a child process; prints one JSON line to stdout"""
+    log_file = tempfile.NamedTemporaryFile(prefix=f'logging-{mode}-', suffix='.log', delete=False)
+    os.dup2(log_file.fileno(), 2)
+    app = make_app(mode)
+    result = {}
+    for path in ('/take_test', '/test_heartbeat'):
+        times, cpu = logging_cost(app, mode, path, threads, requests)
+        result[path] = {
+            'median_us': statistics.median(times) * 1e6,
+            'p99_us': statistics.quantiles(times, n=100)[98] * 1e6,
+            'cpu_us': cpu * 1e6,
+            'rps': end_to_end(app, threads, requests // 4, path, 'POST' if path == '/test_heartbeat' else 'GET'),
+        }
+    logging.shutdown()
+    result['log_bytes'] = os.path.getsize(log_file.name)
+    os.unlink(log_file.name)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=8000)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return run_mode(args.mode, args.threads, args.requests)
+
+    print(f'{args.threads} threads, {args.requests} requests per page')
+    print('logging per request: time in the request thread (median, p99) and CPU including the listener')
+    for mode in MODES:
+        output = subprocess.run([sys.executable, __file__, '--mode', mode, '--threads', str(args.threads),
+                                 '--requests', str(args.requests)], capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        for path in ('/take_test', '/test_heartbeat'):
+            page = result[path]
+            print(f'{mode:>6} {path:<15}: median {page["median_us"]:6.1f} us, p99 {page["p99_us"]:7.1f} us, '
+                  f'CPU {page["cpu_us"]:6.1f} us | dev server {page["rps"]:.0f} req/s')
+        print(f'{mode:>6}: {result["log_bytes"] / 1024:.0f} KiB logged')
+
+if __name__ == '__main__':
+    main()
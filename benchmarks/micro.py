@@ -0,0 +1,262 @@
+"""
+Hot path micro-benchmarks
+=========================
+
+Times the code paths that grow with the data, on a database generated by
+synthetic_data.seed() with a fixed random seed, so runs on one machine are
+comparable:
+
+- dashboard_statistics: get_test_statistics(), the admin dashboard's
+  per-test aggregates, and dashboard_statistics_section, the same for one
+  40-student section with a tenth of the tests,
+- submit_test_grading: loading a test's questions and grading an answer
+  sheet with grade_answers(), as submit_test does,
+- opening_soon_refresh: rebuilding the opening-soon lists, with a tenth of
+  the tests opening over the coming week,
+- export_result_csv, view_result, view_student_records,
+  available_tests_student, dashboard_student, learning_resources_student,
+  learning_resources_admin and security_events_by_type (one test's tab
+  switches, from the admin API): the whole request through the test client,
+  with the fragment cache off.
+
+The benchmarks run round-robin, a few warmup rounds and then --rounds timed
+rounds, and each reports min / median / mean / stddev in milliseconds. The fastest round is
+the least disturbed by the rest of the machine, so min is what gets compared
+with the stored baseline (benchmarks/baselines/micro.json). Shared machines
+also speed up and slow down as a whole from one run to the next; a fixed
+pure-Python workload is timed in every round ('calibration') and every min
+is compared in units of it. A benchmark more than --tolerance slower than its
+baseline is a regression and makes the script exit with status 1.
+
+Baselines are recorded on one machine and only roughly carry over to
+another; after changing machines, or after a change that is meant to move
+the numbers, record a new one with --save.
+
+Usage:
+    python benchmarks/micro.py
+    python benchmarks/micro.py -k export -k records --rounds 50
+    python benchmarks/micro.py --save
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'micro.json')
+
+# The data set every baseline is recorded against
+SCALE = {'students': 300, 'tests': 30, 'questions_per_test': 30, 'results_per_student': 20,
+         'resources': 200, 'files_per_resource': 2, 'progress_per_student': 20, 'random_seed': 41}
+
+
+def calibration():
+    """Fixed interpreter-bound work (JSON, sorting, string formatting), a few milliseconds long"""
+    rows = [{'id': i, 'score': (i * 7919) % 100, 'answer': f'choice {i % 4}'} for i in range(2000)]
+    rows = json.loads(json.dumps(rows))
+    sorted(rows, key=lambda row: (row['score'], row['answer']))
+
+
+def run_benchmarks(functions, rounds, warmup):
+    """Time {name: function} round-robin, so a slow spell of the machine hits all of them alike"""
+    timings = {name: [] for name in functions}
+    for round_number in range(warmup + rounds):
+        for name, function in functions.items():
+            started = time.perf_counter()
+            function()
+            if round_number >= warmup:
+                timings[name].append((time.perf_counter() - started) * 1000)
+    return {name: {
+        'rounds': rounds,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stddev': statistics.stdev(samples) if rounds > 1 else 0.0,
+    } for name, samples in timings.items()}
+
+
+def logged_in_client(app, username, password):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'Could not log in as {username}')
+    return client
+
+
+def get_ok(client, url):
+    def request():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return request
+
+
+def build_benchmarks(app):
+    """{name: callable} for every hot path, against the seeded database"""
+    from app import db, get_test_statistics
+    from attempts import grade_answers
+    from models import User, Test, Result, Section, SectionMembership, SectionTest
+
+    with app.app_context():
+        # One section: the first 40 students and a tenth of the tests
+        section = Section(name='Benchmark section')
+        db.session.add(section)
+        db.session.flush()
+        section_id = section.id
+        for (user_id,) in db.session.query(User.id).filter_by(role='student').order_by(User.id).limit(40):
+            db.session.add(SectionMembership(section_id=section_id, user_id=user_id, role='student'))
+        for (assigned_id,) in db.session.query(Test.id).order_by(Test.id).limit(SCALE['tests'] // 10):
+            db.session.add(SectionTest(section_id=section_id, test_id=assigned_id))
+        # Every tenth test opens over the coming week, for the opening-soon lists
+        for index, (windowed_id,) in enumerate(db.session.query(Test.id).order_by(Test.id.desc())
+                                               .limit(SCALE['tests'] // 10)):
+            db.session.get(Test, windowed_id).opens_at = datetime.utcnow() + timedelta(hours=4 * index + 1)
+        db.session.commit()
+
+        # A typical student: the one with the median number of results
+        student = db.session.query(User.id, User.username).filter_by(role='student').order_by(User.id) \
+            .offset(SCALE['students'] // 2).first()
+        result_id = db.session.query(Result.id).filter_by(user_id=student.id).order_by(Result.id).first()[0]
+        test_id = db.session.query(Test.id).order_by(Test.id).first()[0]
+        answers = {str(question.id): random.choice((question.correct_answer, ''))
+                   for question in db.session.get(Test, test_id).questions}
+        db.session.remove()
+
+    def grade():
+        with app.app_context():
+            test = db.session.get(Test, test_id)  # A fresh session, as in a request
+            grade_answers(test, answers)
+            db.session.remove()
+
+    def refresh_opening_soon():
+        with app.app_context():
+            app.extensions['opening_soon'].refresh()
+            db.session.remove()
+
+    def test_statistics(section_id=None):
+        with app.app_context():
+            get_test_statistics(section_id)
+            db.session.remove()
+
+    admin = logged_in_client(app, 'admin', 'admin')
+    learner = logged_in_client(app, student.username, 'student')
+    return {
+        'dashboard_statistics': test_statistics,
+        'dashboard_statistics_section': lambda: test_statistics(section_id),
+        'submit_test_grading': grade,
+        'export_result_csv': get_ok(admin, f'/export_result_csv/{result_id}'),
+        'view_result': get_ok(admin, f'/result/{result_id}'),
+        'view_student_records': get_ok(admin, f'/student_records/{student.id}'),
+        'available_tests_student': get_ok(learner, '/available_tests'),
+        'dashboard_student': get_ok(learner, '/dashboard'),
+        'opening_soon_refresh': refresh_opening_soon,
+        'learning_resources_student': get_ok(learner, '/learning_resources'),
+        'learning_resources_admin': get_ok(admin, '/learning_resources'),
+        'security_events_by_type': get_ok(admin, f'/api/admin/security_events?test_id={test_id}&type=tab_switch'),
+    }
+
+
+def load_baseline():
+    try:
+        with open(BASELINE) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def save_baseline(results):
+    existing = load_baseline() or {}
+    benchmarks = existing.get('benchmarks', {}) if existing.get('scale') == SCALE else {}
+    benchmarks.update(results)
+    os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+    with open(BASELINE, 'w') as f:
+        json.dump({
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'processor': platform.processor() or platform.machine()},
+            'scale': SCALE,
+            'benchmarks': {name: {key: round(value, 4) if isinstance(value, float) else value
+                                  for key, value in stats.items()}
+                           for name, stats in sorted(benchmarks.items())},
+        }, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help='Only run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown of the min before it counts as a regression')
+    parser.add_argument('--save', action='store_true', help='Record these results as the new baseline')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-micro-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    sys.path.insert(0, ROOT)
+    from app import create_app, create_schema
+    from synthetic_data import seed
+
+    app = create_app(with_migrations=False)
+    app.config['FRAGMENT_CACHE_ENABLED'] = False  # Time the work, not the cache
+    try:
+        with app.app_context():
+            create_schema()
+            started = time.perf_counter()
+            created = seed(**SCALE)
+            print(f'Seeded {created["result"]:,} results, {created["question"]:,} questions and '
+                  f'{created["learning_resource"]:,} resources in {time.perf_counter() - started:.1f} s\n')
+
+        benchmarks = build_benchmarks(app)
+        selected = [name for name in benchmarks if not args.patterns or any(p in name for p in args.patterns)]
+        random.seed()
+        functions = {'calibration': calibration}
+        functions.update((name, benchmarks[name]) for name in selected)
+        results = run_benchmarks(functions, args.rounds, args.warmup)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = load_baseline()
+    if baseline and baseline.get('scale') != SCALE:
+        print('Stored baseline was recorded at a different scale; not comparing\n')
+        baseline = None
+    recorded = baseline['benchmarks'] if baseline and 'calibration' in baseline['benchmarks'] else {}
+    # How much slower the machine is than when the baseline was recorded
+    speed = results['calibration']['min'] / recorded['calibration']['min'] if recorded else 1
+
+    regressions = []
+    print(f'{"benchmark":<28}{"min ms":>9}{"median ms":>11}{"mean ms":>10}{"stddev":>9}{"baseline":>10}{"change":>9}')
+    for name, stats in results.items():
+        line = f'{name:<28}{stats["min"]:>9.2f}{stats["median"]:>11.2f}{stats["mean"]:>10.2f}{stats["stddev"]:>9.2f}'
+        if name in recorded and name != 'calibration':
+            reference = recorded[name]['min'] * speed
+            change = stats['min'] / reference - 1
+            line += f'{reference:>10.2f}{change:>+9.0%}'
+            if change > args.tolerance:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+    if recorded:
+        print(f'\nBaseline mins scaled by {speed:.2f} for the speed of this run (calibration)')
+
+    if args.save:
+        save_baseline(results)
+        print(f'\nBaseline saved to {os.path.relpath(BASELINE, ROOT)}')
+    elif regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Query-plan benchmark for the hot lookup indexes
+===============================================
+
+Builds a synthetic SQLite database at migration 0002 (no secondary indexes),
+times the hot queries and records their query plans, then upgrades to the
+latest migration and measures again.
+
+Usage:
+    python benchmarks/query_plans.py                   # 1,000,000 results
+    python benchmarks/query_plans.py --results 200000 --keep
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, sql, parameter factory)
+HOT_QUERIES = [
+    ('result by user+test (take/submit_test)',
+     'SELECT id FROM result WHERE user_id = ? AND test_id = ? LIMIT 1',
+     lambda s: (random.randint(1, s['users']), random.randint(1, s['tests']))),
+    ('results of one student (student_records)',
+     'SELECT id, score FROM result WHERE user_id = ? ORDER BY date_taken DESC',
+     lambda s: (random.randint(1, s['users']),)),
+    ('test median (dashboard statistics)',
+     'SELECT score FROM result WHERE test_id = ? ORDER BY score LIMIT 1 OFFSET ?',
+     lambda s: (random.randint(1, s['tests']), s['users'] // 2)),
+    ('latest results page (admin results list)',
+     'SELECT id FROM result ORDER BY date_taken DESC, id DESC LIMIT 25',
+     lambda s: ()),
+    ('questions of a test (take_test)',
+     'SELECT id FROM question WHERE test_id = ?',
+     lambda s: (random.randint(1, s['tests']),)),
+    ('progress by resource (delete_learning_resource)',
+     'SELECT id FROM student_progress WHERE resource_id = ?',
+     lambda s: (random.randint(1, s['resources']),)),
+    ('files of a resource (view_resource)',
+     'SELECT id FROM resource_file WHERE resource_id = ? ORDER BY upload_order',
+     lambda s: (random.randint(1, s['resources']),)),
+    ('active resources newest first (learning_resources)',
+     'SELECT id FROM learning_resource WHERE is_active = 1 ORDER BY created_at DESC',
+     lambda s: ()),
+]
+
+
+def seed(path, sizes):
+    """Bulk-load synthetic rows straight through sqlite3"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    now = datetime.utcnow()
+
+    conn.executemany(
+        'INSERT INTO user (id, name, student_id, username, role) VALUES (?, ?, ?, ?, ?)',
+        ((i, f'Student {i}', f'S{i:07d}', f'S{i:07d}', 'student') for i in range(1, sizes['users'] + 1)))
+    conn.executemany(
+        'INSERT INTO learning_resource (id, title, resource_type, created_by, created_at, is_active) VALUES (?, ?, ?, 1, ?, ?)',
+        ((i, f'Resource {i}', 'mixed', now - timedelta(days=i), i % 10 != 0) for i in range(1, sizes['resources'] + 1)))
+    conn.executemany(
+        'INSERT INTO resource_file (resource_id, filename, original_filename, file_path, file_type, upload_order) VALUES (?, ?, ?, ?, ?, ?)',
+        ((r, f'{r}_{o}.pdf', f'{o}.pdf', f'learning_resources/{r}_{o}.pdf', 'pdf', o)
+         for r in range(1, sizes['resources'] + 1) for o in range(5)))
+    conn.executemany(
+        'INSERT INTO test (id, title, time_limit, created_at) VALUES (?, ?, 30, ?)',
+        ((i, f'Test {i}', now - timedelta(days=i)) for i in range(1, sizes['tests'] + 1)))
+    conn.executemany(
+        'INSERT INTO question (test_id, question_text, question_type, correct_answer) VALUES (?, ?, ?, ?)',
+        ((t, f'Question {q} of test {t}', 'identification', 'answer')
+         for t in range(1, sizes['tests'] + 1) for q in range(sizes['questions_per_test'])))
+    conn.executemany(
+        'INSERT INTO student_progress (user_id, resource_id, progress_percentage, completed, time_spent) VALUES (?, ?, ?, ?, ?)',
+        ((u, r, random.random() * 100, random.random() < 0.5, random.randint(0, 3600))
+         for u in range(1, min(sizes['users'], 2000) + 1) for r in range(1, sizes['resources'] + 1)))
+
+    def results():
+        count = 0
+        for test_id in range(1, sizes['tests'] + 1):
+            for user_id in range(1, sizes['users'] + 1):
+                if count >= sizes['results']:
+                    return
+                count += 1
+                yield (user_id, test_id, random.choice((0, 25, 50, 60, 75, 80, 90, 100)),
+                       now - timedelta(minutes=random.randint(0, 525600)), '{}')
+
+    conn.executemany(
+        'INSERT INTO result (user_id, test_id, score, date_taken, raw_data) VALUES (?, ?, ?, ?, ?)',
+        results())
+    conn.commit()
+    conn.close()
+
+
+def measure(path, sizes, repeat):
+    conn = sqlite3.connect(path)
+    measurements = []
+    for label, sql, params in HOT_QUERIES:
+        plan = ' | '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params(sizes)))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params(sizes)).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        measurements.append((label, elapsed_ms, plan))
+    conn.close()
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=1000000)
+    parser.add_argument('--tests', type=int, default=200)
+    parser.add_argument('--resources', type=int, default=100)
+    parser.add_argument('--questions-per-test', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20, help='executions per query')
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic database')
+    args = parser.parse_args()
+
+    sizes = {
+        'results': args.results,
+        'tests': args.tests,
+        'users': max(1, -(-args.results // args.tests)),  # One result per student per test
+        'resources': args.resources,
+        'questions_per_test': args.questions_per_test,
+    }
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from flask_migrate import upgrade
+
+    app = create_app()
+    try:
+        with app.app_context():
+            upgrade(revision='0002')
+
+        started = time.perf_counter()
+        seed(db_path, sizes)
+        print(f'Seeded {sizes["results"]:,} results, {sizes["users"]:,} students, '
+              f'{sizes["tests"]} tests in {time.perf_counter() - started:.1f}s')
+
+        before = measure(db_path, sizes, args.repeat)
+
+        started = time.perf_counter()
+        with app.app_context():
+            upgrade()
+        print(f'Migrated to head (index build + ANALYZE) in {time.perf_counter() - started:.1f}s\n')
+
+        after = measure(db_path, sizes, args.repeat)
+
+        print(f'{"query":<52}{"before ms":>12}{"after ms":>12}{"speedup":>10}')
+        for (label, before_ms, _), (_, after_ms, _) in zip(before, after):
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            print(f'{label:<52}{before_ms:>12.3f}{after_ms:>12.3f}{speedup:>9.1f}x')
+
+        print('\nQuery plans:')
+        for (label, _, before_plan), (_, _, after_plan) in zip(before, after):
+            print(f'  {label}\n    before: {before_plan}\n    after:  {after_plan}')
+    finally:
+        if args.keep:
+            print(f'\nDatabase kept at {db_path}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Result raw_data storage benchmark
+=================================
+
+Seeds a synthetic SQLite database with graded results (multiple-choice and
+identification questions plus a security log per result, as finalize_attempt
+stores them) and reports:
+
+- stored size of raw_data as plain JSON, zlib on its own, and zlib with the
+  test's dictionary (what CompressedText stores),
+- median time to read one result's raw_data and parse it, from a plain TEXT
+  copy of the column and from the compressed column,
+- median time of the view_result page.
+
+Usage:
+    python benchmarks/raw_data_storage.py
+    python benchmarks/raw_data_storage.py --students 500 --tests 10 --questions-per-test 50
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db, models, students, tests, questions_per_test):
+    """Create tests and store one graded result per student and test"""
+    from attempts import grade_answers, test_dictionary
+    from compressed_columns import DictionaryText
+    User, Test, Question, Result = models
+    admin = User(name='Admin', username='admin', student_id='admin', role='admin')
+    admin.set_password('admin')
+    db.session.add(admin)
+    for i in range(students):
+        user = User(name=f'Student {i:04d}', username=f's{i}', student_id=f's{i}', role='student')
+        user.password_hash = admin.password_hash  # Hashing thousands of passwords would dominate the run
+        db.session.add(user)
+    db.session.flush()
+    student_ids = [user.id for user in User.query.filter_by(role='student')]
+
+    for t in range(tests):
+        test = Test(title=f'Unit {t} assessment', description='Covers the unit reading', time_limit=30)
+        db.session.add(test)
+        db.session.flush()
+        for q in range(questions_per_test):
+            if q % 3:
+                choices = [f'{name} is the answer to part {q} of unit {t}' for name in ('Alpha', 'Beta', 'Gamma', 'Delta')]
+                db.session.add(Question(test_id=test.id, question_type='multiple_choice', choices=json.dumps(choices),
+                                        correct_answer=choices[0],
+                                        question_text=f'Unit {t}, question {q}: which statement about the reading is correct?'))
+            else:
+                db.session.add(Question(test_id=test.id, question_type='identification', correct_answer=f'term {q}',
+                                        question_text=f'Unit {t}, question {q}: name the term defined in section {q}.'))
+        db.session.flush()
+        dictionary = test_dictionary(test)
+        options = {question.id: json.loads(question.choices) if question.choices else [question.correct_answer, 'unsure']
+                   for question in test.questions}
+        for user_id in student_ids:
+            score, result_data = grade_answers(test, {str(question_id): random.choice(choices)
+                                                      for question_id, choices in options.items()})
+            events = [{'type': random.choice(('tab_switch', 'fullscreen_exit', 'window_blur')),
+                       'timestamp': f'2025-06-{random.randint(1, 28):02d}T10:{random.randint(0, 59):02d}:00'}
+                      for _ in range(random.randint(0, 6))]
+            result_data['security_info'] = {'violations': len(events), 'tab_switches': len(events),
+                                            'fullscreen_exits': 0, 'security_log': events}
+            result_data['attempt_info'] = {'started_at': '2025-06-02T10:00:00', 'deadline': '2025-06-02T10:30:00',
+                                           'submitted_at': '2025-06-02T10:21:00', 'auto_submitted': False}
+            db.session.add(Result(user_id=user_id, test_id=test.id, score=score,
+                                  raw_data=DictionaryText(json.dumps(result_data), *dictionary)))
+    db.session.commit()
+
+
+def median_ms(function, arguments):
+    timings = []
+    for argument in arguments:
+        started = time.perf_counter()
+        function(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--tests', type=int, default=5)
+    parser.add_argument('--questions-per-test', type=int, default=30)
+    parser.add_argument('--reads', type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-raw-data-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import select, text
+    from app import create_app, create_schema, db
+    from compressed_columns import HEADER, compress
+    from models import User, Test, Question, Result
+
+    app = create_app(with_migrations=False)
+
+    try:
+        with app.app_context():
+            create_schema()
+            seed(db, (User, Test, Question, Result), args.students, args.tests, args.questions_per_test)
+
+            documents = {}
+            for result_id in [result_id for (result_id,) in db.session.query(Result.id)]:
+                documents[result_id] = db.session.get(Result, result_id).raw_data
+                db.session.expunge_all()
+            plain = sum(len(document.encode('utf-8')) for document in documents.values())
+            zlib_only = sum(len(compress(document)) - HEADER.size for document in documents.values())
+            stored = db.session.execute(text('SELECT sum(length(raw_data)) FROM result')).scalar()
+            dictionaries = db.session.execute(text('SELECT sum(length(data)) FROM compression_dictionary')).scalar()
+
+            # A plain TEXT copy of the column, to read the same documents uncompressed
+            db.session.execute(text('CREATE TABLE plain_raw_data (id INTEGER PRIMARY KEY, raw_data TEXT)'))
+            db.session.execute(text('INSERT INTO plain_raw_data VALUES (:id, :raw_data)'),
+                               [{'id': result_id, 'raw_data': document} for result_id, document in documents.items()])
+            db.session.commit()
+            sample = random.sample(list(documents), min(args.reads, len(documents)))
+
+            def read_plain(result_id):
+                json.loads(db.session.execute(text('SELECT raw_data FROM plain_raw_data WHERE id = :id'),
+                                              {'id': result_id}).scalar())
+
+            def read_compressed(result_id):
+                json.loads(db.session.execute(select(Result.raw_data).where(Result.id == result_id)).scalar())
+
+            plain_ms = median_ms(read_plain, sample)
+            compressed_ms = median_ms(read_compressed, sample)
+
+        admin = app.test_client()
+        admin.post('/login', data={'username': 'admin', 'password': 'admin'})
+        page_ms = median_ms(lambda result_id: admin.get(f'/result/{result_id}'), sample[:50])
+
+        count = len(documents)
+        print(f'{count} results, {args.questions_per_test} questions per test\n')
+        print(f'{"raw_data as":<28}{"total B":>14}{"per result B":>14}{"ratio":>8}')
+        for label, size in [('plain JSON', plain), ('zlib', zlib_only), ('zlib + test dictionary', stored)]:
+            print(f'{label:<28}{size:>14,}{size / count:>14,.0f}{plain / size:>7.1f}x')
+        print(f'{"(dictionaries)":<28}{dictionaries:>14,}\n')
+        print(f'read + parse one result:  plain {plain_ms:.3f} ms, compressed {compressed_ms:.3f} ms')
+        print(f'view_result page:         {page_ms:.2f} ms')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Full-text search latency benchmark
+==================================
+
+Seeds a synthetic question bank (100,000 questions by default) through the
+normal sync triggers, then times ranked, paginated searches through the same
+functions the /api/search endpoints use.
+
+Usage:
+    python benchmarks/search_latency.py
+    python benchmarks/search_latency.py --questions 250000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBJECT_WORDS = (
+    'photosynthesis mitochondria equation algebra velocity history revolution '
+    'grammar noun verb ecosystem molecule energy democracy fraction geometry '
+    'triangle probability statistics literature poem novel climate volcano '
+    'continent economy market supply demand cell nucleus protein gravity orbit'
+).split()
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo be da fe gi ho ju ko la ma no pe ri so tu'.split()
+
+QUERIES = ['photosynthesis', 'cell nucleus', 'prob', 'supply demand market', 'volcano climate', 'tri']
+
+
+def build_vocabulary(size=5000):
+    """Synthetic words with Zipf-like frequencies, like real question text.
+
+    Subject words sit in the middle of the frequency range so each query term
+    matches a few percent of the bank rather than every other question.
+    """
+    words = set()
+    while len(words) < size:
+        words.add(''.join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))))
+    words = sorted(words)
+    random.shuffle(words)
+    for offset, word in enumerate(SUBJECT_WORDS):
+        words.insert(40 + offset * 3, word)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+VOCABULARY, WEIGHTS = build_vocabulary()
+
+
+def sentence(words):
+    return ' '.join(random.choices(VOCABULARY, WEIGHTS, k=words))
+
+
+def seed(path, questions, tests):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute("INSERT INTO user (id, name, username, role) VALUES (1, 'Admin', 'admin', 'admin')")
+    conn.executemany('INSERT INTO test (id, title, time_limit) VALUES (?, ?, 30)',
+                     ((i, f'Test {i}') for i in range(1, tests + 1)))
+    conn.executemany(
+        'INSERT INTO question (test_id, question_text, question_type, choices, correct_answer) VALUES (?, ?, ?, ?, ?)',
+        ((random.randint(1, tests), sentence(random.randint(8, 25)), 'multiple_choice',
+          json.dumps([sentence(2) for _ in range(4)]), 'a') for _ in range(questions)))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--tests', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-search-')
+    db_path = os.path.join(workdir, 'search.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SESSION_BACKEND'] = 'memory'  # Keep benchmark sessions out of the source tree
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from flask_migrate import upgrade
+    from search import search_questions
+
+    app = create_app()
+    try:
+        with app.app_context():
+            upgrade()
+
+        started = time.perf_counter()
+        seed(db_path, args.questions, args.tests)
+        print(f'Indexed {args.questions:,} questions in {time.perf_counter() - started:.1f}s\n')
+
+        print(f'{"query":<24}{"page":>6}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+        with app.app_context():
+            for query in QUERIES:
+                for page in (1, 5):
+                    timings = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        search_questions(query, page=page, per_page=20)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                    print(f'{query:<24}{page:>6}{statistics.median(timings):>10.2f}{p95:>10.2f}{timings[-1]:>10.2f}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
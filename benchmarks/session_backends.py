@@ -0,0 +1,199 @@
+"""
+Session backend benchmark
+=========================
+
+Measures the per-request cost of server-side sessions: loading the session
+at the start of a request and saving it at the end, for a request that only
+reads the session (but sets session.permanent, as most views do) and for one
+that changes it. Each store is first filled with --existing sessions, the
+leftovers of a semester, and the time to sweep them all once expired is
+reported too.
+
+Requests go through Werkzeug's threaded server, as serve() runs it, from
+--clients concurrent clients opening a connection per request, so every
+request runs on a new thread the way it does in production. Only the time
+spent in open_session and save_session is counted.
+
+Backends: the session_store.py 'sqlite', 'memory' and 'filesystem' stores,
+and Flask-Session's filesystem interface (the previous setup) if installed.
+
+Usage:
+    python benchmarks/session_backends.py
+    python benchmarks/session_backends.py --existing 50000 --requests 2000 --clients 16
+"""
+
+import argparse
+import hashlib
+import http.client
+import importlib.util
+import logging
+import os
+import pickle
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def typical_session(i):
+    """What a student's session holds during a test"""
+    return {
+        '_user_id': str(i), '_fresh': True, '_permanent': True,
+        '_id': hashlib.sha512(str(i).encode()).hexdigest(),
+        'active_test_id': 3, 'attempt_id': i, 'test_start_time': '2025-06-02T10:00:00',
+        'security_violations': 1, 'tab_switches': 1, 'fullscreen_exits': 0,
+        'security_log': [{'type': 'tab_switch', 'timestamp': f'2025-06-02T10:{n:02d}:00'} for n in range(12)],
+    }
+
+
+def make_app(backend, workdir):
+    from flask import Flask
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    app.config['PERMANENT_SESSION_LIFETIME'] = 86400
+    app.config['SESSION_COOKIE_NAME'] = 'smartexam_session'
+    directory = os.path.join(workdir, backend)
+    if backend == 'flask-session':
+        from flask_session import Session
+        app.config.update(SESSION_TYPE='filesystem', SESSION_FILE_DIR=directory, SESSION_USE_SIGNER=True,
+                          SESSION_FILE_THRESHOLD=10 ** 9)  # As deployed: nothing is ever pruned
+        Session(app)
+    else:
+        from session_store import init_session_store
+        app.config.update(SESSION_BACKEND=backend, SESSION_SQLITE_PATH=os.path.join(directory, 'sessions.db'),
+                          SESSION_FILE_DIR=directory, SESSION_MEMORY_MAX_ENTRIES=10 ** 9, DB_DIR=directory,
+                          SESSION_SWEEP_INTERVAL=10 ** 9)
+        init_session_store(app)
+
+    @app.route('/unchanged')
+    def unchanged():
+        from flask import session
+        session.permanent = True
+        return 'ok'
+
+    @app.route('/changed')
+    def changed():
+        from flask import session
+        session.permanent = True
+        session.update(typical_session(0))
+        session['tick'] = time.perf_counter()
+        return 'ok'
+
+    time_session_calls(app.session_interface)
+    return app
+
+
+def time_session_calls(interface):
+    """Record the seconds each request spends in open_session plus save_session"""
+    interface.timings = []
+    opened = threading.local()
+    open_session, save_session = interface.open_session, interface.save_session
+
+    def timed_open(app, request):
+        started = time.perf_counter()
+        session = open_session(app, request)
+        opened.seconds = time.perf_counter() - started
+        return session
+
+    def timed_save(app, session, response):
+        started = time.perf_counter()
+        save_session(app, session, response)
+        interface.timings.append(opened.seconds + time.perf_counter() - started)
+
+    interface.open_session, interface.save_session = timed_open, timed_save
+
+
+def fill(app, backend, count):
+    """Store count sessions, expiring in an hour, straight into the backend"""
+    interface = app.session_interface
+    expires_at = time.time() + 3600
+    for i in range(count):
+        sid = f'existing-{i}'
+        if backend == 'flask-session':
+            interface.cache.set(interface.key_prefix + sid, typical_session(i), 3600)
+        else:
+            interface.store.save(sid, pickle.dumps(typical_session(i), pickle.HIGHEST_PROTOCOL), expires_at)
+
+
+def get(port, path, cookie):
+    """One request on a new connection; returns the session cookie afterwards"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', path, headers={'Cookie': f'smartexam_session={cookie}'} if cookie else {})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    set_cookie = response.getheader('Set-Cookie')
+    return set_cookie.split(';')[0].split('=', 1)[1] if set_cookie else cookie
+
+
+def run_requests(app, port, path, count, clients):
+    """count requests to path from clients concurrent clients, each with its own session;
+    returns the session timings of those requests"""
+    cookies = [get(port, '/changed', None) for _ in range(clients)]
+    app.session_interface.timings.clear()
+    per_client = max(1, count // clients)
+
+    def client(cookie):
+        for _ in range(per_client):
+            get(port, path, cookie)
+
+    threads = [threading.Thread(target=client, args=(cookie,)) for cookie in cookies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return list(app.session_interface.timings)
+
+
+def sweep_ms(app, backend):
+    if backend == 'flask-session':
+        return None  # Flask-Session never deletes expired files by itself
+    started = time.perf_counter()
+    removed = app.session_interface.sweep(time.time() + 7200)
+    return (time.perf_counter() - started) * 1000, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--existing', type=int, default=20000, help='Sessions already in the store')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    args = parser.parse_args()
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    backends = ['sqlite', 'memory', 'filesystem']
+    # A loader rules out the flask_session/ session directory, which imports as a namespace package
+    spec = importlib.util.find_spec('flask_session')
+    if spec is not None and spec.loader is not None:
+        backends.insert(0, 'flask-session')
+
+    workdir = tempfile.mkdtemp(prefix='smartexam-sessions-')
+    try:
+        print(f'{args.existing:,} existing sessions, median of {args.requests:,} requests '
+              f'from {args.clients} clients (microseconds)\n')
+        print(f'{"backend":<16}{"unchanged us":>14}{"changed us":>12}{"sweep ms":>12}')
+        for backend in backends:
+            app = make_app(backend, workdir)
+            fill(app, backend, args.existing)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                unchanged = run_requests(app, server.port, '/unchanged', args.requests, args.clients)
+                changed = run_requests(app, server.port, '/changed', args.requests, args.clients)
+            finally:
+                server.shutdown()
+            sweep = sweep_ms(app, backend)
+            print(f'{backend:<16}{statistics.median(unchanged) * 1e6:>14.1f}{statistics.median(changed) * 1e6:>12.1f}'
+                  + (f'{sweep[0]:>12.1f}' if sweep else f'{"never":>12}'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup-time benchmark
+======================
+
+Measures how long the server takes from process start until it answers
+/healthz, the readiness probe the Electron shell and launcher.py wait on.
+Each run starts a fresh process; "cold" runs also start from an empty
+database directory (first launch), "warm" runs reuse the one left behind.
+
+By default the source tree is started with `python app.py`. Pass the
+PyInstaller bundle to measure the packaged build instead:
+
+Usage:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10
+    python benchmarks/startup_time.py --command dist/SmartExaM/SmartExaM
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_MARKER = 'SMARTEXAM_READY'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def import_time():
+    """Seconds to import the app module (no app is built)"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def start_once(command, db_path, timeout):
+    """Return (seconds to ready marker or None, seconds to first healthy response)"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', SMARTEXAM_PORT=str(port),
+               PYTHONUNBUFFERED='1', BROWSER='true')
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    marker = {}
+
+    def watch_stdout():
+        for line in process.stdout:
+            if READY_MARKER in line and 'at' not in marker:
+                marker['at'] = time.perf_counter() - started
+
+    threading.Thread(target=watch_stdout, daemon=True).start()
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'Server exited with code {process.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/healthz', timeout=1) as response:
+                    if response.status == 200:
+                        return marker.get('at'), time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f'Server not ready after {timeout}s')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def report(label, samples):
+    ready = [healthy for _, healthy in samples]
+    markers = [at for at, _ in samples if at is not None]
+    marker_ms = f'{statistics.median(markers) * 1000:>10.0f}' if markers else f'{"-":>10}'
+    print(f'{label:<10}{marker_ms}{statistics.median(ready) * 1000:>12.0f}{max(ready) * 1000:>10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--command', help='executable to start instead of `python app.py`')
+    args = parser.parse_args()
+
+    command = [os.path.abspath(args.command)] if args.command else [sys.executable, 'app.py']
+    workdir = tempfile.mkdtemp(prefix='smartexam-startup-')
+    try:
+        if not args.command:
+            imports = [import_time() for _ in range(args.runs)]
+            print(f'import app: median {statistics.median(imports) * 1000:.0f} ms\n')
+
+        cold, warm = [], []
+        for run in range(args.runs):
+            db_path = os.path.join(workdir, f'run{run}.db')
+            cold.append(start_once(command, db_path, args.timeout))
+            warm.append(start_once(command, db_path, args.timeout))
+
+        print(f'{"start":<10}{"ready ms":>10}{"healthy ms":>12}{"max ms":>10}')
+        report('cold', cold)
+        report('warm', warm)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
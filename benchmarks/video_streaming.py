@@ -0,0 +1,151 @@
+"""
+Video streaming
+===============
+
+What transcoding.py changes for a student on a weak connection:
+
+- before: the uploaded MP4 downloaded progressively at its own bitrate
+- after: the HLS stream, starting on the smallest rendition and switching to
+  the largest one the connection can keep up with, segment by segment
+
+A lecture-like test video (--seconds long, 720p with audio, at --bitrate like
+a phone or screen recording) is generated with ffmpeg and transcoded with the
+configured renditions. The report gives the encoding speed, each rendition's
+bitrate and then, for links of --links kbit/s, a simulated playback:
+
+- startup: seconds until the first segment (or as many seconds of the upload)
+  has arrived and playback can start
+- stalls: how often and how long playback waits for data afterwards
+- kbit/s: the average bitrate the student watched
+
+The playback model downloads back to back at exactly the link speed with up to
+30 seconds buffered; the upload's bytes are assumed spread evenly over its
+length. Real players and Wi-Fi are noisier, but the comparison holds.
+
+Needs ffmpeg on the PATH or FFMPEG_BINARY, like the application.
+
+Usage:
+    python benchmarks/video_streaming.py
+    python benchmarks/video_streaming.py --seconds 300 --links 600,1500,4000
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MAX_BUFFER = 30  # Seconds a player reads ahead
+SAFETY = 0.8  # Share of the measured throughput a rendition may use
+
+
+def make_source(ffmpeg, path, seconds, bitrate):
+    """A 720p test pattern with a tone, encoded like a typical upload"""
+    subprocess.run([ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+                    '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+                    '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                    '-c:v', 'libx264', '-preset', 'veryfast', '-b:v', f'{bitrate}k', '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', '-b:a', '128k', '-shortest', path], check=True)
+
+
+def rendition_segments(stream_dir):
+    """{name: [segment bytes, ...]} per rendition, in playlist order"""
+    renditions = {}
+    for name in sorted(os.listdir(stream_dir)):
+        playlist = os.path.join(stream_dir, name, 'index.m3u8')
+        if os.path.isfile(playlist):
+            with open(playlist) as f:
+                segments = re.findall(r'^(\d+\.ts)$', f.read(), re.MULTILINE)
+            renditions[name] = [os.path.getsize(os.path.join(stream_dir, name, s)) for s in segments]
+    # Smallest first, as the player starts
+    return dict(sorted(renditions.items(), key=lambda item: sum(item[1])))
+
+
+def simulate(ladder, segment_seconds, link_kbps):
+    """Play segments over the link; ladder is [[bytes per segment], ...] smallest rendition first.
+
+    Returns (startup seconds, stalls, stalled seconds, average kbit/s watched).
+    """
+    kbps = [sum(sizes) * 8 / 1000 / (len(sizes) * segment_seconds) for sizes in ladder]
+    buffered = 0.0
+    startup = None
+    stalls = stalled = 0
+    watched_bytes = 0
+    level = 0  # The first segment comes from the smallest rendition
+    for i in range(len(ladder[0])):
+        size = ladder[level][i]
+        download = size * 8 / 1000 / link_kbps
+        if startup is None:
+            startup = download
+        elif download > buffered:
+            stalls += 1
+            stalled += download - buffered
+            buffered = 0.0
+        else:
+            buffered -= download
+        buffered = min(buffered + segment_seconds, MAX_BUFFER)
+        watched_bytes += size
+        # Next segment: the largest rendition the measured throughput (the link) sustains
+        level = max([0] + [j for j, rate in enumerate(kbps) if rate <= link_kbps * SAFETY])
+    return startup, stalls, stalled, watched_bytes * 8 / 1000 / (len(ladder[0]) * segment_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=120, help='Length of the test video')
+    parser.add_argument('--bitrate', type=int, default=4000, help='Video kbit/s of the test upload')
+    parser.add_argument('--links', default='600,1500,4000', help='Connection speeds to simulate, kbit/s')
+    args = parser.parse_args()
+
+    from flask import Flask
+    from config import Config
+    from transcoding import MASTER_PLAYLIST, encode, find_encoder
+
+    app = Flask('app')
+    app.config.from_object(Config)
+    ffmpeg = find_encoder(app)
+    if ffmpeg is None:
+        sys.exit('ffmpeg not found; install it or set FFMPEG_BINARY')
+    segment_seconds = app.config['TRANSCODE_SEGMENT_SECONDS']
+
+    work = tempfile.mkdtemp(prefix='video-streaming-')
+    try:
+        source_path = os.path.join(work, 'lecture.mp4')
+        make_source(ffmpeg, source_path, args.seconds, args.bitrate)
+        source_bytes = os.path.getsize(source_path)
+
+        started = time.perf_counter()
+        encode(app, source_path, os.path.join(work, 'stream'))
+        elapsed = time.perf_counter() - started
+        assert os.path.isfile(os.path.join(work, 'stream', MASTER_PLAYLIST))
+        renditions = rendition_segments(os.path.join(work, 'stream'))
+
+        print(f'source: {args.seconds} s, {source_bytes / 1e6:.1f} MB, '
+              f'{source_bytes * 8 / 1000 / args.seconds:.0f} kbit/s')
+        print(f'transcoded in {elapsed:.1f} s ({args.seconds / elapsed:.1f}x real time, '
+              f'{app.config["TRANSCODE_THREADS"]} threads, preset {app.config["TRANSCODE_PRESET"]})')
+        for name, sizes in renditions.items():
+            print(f'  {name:>6}: {len(sizes)} segments, {sum(sizes) * 8 / 1000 / args.seconds:5.0f} kbit/s, '
+                  f'first segment {sizes[0] / 1024:.0f} KiB')
+
+        # The upload as one rendition, cut into the same number of equal pieces
+        count = len(next(iter(renditions.values())))
+        upload = [[source_bytes / count] * count]
+        print(f'\nplayback of {args.seconds} s ({segment_seconds} s segments, up to {MAX_BUFFER} s buffered)')
+        for link in (int(link) for link in args.links.split(',')):
+            for label, ladder in (('before', upload), ('after', list(renditions.values()))):
+                startup, stalls, stalled, watched = simulate(ladder, segment_seconds, link)
+                print(f'{link:>5} kbit/s {label:>6}: startup {startup:5.1f} s, {stalls:3d} stalls '
+                      f'({stalled:6.1f} s), watched at {watched:5.0f} kbit/s')
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Compressed Columns
+==================
+
+Result.raw_data keeps the whole graded attempt as JSON: every question's text,
+choices and answers plus the security log. CompressedText stores such columns
+zlib-compressed and hands back the original string on read. The models defer
+these columns, so the data is only fetched and decompressed when view_result
+or an export actually reads it.
+
+All results of one test repeat the same questions, which compressing each
+document on its own cannot take advantage of. Each test therefore gets a
+preset dictionary (zlib's zdict) in compression_dictionary: a blank result
+for the test, created with its first result. Every stored value starts with a
+small header naming the dictionary it was compressed with:
+
+    b'Z' | dictionary id, 4 bytes big-endian (0 = none) | zlib stream
+
+Dictionaries are never changed and their ids are never reused, so values stay
+readable after a test's questions are edited.
+"""
+
+import struct
+import zlib
+
+from sqlalchemy import LargeBinary, TypeDecorator, select
+
+MAGIC = b'Z'
+HEADER = struct.Struct('>cI')
+NO_DICTIONARY = 0
+LEVEL = 6
+MAX_DICTIONARY_BYTES = 32 * 1024  # zlib only looks back this far
+
+# (database url, dictionary id) -> dictionary bytes; safe to keep, rows never change
+_dictionaries = {}
+
+
+class DictionaryText(str):
+    """A string to be stored compressed with a particular dictionary"""
+
+    def __new__(cls, value, dictionary_id, dictionary):
+        text = super().__new__(cls, value)
+        text.dictionary_id = dictionary_id
+        text.dictionary = dictionary
+        return text
+
+
+def train_dictionary(sample):
+    """A zdict from sample text; zlib favours the end of the dictionary"""
+    return sample.encode('utf-8')[-MAX_DICTIONARY_BYTES:]
+
+
+def compress(text, dictionary_id=NO_DICTIONARY, dictionary=None):
+    compressor = zlib.compressobj(LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(LEVEL)
+    return HEADER.pack(MAGIC, dictionary_id) + compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+
+def dictionary_id(value):
+    magic, dictionary_id = HEADER.unpack_from(value)
+    if magic != MAGIC:
+        raise ValueError('Not a compressed column value')
+    return dictionary_id
+
+
+def decompress(value, dictionary=None):
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return (decompressor.decompress(value[HEADER.size:]) + decompressor.flush()).decode('utf-8')
+
+
+def load_dictionary(dictionary_id):
+    """Dictionary bytes by id, read through the current session's transaction"""
+    from models import db, CompressionDictionary  # models imports this module
+    key = (str(db.session.get_bind().url), dictionary_id)
+    if key not in _dictionaries:
+        data = db.session.connection().execute(
+            select(CompressionDictionary.data).where(CompressionDictionary.id == dictionary_id)).scalar()
+        if data is None:
+            raise LookupError(f'Compression dictionary {dictionary_id} is missing')
+        _dictionaries[key] = bytes(data)
+    return _dictionaries[key]
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed in a binary column.
+
+    Plain strings are compressed on their own; a DictionaryText is compressed
+    with its dictionary.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, DictionaryText):
+            return compress(value, value.dictionary_id, value.dictionary)
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        used = dictionary_id(value)
+        return decompress(value, load_dictionary(used) if used != NO_DICTIONARY else None)
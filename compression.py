@@ -0,0 +1,87 @@
+"""
+Response Compression
+====================
+
+Compresses HTML, JSON, CSS and JavaScript responses with brotli (when the
+brotli package is installed) or gzip, whichever the client prefers.
+
+Responses are left alone when they:
+- are smaller than COMPRESS_MIN_SIZE (heartbeat/progress acks, redirects),
+- are files or streams (send_file/send_from_directory responses are
+  direct passthrough, so media, PDFs and Range requests stay byte-exact),
+- answer a Range request, already carry a Content-Encoding, or
+- come from an endpoint in COMPRESS_EXCLUDE_ENDPOINTS (the CSV export).
+"""
+
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Fall back to gzip only
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'application/json',
+    'text/css',
+    'text/javascript',
+    'application/javascript',
+)
+
+
+def choose_encoding(accept_encodings):
+    """Pick br or gzip, whichever the client rates higher (br wins ties)"""
+    candidates = [('gzip', accept_encodings['gzip'])]
+    if brotli is not None:
+        candidates.insert(0, ('br', accept_encodings['br']))
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level)
+
+
+def should_compress(response, config):
+    if not config.get('COMPRESS_ENABLED', True):
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES):
+        return False
+    if request.range is not None or request.endpoint in config.get('COMPRESS_EXCLUDE_ENDPOINTS', ()):
+        return False
+    return (response.content_length or 0) >= config.get('COMPRESS_MIN_SIZE', 500)
+
+
+def compress_response(response):
+    """after_request hook: compress the body in place if it qualifies"""
+    config = current_app.config
+    if not should_compress(response, config):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding,
+                               gzip_level=config.get('COMPRESS_LEVEL', 6),
+                               brotli_quality=config.get('COMPRESS_BROTLI_QUALITY', 4)))
+    response.headers['Content-Encoding'] = encoding
+
+    # A compressed body is a different representation of the same resource
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -6,20 +6,26 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'development-secret-key-change-in-production-2024'
-    # Create a database directory if it doesn't exist
     DB_DIR = os.path.join(basedir, 'database')
-    if not os.path.exists(DB_DIR):
-        os.makedirs(DB_DIR)
-    # SQLite database path
+    # SQLite database path, or any postgresql:// URL
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f'sqlite:///{os.path.join(DB_DIR, "smartexam.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool for PostgreSQL (see backends.py); SQLite ignores these.
+    # Size it for the request threads plus the background workers.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800  # Reconnect before server-side idle timeouts
     
-    # Session configuration for better persistence
-    SESSION_TYPE = 'filesystem'
-    SESSION_PERMANENT = True
-    SESSION_USE_SIGNER = True
-    SESSION_KEY_PREFIX = 'smartexam:'
+    # Server-side sessions (see session_store.py): 'sqlite', 'memory' or 'filesystem'
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+    SESSION_SQLITE_PATH = os.environ.get('SESSION_SQLITE_PATH')  # Default: sessions.db in DB_DIR
+    SESSION_SQLITE_POOL_SIZE = 8  # Idle connections kept open for the per-connection request threads
+    SESSION_MEMORY_MAX_ENTRIES = 10000
+    SESSION_REFRESH_INTERVAL = 300  # Seconds before an unchanged session's expiry is pushed forward
+    SESSION_SWEEP_INTERVAL = 600  # Seconds between deletions of expired sessions
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_SAMESITE = 'Lax'
@@ -33,17 +39,107 @@ class Config:
     
     # Performance settings for concurrent access
     SEND_FILE_MAX_AGE_DEFAULT = 300
+    ASSET_MAX_AGE = 365 * 24 * 3600  # Hashed files from build-assets never change
     THREADED = True
-    
-    # Create upload directories if they don't exist
-    for folder in [UPLOAD_FOLDER, LEARNING_RESOURCES_FOLDER]:
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-    
-    # Create session directory if using filesystem sessions
+
+    # Admin list pagination
+    ADMIN_PAGE_SIZE = 25
+    ADMIN_MAX_PAGE_SIZE = 100
+
+    # Server-side exam timer settings
+    EXAM_GRACE_PERIOD_SECONDS = 30  # Allowance for network latency on the final submit
+    ATTEMPT_SWEEP_INTERVAL = 15  # Seconds between sweeps for expired attempts
+    ATTEMPT_SWEEP_BATCH_SIZE = 100  # Expired attempts auto-submitted per batch
+
+    # Heartbeat, security and progress telemetry (see telemetry.py)
+    TELEMETRY_FLUSH_INTERVAL = 1  # Seconds between batched writes
+    TELEMETRY_BATCH_SIZE = 500  # Pending attempts and progress rows that trigger an early write
+
+    # Exam channel WebSockets (see exam_channel.py)
+    EXAM_CHANNEL_ENABLED = True  # False: take_test.js uses the HTTP endpoints only
+    EXAM_CHANNEL_IDLE_TIMEOUT = 90  # Seconds without a message (heartbeats come every 30) before closing
+    EXAM_CHANNEL_MAX_MESSAGE = 1024 * 1024  # Bytes
+
+    # Test windows (see availability.py)
+    TEST_WINDOW_UPCOMING_DAYS = 7  # How far ahead the student dashboard lists exams opening soon
+    TEST_WINDOW_REFRESH_INTERVAL = 60  # Seconds between refreshes of the opening-soon lists
+
+    # SQLite maintenance (see maintenance.py); PostgreSQL relies on autovacuum
+    MAINTENANCE_ENABLED = True
+    MAINTENANCE_INTERVAL = 30  # Seconds between scheduler ticks
+    MAINTENANCE_QUIET_SECONDS = 120  # Idle time (and no exam running) before heavier tasks run
+    MAINTENANCE_BUSY_TIMEOUT = 1  # Seconds a task waits for a lock before giving up until later
+    MAINTENANCE_CHECKPOINT_INTERVAL = 300  # Seconds between PASSIVE checkpoints while busy
+    MAINTENANCE_OPTIMIZE_INTERVAL = 6 * 3600
+    MAINTENANCE_BACKUP_INTERVAL = 24 * 3600
+    MAINTENANCE_BACKUP_DIR = None  # Default: backups/ next to the database file
+    MAINTENANCE_BACKUP_KEEP = 7
+    MAINTENANCE_BACKUP_PAGES = 256  # Pages copied per backup step
+    MAINTENANCE_BACKUP_SLEEP = 0.05  # Seconds between backup steps
+
+    # Learning analytics (see analytics.py)
+    ANALYTICS_AT_RISK_SCORE = 50  # Scores below this, without the linked resource completed, are at risk
+    ANALYTICS_BATCH_TESTS = 50  # Tests recomputed per transaction
+
+    # Response compression (see compression.py)
+    COMPRESS_ENABLED = True
+    COMPRESS_LEVEL = 6  # gzip level, 1 (fastest) - 9 (smallest)
+    COMPRESS_BROTLI_QUALITY = 4  # brotli quality, 0 - 11
+    COMPRESS_MIN_SIZE = 500  # Bytes; smaller responses gain nothing
+    COMPRESS_EXCLUDE_ENDPOINTS = ('export_result_csv', 'export_analytics_csv', 'export_at_risk_csv', 'resource_file')
+
+    # Rendered template fragments (see fragment_cache.py)
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_MAX_ENTRIES = 256
+    FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+    # Adaptive video streaming (see transcoding.py)
+    TRANSCODE_ENABLED = True
+    TRANSCODE_FFMPEG = os.environ.get('FFMPEG_BINARY')  # Default: ffmpeg on the PATH
+    TRANSCODE_RENDITIONS = (  # (height, video kbit/s, audio kbit/s); none taller than the upload is made
+        (240, 400, 64),  # Keeps playing on a crowded classroom access point
+        (360, 800, 96),
+        (540, 1400, 128),
+        (720, 2800, 128),
+    )
+    TRANSCODE_SEGMENT_SECONDS = 4  # Short segments start faster and switch renditions sooner on weak Wi-Fi
+    TRANSCODE_PRESET = 'veryfast'  # x264 preset
+    TRANSCODE_THREADS = 2  # Per encoder; the rest of the CPU stays with the server
+    TRANSCODE_TIMEOUT = 4 * 3600  # Seconds per video
+    TRANSCODE_LEASE = 300  # Seconds a claim lasts without renewal before another worker may take the video over
+    TRANSCODE_POLL_INTERVAL = 60  # Seconds between checks for pending videos; uploads wake the worker
+    STREAM_MAX_AGE = 365 * 24 * 3600  # Stream files never change (see resource_stream)
+
+    # Logging (see structured_logging.py)
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # 'json': one object per line; 'text': Flask's usual lines
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.environ.get('LOG_FILE')  # Default: stderr
+    LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+    LOG_FILE_BACKUPS = 5
+    LOG_QUEUE_SIZE = 10000  # Records waiting to be written; more are dropped instead of blocking requests
+    LOG_ACCESS = True  # One 'request' record per request, in place of the dev server's access log
+    # Fraction of the requests to each endpoint that get a 'request' record; 5xx responses always do
+    LOG_ACCESS_SAMPLE_RATES = {
+        'test_heartbeat': 0.01,
+        'autosave_answers': 0.01,
+        'update_progress': 0.01,
+        'record_security_violation': 0.1,  # Each one is a SecurityEvent row already
+        'static': 0.1,
+        'assets': 0.1,
+    }
+    LOG_SAMPLE_RATES = {}  # {event: fraction} for other high-volume records; warnings and errors are always kept
+
+    # Port the desktop launchers serve on
+    PORT = int(os.environ.get('SMARTEXAM_PORT', 5000))
+
+    # Session directory for the 'filesystem' session backend
     SESSION_FILE_DIR = os.path.join(basedir, 'flask_session')
-    if not os.path.exists(SESSION_FILE_DIR):
-        os.makedirs(SESSION_FILE_DIR)
+
+    @staticmethod
+    def init_app(app):
+        """Create the database, upload and session directories if they don't exist"""
+        for key in ('DB_DIR', 'UPLOAD_FOLDER', 'LEARNING_RESOURCES_FOLDER', 'SESSION_FILE_DIR'):
+            os.makedirs(app.config[key], exist_ok=True)
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -1,16 +1,25 @@
 import os
 import click
+from flask import current_app
 from flask.cli import FlaskGroup
-from app import app, db, User
+from sqlalchemy import text
+from app import create_app, db, User, create_schema, upgrade_database
 from models import LearningResource, ResourceFile
+from search import install_search_index, index_resource_text
+from assets import build_assets, brotli
+from archive import archive_results, count_archivable
+from maintenance import TASKS, run_task
+from synthetic_data import seed
+from analytics import refresh_analytics
+from transcoding import PENDING, FAILED, READY, find_encoder, claim_next, reclaim_expired, transcode_file
 
-cli = FlaskGroup(app)
+cli = FlaskGroup(create_app=create_app)
 
 @cli.command('init-db')
 def init_db_command():
     """Clear existing data and create new tables."""
     db.drop_all()
-    db.create_all()
+    create_schema()
     
     # Create admin user
     admin = User(name='Admin', username='admin', role='admin', student_id='admin')
@@ -24,8 +33,8 @@ def init_db_command():
 def update_db_command():
     """Update database schema without losing data."""
     try:
-        # Create new tables if they don't exist
-        db.create_all()
+        # Apply any pending migrations (new tables, columns and indexes)
+        upgrade_database()
         click.echo('Database schema updated successfully')
     except Exception as e:
         click.echo(f'Error updating database: {str(e)}')
@@ -50,7 +59,8 @@ def migrate_resources_command():
                     file_type=file_type,
                     file_size=resource.file_size or 0,
                     upload_order=0,
-                    mime_type='application/octet-stream'
+                    mime_type='application/octet-stream',
+                    stream_status=PENDING if file_type == 'video' else None
                 )
                 
                 db.session.add(resource_file)
@@ -62,6 +72,129 @@ def migrate_resources_command():
         db.session.rollback()
         click.echo(f'Error migrating resources: {str(e)}')
 
+@cli.command('reindex-search')
+def reindex_search_command():
+    """Rebuild the full-text search indexes, including extracted file text."""
+    with db.engine.begin() as connection:
+        if not install_search_index(connection):
+            click.echo('Full-text search requires SQLite; nothing to index')
+            return
+        connection.execute(text("INSERT INTO question_fts(question_fts) VALUES ('rebuild')"))
+    
+    app = current_app._get_current_object()
+    resource_ids = [row.id for row in LearningResource.query.with_entities(LearningResource.id).all()]
+    with click.progressbar(resource_ids, label='Indexing resource files') as bar:
+        for resource_id in bar:
+            index_resource_text(app, resource_id)
+    click.echo(f'Search index rebuilt for {len(resource_ids)} resources')
+
+@cli.command('build-assets')
+def build_assets_command():
+    """Build hashed, precompressed static assets (run before packaging)."""
+    manifest = build_assets(current_app.static_folder)
+    compressed = 'gzip and brotli' if brotli is not None else 'gzip'
+    click.echo(f'Built {len(manifest)} assets into static/dist ({compressed})')
+
+@cli.command('archive')
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive results taken before this date (YYYY-MM-DD)')
+@click.option('--batch-size', default=500, show_default=True, help='Results moved per transaction')
+@click.option('--dry-run', is_flag=True, help='Only report how many results would be archived')
+def archive_command(before, batch_size, dry_run):
+    """Move old results into the compressed archive table."""
+    if dry_run:
+        click.echo(f'{count_archivable(before)} results taken before {before:%Y-%m-%d} would be archived')
+        return
+    try:
+        archived = archive_results(before, batch_size=batch_size)
+        click.echo(f'Archived {archived} results taken before {before:%Y-%m-%d}')
+    except Exception as e:
+        click.echo(f'Error archiving results: {str(e)}')
+
+@cli.command('maintenance')
+@click.argument('tasks', nargs=-1, type=click.Choice(TASKS))
+def maintenance_command(tasks):
+    """Run SQLite maintenance now (default: checkpoint, optimize, backup)."""
+    app = current_app._get_current_object()
+    for task in tasks or ('checkpoint', 'optimize', 'backup'):
+        try:
+            outcome = run_task(app, task)
+            click.echo(f'{task}: done' + (f' ({outcome})' if outcome else ''))
+        except Exception as e:
+            click.echo(f'{task}: failed: {str(e)}')
+            return
+
+@cli.command('analytics')
+@click.option('--full', is_flag=True, help='Recompute every test, not only the stale ones')
+def analytics_command(full):
+    """Bring the precomputed learning analytics up to date."""
+    try:
+        computed = refresh_analytics(full=full)
+        click.echo(f'Analytics computed for {computed} tests')
+    except Exception as e:
+        click.echo(f'Error computing analytics: {str(e)}')
+
+@cli.command('transcode-videos')
+@click.option('--retry-failed', is_flag=True, help='Queue the videos whose transcoding failed again first')
+def transcode_videos_command(retry_failed):
+    """Transcode the pending videos into adaptive streams now."""
+    app = current_app._get_current_object()
+    if find_encoder(app) is None:
+        click.echo('ffmpeg not found; install it or set FFMPEG_BINARY')
+        return
+    if retry_failed:
+        ResourceFile.query.filter_by(stream_status=FAILED).update({'stream_status': PENDING, 'stream_error': None})
+        db.session.commit()
+    reclaim_expired(app)  # Left by a worker that stopped
+    ready = failed = 0
+    while True:
+        file_id = claim_next()
+        if file_id is None:
+            break
+        outcome = transcode_file(app, file_id)
+        if outcome == READY:
+            ready += 1
+        elif outcome == FAILED:
+            failed += 1
+            click.echo(f'Resource file {file_id}: {db.session.get(ResourceFile, file_id).stream_error}')
+    click.echo(f'Transcoded {ready} videos' + (f', {failed} failed' if failed else ''))
+
+@cli.command('seed')
+@click.option('--students', default=1000, show_default=True)
+@click.option('--tests', default=50, show_default=True)
+@click.option('--questions-per-test', default=30, show_default=True)
+@click.option('--results-per-student', default=20, show_default=True, help='Tests each student has taken')
+@click.option('--resources', default=200, show_default=True, help='Learning resources')
+@click.option('--files-per-resource', default=2, show_default=True)
+@click.option('--progress-per-student', default=10, show_default=True, help='Resources each student has opened')
+@click.option('--days', default=365, show_default=True, help='Spread results over this many past days')
+@click.option('--prefix', default='s', show_default=True, help='Student usernames are PREFIX0, PREFIX1, ...')
+@click.option('--password', default='student', show_default=True, help='Password of every generated student')
+@click.option('--sections', default=0, show_default=True, help='Split students and tests among this many sections')
+@click.option('--batch-size', default=2000, show_default=True, help='Rows inserted per transaction')
+@click.option('--random-seed', type=int, help='Make the generated data reproducible')
+def seed_command(students, tests, questions_per_test, results_per_student, resources, files_per_resource,
+                 progress_per_student, days, prefix, password, sections, batch_size, random_seed):
+    """Fill the database with synthetic students, tests, results and resources.
+
+    For example, 1,000,000 results: --students 20000 --tests 100 --results-per-student 50
+    """
+    rows = {}
+    def progress(table, count):
+        rows[table] = rows.get(table, 0) + count
+        if table == 'result' and rows[table] % 100000 < count:
+            click.echo(f'  {rows[table]:,} results')
+    try:
+        created = seed(students=students, tests=tests, questions_per_test=questions_per_test,
+                       results_per_student=results_per_student, resources=resources,
+                       files_per_resource=files_per_resource, progress_per_student=progress_per_student,
+                       days=days, prefix=prefix, password=password, sections=sections, batch_size=batch_size,
+                       random_seed=random_seed, progress=progress)
+        click.echo('Created ' + ', '.join(f'{count:,} {table}' for table, count in created.items()))
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'Error seeding database: {str(e)}')
+
 @cli.command('create-user')
 @click.option('--name', prompt=True, help='User\'s full name')
 @click.option('--student-id', prompt=True, help='Student ID')
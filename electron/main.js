@@ -1,9 +1,18 @@
 const { app, BrowserWindow } = require('electron')
 const path = require('path')
 const { spawn } = require('child_process')
+const http = require('http')
 const process = require('process')
 let mainWindow
 let flaskProcess
+let serverUrl = null
+
+// Printed by the Flask server, followed by its URL, once it is accepting connections
+const READY_MARKER = 'SMARTEXAM_READY'
+// Passed to the server as SMARTEXAM_PORT, so the fallback URLs match what it binds
+const PORT = parseInt(process.env.SMARTEXAM_PORT, 10) || 5000
+const SERVER_URL = `http://127.0.0.1:${PORT}/`
+const HEALTH_URL = `${SERVER_URL}healthz`
 
 function createWindow() {
   mainWindow = new BrowserWindow({
@@ -15,17 +24,46 @@ function createWindow() {
     icon: path.join(__dirname, 'icon.ico')
   })
 
-  // Wait for Flask server to start
-  setTimeout(() => {
-    mainWindow.loadURL('http://localhost:5000')
-    mainWindow.setTitle('SmartExaM')
-  }, 3000)
+  // Load as soon as the server reports ready (it may already have)
+  if (serverUrl) {
+    loadApp()
+  }
 
   mainWindow.on('closed', function () {
     mainWindow = null
   })
 }
 
+function loadApp() {
+  if (mainWindow && !mainWindow.webContents.getURL().startsWith(serverUrl)) {
+    mainWindow.loadURL(serverUrl)
+    mainWindow.setTitle('SmartExaM')
+  }
+}
+
+function onServerReady(url) {
+  if (serverUrl) {
+    return
+  }
+  serverUrl = url
+  loadApp()
+}
+
+// Fallback in case the ready line is missed: poll the readiness endpoint
+function waitForHealth() {
+  if (serverUrl) {
+    return
+  }
+  http.get(HEALTH_URL, (res) => {
+    res.resume()
+    if (res.statusCode === 200) {
+      onServerReady(SERVER_URL)
+    } else {
+      setTimeout(waitForHealth, 200)
+    }
+  }).on('error', () => setTimeout(waitForHealth, 200))
+}
+
 function startFlaskServer() {
   let pythonPath
   let scriptPath
@@ -38,10 +76,24 @@ function startFlaskServer() {
     scriptPath = path.join(__dirname, '..', 'app.py')
   }
 
-  flaskProcess = spawn(pythonPath, [scriptPath])
+  flaskProcess = spawn(pythonPath, [scriptPath], {
+    env: { ...process.env, SMARTEXAM_PORT: String(PORT) }
+  })
   
+  // Chunks can end mid-line, so only complete lines are checked for the marker
+  let pending = ''
   flaskProcess.stdout.on('data', (data) => {
     console.log(`Flask stdout: ${data}`)
+    pending += data.toString()
+    const lines = pending.split(/\r?\n/)
+    pending = lines.pop()
+    for (const line of lines) {
+      const index = line.indexOf(READY_MARKER)
+      if (index !== -1) {
+        const url = line.slice(index + READY_MARKER.length).trim()
+        onServerReady(url || SERVER_URL)
+      }
+    }
   })
   
   flaskProcess.stderr.on('data', (data) => {
@@ -51,6 +103,7 @@ function startFlaskServer() {
 
 app.on('ready', () => {
   startFlaskServer()
+  waitForHealth()
   createWindow()
 })
 
@@ -0,0 +1,346 @@
+"""
+Exam Channel
+============
+
+One WebSocket per exam attempt (/exam_channel), opened by take_test.js, that
+carries in both directions what used to be separate polls:
+
+- from the student: heartbeats, autosaved answers (only the ones that
+  changed) and security violations, as JSON {"type": ...} messages,
+- from the server: the remaining time after every heartbeat and autosave,
+  and the commands an admin sends from the Live Exam page ("extend",
+  "end", "message"), plus "sync" when a deadline changed some other way.
+
+The deadline stays on the attempt in the database; the channel only tells
+students about it sooner. Browsers that cannot open the channel, or servers
+that cannot upgrade the connection, fall back to the HTTP endpoints.
+
+The protocol is the small part of RFC 6455 that browsers use, served on the
+raw socket Werkzeug's server exposes (environ['werkzeug.socket']), so it
+needs no extra dependency but only works under that server (as app.py and
+the launcher run it). Each connection keeps its request thread. Sockets are
+non-blocking: a broadcast encodes its frame once and hands it to every
+socket without waiting, and whatever a slow client cannot take yet is left
+in its outbox for its own thread to finish, so one stalled student never
+holds up the rest of the classroom.
+
+ExamHub keeps the open connections of this process, by attempt and test.
+"""
+
+import base64
+import hashlib
+import json
+import select
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request
+from werkzeug.wrappers import Response
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+CONTINUATION, TEXT, BINARY, CLOSE, PING, PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+MAX_OUTBOX = 1024 * 1024  # Bytes a client may fall behind before it is dropped
+
+
+class HandshakeError(Exception):
+    """The request cannot be upgraded to a WebSocket"""
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+def encode_frame(payload, opcode=TEXT):
+    """A final, unmasked frame, as servers send them"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def encode_message(message):
+    return encode_frame(json.dumps(message, separators=(',', ':')))
+
+
+def unmask(payload, mask):
+    if not payload:
+        return b''
+    length = len(payload)
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def check_handshake(environ, headers, host):
+    """The Sec-WebSocket-Accept value for a valid upgrade request; raises HandshakeError"""
+    if 'werkzeug.socket' not in environ:
+        raise HandshakeError('This server cannot upgrade connections')
+    if headers.get('Upgrade', '').lower() != 'websocket' or \
+            'upgrade' not in headers.get('Connection', '').lower():
+        raise HandshakeError('Not a WebSocket request')
+    if headers.get('Sec-WebSocket-Version') != '13' or not headers.get('Sec-WebSocket-Key'):
+        raise HandshakeError('Unsupported WebSocket version')
+    # Cookies authenticate the channel, so only pages of this site may open it
+    origin = headers.get('Origin')
+    if origin and origin.split('://', 1)[-1] != host:
+        raise HandshakeError('Cross-origin WebSocket request')
+    return accept_key(headers['Sec-WebSocket-Key'])
+
+
+class Connection:
+    """One upgraded socket, owned by its request thread"""
+
+    def __init__(self, sock, attempt_id, test_id, user_id, max_message=1024 * 1024):
+        self.sock = sock
+        self.attempt_id = attempt_id
+        self.test_id = test_id
+        self.user_id = user_id
+        self.max_message = max_message
+        self.connected_at = datetime.utcnow()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._outbox = bytearray()
+        self._inbox = bytearray()
+        self._fragments = None
+        # poll() has no limit on descriptor numbers, unlike select(); Windows only has select()
+        self._poll = select.poll() if hasattr(select, 'poll') else None
+
+    def handshake(self, accept):
+        self.sock.sendall(('HTTP/1.1 101 Switching Protocols\r\n'
+                           'Upgrade: websocket\r\n'
+                           'Connection: Upgrade\r\n'
+                           f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('ascii'))
+        self.sock.setblocking(False)
+        if self._poll:
+            self._poll.register(self.sock, select.POLLIN)
+
+    def _wait(self, timeout):
+        """(readable, writable) after waiting up to timeout seconds"""
+        want_write = bool(self._outbox)
+        if self._poll is None:
+            readable, writable, _ = select.select([self.sock], [self.sock] if want_write else [], [], timeout)
+            return bool(readable), bool(writable)
+        self._poll.modify(self.sock, select.POLLIN | (select.POLLOUT if want_write else 0))
+        events = 0
+        for _, event in self._poll.poll(timeout * 1000):
+            events |= event
+        return bool(events & (select.POLLIN | select.POLLHUP | select.POLLERR)), bool(events & select.POLLOUT)
+
+    def send(self, message):
+        return self.send_frame(encode_message(message))
+
+    def send_frame(self, frame):
+        """Queue a frame without blocking; returns False if the connection is gone"""
+        with self._lock:
+            if self.closed:
+                return False
+            if not self._outbox:
+                try:
+                    frame = frame[self.sock.send(frame):]
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError:
+                    self.closed = True
+                    return False
+            self._outbox += frame
+            if len(self._outbox) > MAX_OUTBOX:
+                self.closed = True
+                return False
+            return True
+
+    def _flush_outbox(self):
+        with self._lock:
+            if self._outbox and not self.closed:
+                try:
+                    del self._outbox[:self.sock.send(self._outbox)]
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError:
+                    self.closed = True
+
+    def messages(self, idle_timeout):
+        """Yield the text messages received until the client closes, errs or goes quiet"""
+        last_received = time.monotonic()
+        while not self.closed:
+            # Short waits while output is pending, so broadcasts left in the outbox go out promptly
+            readable, writable = self._wait(0.2 if self._outbox else 1)
+            if writable:
+                self._flush_outbox()
+            if readable:
+                try:
+                    data = self.sock.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    break
+                if not data:
+                    break
+                last_received = time.monotonic()
+                self._inbox += data
+                try:
+                    yield from self._parse()
+                except ConnectionClosed:
+                    break
+            elif time.monotonic() - last_received > idle_timeout:
+                self.close(1001)
+                break
+        self.closed = True
+
+    def _parse(self):
+        while len(self._inbox) >= 2:
+            first, second = self._inbox[0], self._inbox[1]
+            fin, opcode, length = first & 0x80, first & 0x0F, second & 0x7F
+            offset = 2
+            if length == 126:
+                if len(self._inbox) < 4:
+                    return
+                length, offset = struct.unpack('!H', self._inbox[2:4])[0], 4
+            elif length == 127:
+                if len(self._inbox) < 10:
+                    return
+                length, offset = struct.unpack('!Q', self._inbox[2:10])[0], 10
+            if not second & 0x80:
+                self.close(1002)  # Clients must mask their frames
+                raise ConnectionClosed()
+            if length > self.max_message:
+                self.close(1009)
+                raise ConnectionClosed()
+            end = offset + 4 + length
+            if len(self._inbox) < end:
+                return
+            payload = unmask(bytes(self._inbox[offset + 4:end]), bytes(self._inbox[offset:offset + 4]))
+            del self._inbox[:end]
+
+            if opcode == CLOSE:
+                self.close(1000)
+                raise ConnectionClosed()
+            if opcode == PING:
+                self.send_frame(encode_frame(payload, PONG))
+            elif opcode in (TEXT, BINARY):
+                self._fragments = None if fin else [opcode, payload]
+                if fin and opcode == TEXT:
+                    yield payload.decode('utf-8', 'replace')
+            elif opcode == CONTINUATION and self._fragments is not None:
+                self._fragments[1] += payload
+                if len(self._fragments[1]) > self.max_message:
+                    self.close(1009)
+                    raise ConnectionClosed()
+                if fin:
+                    opcode, payload = self._fragments
+                    self._fragments = None
+                    if opcode == TEXT:
+                        yield payload.decode('utf-8', 'replace')
+
+    def close(self, code=1000):
+        if not self.closed:
+            self.send_frame(encode_frame(struct.pack('!H', code), CLOSE))
+            self._flush_outbox()
+            self.closed = True
+
+    def shutdown(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ExamHub:
+    """The open exam channels of this process, for broadcasts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def register(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+
+    def unregister(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def connections(self, test_id=None, attempt_ids=None):
+        with self._lock:
+            connections = list(self._connections)
+        if test_id is not None:
+            connections = [c for c in connections if c.test_id == test_id]
+        if attempt_ids is not None:
+            attempt_ids = set(attempt_ids)
+            connections = [c for c in connections if c.attempt_id in attempt_ids]
+        return connections
+
+    def connected_attempts(self, test_id):
+        return {connection.attempt_id for connection in self.connections(test_id)}
+
+    def broadcast(self, message, test_id=None, attempt_ids=None):
+        """Send one message to the matching connections; returns how many took it"""
+        frame = encode_message(message)
+        return sum(connection.send_frame(frame) for connection in self.connections(test_id, attempt_ids))
+
+
+class WebSocketResponse(Response):
+    """Returned once the channel has closed.
+
+    The handshake and every frame went straight to the socket, so there is
+    nothing left to send: raising ConnectionError makes Werkzeug's server
+    drop the connection without writing a response of its own.
+    """
+
+    def __call__(self, environ, start_response):
+        raise ConnectionError('WebSocket closed')
+
+
+def init_exam_channel(app):
+    app.extensions['exam_hub'] = ExamHub()
+
+
+def exam_hub():
+    return current_app.extensions['exam_hub']
+
+
+def serve_channel(attempt_id, test_id, user_id, handle):
+    """Upgrade the current request and pass each decoded message to handle(connection, message).
+
+    Returns the response for the view: an error for a request that cannot be
+    upgraded, else a WebSocketResponse once the channel has closed.
+    """
+    try:
+        accept = check_handshake(request.environ, request.headers, request.host)
+    except HandshakeError as e:
+        return Response(str(e), status=400)
+
+    config = current_app.config
+    connection = Connection(request.environ['werkzeug.socket'], attempt_id, test_id, user_id,
+                            max_message=config.get('EXAM_CHANNEL_MAX_MESSAGE', 1024 * 1024))
+    connection.handshake(accept)
+    hub = exam_hub()
+    hub.register(connection)
+    try:
+        for text in connection.messages(config.get('EXAM_CHANNEL_IDLE_TIMEOUT', 90)):
+            try:
+                message = json.loads(text)
+            except ValueError:
+                connection.send({'type': 'error', 'error': 'Invalid JSON'})
+                continue
+            if isinstance(message, dict):
+                handle(connection, message)
+    finally:
+        hub.unregister(connection)
+        connection.shutdown()
+    return WebSocketResponse(status=101)
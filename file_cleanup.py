@@ -0,0 +1,142 @@
+"""
+File Cleanup
+============
+
+Deleting a test, question or learning resource is a single DELETE: the
+database cascades to questions, results, attempts, resource files and
+progress. The uploaded files those rows pointed at are collected first and
+removed afterwards by remove_unreferenced_files on the background executor,
+so a large delete never waits on the disk. A video's transcoded stream
+(see transcoding.py) is a directory of playlists and segments; its files
+go the same way and the emptied directory is removed with them.
+
+Upload names can come back: question images keep their original file name,
+and SQLite reuses the highest id, which resource file names start with. A
+file is therefore only removed if, by the time the worker reaches it, no row
+references it any more and it has not been rewritten since the delete.
+"""
+
+import json
+import os
+import time
+
+from sqlalchemy import or_
+
+from models import db, Question, LearningResource, ResourceFile
+from transcoding import STREAMS_DIR, streams_folder
+
+
+def _upload_path(app, relative):
+    """Absolute path of an 'uploads/...' (static) or 'learning_resources/...' (uploads) reference"""
+    relative = relative.replace('\\', '/')
+    if relative.startswith('uploads/'):
+        return os.path.join(app.static_folder, relative)
+    return os.path.join(app.config['UPLOAD_FOLDER'], relative)
+
+
+def question_files(app, questions):
+    """Image files referenced by (question.image_path, question.choice_images) rows"""
+    paths = []
+    for image_path, choice_images in questions:
+        if image_path:
+            paths.append(_upload_path(app, image_path))
+        for choice_image in (json.loads(choice_images) if choice_images else []):
+            if choice_image:
+                paths.append(_upload_path(app, choice_image))
+    return paths
+
+
+def test_files(app, test_id):
+    return question_files(app, db.session.query(Question.image_path, Question.choice_images)
+                          .filter(Question.test_id == test_id,
+                                  or_(Question.image_path.isnot(None), Question.choice_images.isnot(None))))
+
+
+def _stream_files(app, stream_path):
+    """Every file of the stream whose master playlist is at stream_path"""
+    stream_dir = os.path.dirname(os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], stream_path))
+    return [os.path.join(root, name) for root, _, names in os.walk(stream_dir) for name in names]
+
+
+def _stream_dir(app, path):
+    """'streams/<name>/' if path is inside a stream directory, otherwise None"""
+    relative = os.path.relpath(path, os.path.realpath(app.config['LEARNING_RESOURCES_FOLDER'])).split(os.sep)
+    if len(relative) > 2 and relative[0] == STREAMS_DIR:
+        return f'{STREAMS_DIR}/{relative[1]}/'
+    return None
+
+
+def resource_files(app, resource):
+    """Every file on disk behind a learning resource, including legacy single-file paths"""
+    paths = []
+    for filename, stream_path in db.session.query(ResourceFile.filename, ResourceFile.stream_path) \
+            .filter_by(resource_id=resource.id):
+        paths.append(os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], filename))
+        if stream_path:
+            paths.extend(_stream_files(app, stream_path))
+    for legacy_path in (resource.file_path, resource.thumbnail_path):
+        if legacy_path:
+            paths.append(_upload_path(app, legacy_path))
+    return paths
+
+
+def is_referenced(app, path):
+    """Whether any row still points at the file at path"""
+    stream_dir = _stream_dir(app, path)
+    if stream_dir is not None:
+        # Stream files belong to the one ResourceFile whose playlist is in their directory
+        return db.session.query(ResourceFile.query.filter(
+            ResourceFile.stream_path.startswith(stream_dir, autoescape=True)).exists()).scalar()
+    from_uploads = os.path.relpath(path, os.path.realpath(app.config['UPLOAD_FOLDER'])).replace(os.sep, '/')
+    from_static = f'uploads/{from_uploads}'
+    checks = [
+        Question.query.filter(or_(Question.image_path == from_static,
+                                  Question.choice_images.contains(json.dumps(from_static), autoescape=True))),
+        ResourceFile.query.filter(or_(ResourceFile.file_path == from_uploads,
+                                      ResourceFile.filename == os.path.basename(path))),
+        LearningResource.query.filter(or_(LearningResource.file_path == from_uploads,
+                                          LearningResource.thumbnail_path == from_uploads)),
+    ]
+    return any(db.session.query(query.exists()).scalar() for query in checks)
+
+
+def remove_unreferenced_files(app, paths, requested_at=None):
+    """Delete files left behind by a delete, unless something still uses them.
+
+    Runs outside the request (see app.executor), so it opens its own context.
+    Returns the number of files removed.
+    """
+    requested_at = requested_at or time.time()
+    upload_root = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    streams_root = os.path.realpath(streams_folder(app))
+    removed = 0
+    emptied = set()
+    with app.app_context():
+        try:
+            for path in sorted(set(paths)):
+                real_path = os.path.realpath(path)
+                if not real_path.startswith(upload_root + os.sep) or not os.path.isfile(real_path):
+                    continue  # Never touch anything outside the upload folder
+                if os.path.getmtime(real_path) > requested_at or is_referenced(app, real_path):
+                    continue  # Re-uploaded or shared since the delete
+                try:
+                    os.remove(real_path)
+                    removed += 1
+                    if real_path.startswith(streams_root + os.sep):
+                        emptied.add(os.path.dirname(real_path))
+                except OSError as e:
+                    app.logger.warning(f'Could not remove {real_path}: {str(e)}')
+            # Stream directories (renditions first) once nothing is left in them
+            for directory in sorted(emptied | {os.path.dirname(d) for d in emptied}, key=len, reverse=True):
+                if directory.startswith(streams_root + os.sep):
+                    try:
+                        os.rmdir(directory)
+                    except OSError:
+                        pass  # Not empty
+            if removed:
+                app.logger.info(f'Removed {removed} unreferenced upload file(s)')
+        except Exception as e:
+            app.logger.error(f'Upload cleanup failed: {str(e)}')
+        finally:
+            db.session.remove()
+    return removed
@@ -0,0 +1,177 @@
+"""
+Fragment Cache
+==============
+
+Caches rendered pieces of the large templates (test statistics, the resource
+library, resource file lists) so they are rebuilt only when what they show
+changes. In a template:
+
+    {% cache 'dashboard-test-stats', cache_version('tests', 'results') %}
+        {% set test_statistics = load_test_statistics() %}
+        ...
+    {% endcache %}
+
+Every fragment is keyed by its name, the current user's role and the values
+after the name. cache_version() turns table names into version tokens (row
+count, highest id and latest timestamp), so any insert, update or delete
+produces a new key and stale entries simply age out of the LRU.
+
+Views pass loaders (see lazy) instead of query results, so on a cache hit the
+queries behind a fragment never run.
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import func
+
+from models import db, Test, Question, LearningResource, ResourceFile, Result, Section
+
+# Dependency name -> (id column, change timestamp column)
+DEPENDENCIES = {
+    'tests': (Test.id, Test.updated_at),
+    'questions': (Question.id, Question.updated_at),
+    'resources': (LearningResource.id, LearningResource.updated_at),
+    'resource_files': (ResourceFile.id, ResourceFile.updated_at),  # Transcoding bumps updated_at
+    'results': (Result.id, Result.date_taken),
+    'sections': (Section.id, Section.updated_at),  # Membership and assignment changes bump updated_at
+}
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments, bounded by entries and bytes"""
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fragments = {}  # Fragment name -> {'hits': n, 'misses': n}
+
+    def _count(self, name, outcome):
+        counts = self.fragments.setdefault(name, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                self._count(key[0], 'misses')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._count(key[0], 'hits')
+            return entry[0]
+
+    def set(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+                'fragments': {name: dict(counts) for name, counts in sorted(self.fragments.items())}
+            }
+
+
+def cache_version(*names):
+    """Version token for the given dependencies, computed once per request"""
+    versions = g.setdefault('_fragment_cache_versions', {})
+    tokens = []
+    for name in names:
+        if name not in versions:
+            id_column, changed_column = DEPENDENCIES[name]
+            count, max_id, last_changed = db.session.query(
+                func.count(id_column), func.max(id_column), func.max(changed_column)).one()
+            versions[name] = f'{count}:{max_id}:{last_changed}'
+        tokens.append(versions[name])
+    return '|'.join(tokens)
+
+
+class lazy:
+    """Memoized loader for data a cached fragment needs: call it to load"""
+
+    def __init__(self, loader, *args, **kwargs):
+        self._loader = loader
+        self._args = args
+        self._kwargs = kwargs
+        self._loaded = False
+        self._value = None
+
+    def __call__(self):
+        if not self._loaded:
+            self._value = self._loader(*self._args, **self._kwargs)
+            self._loaded = True
+        return self._value
+
+
+class FragmentCacheExtension(Extension):
+    """Adds {% cache name, key... %}...{% endcache %} to Jinja"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        key = []
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [name, nodes.List(key)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, key, caller):
+        cache = current_app.extensions.get('fragment_cache')
+        if cache is None or not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+
+        role = current_user.role if current_user.is_authenticated else 'anonymous'
+        cache_key = (name, role) + tuple(str(part) for part in key)
+        html = cache.get(cache_key)
+        if html is None:
+            html = caller()
+            cache.set(cache_key, str(html))
+        return Markup(html)
+
+
+def init_fragment_cache(app):
+    app.extensions['fragment_cache'] = FragmentCache(
+        max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 256),
+        max_bytes=app.config.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['cache_version'] = cache_version
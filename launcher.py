@@ -2,24 +2,25 @@ import os
 import sys
 import threading
 import webbrowser
-import time
-from app import app
+from app import create_app, init_db, serve, start_background_workers
 
-def open_browser():
-    """Open browser after a short delay"""
-    time.sleep(1.5)
-    webbrowser.open_new('http://localhost:5000/')
+def open_browser(url):
+    """Open the browser as soon as the server is listening"""
+    threading.Thread(target=webbrowser.open_new, args=(url,), daemon=True).start()
 
 def start_app():
     """Start the Flask application"""
-    # Ensure app runs on a specific port with threading enabled
-    port = 5000
-    
-    # Open browser in a separate thread
-    threading.Timer(1, open_browser).start()
-    
-    # Enable multi-device support and threading
-    app.run(host='0.0.0.0', port=port, debug=False, threaded=True, use_reloader=False)
+    # Migrations are only loaded if the database turns out to need them
+    app = create_app(with_migrations=False)
+
+    # Create or upgrade the schema before anything touches it
+    init_db(app)
+
+    # Sweeper, maintenance, opening-soon, telemetry and transcode threads
+    start_background_workers(app)
+
+    # Enable multi-device support and threading; the browser opens once ready
+    serve(app, host='0.0.0.0', port=app.config['PORT'], on_ready=open_browser)
 
 if __name__ == '__main__':
     # Check if running as PyInstaller bundle
@@ -27,5 +28,5 @@ if __name__ == '__main__':
         # Set the application path to the directory containing the executable
         application_path = os.path.dirname(sys.executable)
         os.chdir(application_path)
-    
+
     start_app()
@@ -0,0 +1,300 @@
+"""
+Database Maintenance
+====================
+
+SQLite in WAL mode never shrinks its -wal file by itself, and its query
+planner statistics go stale as results pile up. MaintenanceScheduler is a
+daemon thread (like the attempt sweeper) that keeps database/smartexam.db
+healthy without getting in the way of an exam:
+
+- while requests are coming in it only runs PASSIVE checkpoints, which never
+  wait for readers or writers,
+- once the app is quiet (no request for MAINTENANCE_QUIET_SECONDS and no exam
+  attempt in progress) it truncates the WAL, runs PRAGMA optimize, and takes
+  an online backup through the SQLite backup API into MAINTENANCE_BACKUP_DIR
+  (backups/ next to the database by default), keeping the newest
+  MAINTENANCE_BACKUP_KEEP copies.
+
+Backups are copied a few pages at a time with a pause in between, and are
+abandoned as soon as a request arrives; the next quiet period starts over.
+Every task uses its own connection with a short busy timeout, so it gives up
+rather than queueing behind exam traffic. VACUUM rewrites the whole file and
+is only run on demand (`python db_manage.py maintenance vacuum`).
+
+PostgreSQL has autovacuum and pg_dump for this; the scheduler does not start.
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from models import db, TestAttempt
+
+TASKS = ('checkpoint', 'optimize', 'backup', 'analyze', 'vacuum')
+
+
+class Activity:
+    """Counts requests in flight and remembers when the last one finished"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.last_request = time.monotonic()
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.last_request = time.monotonic()
+
+    def end(self, exc=None):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.last_request = time.monotonic()
+
+    def idle_seconds(self):
+        with self._lock:
+            return 0 if self.in_flight else time.monotonic() - self.last_request
+
+
+def database_path(app):
+    """File of the app's SQLite database, or None for other backends"""
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.database
+
+
+def backup_dir(app, path):
+    return app.config.get('MAINTENANCE_BACKUP_DIR') or os.path.join(os.path.dirname(path), 'backups')
+
+
+def connect(path, busy_timeout):
+    # Autocommit: VACUUM and checkpoints cannot run inside a transaction
+    return sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+
+
+def wal_size(path):
+    try:
+        return os.path.getsize(path + '-wal')
+    except OSError:
+        return 0
+
+
+def checkpoint(path, mode='PASSIVE', busy_timeout=1):
+    """Run a WAL checkpoint; returns (busy, wal frames, frames checkpointed)"""
+    connection = connect(path, busy_timeout)
+    try:
+        return tuple(connection.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+    finally:
+        connection.close()
+
+
+def optimize(path, busy_timeout=1):
+    """Refresh planner statistics where SQLite thinks they are stale"""
+    connection = connect(path, busy_timeout)
+    try:
+        connection.execute('PRAGMA analysis_limit=400')  # Sample large indexes instead of scanning them
+        connection.execute('PRAGMA optimize')
+    finally:
+        connection.close()
+
+
+def analyze(path, busy_timeout=1):
+    """Full ANALYZE of every table and index"""
+    connection = connect(path, busy_timeout)
+    try:
+        connection.execute('ANALYZE')
+    finally:
+        connection.close()
+
+
+def vacuum(path, busy_timeout=30):
+    connection = connect(path, busy_timeout)
+    try:
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
+
+
+class BackupInterrupted(Exception):
+    pass
+
+
+def backup_files(path, backup_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return sorted(glob.glob(os.path.join(backup_dir, f'{name}-*.db')))
+
+
+def backup(path, backup_dir, keep=7, pages=256, sleep=0.05, busy_timeout=1, should_stop=None):
+    """Copy the database into backup_dir through the SQLite backup API.
+
+    Copies pages at a time, sleeping in between. If should_stop() turns true
+    the copy is abandoned and BackupInterrupted raised. Only the newest keep
+    backups are kept. Returns the new backup's path.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(backup_dir, f'{name}-{datetime.now():%Y%m%d-%H%M%S}.db')
+    partial = target + '.partial'
+
+    def progress(status, remaining, total):
+        if should_stop and should_stop():
+            raise BackupInterrupted(f'Backup stopped with {remaining} of {total} pages left')
+
+    source = connect(path, busy_timeout)
+    destination = sqlite3.connect(partial)
+    try:
+        source.backup(destination, pages=pages, progress=progress, sleep=sleep)
+    except BaseException:
+        destination.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    destination.close()
+    os.replace(partial, target)
+
+    for old in backup_files(path, backup_dir)[:-keep] if keep else []:
+        os.remove(old)
+    return target
+
+
+def run_task(app, task):
+    """Run one maintenance task now, whatever the traffic (db_manage.py maintenance)"""
+    path = database_path(app)
+    if path is None:
+        raise RuntimeError('Maintenance tasks are for SQLite databases only')
+    if task == 'checkpoint':
+        return checkpoint(path, 'TRUNCATE', busy_timeout=30)
+    if task == 'optimize':
+        return optimize(path, busy_timeout=30)
+    if task == 'analyze':
+        return analyze(path, busy_timeout=30)
+    if task == 'backup':
+        return backup(path, backup_dir(app, path), keep=app.config.get('MAINTENANCE_BACKUP_KEEP', 7),
+                      pages=-1, sleep=0, busy_timeout=30)
+    if task == 'vacuum':
+        return vacuum(path)
+    raise ValueError(f'Unknown maintenance task "{task}"')
+
+
+class MaintenanceScheduler:
+    """Daemon thread that runs the maintenance tasks when they are due"""
+
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.activity = app.extensions['maintenance_activity']
+        self.interval = app.config.get('MAINTENANCE_INTERVAL', 30)
+        self.quiet_seconds = app.config.get('MAINTENANCE_QUIET_SECONDS', 120)
+        self.busy_timeout = app.config.get('MAINTENANCE_BUSY_TIMEOUT', 1)
+        self.due = {
+            'checkpoint': app.config.get('MAINTENANCE_CHECKPOINT_INTERVAL', 300),
+            'optimize': app.config.get('MAINTENANCE_OPTIMIZE_INTERVAL', 6 * 3600),
+            'backup': app.config.get('MAINTENANCE_BACKUP_INTERVAL', 24 * 3600),
+        }
+        self.backup_dir = backup_dir(app, path)
+        # Checkpoint and optimize once the first quiet period comes; back up when the newest backup is old
+        backups = backup_files(path, self.backup_dir)
+        self.last_run = {'checkpoint': 0, 'optimize': 0,
+                         'backup': os.path.getmtime(backups[-1]) if backups else 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_due(self, task, now):
+        return now - self.last_run[task] >= self.due[task]
+
+    def is_quiet(self):
+        if self.activity.idle_seconds() < self.quiet_seconds:
+            return False
+        with self.app.app_context():
+            try:
+                exam_running = db.session.query(TestAttempt.query.filter(
+                    TestAttempt.status == 'active', TestAttempt.deadline > datetime.utcnow()).exists()).scalar()
+            finally:
+                db.session.remove()
+        return not exam_running
+
+    def tick(self, now=None):
+        """Run whatever is due; returns the names of the tasks that ran"""
+        now = now or time.time()
+        logger = self.app.logger
+        ran = []
+        try:
+            if not self.is_quiet():
+                # Busy: only the checkpoint that never blocks anybody
+                if self.is_due('checkpoint', now) and wal_size(self.path):
+                    checkpoint(self.path, 'PASSIVE', self.busy_timeout)
+                    self.last_run['checkpoint'] = now
+                    ran.append('checkpoint')
+                return ran
+
+            if wal_size(self.path):
+                busy, frames, done = checkpoint(self.path, 'TRUNCATE', self.busy_timeout)
+                self.last_run['checkpoint'] = now
+                ran.append('checkpoint')
+                if busy:
+                    logger.info(f'WAL checkpoint deferred: {done} of {frames} frames copied')
+            if self.is_due('optimize', now):
+                optimize(self.path, self.busy_timeout)
+                self.last_run['optimize'] = now
+                ran.append('optimize')
+            if self.is_due('backup', now):
+                requests = self.activity.requests
+                target = backup(self.path, self.backup_dir,
+                                keep=self.app.config.get('MAINTENANCE_BACKUP_KEEP', 7),
+                                pages=self.app.config.get('MAINTENANCE_BACKUP_PAGES', 256),
+                                sleep=self.app.config.get('MAINTENANCE_BACKUP_SLEEP', 0.05),
+                                busy_timeout=self.busy_timeout,
+                                should_stop=lambda: self._stop.is_set() or self.activity.requests != requests)
+                self.last_run['backup'] = now
+                ran.append('backup')
+                logger.info(f'Database backed up to {target}')
+        except BackupInterrupted as e:
+            logger.info(f'Database backup postponed: {str(e)}')
+        except sqlite3.OperationalError as e:
+            # Usually "database is locked": traffic came back, try again next tick
+            logger.info(f'Database maintenance postponed: {str(e)}')
+        except Exception as e:
+            logger.error(f'Database maintenance error: {str(e)}')
+        return ran
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+
+
+def init_maintenance(app):
+    """Track request activity so maintenance can wait for quiet periods"""
+    activity = Activity()
+    app.extensions['maintenance_activity'] = activity
+    app.before_request(activity.begin)
+    app.teardown_request(activity.end)
+
+
+def start_maintenance_scheduler(app):
+    """Start the maintenance thread once per application (SQLite only)"""
+    scheduler = app.extensions.get('maintenance_scheduler')
+    if scheduler is None:
+        path = database_path(app)
+        if path is None or not app.config.get('MAINTENANCE_ENABLED', True):
+            return None
+        scheduler = MaintenanceScheduler(app, path)
+        app.extensions['maintenance_scheduler'] = scheduler
+    scheduler.start()
+    return scheduler
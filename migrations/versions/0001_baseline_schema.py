@@ -0,0 +1,126 @@
+"""Baseline schema
+
+Tables as created by db.create_all() before migrations were introduced.
+Databases created that way are stamped at this revision by
+`python db_manage.py update-db` and upgraded from here.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2025-06-25 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('student_id', sa.String(length=50), nullable=True),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('student_id'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table('learning_resource',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('resource_type', sa.String(length=20), nullable=False),
+        sa.Column('file_path', sa.String(length=500), nullable=True),
+        sa.Column('thumbnail_path', sa.String(length=500), nullable=True),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('test',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('time_limit', sa.Integer(), nullable=False),
+        sa.Column('learning_resource_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['learning_resource_id'], ['learning_resource.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('resource_file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=False),
+        sa.Column('file_path', sa.String(length=500), nullable=False),
+        sa.Column('file_type', sa.String(length=50), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('upload_order', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['resource_id'], ['learning_resource.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('student_progress',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('progress_percentage', sa.Float(), nullable=True),
+        sa.Column('last_position', sa.Integer(), nullable=True),
+        sa.Column('completed', sa.Boolean(), nullable=True),
+        sa.Column('time_spent', sa.Integer(), nullable=True),
+        sa.Column('first_accessed', sa.DateTime(), nullable=True),
+        sa.Column('last_accessed', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['resource_id'], ['learning_resource.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'resource_id', name='unique_user_resource')
+    )
+    op.create_table('question',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('question_text', sa.Text(), nullable=False),
+        sa.Column('question_type', sa.String(length=20), nullable=False),
+        sa.Column('choices', sa.Text(), nullable=True),
+        sa.Column('choice_images', sa.Text(), nullable=True),
+        sa.Column('correct_answer', sa.Text(), nullable=False),
+        sa.Column('image_path', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('result',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('date_taken', sa.DateTime(), nullable=False),
+        sa.Column('raw_data', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('result')
+    op.drop_table('question')
+    op.drop_table('student_progress')
+    op.drop_table('resource_file')
+    op.drop_table('test')
+    op.drop_table('learning_resource')
+    op.drop_table('user')
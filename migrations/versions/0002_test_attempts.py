@@ -0,0 +1,51 @@
+"""Server-side test attempts
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-06-26 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # update-db used to run create_all, which may already have built this table
+    if sa.inspect(op.get_bind()).has_table('test_attempt'):
+        return
+
+    op.create_table('test_attempt',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('deadline', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('answers', sa.Text(), nullable=True),
+        sa.Column('last_saved_at', sa.DateTime(), nullable=True),
+        sa.Column('last_heartbeat', sa.DateTime(), nullable=True),
+        sa.Column('security_violations', sa.Integer(), nullable=True),
+        sa.Column('tab_switches', sa.Integer(), nullable=True),
+        sa.Column('fullscreen_exits', sa.Integer(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('result_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['result_id'], ['result.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_test_attempt_status_deadline', 'test_attempt', ['status', 'deadline'])
+    op.create_index('ix_test_attempt_user_test', 'test_attempt', ['user_id', 'test_id'])
+
+
+def downgrade():
+    op.drop_index('ix_test_attempt_user_test', table_name='test_attempt')
+    op.drop_index('ix_test_attempt_status_deadline', table_name='test_attempt')
+    op.drop_table('test_attempt')
@@ -0,0 +1,100 @@
+"""Indexes for hot lookup columns and one result per student per test
+
+Before the unique index is built, duplicate (user_id, test_id) results are
+moved out of result, keeping the earliest submission, which is the one
+take_test and submit_test have always treated as authoritative. The others
+are not deleted: they are copied as they were into result_duplicate, with
+the time they were moved, and the migration logs how many. The table is
+only created when there are duplicates and is not part of the models (see
+KEPT_TABLES in env.py); downgrading moves its rows back into result.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-06-27 00:00:00
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ('uq_result_user_test', 'result', ['user_id', 'test_id'], True),
+    ('ix_result_test_score', 'result', ['test_id', 'score'], False),
+    ('ix_result_date_taken', 'result', ['date_taken'], False),
+    ('ix_question_test_id', 'question', ['test_id'], False),
+    ('ix_student_progress_resource_id', 'student_progress', ['resource_id'], False),
+    ('ix_resource_file_resource_order', 'resource_file', ['resource_id', 'upload_order'], False),
+    ('ix_learning_resource_active_created', 'learning_resource', ['is_active', 'created_at'], False),
+    ('ix_user_name', 'user', ['name'], False),
+    ('ix_test_created_at', 'test', ['created_at'], False),
+]
+
+
+DUPLICATES_TABLE = 'result_duplicate'
+RESULT_COLUMNS = 'id, user_id, test_id, score, date_taken, raw_data'
+DUPLICATES = 'id NOT IN (SELECT MIN(id) FROM result GROUP BY user_id, test_id)'
+
+log = logging.getLogger('alembic.runtime.migration')
+
+
+def existing_indexes(bind, table):
+    return {index['name'] for index in sa.inspect(bind).get_indexes(table)}
+
+
+def move_duplicate_results(bind):
+    """Move all but the earliest result per (user_id, test_id) into result_duplicate"""
+    count = bind.execute(sa.text(f'SELECT COUNT(*) FROM result WHERE {DUPLICATES}')).scalar()
+    if not count:
+        return
+    if not sa.inspect(bind).has_table(DUPLICATES_TABLE):
+        # No foreign keys: the copies must outlive the users and tests they belong to
+        op.create_table(DUPLICATES_TABLE,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('test_id', sa.Integer(), nullable=False),
+            sa.Column('score', sa.Float(), nullable=False),
+            sa.Column('date_taken', sa.DateTime(), nullable=False),
+            sa.Column('raw_data', sa.Text(), nullable=True),
+            sa.Column('moved_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.execute(f'INSERT INTO {DUPLICATES_TABLE} ({RESULT_COLUMNS}, moved_at) '
+               f'SELECT {RESULT_COLUMNS}, CURRENT_TIMESTAMP FROM result WHERE {DUPLICATES}')
+    op.execute(f'DELETE FROM result WHERE {DUPLICATES}')
+    log.warning(f'Moved {count} duplicate result(s) into {DUPLICATES_TABLE}; '
+                f'the earliest result of each student and test was kept')
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    move_duplicate_results(bind)
+
+    for name, table, columns, unique in INDEXES:
+        if name not in existing_indexes(bind, table):
+            op.create_index(name, table, columns, unique=unique)
+
+    # The planner only picks the new indexes reliably once it has statistics
+    if bind.dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name, table, columns, unique in reversed(INDEXES):
+        if name in existing_indexes(bind, table):
+            op.drop_index(name, table_name=table)
+
+    if sa.inspect(bind).has_table(DUPLICATES_TABLE):
+        op.execute(f'INSERT INTO result ({RESULT_COLUMNS}) SELECT {RESULT_COLUMNS} FROM {DUPLICATES_TABLE}')
+        op.drop_table(DUPLICATES_TABLE)
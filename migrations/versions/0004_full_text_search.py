@@ -0,0 +1,27 @@
+"""Full-text search indexes for questions and learning resources
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-06-28 00:00:00
+
+"""
+from alembic import op
+
+from search import install_search_index, uninstall_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 tables and their sync triggers; extracted file text is filled in
+    # afterwards by `python db_manage.py reindex-search`
+    install_search_index(op.get_bind())
+
+
+def downgrade():
+    uninstall_search_index(op.get_bind())
@@ -0,0 +1,63 @@
+"""Cascade deletes of users and learning resources in the database
+
+Results, attempts and progress rows now go with their user (ON DELETE
+CASCADE), and tests are unlinked from a deleted learning resource (ON DELETE
+SET NULL), so the same deletes behave identically on SQLite and PostgreSQL.
+
+SQLite cannot alter a constraint in place; batch mode rebuilds the tables.
+env.py switches foreign key enforcement off while it does.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-06-29 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, referenced table, ondelete)
+FOREIGN_KEYS = [
+    ('result', 'user_id', 'user', 'CASCADE'),
+    ('test', 'learning_resource_id', 'learning_resource', 'SET NULL'),
+    ('student_progress', 'user_id', 'user', 'CASCADE'),
+    ('test_attempt', 'user_id', 'user', 'CASCADE'),
+]
+
+# Names SQLite's unnamed constraints are reflected under in batch mode
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def foreign_key_name(bind, table, column):
+    for foreign_key in sa.inspect(bind).get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column]:
+            return foreign_key['name']
+    return None
+
+
+def replace_foreign_key(table, column, referent, ondelete):
+    bind = op.get_bind()
+    convention_name = NAMING_CONVENTION['fk'] % {
+        'table_name': table, 'column_0_name': column, 'referred_table_name': referent}
+    current_name = foreign_key_name(bind, table, column) or convention_name
+
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(current_name, type_='foreignkey')
+        batch_op.create_foreign_key(convention_name, referent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    for table, column, referent, ondelete in FOREIGN_KEYS:
+        replace_foreign_key(table, column, referent, ondelete)
+
+
+def downgrade():
+    for table, column, referent, ondelete in reversed(FOREIGN_KEYS):
+        replace_foreign_key(table, column, referent, None)
@@ -0,0 +1,49 @@
+"""Archive table for old results
+
+archived_result holds results moved out of the hot result table by
+`python db_manage.py archive`, with raw_data zlib-compressed. Archived rows
+keep their result id, so on SQLite the result table is rebuilt with
+AUTOINCREMENT to stop those ids from being handed out again (PostgreSQL
+sequences never reuse ids).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-06-30 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_result',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('date_taken', sa.DateTime(), nullable=False),
+        sa.Column('raw_data', sa.LargeBinary(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_archived_result_user_test', 'archived_result', ['user_id', 'test_id'], unique=True)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # No column changes: recreating the table is what adds AUTOINCREMENT
+        with op.batch_alter_table('result', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade():
+    op.drop_index('uq_archived_result_user_test', table_name='archived_result')
+    op.drop_table('archived_result')
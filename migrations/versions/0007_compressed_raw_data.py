@@ -0,0 +1,110 @@
+"""Compressed result raw_data
+
+result.raw_data becomes a binary column holding zlib-compressed JSON (see
+compressed_columns.py). Existing results are compressed in batches with a
+dictionary per test, trained on the test's first stored result. Archived
+results, already plain zlib, only gain the header naming no dictionary.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-07-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from compressed_columns import (HEADER, MAGIC, NO_DICTIONARY, compress, decompress, dictionary_id,
+                                train_dictionary)
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+dictionary_table = sa.table('compression_dictionary', sa.column('id', sa.Integer), sa.column('test_id', sa.Integer),
+                            sa.column('data', sa.LargeBinary), sa.column('created_at', sa.DateTime))
+
+
+def data_table(name):
+    return sa.table(name, sa.column('id', sa.Integer), sa.column('test_id', sa.Integer),
+                    sa.column('raw_data', sa.LargeBinary))
+
+
+def as_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else bytes(value)
+
+
+def rewrite(bind, table, convert):
+    """Replace every non-null raw_data with convert(test_id, bytes), in id order"""
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.select(table.c.id, table.c.test_id, table.c.raw_data)
+                            .where(table.c.id > last_id, table.c.raw_data.isnot(None))
+                            .order_by(table.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        bind.execute(table.update().where(table.c.id == sa.bindparam('row_id'))
+                     .values(raw_data=sa.bindparam('value')),
+                     [{'row_id': row.id, 'value': convert(row.test_id, as_bytes(row.raw_data))} for row in rows])
+        last_id = rows[-1].id
+
+
+def alter_raw_data(bind, from_type, to_type, using):
+    if bind.dialect.name == 'postgresql':
+        op.alter_column('result', 'raw_data', type_=to_type, existing_type=from_type,
+                        postgresql_using=using)
+    else:
+        with op.batch_alter_table('result', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            batch_op.alter_column('raw_data', type_=to_type, existing_type=from_type)
+
+
+def upgrade():
+    op.create_table('compression_dictionary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('test_id'),
+        sqlite_autoincrement=True
+    )
+
+    bind = op.get_bind()
+    alter_raw_data(bind, sa.Text(), sa.LargeBinary(), "convert_to(raw_data, 'UTF8')")
+
+    dictionaries = {}
+
+    def compress_result(test_id, value):
+        text = value.decode('utf-8')
+        if test_id not in dictionaries:
+            bind.execute(dictionary_table.insert().values(test_id=test_id, data=train_dictionary(text),
+                                                          created_at=sa.func.now()))
+            dictionaries[test_id] = bind.execute(sa.select(dictionary_table.c.id, dictionary_table.c.data)
+                                                 .where(dictionary_table.c.test_id == test_id)).one()
+        dictionary = dictionaries[test_id]
+        return compress(text, dictionary.id, dictionary.data)
+
+    rewrite(bind, data_table('result'), compress_result)
+    rewrite(bind, data_table('archived_result'), lambda test_id, value: HEADER.pack(MAGIC, NO_DICTIONARY) + value)
+
+
+def downgrade():
+    bind = op.get_bind()
+    dictionaries = dict(bind.execute(sa.select(dictionary_table.c.id, dictionary_table.c.data)).all())
+
+    def plain(value):
+        used = dictionary_id(value)
+        return decompress(value, dictionaries[used] if used != NO_DICTIONARY else None)
+
+    rewrite(bind, data_table('result'), lambda test_id, value: plain(value).encode('utf-8'))
+    rewrite(bind, data_table('archived_result'),
+            lambda test_id, value: compress(plain(value))[HEADER.size:])
+
+    alter_raw_data(bind, sa.LargeBinary(), sa.Text(), "convert_from(raw_data, 'UTF8')")
+    op.drop_table('compression_dictionary')
@@ -0,0 +1,61 @@
+"""Precomputed learning analytics
+
+test_analytics holds one row of learning-to-score statistics per test and
+at_risk_student the students each test flags (see analytics.py). Both start
+empty; every test is computed on the first refresh.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-07-03 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('test_analytics',
+        sa.Column('test_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=True),
+        sa.Column('stale', sa.Boolean(), nullable=False),
+        sa.Column('students', sa.Integer(), nullable=False),
+        sa.Column('completed_students', sa.Integer(), nullable=False),
+        sa.Column('completed_average', sa.Float(), nullable=True),
+        sa.Column('completed_histogram', sa.Text(), nullable=True),
+        sa.Column('other_students', sa.Integer(), nullable=False),
+        sa.Column('other_average', sa.Float(), nullable=True),
+        sa.Column('other_histogram', sa.Text(), nullable=True),
+        sa.Column('not_opened_students', sa.Integer(), nullable=False),
+        sa.Column('time_spent_quantiles', sa.Text(), nullable=True),
+        sa.Column('time_score_correlation', sa.Float(), nullable=True),
+        sa.Column('at_risk_students', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['resource_id'], ['learning_resource.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_id')
+    )
+    op.create_table('at_risk_student',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('progress_percentage', sa.Float(), nullable=True),
+        sa.Column('time_spent', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_at_risk_student_test_user', 'at_risk_student', ['test_id', 'user_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_at_risk_student_test_user', table_name='at_risk_student')
+    op.drop_table('at_risk_student')
+    op.drop_table('test_analytics')
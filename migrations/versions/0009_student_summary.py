@@ -0,0 +1,43 @@
+"""Cached per-student result summaries
+
+student_summary holds each student's record statistics (see
+student_summary.py). It starts empty; a student's row is computed the first
+time their records are viewed.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-07-05 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('student_summary',
+        sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('stale', sa.Boolean(), nullable=False),
+        sa.Column('tests_taken', sa.Integer(), nullable=False),
+        sa.Column('score_total', sa.Float(), nullable=False),
+        sa.Column('highest_score', sa.Float(), nullable=True),
+        sa.Column('lowest_score', sa.Float(), nullable=True),
+        sa.Column('excellent_count', sa.Integer(), nullable=False),
+        sa.Column('good_count', sa.Integer(), nullable=False),
+        sa.Column('fair_count', sa.Integer(), nullable=False),
+        sa.Column('poor_count', sa.Integer(), nullable=False),
+        sa.Column('last_taken', sa.DateTime(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('student_summary')
@@ -0,0 +1,69 @@
+"""Sections with memberships and test and resource assignments
+
+section groups students and their teachers; section_test and
+section_resource assign tests and learning resources to sections (see
+sections.py). Every link table is keyed both ways, so scoping a query to a
+section or to a student's sections is an index lookup. All start empty,
+which leaves every test and resource open to every student.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-07-08 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('section',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('section_membership',
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['section_id'], ['section.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('section_id', 'user_id')
+    )
+    op.create_index('ix_section_membership_user_section', 'section_membership', ['user_id', 'section_id'])
+    op.create_table('section_test',
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['section_id'], ['section.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('section_id', 'test_id')
+    )
+    op.create_index('ix_section_test_test_section', 'section_test', ['test_id', 'section_id'])
+    op.create_table('section_resource',
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['resource_id'], ['learning_resource.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['section_id'], ['section.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('section_id', 'resource_id')
+    )
+    op.create_index('ix_section_resource_resource_section', 'section_resource', ['resource_id', 'section_id'])
+
+
+def downgrade():
+    op.drop_index('ix_section_resource_resource_section', table_name='section_resource')
+    op.drop_table('section_resource')
+    op.drop_index('ix_section_test_test_section', table_name='section_test')
+    op.drop_table('section_test')
+    op.drop_index('ix_section_membership_user_section', table_name='section_membership')
+    op.drop_table('section_membership')
+    op.drop_table('section')
@@ -0,0 +1,45 @@
+"""Test windows
+
+test.opens_at and test.closes_at bound when a test can be taken;
+section_test.opens_at and closes_at override them for one section (see
+availability.py). Both are indexed on the opening time so the opening-soon
+lists are range scans. Existing tests get no window and stay open.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-07-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('opens_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('closes_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_test_window', ['opens_at', 'closes_at'], unique=False)
+
+    with op.batch_alter_table('section_test', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('opens_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('closes_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_section_test_opens_at', ['opens_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('section_test', schema=None) as batch_op:
+        batch_op.drop_index('ix_section_test_opens_at')
+        batch_op.drop_column('closes_at')
+        batch_op.drop_column('opens_at')
+
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_window')
+        batch_op.drop_column('closes_at')
+        batch_op.drop_column('opens_at')
@@ -0,0 +1,30 @@
+"""Security log on the attempt
+
+Security violations used to be kept in the student's session until submit.
+They are now buffered and written onto the attempt with its heartbeats (see
+telemetry.py), so auto-submitted results keep them too.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2025-07-22 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('security_log', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_column('security_log')
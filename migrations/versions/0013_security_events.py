@@ -0,0 +1,107 @@
+"""Security events
+
+security_event holds one row per security violation, indexed by attempt,
+by test and type, and by student (see security_events.py). The logs kept on
+test_attempt.security_log move into it and the column is dropped. Those
+entries only had the page's timestamp, so their occurred_at is the
+attempt's last heartbeat (or its start).
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2025-07-29 00:00:00
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+LOG_LIMIT = 100  # Entries the old column kept
+
+attempt_table = sa.table('test_attempt', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                         sa.column('test_id', sa.Integer), sa.column('started_at', sa.DateTime),
+                         sa.column('last_heartbeat', sa.DateTime), sa.column('security_log', sa.Text))
+
+event_table = sa.table('security_event', sa.column('id', sa.Integer), sa.column('attempt_id', sa.Integer),
+                       sa.column('user_id', sa.Integer), sa.column('test_id', sa.Integer),
+                       sa.column('event_type', sa.String), sa.column('occurred_at', sa.DateTime),
+                       sa.column('client_time', sa.String), sa.column('total_violations', sa.Integer))
+
+
+def upgrade():
+    op.create_table('security_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('attempt_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('client_time', sa.String(length=40), nullable=True),
+        sa.Column('total_violations', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['attempt_id'], ['test_attempt.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_security_event_attempt', 'security_event', ['attempt_id', 'occurred_at'])
+    op.create_index('ix_security_event_test_type', 'security_event', ['test_id', 'event_type', 'occurred_at'])
+    op.create_index('ix_security_event_user', 'security_event', ['user_id', 'occurred_at'])
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        attempts = bind.execute(sa.select(attempt_table)
+                                .where(attempt_table.c.id > last_id, attempt_table.c.security_log.isnot(None))
+                                .order_by(attempt_table.c.id).limit(BATCH_SIZE)).all()
+        if not attempts:
+            break
+        events = []
+        for attempt in attempts:
+            for entry in json.loads(attempt.security_log or '[]'):
+                timestamp = entry.get('timestamp')
+                events.append({
+                    'attempt_id': attempt.id,
+                    'user_id': attempt.user_id,
+                    'test_id': attempt.test_id,
+                    'event_type': str(entry.get('type') or 'unknown')[:50],
+                    'occurred_at': attempt.last_heartbeat or attempt.started_at,
+                    'client_time': str(timestamp)[:40] if timestamp is not None else None,
+                    'total_violations': None,
+                })
+        if events:
+            bind.execute(event_table.insert(), events)
+        last_id = attempts[-1].id
+
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_column('security_log')
+
+
+def downgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('security_log', sa.Text(), nullable=True))
+
+    # Back into each attempt's log, the latest LOG_LIMIT entries as the column kept them
+    bind = op.get_bind()
+    logs = {}
+    for event in bind.execute(sa.select(event_table.c.attempt_id, event_table.c.event_type,
+                                        event_table.c.client_time, event_table.c.test_id)
+                              .order_by(event_table.c.attempt_id, event_table.c.occurred_at, event_table.c.id)):
+        logs.setdefault(event.attempt_id, []).append(
+            {'type': event.event_type, 'timestamp': event.client_time, 'test_id': event.test_id})
+    rows = [{'attempt_id': attempt_id, 'log': json.dumps(entries[-LOG_LIMIT:])} for attempt_id, entries in logs.items()]
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(attempt_table.update().where(attempt_table.c.id == sa.bindparam('attempt_id'))
+                     .values(security_log=sa.bindparam('log')), rows[start:start + BATCH_SIZE])
+
+    op.drop_index('ix_security_event_user', table_name='security_event')
+    op.drop_index('ix_security_event_test_type', table_name='security_event')
+    op.drop_index('ix_security_event_attempt', table_name='security_event')
+    op.drop_table('security_event')
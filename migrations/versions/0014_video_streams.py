@@ -0,0 +1,48 @@
+"""Video streams
+
+resource_file gets the state of its HLS stream (see transcoding.py): status,
+master playlist path and last error, indexed on the status so the worker
+finds pending videos without a scan. updated_at lets the fragment cache see
+a stream becoming ready. Videos uploaded before this are queued for
+transcoding; their uploaded files keep playing until then.
+
+Downgrading leaves the stream files in learning_resources/streams.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2025-08-05 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+file_table = sa.table('resource_file', sa.column('file_type', sa.String), sa.column('stream_status', sa.String),
+                      sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+
+
+def upgrade():
+    with op.batch_alter_table('resource_file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stream_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('stream_path', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('stream_error', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_resource_file_stream_status', ['stream_status'], unique=False)
+
+    op.execute(file_table.update().values(updated_at=file_table.c.created_at))
+    op.execute(file_table.update().where(file_table.c.file_type == 'video').values(stream_status='pending'))
+
+
+def downgrade():
+    with op.batch_alter_table('resource_file', schema=None) as batch_op:
+        batch_op.drop_index('ix_resource_file_stream_status')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('stream_error')
+        batch_op.drop_column('stream_path')
+        batch_op.drop_column('stream_status')
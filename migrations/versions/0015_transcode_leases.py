@@ -0,0 +1,39 @@
+"""Transcode leases
+
+resource_file records which worker is transcoding a video (its stream
+directory name) and when it last renewed that claim, so a worker only
+takes over videos whose claim expired instead of every 'processing' one.
+Videos left 'processing' by an older version are queued again.
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2025-08-12 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+file_table = sa.table('resource_file', sa.column('stream_status', sa.String))
+
+
+def upgrade():
+    with op.batch_alter_table('resource_file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stream_claim', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('stream_claimed_at', sa.DateTime(), nullable=True))
+
+    # Their claim is unknown; the stream directories they left are .tmp and never served
+    op.execute(file_table.update().where(file_table.c.stream_status == 'processing')
+               .values(stream_status='pending'))
+
+
+def downgrade():
+    with op.batch_alter_table('resource_file', schema=None) as batch_op:
+        batch_op.drop_column('stream_claimed_at')
+        batch_op.drop_column('stream_claim')
@@ -2,18 +2,19 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from compressed_columns import CompressedText
 
 db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     student_id = db.Column(db.String(50), unique=True, nullable=True)  # New field
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
     role = db.Column(db.String(20), default='student')  # 'admin' or 'student'
-      # Add relationship to results with cascade delete
-    results = db.relationship('Result', backref='user', lazy=True, cascade='all, delete-orphan')
+      # Add relationship to results with cascade delete (run by the database, see ondelete)
+    results = db.relationship('Result', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -23,33 +24,75 @@ class User(UserMixin, db.Model):
 
 class Result(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
     score = db.Column(db.Float, nullable=False)
-    date_taken = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    raw_data = db.Column(db.Text)  # Store JSON or other structured data
+    date_taken = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    raw_data = db.deferred(db.Column(CompressedText))  # Graded answers as JSON, see compressed_columns
+
+    archived = False  # See ArchivedResult
+
+    __table_args__ = (
+        # One result per student per test; also serves every user_id lookup
+        db.Index('uq_result_user_test', 'user_id', 'test_id', unique=True),
+        # Per-test score ordering backs the dashboard medians and ranked result lists
+        db.Index('ix_result_test_score', 'test_id', 'score'),
+        # Archived results keep their ids, so SQLite must never hand them out again
+        {'sqlite_autoincrement': True},
+    )
+
+class ArchivedResult(db.Model):
+    """A result moved out of the result table by `db_manage.py archive`"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The id it had as a Result, so links keep working
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    date_taken = db.Column(db.DateTime, nullable=False)
+    raw_data = db.deferred(db.Column(CompressedText))  # Copied from the result as stored
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    archived = True
+
+    user = db.relationship('User')
+    test = db.relationship('Test')
+
+    __table_args__ = (db.Index('uq_archived_result_user_test', 'user_id', 'test_id', unique=True),)
+
+class CompressionDictionary(db.Model):
+    """Preset zlib dictionary for the raw_data of one test's results"""
+    id = db.Column(db.Integer, primary_key=True)  # Stored in every value compressed with it
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False, unique=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Values name their dictionary by id, so ids must never be handed out twice
+    __table_args__ = ({'sqlite_autoincrement': True},)
 
 class Test(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     time_limit = db.Column(db.Integer, nullable=False)  # Time limit in minutes
-    learning_resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id'), nullable=True)  # Link to learning resource
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    learning_resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id', ondelete='SET NULL'), nullable=True)  # Link to learning resource
+    opens_at = db.Column(db.DateTime, nullable=True)  # UTC; open from creation when empty
+    closes_at = db.Column(db.DateTime, nullable=True)  # UTC; never closes when empty
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_test_window', 'opens_at', 'closes_at'),)
     
     # Add relationship to questions with cascade delete
-    questions = db.relationship('Question', backref='test', lazy=True, cascade='all, delete-orphan')
+    questions = db.relationship('Question', backref='test', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     # Add relationship to results with cascade delete
-    results = db.relationship('Result', backref='test', lazy=True, cascade='all, delete-orphan')
+    results = db.relationship('Result', backref='test', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Test {self.title}>'
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False, index=True)
     question_text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(20), nullable=False)  # 'multiple_choice', 'identification', or 'image'
     choices = db.Column(db.Text)  # Stored as JSON for multiple-choice questions
@@ -73,11 +116,14 @@ class LearningResource(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    # Resource lists always filter on is_active and sort newest first
+    __table_args__ = (db.Index('ix_learning_resource_active_created', 'is_active', 'created_at'),)
+    
     # Relationship to tests (one resource can have multiple linked tests)
-    linked_tests = db.relationship('Test', backref='learning_resource', lazy=True)
+    linked_tests = db.relationship('Test', backref='learning_resource', lazy=True, passive_deletes=True)
     
     # Relationship to multiple files
-    files = db.relationship('ResourceFile', backref='resource', lazy=True, cascade='all, delete-orphan')
+    files = db.relationship('ResourceFile', backref='resource', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<LearningResource {self.title}>'
@@ -93,15 +139,25 @@ class ResourceFile(db.Model):
     mime_type = db.Column(db.String(100))
     duration = db.Column(db.Integer)  # Duration in seconds for videos
     upload_order = db.Column(db.Integer, default=0)  # Order of files in the resource
+    # Adaptive streaming of videos (see transcoding.py)
+    stream_status = db.Column(db.String(20))  # 'pending', 'processing', 'ready' or 'failed'; None for other files
+    stream_path = db.Column(db.String(500))  # Master playlist, relative to LEARNING_RESOURCES_FOLDER
+    stream_error = db.Column(db.String(500))
+    stream_claim = db.Column(db.String(50))  # Stream directory name of the worker transcoding it
+    stream_claimed_at = db.Column(db.DateTime)  # Renewed while transcoding; expired means the worker died
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_resource_file_resource_order', 'resource_id', 'upload_order'),
+                      db.Index('ix_resource_file_stream_status', 'stream_status'))
     
     def __repr__(self):
         return f'<ResourceFile {self.filename}>'
 
 class StudentProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id', ondelete='CASCADE'), nullable=False, index=True)
     progress_percentage = db.Column(db.Float, default=0.0)  # 0-100
     last_position = db.Column(db.Integer, default=0)  # For video playback position
     completed = db.Column(db.Boolean, default=False)
@@ -111,3 +167,148 @@ class StudentProgress(db.Model):
     
     # Composite unique constraint
     __table_args__ = (db.UniqueConstraint('user_id', 'resource_id', name='unique_user_resource'),)
+
+class TestAttempt(db.Model):
+    """Server-side record of a single timed test attempt"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False)  # started_at + test.time_limit
+    status = db.Column(db.String(20), default='active', nullable=False)  # 'active', 'submitting', 'submitted', 'expired'
+    answers = db.Column(db.Text)  # Autosaved answers stored as JSON {question_id: answer}
+    last_saved_at = db.Column(db.DateTime)
+    last_heartbeat = db.Column(db.DateTime)
+    security_violations = db.Column(db.Integer, default=0)
+    tab_switches = db.Column(db.Integer, default=0)
+    fullscreen_exits = db.Column(db.Integer, default=0)
+    submitted_at = db.Column(db.DateTime)
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id', ondelete='SET NULL'), nullable=True)
+
+    # The sweeper only ever reads active attempts ordered by deadline,
+    # so this index keeps each tick proportional to the expired attempts
+    __table_args__ = (
+        db.Index('ix_test_attempt_status_deadline', 'status', 'deadline'),
+        db.Index('ix_test_attempt_user_test', 'user_id', 'test_id'),
+    )
+
+    def remaining_seconds(self, now=None):
+        now = now or datetime.utcnow()
+        return max(0, int((self.deadline - now).total_seconds()))
+
+    def __repr__(self):
+        return f'<TestAttempt {self.id} user={self.user_id} test={self.test_id} {self.status}>'
+
+class SecurityEvent(db.Model):
+    """One security violation during an attempt; rows are only ever inserted (see security_events.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('test_attempt.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)  # 'tab_switch', 'window_blur', 'keyboard_c', ...
+    occurred_at = db.Column(db.DateTime, nullable=False)  # When the server received it
+    client_time = db.Column(db.String(40))  # The page's own timestamp, as sent
+    total_violations = db.Column(db.Integer)  # The page's running count at the time
+
+    # Timelines read one attempt, admin queries one test (often one type) or one student
+    __table_args__ = (
+        db.Index('ix_security_event_attempt', 'attempt_id', 'occurred_at'),
+        db.Index('ix_security_event_test_type', 'test_id', 'event_type', 'occurred_at'),
+        db.Index('ix_security_event_user', 'user_id', 'occurred_at'),
+    )
+
+    def __repr__(self):
+        return f'<SecurityEvent {self.event_type} attempt={self.attempt_id}>'
+
+class TestAnalytics(db.Model):
+    """Precomputed learning-to-score statistics for one test, see analytics.py"""
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id', ondelete='SET NULL'))  # Linked resource when computed
+    stale = db.Column(db.Boolean, default=True, nullable=False)  # Set by result and progress events
+    students = db.Column(db.Integer, default=0, nullable=False)
+    # Students who completed the linked resource, and everybody else (not_opened are among them)
+    completed_students = db.Column(db.Integer, default=0, nullable=False)
+    completed_average = db.Column(db.Float)
+    completed_histogram = db.Column(db.Text)  # JSON, ten score ranges like the dashboard chart
+    other_students = db.Column(db.Integer, default=0, nullable=False)
+    other_average = db.Column(db.Float)
+    other_histogram = db.Column(db.Text)
+    not_opened_students = db.Column(db.Integer, default=0, nullable=False)
+    time_spent_quantiles = db.Column(db.Text)  # JSON {"p25": seconds, ...} of students who opened the resource
+    time_score_correlation = db.Column(db.Float)  # Pearson r of time spent and score
+    at_risk_students = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime)
+
+    test = db.relationship('Test')
+    resource = db.relationship('LearningResource')
+
+class AtRiskStudent(db.Model):
+    """A student who failed a test without completing its learning resource"""
+    id = db.Column(db.Integer, primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    progress_percentage = db.Column(db.Float)  # None: never opened the resource
+    time_spent = db.Column(db.Integer)
+
+    user = db.relationship('User')
+
+    __table_args__ = (db.Index('uq_at_risk_student_test_user', 'test_id', 'user_id', unique=True),)
+
+class StudentSummary(db.Model):
+    """Cached score aggregates of one student's results, see student_summary.py"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    stale = db.Column(db.Boolean, default=True, nullable=False)  # Set when a result is added or removed
+    tests_taken = db.Column(db.Integer, default=0, nullable=False)  # Current and archived results
+    score_total = db.Column(db.Float, default=0.0, nullable=False)
+    highest_score = db.Column(db.Float)
+    lowest_score = db.Column(db.Float)
+    excellent_count = db.Column(db.Integer, default=0, nullable=False)  # 90-100
+    good_count = db.Column(db.Integer, default=0, nullable=False)  # 70-89
+    fair_count = db.Column(db.Integer, default=0, nullable=False)  # 50-69
+    poor_count = db.Column(db.Integer, default=0, nullable=False)  # Below 50
+    last_taken = db.Column(db.DateTime)
+    computed_at = db.Column(db.DateTime)
+
+    @property
+    def average_score(self):
+        return self.score_total / self.tests_taken if self.tests_taken else 0
+
+class Section(db.Model):
+    """A class of students with its teachers, tests and resources, see sections.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Also bumped when members or assignments change
+
+    def __repr__(self):
+        return f'<Section {self.name}>'
+
+class SectionMembership(db.Model):
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    role = db.Column(db.String(20), default='student', nullable=False)  # 'student' or 'teacher'
+
+    user = db.relationship('User')
+
+    # The primary key serves a section's roster; this serves a user's sections
+    __table_args__ = (db.Index('ix_section_membership_user_section', 'user_id', 'section_id'),)
+
+class SectionTest(db.Model):
+    """A test assigned to a section; tests without any are open to every student"""
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), primary_key=True)
+    # Overrides of the test's window for this section; empty keeps the test's own
+    opens_at = db.Column(db.DateTime, nullable=True)
+    closes_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_section_test_test_section', 'test_id', 'section_id'),
+                      db.Index('ix_section_test_opens_at', 'opens_at'))
+
+class SectionResource(db.Model):
+    """A learning resource assigned to a section; unassigned resources are open to every student"""
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('learning_resource.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (db.Index('ix_section_resource_resource_section', 'resource_id', 'section_id'),)
@@ -0,0 +1,107 @@
+"""
+Keyset Pagination
+=================
+
+Admin lists (users, results, tests) are paged by keyset instead of OFFSET:
+each page remembers the (sort value, id) of its last row in an opaque cursor,
+and the next page starts strictly after it. With an index on the sort column
+every page costs the same no matter how deep into the list it is.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid pagination cursor')
+
+
+def keyset_paginate(query, sort_column, id_column, descending=False, cursor=None, limit=25, row_key=None):
+    """Return (rows, next_cursor) for one page of query.
+
+    sort_column is the column the list is ordered by; id_column breaks ties so
+    the order is total. row_key(row) must return (sort_value, id) for a row and
+    defaults to reading both attributes off the row itself. NULLs in a
+    nullable sort column come after every value (before them when descending).
+    """
+    nullable = getattr(sort_column.expression, 'nullable', False)
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query = query.filter(_after(sort_column, id_column, last_value, last_id, descending, nullable))
+
+    if descending:
+        order = [sort_column.desc(), id_column.desc()]
+    else:
+        order = [sort_column.asc(), id_column.asc()]
+    if nullable:
+        # NULL sorts first in SQLite and last in PostgreSQL; pin it explicitly
+        is_null = sort_column.is_(None)
+        order.insert(0, is_null.desc() if descending else is_null.asc())
+    query = query.order_by(*order)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    if row_key is None:
+        row_key = lambda row: (getattr(row, sort_column.key), getattr(row, id_column.key))
+    return rows, encode_cursor(*row_key(rows[-1]))
+
+
+def _after(sort_column, id_column, last_value, last_id, descending, nullable):
+    """The rows that come strictly after (last_value, last_id) in list order"""
+    if last_value is None:
+        # Within the NULL block only the id orders rows
+        if descending:
+            return or_(sort_column.isnot(None), and_(sort_column.is_(None), id_column < last_id))
+        return and_(sort_column.is_(None), id_column > last_id)
+
+    if descending:
+        return or_(sort_column < last_value, and_(sort_column == last_value, id_column < last_id))
+    after = or_(sort_column > last_value, and_(sort_column == last_value, id_column > last_id))
+    return or_(after, sort_column.is_(None)) if nullable else after
+
+
+def page_args(request, sort_options, default_sort, default_order='asc', default_limit=25, max_limit=100):
+    """Parse sort/order/cursor/limit query arguments shared by the list endpoints"""
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_options:
+        sort = default_sort
+    order = request.args.get('order', default_order)
+    descending = order == 'desc'
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        limit = default_limit
+    limit = max(1, min(limit, max_limit))
+    return sort, descending, request.args.get('cursor') or None, limit
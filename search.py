@@ -0,0 +1,285 @@
+"""
+Full-Text Search
+================
+
+SQLite FTS5 indexes over the question bank and the learning resource library.
+
+- question_fts is an external-content index on question(question_text, choices),
+  kept in sync by triggers, so every insert/update/delete through the ORM or
+  through bulk SQL is reflected immediately.
+- learning_resource_fts holds title and description (also trigger-maintained)
+  plus file_text, the text extracted from a resource's PDF and text files.
+  Extraction is slow, so it is done by index_resource_text in the background
+  after an upload instead of inside the request.
+
+Databases without FTS5 (or non-SQLite backends) fall back to LIKE matching.
+"""
+
+import html
+import os
+import re
+
+from sqlalchemy import inspect, text
+
+from models import db, LearningResource, ResourceFile
+
+MAX_FILE_TEXT_LENGTH = 200000  # Characters of extracted text kept per resource
+
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5(
+        question_text, choices,
+        content='question', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS question_fts_ai AFTER INSERT ON question BEGIN
+        INSERT INTO question_fts(rowid, question_text, choices)
+        VALUES (new.id, new.question_text, coalesce(new.choices, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS question_fts_ad AFTER DELETE ON question BEGIN
+        INSERT INTO question_fts(question_fts, rowid, question_text, choices)
+        VALUES ('delete', old.id, old.question_text, coalesce(old.choices, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS question_fts_au AFTER UPDATE OF question_text, choices ON question BEGIN
+        INSERT INTO question_fts(question_fts, rowid, question_text, choices)
+        VALUES ('delete', old.id, old.question_text, coalesce(old.choices, ''));
+        INSERT INTO question_fts(rowid, question_text, choices)
+        VALUES (new.id, new.question_text, coalesce(new.choices, ''));
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS learning_resource_fts USING fts5(
+        title, description, file_text,
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS learning_resource_fts_ai AFTER INSERT ON learning_resource BEGIN
+        INSERT INTO learning_resource_fts(rowid, title, description, file_text)
+        VALUES (new.id, new.title, coalesce(new.description, ''), '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS learning_resource_fts_ad AFTER DELETE ON learning_resource BEGIN
+        DELETE FROM learning_resource_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS learning_resource_fts_au AFTER UPDATE OF title, description ON learning_resource BEGIN
+        UPDATE learning_resource_fts SET title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END""",
+]
+
+DROP_DDL = [
+    'DROP TRIGGER IF EXISTS learning_resource_fts_au',
+    'DROP TRIGGER IF EXISTS learning_resource_fts_ad',
+    'DROP TRIGGER IF EXISTS learning_resource_fts_ai',
+    'DROP TABLE IF EXISTS learning_resource_fts',
+    'DROP TRIGGER IF EXISTS question_fts_au',
+    'DROP TRIGGER IF EXISTS question_fts_ad',
+    'DROP TRIGGER IF EXISTS question_fts_ai',
+    'DROP TABLE IF EXISTS question_fts',
+]
+
+
+def install_search_index(connection):
+    """Create the FTS tables and triggers and backfill them from existing rows.
+
+    Safe to run more than once. Does nothing on non-SQLite backends.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+
+    already_installed = inspect(connection).has_table('question_fts')
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+
+    if not already_installed:
+        connection.execute(text("INSERT INTO question_fts(question_fts) VALUES ('rebuild')"))
+        connection.execute(text(
+            "INSERT INTO learning_resource_fts(rowid, title, description, file_text) "
+            "SELECT id, title, coalesce(description, ''), '' FROM learning_resource"
+        ))
+    return True
+
+
+def uninstall_search_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in DROP_DDL:
+        connection.execute(text(statement))
+
+
+def search_available():
+    bind = db.session.get_bind()
+    return bind.dialect.name == 'sqlite' and inspect(bind).has_table('question_fts')
+
+
+def like_operator():
+    """Case-insensitive LIKE for the fallback search (SQLite's LIKE already is)"""
+    return 'ILIKE' if db.session.get_bind().dialect.name == 'postgresql' else 'LIKE'
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms[:20])
+
+
+def _highlight(snippet):
+    # Snippets come back with \x02/\x03 around matches; escape everything else
+    return html.escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def _with_snippets(rows, fts_table, column, match):
+    """Replace each row's snippet with a highlighted FTS snippet.
+
+    Snippets are computed in a second query restricted to the rowids of the
+    page, which is far cheaper than generating one for every match.
+    """
+    if not rows:
+        return rows
+    ids = [row['id'] for row in rows]
+    placeholders = ', '.join(f':id{i}' for i in range(len(ids)))
+    params = {f'id{i}': row_id for i, row_id in enumerate(ids)}
+    params['match'] = match
+    snippets = dict(db.session.execute(text(f"""
+        SELECT rowid, snippet({fts_table}, {column}, char(2), char(3), '...', 16)
+        FROM {fts_table}
+        WHERE {fts_table} MATCH :match AND rowid IN ({placeholders})
+    """), params).all())
+    return [dict(row, snippet=snippets.get(row['id']) or row['snippet']) for row in rows]
+
+
+def search_questions(query, page=1, per_page=20):
+    """Ranked question search. Returns (items, has_more)"""
+    match = build_match_query(query)
+    if not match:
+        return [], False
+    offset = (page - 1) * per_page
+
+    if search_available():
+        # Rank inside FTS first and only join/snippet the rows of this page
+        rows = db.session.execute(text("""
+            SELECT q.id, q.test_id, q.question_type, t.title AS test_title,
+                   m.rank, q.question_text AS snippet
+            FROM (SELECT rowid, rank FROM question_fts
+                  WHERE question_fts MATCH :match
+                  ORDER BY rank LIMIT :limit OFFSET :offset) m
+            JOIN question q ON q.id = m.rowid
+            JOIN test t ON t.id = q.test_id
+            ORDER BY m.rank
+        """), {'match': match, 'limit': per_page + 1, 'offset': offset}).mappings().all()
+        rows = _with_snippets(rows, 'question_fts', 0, match)
+    else:
+        rows = db.session.execute(text(f"""
+            SELECT q.id, q.test_id, q.question_type, t.title AS test_title,
+                   q.question_text AS snippet, 0 AS rank
+            FROM question q JOIN test t ON t.id = q.test_id
+            WHERE q.question_text {like_operator()} :pattern OR q.choices {like_operator()} :pattern
+            ORDER BY q.id DESC
+            LIMIT :limit OFFSET :offset
+        """), {'pattern': f'%{query.strip()}%', 'limit': per_page + 1, 'offset': offset}).mappings().all()
+
+    items = [{
+        'id': row['id'],
+        'test_id': row['test_id'],
+        'test_title': row['test_title'],
+        'question_type': row['question_type'],
+        'snippet': _highlight(row['snippet']),
+        'rank': row['rank']
+    } for row in rows[:per_page]]
+    return items, len(rows) > per_page
+
+
+def search_resources(query, page=1, per_page=20, active_only=True, visible_to=None):
+    """Ranked resource search over title, description and file text.
+
+    visible_to limits the results to the resources open to that student's
+    sections (see sections.py).
+    """
+    match = build_match_query(query)
+    if not match:
+        return [], False
+    offset = (page - 1) * per_page
+    filters = 'AND r.is_active = :active' if active_only else ''
+    if visible_to is not None:
+        filters += """
+              AND (NOT EXISTS (SELECT 1 FROM section_resource sr WHERE sr.resource_id = r.id)
+                   OR EXISTS (SELECT 1 FROM section_resource sr
+                              JOIN section_membership sm ON sm.section_id = sr.section_id
+                              WHERE sr.resource_id = r.id AND sm.user_id = :user_id))"""
+
+    if search_available():
+        # Title matches weigh most, then description, then file text
+        rows = db.session.execute(text(f"""
+            SELECT r.id, r.title, r.resource_type, m.rank, coalesce(r.description, '') AS snippet
+            FROM (SELECT rowid, bm25(learning_resource_fts, 10.0, 4.0, 1.0) AS rank
+                  FROM learning_resource_fts
+                  WHERE learning_resource_fts MATCH :match
+                  ORDER BY rank) m
+            JOIN learning_resource r ON r.id = m.rowid
+            WHERE 1 = 1 {filters}
+            ORDER BY m.rank
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'active': True, 'user_id': visible_to, 'limit': per_page + 1, 'offset': offset}).mappings().all()
+        rows = _with_snippets(rows, 'learning_resource_fts', -1, match)
+    else:
+        rows = db.session.execute(text(f"""
+            SELECT r.id, r.title, r.resource_type, coalesce(r.description, '') AS snippet, 0 AS rank
+            FROM learning_resource r
+            WHERE (r.title {like_operator()} :pattern OR r.description {like_operator()} :pattern) {filters}
+            ORDER BY r.created_at DESC
+            LIMIT :limit OFFSET :offset
+        """), {'pattern': f'%{query.strip()}%', 'active': True, 'user_id': visible_to,
+              'limit': per_page + 1, 'offset': offset}).mappings().all()
+
+    items = [{
+        'id': row['id'],
+        'title': row['title'],
+        'resource_type': row['resource_type'],
+        'snippet': _highlight(row['snippet']),
+        'rank': row['rank']
+    } for row in rows[:per_page]]
+    return items, len(rows) > per_page
+
+
+def extract_file_text(path, file_type):
+    """Best-effort plain text from a PDF or text file"""
+    try:
+        if file_type == 'pdf':
+            try:
+                from pypdf import PdfReader  # Imported on first use; slow to load
+            except ImportError:  # PDF text is simply not indexed without pypdf
+                return ''
+            reader = PdfReader(path)
+            return '\n'.join(page.extract_text() or '' for page in reader.pages)
+        if path.lower().endswith('.txt'):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read(MAX_FILE_TEXT_LENGTH)
+    except Exception:
+        pass
+    return ''
+
+
+def index_resource_text(app, resource_id):
+    """Extract text from a resource's files into learning_resource_fts.
+
+    Runs outside the request (see app.executor), so it opens its own context.
+    """
+    with app.app_context():
+        try:
+            if not search_available():
+                return
+            resource = db.session.get(LearningResource, resource_id)
+            if resource is None:
+                return
+
+            parts = []
+            files = ResourceFile.query.filter_by(resource_id=resource_id).order_by(ResourceFile.upload_order).all()
+            for resource_file in files:
+                path = os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], resource_file.filename)
+                parts.append(extract_file_text(path, resource_file.file_type))
+            file_text = '\n'.join(part for part in parts if part)[:MAX_FILE_TEXT_LENGTH]
+
+            db.session.execute(text(
+                'UPDATE learning_resource_fts SET file_text = :file_text WHERE rowid = :id'
+            ), {'file_text': file_text, 'id': resource_id})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'Search indexing failed for resource {resource_id}: {str(e)}')
+        finally:
+            db.session.remove()
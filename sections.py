@@ -0,0 +1,164 @@
+"""
+Sections
+========
+
+A section is a class of students taught by one or more teachers (admins),
+with the tests and learning resources assigned to it. Memberships and
+assignments are plain link tables keyed for both directions of lookup, so
+every scoped query is an indexed join instead of a scan of the school's
+tables.
+
+Students see the tests and resources assigned to any of their sections,
+plus everything assigned to no section at all, which stays open to the
+whole school. A school that never creates a section works as before.
+
+Admins see the whole school by default, or pick a section on the
+dashboard: its users are the section's members, its tests the ones assigned
+to it, and its results its students' results on those tests.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, distinct, func, or_, select, update
+
+from backends import upsert
+from models import (db, User, Result, Test, LearningResource, ResourceFile, Section, SectionMembership, SectionTest,
+                    SectionResource)
+
+
+def _open_to(assignment, key, column, user_id):
+    """Filter for rows assigned to no section or to one of the user's sections"""
+    assigned = select(assignment.section_id).where(key == column)
+    shared = assigned.join(SectionMembership, SectionMembership.section_id == assignment.section_id) \
+        .where(SectionMembership.user_id == user_id)
+    return or_(~assigned.exists(), shared.exists())
+
+
+def visible_test_filter(user_id):
+    return _open_to(SectionTest, SectionTest.test_id, Test.id, user_id)
+
+
+def visible_resource_filter(user_id):
+    return _open_to(SectionResource, SectionResource.resource_id, LearningResource.id, user_id)
+
+
+def visible_tests(user_id):
+    return Test.query.filter(visible_test_filter(user_id))
+
+
+def can_take_test(user_id, test_id):
+    return db.session.query(Test.id).filter(Test.id == test_id, visible_test_filter(user_id)).first() is not None
+
+
+def can_view_resource(user_id, resource_id):
+    return db.session.query(LearningResource.id).filter(
+        LearningResource.id == resource_id, visible_resource_filter(user_id)).first() is not None
+
+
+def can_view_resource_file(user_id, filename):
+    """Whether the user can see the resource an uploaded file belongs to (a ResourceFile or a legacy path)"""
+    owners = or_(LearningResource.id.in_(select(ResourceFile.resource_id).where(ResourceFile.filename == filename)),
+                 LearningResource.file_path.endswith(f'/{filename}', autoescape=True),
+                 LearningResource.thumbnail_path.endswith(f'/{filename}', autoescape=True))
+    return db.session.query(LearningResource.id).filter(owners, visible_resource_filter(user_id)).first() is not None
+
+
+def can_view_stream(user_id, file_id, stream_dir):
+    """Whether the user can see the resource of the video whose stream is in stream_dir (see transcoding.py)"""
+    owner = select(ResourceFile.resource_id).where(ResourceFile.id == file_id,
+                                                   ResourceFile.stream_path.startswith(stream_dir, autoescape=True))
+    return db.session.query(LearningResource.id).filter(LearningResource.id.in_(owner),
+                                                         visible_resource_filter(user_id)).first() is not None
+
+
+def visible_test_counts(user_ids):
+    """{user_id: number of tests the student can see}, two grouped queries for any number of students"""
+    open_tests = db.session.query(func.count(Test.id)) \
+        .filter(~select(SectionTest.section_id).where(SectionTest.test_id == Test.id).exists()).scalar()
+    assigned = dict(db.session.query(SectionMembership.user_id, func.count(distinct(SectionTest.test_id)))
+                    .join(SectionTest, SectionTest.section_id == SectionMembership.section_id)
+                    .filter(SectionMembership.user_id.in_(user_ids))
+                    .group_by(SectionMembership.user_id))
+    return {user_id: open_tests + assigned.get(user_id, 0) for user_id in user_ids}
+
+
+def scope_users(query, section_id):
+    return query.join(SectionMembership, and_(SectionMembership.user_id == User.id,
+                                              SectionMembership.section_id == section_id))
+
+
+def scope_tests(query, section_id):
+    return query.join(SectionTest, and_(SectionTest.test_id == Test.id, SectionTest.section_id == section_id))
+
+
+def scope_results(query, section_id):
+    """The section's students' results on the section's tests"""
+    return query.join(SectionMembership, and_(SectionMembership.user_id == Result.user_id,
+                                              SectionMembership.section_id == section_id)) \
+        .join(SectionTest, and_(SectionTest.test_id == Result.test_id, SectionTest.section_id == section_id))
+
+
+def section_counts():
+    """{section_id: {'students': n, 'teachers': n, 'tests': n, 'resources': n}}"""
+    counts = {}
+    for section_id, role, count in db.session.query(SectionMembership.section_id, SectionMembership.role,
+                                                    func.count()).group_by(SectionMembership.section_id,
+                                                                           SectionMembership.role):
+        counts.setdefault(section_id, {})[f'{role}s'] = count
+    for model, name in ((SectionTest, 'tests'), (SectionResource, 'resources')):
+        for section_id, count in db.session.query(model.section_id, func.count()).group_by(model.section_id):
+            counts.setdefault(section_id, {})[name] = count
+    return counts
+
+
+def touch(section_id):
+    """Bump the section's version so cached fragments scoped to it are rebuilt"""
+    db.session.execute(update(Section).where(Section.id == section_id).values(updated_at=datetime.utcnow()))
+
+
+def add_members(section_id, identifiers):
+    """Add users by username or student ID; returns (added users, identifiers not found).
+
+    Admins join as teachers, everybody else as students.
+    """
+    identifiers = list(dict.fromkeys(identifier.strip() for identifier in identifiers if identifier.strip()))
+    if not identifiers:
+        return [], []
+    users = User.query.filter(or_(User.username.in_(identifiers), User.student_id.in_(identifiers))).all()
+    found = {user.username for user in users} | {user.student_id for user in users}
+    for user in users:
+        db.session.execute(upsert(SectionMembership, {
+            'section_id': section_id,
+            'user_id': user.id,
+            'role': 'teacher' if user.role == 'admin' else 'student'
+        }, ['section_id', 'user_id']))
+    touch(section_id)
+    return users, [identifier for identifier in identifiers if identifier not in found]
+
+
+# URL name -> link table and the column it links
+ASSIGNMENTS = {
+    'tests': (SectionTest, 'test_id'),
+    'resources': (SectionResource, 'resource_id'),
+}
+
+
+def assign(kind, section_id, ids):
+    """Assign tests or resources (see ASSIGNMENTS) to the section"""
+    model, key = ASSIGNMENTS[kind]
+    for item_id in ids:
+        db.session.execute(upsert(model, {'section_id': section_id, key: item_id}, ['section_id', key]))
+    touch(section_id)
+
+
+def unassign(kind, section_id, item_id):
+    model, key = ASSIGNMENTS[kind]
+    db.session.query(model).filter(model.section_id == section_id, getattr(model, key) == item_id) \
+        .delete(synchronize_session=False)
+    touch(section_id)
+
+
+def remove_member(section_id, user_id):
+    db.session.query(SectionMembership).filter(SectionMembership.section_id == section_id,
+                                               SectionMembership.user_id == user_id).delete(synchronize_session=False)
+    touch(section_id)
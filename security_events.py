@@ -0,0 +1,108 @@
+"""
+Security Events
+===============
+
+Every security violation an exam page reports (a tab switch, a blocked
+shortcut, leaving fullscreen, closing the page) becomes one SecurityEvent
+row: attempt, student, test, type, and the time the server received it. The
+rows are only ever inserted, in batches by the telemetry writer (see
+telemetry.py), and indexed by attempt, by test and type, and by student, so:
+
+- result.html shows the attempt's full timeline, however long, while the
+  result itself only keeps the counters,
+- admins can ask for "every tab switch during test X" or one student's
+  events across tests (api_admin_security_events) without scanning logs.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func, or_
+
+from models import db, SecurityEvent, TestAttempt, User
+
+TIMELINE_LIMIT = 500  # Events shown on a result page
+
+LABELS = {
+    'tab_switch': 'Switched tab',
+    'window_blur': 'Left the window',
+    'fullscreen_exit': 'Exited fullscreen',
+    'right_click': 'Right-clicked',
+    'attempted_exit': 'Tried to leave the page',
+    'navigation_attempt': 'Tried to navigate away',
+    'test_abandoned': 'Closed the test',
+}
+
+
+def event_label(event_type):
+    if event_type.startswith('keyboard_'):
+        return f'Blocked shortcut ({event_type[len("keyboard_"):]})'
+    return LABELS.get(event_type, event_type.replace('_', ' ').capitalize())
+
+
+def new_event(attempt_id, user_id, test_id, event_type, client_time=None, total_violations=None, now=None):
+    """The row for one reported violation, cleaned of whatever the page sent"""
+    return {
+        'attempt_id': attempt_id,
+        'user_id': user_id,
+        'test_id': test_id,
+        'event_type': (str(event_type) if event_type else 'unknown')[:50],
+        'occurred_at': now or datetime.utcnow(),
+        'client_time': str(client_time)[:40] if client_time is not None else None,
+        'total_violations': (total_violations if isinstance(total_violations, int) and not isinstance(total_violations, bool)
+                             and 0 <= total_violations < 2 ** 31 else None),
+    }
+
+
+def event_query(test_id=None, user_id=None, attempt_id=None, event_type=None, since=None, until=None):
+    """(SecurityEvent, student name, student ID) rows matching every filter given"""
+    query = db.session.query(SecurityEvent, User.name, User.student_id).join(User, User.id == SecurityEvent.user_id)
+    if test_id is not None:
+        query = query.filter(SecurityEvent.test_id == test_id)
+    if user_id is not None:
+        query = query.filter(SecurityEvent.user_id == user_id)
+    if attempt_id is not None:
+        query = query.filter(SecurityEvent.attempt_id == attempt_id)
+    if event_type:
+        query = query.filter(SecurityEvent.event_type == event_type)
+    if since is not None:
+        query = query.filter(SecurityEvent.occurred_at >= since)
+    if until is not None:
+        query = query.filter(SecurityEvent.occurred_at < until)
+    return query
+
+
+def result_timeline(result, limit=TIMELINE_LIMIT):
+    """(events, started_at, counts) for the attempt graded into a result.
+
+    events are the first `limit` events, oldest first; counts is {event_type:
+    count} over all of them. Archiving a result unlinks its attempt
+    (result_id), so then the student's unlinked finished attempt on the test
+    stands in. Results from before attempts existed have none.
+    """
+    attempt = db.session.query(TestAttempt.id, TestAttempt.started_at) \
+        .filter(TestAttempt.user_id == result.user_id, TestAttempt.test_id == result.test_id,
+                TestAttempt.status != 'active',
+                or_(TestAttempt.result_id == result.id, TestAttempt.result_id.is_(None))) \
+        .order_by(TestAttempt.result_id.is_(None), TestAttempt.submitted_at.desc()).first()
+    if attempt is None:
+        return [], None, {}
+    events = SecurityEvent.query.filter_by(attempt_id=attempt.id) \
+        .order_by(SecurityEvent.occurred_at, SecurityEvent.id).limit(limit).all()
+    if len(events) < limit:
+        counts = {}
+        for event in events:
+            counts[event.event_type] = counts.get(event.event_type, 0) + 1
+    else:
+        counts = dict(db.session.query(SecurityEvent.event_type, func.count(SecurityEvent.id))
+                      .filter_by(attempt_id=attempt.id).group_by(SecurityEvent.event_type))
+    return events, attempt.started_at, counts
+
+
+def test_event_counts(test_id):
+    """{event_type: count} over a test's events"""
+    return dict(db.session.query(SecurityEvent.event_type, func.count(SecurityEvent.id))
+                .filter(SecurityEvent.test_id == test_id).group_by(SecurityEvent.event_type))
+
+
+def init_security_events(app):
+    app.add_template_filter(event_label, 'security_event')
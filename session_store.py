@@ -0,0 +1,365 @@
+"""
+Session Store
+=============
+
+Server-side sessions with a choice of backend (SESSION_BACKEND):
+
+- 'sqlite' (default): one row per session in its own SQLite file
+  (SESSION_SQLITE_PATH, database/sessions.db), so session writes never wait
+  behind exam writes to the main database,
+- 'memory': an in-process LRU of SESSION_MEMORY_MAX_ENTRIES sessions; the
+  fastest, but sessions are lost on restart and not shared between processes,
+- 'filesystem': one file per session in SESSION_FILE_DIR.
+
+Most requests do not change the session, yet many views set
+session.permanent, which marks it modified. The session is therefore
+compared with what was loaded and only written back when its contents
+changed; an unchanged session just has its expiry pushed forward, at most
+once per SESSION_REFRESH_INTERVAL. Expired sessions are deleted by a sweep
+that runs in the background every SESSION_SWEEP_INTERVAL seconds.
+
+Cookies are signed the same way Flask-Session signed them, so switching
+backends only logs people out, it never rejects their cookies. The files
+Flask-Session left in SESSION_FILE_DIR are useless after the switch and
+are removed in the background at startup (remove_legacy_session_files).
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer, want_bytes
+from werkzeug.datastructures import CallbackDict
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    """A session dict that remembers the serialized form it was loaded from"""
+
+    def __init__(self, initial=None, sid=None, loaded=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.loaded = loaded  # Pickled data as stored, None for a new session
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class MemoryStore:
+    """Sessions in an LRU dict, evicting the least recently used when full"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()  # sid -> (expires_at, data)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None:
+                self._sessions.move_to_end(sid)
+            return entry
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._sessions[sid] = (expires_at, data)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid] = (expires_at, self._sessions[sid][1])
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def sweep(self, now):
+        with self._lock:
+            expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SqliteStore:
+    """Sessions as rows of a table in a dedicated SQLite file.
+
+    The threaded server starts a thread per connection, so connections are
+    kept in a small shared pool rather than per thread: a request borrows an
+    open one instead of reconnecting and setting the PRAGMAs again. Up to
+    pool_size idle connections are kept; extra ones made under load are closed.
+    """
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS session '
+                               '(sid TEXT PRIMARY KEY, expires_at REAL NOT NULL, data BLOB NOT NULL) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_session_expires_at ON session (expires_at)')
+
+    def _connect(self):
+        # Autocommit, so a pooled connection never carries an open transaction to its next user
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')  # A lost session is only a login away
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection for one statement"""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+    def load(self, sid):
+        with self._connection() as connection:
+            return connection.execute('SELECT expires_at, data FROM session WHERE sid = ?', (sid,)).fetchone()
+
+    def save(self, sid, data, expires_at):
+        with self._connection() as connection:
+            connection.execute('INSERT INTO session (sid, expires_at, data) VALUES (?, ?, ?) '
+                               'ON CONFLICT (sid) DO UPDATE SET expires_at = excluded.expires_at, '
+                               'data = excluded.data', (sid, expires_at, data))
+
+    def touch(self, sid, expires_at):
+        with self._connection() as connection:
+            connection.execute('UPDATE session SET expires_at = ? WHERE sid = ?', (expires_at, sid))
+
+    def delete(self, sid):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM session WHERE sid = ?', (sid,))
+
+    def sweep(self, now):
+        with self._connection() as connection:
+            return connection.execute('DELETE FROM session WHERE expires_at <= ?', (now,)).rowcount
+
+
+class FileSystemStore:
+    """One file per session: an 8-byte expiry followed by the pickled data"""
+
+    header = struct.Struct('>d')
+    suffix = '.session'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, hashlib.sha256(sid.encode('utf-8')).hexdigest() + self.suffix)
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid), 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        return self.header.unpack_from(content)[0], content[self.header.size:]
+
+    def save(self, sid, data, expires_at):
+        path = self._path(sid)
+        partial = f'{path}.{threading.get_ident()}.tmp'
+        with open(partial, 'wb') as f:
+            f.write(self.header.pack(expires_at) + data)
+        os.replace(partial, path)
+
+    def touch(self, sid, expires_at):
+        try:
+            with open(self._path(sid), 'r+b') as f:
+                f.write(self.header.pack(expires_at))
+        except OSError:
+            pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def sweep(self, now):
+        removed = 0
+        for path in glob.glob(os.path.join(self.directory, '*' + self.suffix)):
+            try:
+                with open(path, 'rb') as f:
+                    expires_at = self.header.unpack(f.read(self.header.size))[0]
+                if expires_at <= now:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, struct.error):
+                continue
+        return removed
+
+
+# What Flask-Session's cachelib FileSystemCache wrote: files named by the md5
+# (or, in newer cachelib, sha256) of the key, its file counter and its partial writes
+_legacy_session_file = re.compile(r'[0-9a-f]{32}|[0-9a-f]{64}|__wz_cache_count|.+\.__wz_cache')
+
+
+def remove_legacy_session_files(directory, logger=None):
+    """Delete the Flask-Session files in directory; returns how many were removed"""
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        if _legacy_session_file.fullmatch(name):
+            try:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+            except OSError:
+                continue
+    if removed and logger:
+        logger.info(f'Removed {removed} old Flask-Session file(s) from {directory}')
+    return removed
+
+
+def create_store(config):
+    backend = config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        return SqliteStore(config.get('SESSION_SQLITE_PATH') or os.path.join(config['DB_DIR'], 'sessions.db'),
+                           config.get('SESSION_SQLITE_POOL_SIZE', 8))
+    if backend == 'memory':
+        return MemoryStore(config.get('SESSION_MEMORY_MAX_ENTRIES', 10000))
+    if backend == 'filesystem':
+        return FileSystemStore(config['SESSION_FILE_DIR'])
+    raise RuntimeError(f'Unknown SESSION_BACKEND "{backend}"; use sqlite, memory or filesystem')
+
+
+class StoreSessionInterface(SessionInterface):
+    """Flask session interface on top of one of the stores above"""
+
+    serializer = pickle
+
+    def __init__(self, store, refresh_interval=300, sweep_interval=600, logger=None):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.sweep_interval = sweep_interval
+        self.logger = logger
+        self._next_sweep = time.time() + sweep_interval
+        self._sweep_lock = threading.Lock()
+        self.writes = 0
+        self.refreshes = 0
+        self.skipped_writes = 0
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='flask-session', key_derivation='hmac')
+
+    def _new_session(self):
+        return StoredSession(sid=str(uuid4()))
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._new_session()
+        try:
+            sid = self._signer(app).unsign(cookie).decode()
+        except BadSignature:
+            return self._new_session()
+
+        entry = self.store.load(sid)
+        if entry is None or entry[0] <= time.time():
+            return StoredSession(sid=sid)
+        expires_at, data = entry
+        data = bytes(data)
+        try:
+            return StoredSession(self.serializer.loads(data), sid=sid, loaded=data, expires_at=expires_at)
+        except Exception:
+            return StoredSession(sid=sid)
+
+    def save_session(self, app, session, response):
+        now = time.time()
+        self._maybe_sweep(now)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.loaded is not None or session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(self.get_cookie_name(app), domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        data = self.serializer.dumps(dict(session), pickle.HIGHEST_PROTOCOL)
+        if data != session.loaded:
+            session.expires_at = now + lifetime
+            self.store.save(session.sid, data, session.expires_at)
+            self.writes += 1
+        elif session.expires_at - now < lifetime - self.refresh_interval:
+            session.expires_at = now + lifetime
+            self.store.touch(session.sid, session.expires_at)
+            self.refreshes += 1
+        else:
+            self.skipped_writes += 1
+            return  # Same data, same expiry: the browser's cookie is still right
+
+        expires = datetime.fromtimestamp(session.expires_at, timezone.utc) if session.permanent else None
+        response.set_cookie(self.get_cookie_name(app), self._signer(app).sign(want_bytes(session.sid)).decode(),
+                            expires=expires,
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+    def _maybe_sweep(self, now):
+        """Delete expired sessions in the background, at most once per interval"""
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        self._next_sweep = now + self.sweep_interval
+        threading.Thread(target=self._background_sweep, name='session-sweep', daemon=True).start()
+
+    def _background_sweep(self):
+        try:
+            self.sweep()
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self, now=None):
+        """Delete expired sessions now; returns how many were removed"""
+        try:
+            removed = self.store.sweep(now or time.time())
+            if removed and self.logger:
+                self.logger.info(f'Removed {removed} expired session(s)')
+            return removed
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f'Session sweep failed: {str(e)}')
+            return 0
+
+
+def init_session_store(app):
+    if not app.secret_key:
+        raise RuntimeError('Server-side sessions need a SECRET_KEY to sign the session cookie')
+    app.session_interface = StoreSessionInterface(
+        create_store(app.config),
+        refresh_interval=app.config.get('SESSION_REFRESH_INTERVAL', 300),
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 600),
+        logger=app.logger)
+    if app.config.get('SESSION_FILE_DIR') and os.path.isdir(app.config['SESSION_FILE_DIR']):
+        threading.Thread(target=remove_legacy_session_files, args=(app.config['SESSION_FILE_DIR'], app.logger),
+                         name='legacy-session-cleanup', daemon=True).start()
+    return app.session_interface
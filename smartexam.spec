@@ -8,14 +8,16 @@ a = Analysis(
     binaries=[],
     datas=[
         ('templates', 'templates'),
-        ('static', 'static'),
-        ('database', 'database')
+        ('static', 'static'),  # Run `python db_manage.py build-assets` first to bundle static/dist
+        ('database', 'database'),
+        ('migrations', 'migrations')
     ],
     hiddenimports=[
         'flask',
         'flask_login',
         'flask_sqlalchemy',
         'flask_migrate',
+        'alembic',
         'werkzeug',
         'jinja2',
         'sqlalchemy',
@@ -0,0 +1,168 @@
+// Global variable to store all selected files
+let selectedFiles = [];
+let currentDataTransfer = new DataTransfer();
+
+// Function to handle file selection
+function handleFileSelection(event) {
+    const files = Array.from(event.target.files);
+    updateSelectedFiles(files);
+}
+
+// Function to update the selected files array and display
+function updateSelectedFiles(newFiles) {
+    // Add new files to the selected files array
+    newFiles.forEach(file => {
+        // Check if file is not already selected
+        const exists = selectedFiles.some(existingFile => 
+            existingFile.name === file.name && existingFile.size === file.size
+        );
+
+        if (!exists) {
+            selectedFiles.push(file);
+            currentDataTransfer.items.add(file);
+        }
+    });
+
+    // Update the file input
+    const fileInput = document.getElementById('fileInput');
+    fileInput.files = currentDataTransfer.files;
+
+    // Update the preview
+    updateFilePreview();
+}
+
+// Function to update file preview
+function updateFilePreview() {
+    const previewArea = document.getElementById('filePreview');
+    const fileList = document.getElementById('fileList');
+    const uploadBtn = document.getElementById('uploadBtn');
+
+    if (selectedFiles.length > 0) {
+        previewArea.style.display = 'block';
+        fileList.innerHTML = '';
+
+        selectedFiles.forEach((file, index) => {
+            const fileName = file.name.toLowerCase();
+            let icon = 'fa-file';
+            let color = 'secondary';
+
+            if (fileName.includes('.mp4') || fileName.includes('.avi') || fileName.includes('.mov') || fileName.includes('.wmv') || fileName.includes('.flv') || fileName.includes('.webm')) {
+                icon = 'fa-play';
+                color = 'danger';
+            } else if (fileName.includes('.pdf')) {
+                icon = 'fa-file-pdf';
+                color = 'warning';
+            } else if (fileName.includes('.doc') || fileName.includes('.docx')) {
+                icon = 'fa-file-word';
+                color = 'primary';
+            } else if (fileName.includes('.ppt') || fileName.includes('.pptx')) {
+                icon = 'fa-file-powerpoint';
+                color = 'warning';
+            } else if (fileName.includes('.txt')) {
+                icon = 'fa-file-alt';
+                color = 'info';
+            }
+
+            const badge = document.createElement('span');
+            badge.className = `badge bg-${color} p-2 me-1 mb-1 position-relative`;
+            badge.innerHTML = `
+                <i class="fas ${icon} me-1"></i>${file.name.length > 25 ? file.name.substring(0, 25) + '...' : file.name}
+                <button type="button" class="btn-close btn-close-white position-absolute top-0 start-100 translate-middle" 
+                        style="font-size: 0.6rem; padding: 0.1rem;" onclick="removeFile(${index})"></button>
+            `;
+            fileList.appendChild(badge);
+        });
+
+        // Update button text
+        uploadBtn.innerHTML = `<i class="fas fa-upload me-1"></i>Upload ${selectedFiles.length} File${selectedFiles.length > 1 ? 's' : ''}`;
+    } else {
+        previewArea.style.display = 'none';
+        uploadBtn.innerHTML = `<i class="fas fa-upload me-1"></i>Create Learning Package`;
+    }
+}
+
+// Function to remove a specific file
+function removeFile(index) {
+    selectedFiles.splice(index, 1);
+
+    // Rebuild DataTransfer object
+    currentDataTransfer = new DataTransfer();
+    selectedFiles.forEach(file => {
+        currentDataTransfer.items.add(file);
+    });
+
+    // Update the file input
+    const fileInput = document.getElementById('fileInput');
+    fileInput.files = currentDataTransfer.files;
+
+    updateFilePreview();
+}
+
+// Function to add more files based on type
+function addMoreFiles(type) {
+    const input = document.createElement('input');
+    input.type = 'file';
+    input.multiple = true;
+
+    // Set accept attribute based on type
+    switch(type) {
+        case 'video':
+            input.accept = '.mp4,.avi,.mov,.wmv,.flv,.webm';
+            break;
+        case 'pdf':
+            input.accept = '.pdf';
+            break;
+        case 'document':
+            input.accept = '.doc,.docx,.ppt,.pptx,.txt';
+            break;
+        default:
+            input.accept = '.mp4,.avi,.mov,.wmv,.flv,.webm,.pdf,.doc,.docx,.ppt,.pptx,.txt';
+    }
+
+    input.onchange = function(event) {
+        const files = Array.from(event.target.files);
+        updateSelectedFiles(files);
+    };
+
+    input.click();
+}
+
+// Function to clear all files
+function clearAllFiles() {
+    selectedFiles = [];
+    currentDataTransfer = new DataTransfer();
+
+    const fileInput = document.getElementById('fileInput');
+    fileInput.value = '';
+    fileInput.files = currentDataTransfer.files;
+
+    updateFilePreview();
+}
+
+// Initialize when document loads
+document.addEventListener('DOMContentLoaded', function() {
+    const fileInput = document.getElementById('fileInput');
+    if (fileInput) {
+        // Handle drag and drop
+        fileInput.addEventListener('dragover', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+            this.classList.add('drag-over');
+        });
+
+        fileInput.addEventListener('dragleave', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+            this.classList.remove('drag-over');
+        });
+
+        fileInput.addEventListener('drop', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+            this.classList.remove('drag-over');
+
+            const files = Array.from(e.dataTransfer.files);
+            updateSelectedFiles(files);
+        });
+    }
+});
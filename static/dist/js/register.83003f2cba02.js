@@ -0,0 +1,67 @@
+// Example starter JavaScript for disabling form submissions if there are invalid fields
+(function () {
+    'use strict'
+
+    // Fetch all the forms we want to apply custom Bootstrap validation styles to
+    var forms = document.querySelectorAll('.needs-validation')
+
+    // Loop over them and prevent submission
+    Array.prototype.slice.call(forms)
+        .forEach(function (form) {
+            form.addEventListener('submit', function (event) {
+                if (!form.checkValidity()) {
+                    event.preventDefault()
+                    event.stopPropagation()
+                }
+
+                form.classList.add('was-validated')
+            }, false)
+        })
+
+    // Add touch-friendly features for mobile
+document.addEventListener('DOMContentLoaded', function() {
+    // Improve mobile form interactions
+    const inputs = document.querySelectorAll('.form-control-modern, .form-select-modern');
+
+    inputs.forEach(input => {
+        // Improve scrolling when focusing on inputs in mobile
+        input.addEventListener('focus', function() {
+            // Small delay to allow for virtual keyboard to appear
+            setTimeout(() => {
+                if (window.innerWidth <= 767) {
+                    this.scrollIntoView({ 
+                        behavior: 'smooth', 
+                        block: 'center',
+                        inline: 'nearest'
+                    });
+                }
+            }, 300);
+        });
+    });
+
+    // Improve button spacing on mobile
+    const buttons = document.querySelectorAll('.btn-register, .btn-back');
+    buttons.forEach(button => {
+        button.addEventListener('touchstart', function() {
+            this.style.transform = 'scale(0.98)';
+        });
+
+        button.addEventListener('touchend', function() {
+            this.style.transform = 'scale(1)';
+        });
+    });
+});
+    const roleSelect = document.getElementById('role');
+    const studentIdInput = document.getElementById('student_id');
+    const studentIdRequired = document.getElementById('student_id_required');
+
+    roleSelect.addEventListener('change', function() {
+        if (this.value === 'admin') {
+            studentIdInput.removeAttribute('required');
+            studentIdRequired.textContent = '(optional for admin)';
+        } else {
+            studentIdInput.setAttribute('required', '');
+            studentIdRequired.textContent = '(required)';
+        }
+    });
+})()
@@ -0,0 +1,274 @@
+// Progress tracking variables
+let startTime = Date.now();
+let lastPosition = 0;
+
+// Function to toggle fullscreen for specific video
+function toggleFullscreen(videoId) {
+    const video = document.getElementById(videoId);
+    if (video) {
+        if (video.requestFullscreen) {
+            video.requestFullscreen();
+        } else if (video.webkitRequestFullscreen) {
+            video.webkitRequestFullscreen();
+        } else if (video.msRequestFullscreen) {
+            video.msRequestFullscreen();
+        }
+    }
+}
+
+// Play a video's adaptive stream (data-stream) instead of its uploaded file.
+// Safari plays HLS itself; elsewhere hls.js feeds it to the video element.
+// If neither can, or the stream fails, the uploaded file (<source>) plays.
+function attachStream(video) {
+    const streamUrl = video.dataset.stream;
+    if (!streamUrl) {
+        return;
+    }
+    if (typeof Hls !== 'undefined' && Hls.isSupported()) {
+        const hls = new Hls({ capLevelToPlayerSize: true });
+        hls.on(Hls.Events.ERROR, function(event, data) {
+            if (data.fatal) {
+                console.error('Stream failed, playing the uploaded video:', data.details);
+                hls.destroy();
+                video.load();
+            }
+        });
+        hls.loadSource(streamUrl);
+        hls.attachMedia(video);
+    } else if (video.canPlayType('application/vnd.apple.mpegurl')) {
+        video.addEventListener('error', function() {
+            if (video.getAttribute('src')) {
+                video.removeAttribute('src');
+                video.load();
+            }
+        });
+        video.src = streamUrl;
+    }
+}
+
+// Function to open file in new tab
+function openFileInNewTab(fileUrl) {
+    try {
+        const newTab = window.open(fileUrl, '_blank', 'noopener,noreferrer');
+        if (newTab) {
+            newTab.focus();
+            updateProgress(25, false);
+        } else {
+            // Fallback: create a temporary link and click it
+            const link = document.createElement('a');
+            link.href = fileUrl;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+        }
+    } catch (error) {
+        console.error('Error opening file:', error);
+        // Final fallback: direct navigation
+        window.location.href = fileUrl;
+    }
+}
+
+// Function to open PDF/Document in new tab (backward compatibility)
+function openInNewTab() {
+    const url = resourceDirectUrl;
+    try {
+        const newTab = window.open(url, '_blank', 'noopener,noreferrer');
+        if (newTab) {
+            newTab.focus();
+            if (resourceIsDocument) {
+                updateProgress(25, false);
+            }
+        } else {
+            // Fallback: create a temporary link and click it
+            const link = document.createElement('a');
+            link.href = url;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+        }
+    } catch (error) {
+        console.error('Error opening PDF:', error);
+        // Final fallback: direct navigation
+        window.location.href = url;
+    }
+}
+
+// Enhanced PDF functions for mobile and desktop
+function openPDFInNewTab(pdfUrl, filename) {
+    console.log('Opening PDF in new tab:', pdfUrl, 'Filename:', filename);
+
+    try {
+        // Try to open in new tab with specific window features
+        const windowFeatures = 'noopener,noreferrer,scrollbars=yes,resizable=yes,status=yes,location=yes,toolbar=yes,menubar=yes';
+        const newTab = window.open(pdfUrl, '_blank', windowFeatures);
+
+        if (newTab) {
+            // Successfully opened in new tab
+            newTab.focus();
+            console.log('PDF opened in new tab successfully');
+            updateProgress(30, false);
+        } else {
+            // Popup blocked or failed, use link method
+            console.log('Window.open failed, using link method');
+            const link = document.createElement('a');
+            link.href = pdfUrl;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
+            link.style.display = 'none';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            updateProgress(30, false);
+        }
+
+    } catch (error) {
+        console.error('Error opening PDF:', error);
+        // Final fallback - create and click link
+        try {
+            const link = document.createElement('a');
+            link.href = pdfUrl;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
+            link.download = filename || 'document.pdf';
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+        } catch (linkError) {
+            console.error('Link fallback failed:', linkError);
+            // Last resort - direct navigation
+            window.location.href = pdfUrl;
+        }
+    }
+}
+
+function downloadPDF(pdfUrl, filename) {
+    console.log('Downloading PDF:', pdfUrl, 'as', filename);
+
+    try {
+        // Create download link
+        const link = document.createElement('a');
+        link.href = pdfUrl;
+        link.download = filename || 'document.pdf';
+        link.target = '_blank';
+        link.rel = 'noopener noreferrer';
+        link.style.display = 'none';
+
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+
+        updateProgress(25, false);
+
+    } catch (error) {
+        console.error('Download error:', error);
+        // Fallback - open in new tab instead
+        openPDFInNewTab(pdfUrl, filename);
+    }
+}
+
+// Enhanced button click handlers with better error handling
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('DOM Content Loaded - Initializing PDF functionality');
+
+    // Initialize all PDF buttons
+    initializePDFButtons();
+
+    document.querySelectorAll('video[data-stream]').forEach(attachStream);
+
+    // Add click event listeners for mobile controls
+    const mobileControls = document.querySelectorAll('.pdf-mobile-controls .btn');
+    mobileControls.forEach(btn => {
+        btn.addEventListener('click', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            const isDownload = this.innerHTML.includes('fa-download');
+            const parentCard = this.closest('.file-card') || this.closest('.card');
+
+            if (parentCard) {
+                const iframe = parentCard.querySelector('iframe');
+                if (iframe && iframe.src) {
+                    if (isDownload) {
+                        downloadPDF(iframe.src, 'document.pdf');
+                    } else {
+                        openPDFInNewTab(iframe.src, 'document.pdf');
+                    }
+                }
+            }
+        });
+    });
+});
+
+function initializePDFButtons() {
+    console.log('Initializing PDF buttons');
+
+    // Get all buttons with PDF functionality
+    const allPDFButtons = document.querySelectorAll('button[onclick*="openPDFInNewTab"], button[onclick*="downloadPDF"], .open-new-tab-btn');
+    console.log('Found', allPDFButtons.length, 'PDF buttons');
+
+    allPDFButtons.forEach((btn, index) => {
+        console.log('Processing button', index + 1, 'of', allPDFButtons.length);
+
+        const onclickAttr = btn.getAttribute('onclick');
+        console.log('Button onclick:', onclickAttr);
+
+        // Remove the onclick attribute to prevent conflicts
+        btn.removeAttribute('onclick');
+
+        btn.addEventListener('click', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            console.log('Button clicked, processing:', onclickAttr);
+
+            if (!onclickAttr) {
+                // Handle buttons without onclick (like .open-new-tab-btn)
+                const parentCard = this.closest('.file-card') || this.closest('.card');
+                if (parentCard) {
+                    const iframe = parentCard.querySelector('iframe');
+                    if (iframe && iframe.src) {
+                        openPDFInNewTab(iframe.src, 'document.pdf');
+                    }
+                }
+                return;
+            }
+
+            // Parse the function call
+            if (onclickAttr.includes('openPDFInNewTab')) {
+                const match = onclickAttr.match(/openPDFInNewTab\(([^)]+)\)/);
+                if (match) {
+                    const args = match[1].split(',').map(arg => arg.trim().replace(/^['"]|['"]$/g, ''));
+                    const pdfUrl = args[0];
+                    const filename = args[1] || 'document.pdf';
+                    console.log('Opening PDF:', pdfUrl, 'Filename:', filename);
+                    openPDFInNewTab(pdfUrl, filename);
+                }
+            } else if (onclickAttr.includes('downloadPDF')) {
+                const match = onclickAttr.match(/downloadPDF\(([^)]+)\)/);
+                if (match) {
+                    const args = match[1].split(',').map(arg => arg.trim().replace(/^['"]|['"]$/g, ''));
+                    const pdfUrl = args[0];
+                    const filename = args[1] || 'document.pdf';
+                    console.log('Downloading PDF:', pdfUrl, 'Filename:', filename);
+                    downloadPDF(pdfUrl, filename);
+                }
+            } else if (onclickAttr.includes('openFileInNewTab')) {
+                const match = onclickAttr.match(/openFileInNewTab\(([^)]+)\)/);
+                if (match) {
+                    const fileUrl = match[1].trim().replace(/^['"]|['"]$/g, '');
+                    console.log('Opening file:', fileUrl);
+                    openFileInNewTab(fileUrl);
+                }
+            } else if (onclickAttr.includes('openInNewTab')) {
+                console.log('Opening resource in new tab');
+                openInNewTab();
+            }
+        });
+    });
+
+    console.log('PDF button initialization complete');
+}
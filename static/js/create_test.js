@@ -0,0 +1,262 @@
+// Question bank search
+document.addEventListener('DOMContentLoaded', function() {
+    const searchInput = document.getElementById('questionSearch');
+    const resultsList = document.getElementById('questionSearchResults');
+    const moreContainer = document.getElementById('questionSearchMoreContainer');
+    const moreButton = document.getElementById('questionSearchMore');
+    let searchTimeout;
+    let currentPage = 1;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value;
+        return div.innerHTML;
+    }
+
+    function runSearch(page) {
+        const query = searchInput.value.trim();
+        if (!query) {
+            resultsList.innerHTML = '';
+            resultsList.classList.add('d-none');
+            moreContainer.classList.add('d-none');
+            return;
+        }
+
+        fetch(`${questionSearchUrl}?q=${encodeURIComponent(query)}&page=${page}`)
+            .then(response => response.json())
+            .then(data => {
+                if (page === 1) resultsList.innerHTML = '';
+                currentPage = page;
+
+                if (page === 1 && data.items.length === 0) {
+                    resultsList.innerHTML = '<div class="list-group-item text-muted">No matching questions</div>';
+                }
+                data.items.forEach(item => {
+                    // Snippets are escaped on the server apart from <mark> highlights
+                    resultsList.insertAdjacentHTML('beforeend', `
+                        <a href="${item.edit_url}" class="list-group-item list-group-item-action">
+                            <div class="d-flex justify-content-between align-items-start">
+                                <div class="me-3">${item.snippet}</div>
+                                <span class="badge bg-info text-nowrap">${escapeHtml(item.test_title)}</span>
+                            </div>
+                        </a>`);
+                });
+                resultsList.classList.remove('d-none');
+                moreContainer.classList.toggle('d-none', !data.has_more);
+            })
+            .catch(error => console.error('Question search failed:', error));
+    }
+
+    searchInput.addEventListener('input', function() {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(() => runSearch(1), 250);
+    });
+    moreButton.addEventListener('click', () => runSearch(currentPage + 1));
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Form validation
+    const forms = document.querySelectorAll('.needs-validation');
+    Array.from(forms).forEach(form => {
+        form.addEventListener('submit', event => {
+            if (!form.checkValidity()) {
+                event.preventDefault();
+                event.stopPropagation();
+            }
+            form.classList.add('was-validated');
+        }, false);
+    });
+
+    // Show/hide fields based on question type
+    const questionType = document.getElementById('question_type');
+    const choicesContainer = document.getElementById('choices_container');
+    const imageContainer = document.getElementById('image_container');
+
+    if (questionType) {
+        function updateFormFields() {
+            const choiceInputs = choicesContainer.querySelectorAll('input[name="choices"]');
+            const choiceImageInputs = choicesContainer.querySelectorAll('input[name="choice_images"]');
+            const imageFileInput = document.getElementById('image_file');
+            const imagePathInput = document.getElementById('image_path');
+
+            if (questionType.value === 'multiple_choice') {
+                choicesContainer.style.display = 'block';
+                imageContainer.style.display = 'none';
+
+                // Check which type of choices to show
+                updateChoiceDisplay();
+
+                // Remove image requirements
+                if (imageFileInput) imageFileInput.removeAttribute('required');
+                if (imagePathInput) imagePathInput.removeAttribute('required');
+
+            } else if (questionType.value === 'image') {
+                choicesContainer.style.display = 'none';
+                imageContainer.style.display = 'block';
+
+                // Remove choices requirements
+                choiceInputs.forEach(input => {
+                    input.removeAttribute('required');
+                });
+                choiceImageInputs.forEach(input => {
+                    input.removeAttribute('required');
+                });
+
+            } else { // identification
+                choicesContainer.style.display = 'none';
+                imageContainer.style.display = 'none';
+
+                // Remove all special requirements
+                choiceInputs.forEach(input => {
+                    input.removeAttribute('required');
+                });
+                choiceImageInputs.forEach(input => {
+                    input.removeAttribute('required');
+                });
+                if (imageFileInput) imageFileInput.removeAttribute('required');
+                if (imagePathInput) imagePathInput.removeAttribute('required');
+            }
+        }
+
+        // Function to update choice display based on checkbox
+        function updateChoiceDisplay() {
+            const useChoiceImages = document.getElementById('use_choice_images');
+            const textChoices = document.getElementById('text_choices');
+            const imageChoices = document.getElementById('image_choices');
+
+            if (useChoiceImages && useChoiceImages.checked) {
+                textChoices.style.display = 'none';
+                imageChoices.style.display = 'block';
+            } else {
+                textChoices.style.display = 'block';
+                imageChoices.style.display = 'none';
+            }
+        }
+
+        // Initialize form state
+        updateFormFields();
+
+        // Update form when question type changes
+        questionType.addEventListener('change', updateFormFields);
+
+        // Update choice display when checkbox changes
+        const useChoiceImages = document.getElementById('use_choice_images');
+        if (useChoiceImages) {
+            useChoiceImages.addEventListener('change', updateChoiceDisplay);
+        }
+
+        // Add new text choice field
+        const addChoiceBtn = document.getElementById('add_choice');
+        const choicesList = document.getElementById('choices_list');
+
+        if (addChoiceBtn && choicesList) {
+            addChoiceBtn.addEventListener('click', function() {
+                const newChoice = document.createElement('div');
+                newChoice.className = 'input-group mb-2';
+                newChoice.innerHTML = `
+                    <input type="text" class="form-control" name="choices">
+                    <button type="button" class="btn btn-outline-danger remove-choice">Remove</button>
+                `;
+                choicesList.appendChild(newChoice);
+
+                newChoice.querySelector('.remove-choice').addEventListener('click', function() {
+                    choicesList.removeChild(newChoice);
+                });
+            });
+        }
+
+        // Add new image choice field
+        const addChoiceImageBtn = document.getElementById('add_choice_image');
+        const choiceImagesList = document.getElementById('choice_images_list');
+
+        if (addChoiceImageBtn && choiceImagesList) {
+            addChoiceImageBtn.addEventListener('click', function() {
+                const imageCount = choiceImagesList.children.length + 1;
+                const newImageChoice = document.createElement('div');
+                newImageChoice.className = 'choice-image-item mb-3 border rounded p-3';
+                newImageChoice.innerHTML = `
+                    <div class="row align-items-center">
+                        <div class="col-md-8">
+                            <label class="form-label">Image Description</label>
+                            <input type="text" class="form-control mb-2 choice-description-input" 
+                                   name="choice_descriptions" 
+                                   placeholder="Enter description for this image (e.g., 'Red Apple', 'Triangle Shape')"
+                                   value="Image ${imageCount}"
+                                   required>
+                            <input type="file" class="form-control choice-image-input" name="choice_images" accept="image/*">
+                        </div>
+                        <div class="col-md-4 text-end">
+                            <button type="button" class="btn btn-outline-danger remove-choice-image">Remove</button>
+                        </div>
+                    </div>
+                `;
+                choiceImagesList.appendChild(newImageChoice);
+
+                newImageChoice.querySelector('.remove-choice-image').addEventListener('click', function() {
+                    choiceImagesList.removeChild(newImageChoice);
+                    updateImageLabels();
+                });
+            });
+        }
+
+        // Update image labels after removal
+        function updateImageLabels() {
+            const imageItems = choiceImagesList.querySelectorAll('.choice-image-item');
+            imageItems.forEach((item, index) => {
+                const descInput = item.querySelector('.choice-description-input');
+                if (descInput && descInput.value.startsWith('Image ')) {
+                    descInput.value = `Image ${index + 1}`;
+                }
+            });
+        }
+
+        // Remove choice image field
+        document.addEventListener('click', function(e) {
+            if (e.target.classList.contains('remove-choice-image')) {
+                const choiceDiv = e.target.closest('.choice-image-item');
+                if (choiceImagesList.children.length > 1) {
+                    choiceImagesList.removeChild(choiceDiv);
+                    updateImageLabels();
+                }
+            }
+        });
+
+        // Image preview functionality
+        const imageFileInput = document.getElementById('image_file');
+        const imagePreviewContainer = document.getElementById('image_preview_container');
+        const imagePreview = document.getElementById('image_preview');
+        const imagePathInput = document.getElementById('image_path');
+
+        if (imageFileInput && imagePreviewContainer && imagePreview && imagePathInput) {
+            imageFileInput.addEventListener('change', function() {
+                if (this.files && this.files[0]) {
+                    const reader = new FileReader();
+
+                    reader.onload = function(e) {
+                        imagePreview.src = e.target.result;
+                        imagePreviewContainer.style.display = 'block';
+                    }
+
+                    reader.readAsDataURL(this.files[0]);
+
+                    // Update filename for display purposes
+                    const filename = this.files[0].name;
+                    imagePathInput.value = 'uploads/' + filename;
+                } else {
+                    imagePreviewContainer.style.display = 'none';
+                }
+            });
+        }
+    }
+
+    // If URL has a tab parameter, activate that tab
+    const urlParams = new URLSearchParams(window.location.search);
+    const tabParam = urlParams.get('tab');
+    if (tabParam === 'questions') {
+        const questionsTab = document.getElementById('questions-tab');
+        if (questionsTab) {
+            const tab = new bootstrap.Tab(questionsTab);
+            tab.show();
+        }
+    }
+});
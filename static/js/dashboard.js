@@ -0,0 +1,221 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const pageSize = adminListConfig.pageSize;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value === null || value === undefined ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    function scoreBarClass(score) {
+        return score >= 70 ? 'bg-success' : score >= 50 ? 'bg-warning' : 'bg-danger';
+    }
+
+    function performanceBarClass(score) {
+        return score >= 90 ? 'bg-success' : score >= 70 ? 'bg-info' : score >= 50 ? 'bg-warning' : 'bg-danger';
+    }
+
+    function renderUserRow(user) {
+        const recordsLink = user.records_url ? `
+                                        <a href="${user.records_url}" class="btn btn-outline-info">
+                                            <i class="fas fa-chart-line"></i>
+                                        </a>` : '';
+        return `
+                            <tr style="background-color: white;">
+                                <td class="px-4 py-3">
+                                    <div class="d-flex align-items-center">
+                                        <div class="bg-primary rounded-circle p-2 me-3" style="width: 40px; height: 40px; display: flex; align-items: center; justify-content: center;">
+                                            <i class="fas fa-user text-white"></i>
+                                        </div>
+                                        <div>
+                                            <h6 class="mb-0">${escapeHtml(user.name)}</h6>
+                                            <small class="text-muted">ID: ${user.id}</small>
+                                        </div>
+                                    </div>
+                                </td>
+                                <td class="px-4 py-3">${escapeHtml(user.student_id || 'N/A')}</td>
+                                <td class="px-4 py-3">
+                                    <span class="badge rounded-pill ${user.role === 'admin' ? 'bg-danger' : 'bg-success'} fs-6">
+                                        ${escapeHtml(user.role.charAt(0).toUpperCase() + user.role.slice(1))}
+                                    </span>
+                                </td>
+                                <td class="px-4 py-3">
+                                    <div class="btn-group btn-group-sm">
+                                        <a href="${user.edit_url}" class="btn btn-outline-warning">
+                                            <i class="fas fa-edit"></i>
+                                        </a>${recordsLink}
+                                        <button type="button" class="btn btn-outline-danger" data-bs-toggle="modal" data-bs-target="#deleteUserModal"
+                                                data-user-name="${escapeHtml(user.name)}" data-delete-url="${user.delete_url}">
+                                            <i class="fas fa-trash"></i>
+                                        </button>
+                                    </div>
+                                </td>
+                            </tr>`;
+    }
+
+    function renderResultRow(result) {
+        return `
+                            <tr style="background-color: white;">
+                                <td class="px-4 py-3">${escapeHtml(result.student_name)}</td>
+                                <td class="px-4 py-3">${escapeHtml(result.test_title)}</td>
+                                <td class="px-4 py-3">
+                                    <div class="d-flex align-items-center">
+                                        <div class="progress me-3" style="width: 100px; height: 8px;">
+                                            <div class="progress-bar ${scoreBarClass(result.score)}" style="width: ${result.score}%"></div>
+                                        </div>
+                                        <span class="fw-bold">${result.score.toFixed(1)}%</span>
+                                    </div>
+                                </td>
+                                <td class="px-4 py-3">${result.date_display}</td>
+                                <td class="px-4 py-3">
+                                    <a href="${result.view_url}" class="btn btn-sm btn-outline-info">
+                                        <i class="fas fa-eye me-1"></i>View
+                                    </a>
+                                </td>
+                            </tr>`;
+    }
+
+    function renderInsightRow(result, rank) {
+        const rankBadge = rank <= 3 ? `
+                                                        <span class="badge ${rank === 1 ? 'bg-warning' : rank === 2 ? 'bg-secondary' : 'bg-dark'} me-2">${rank}</span>
+                                                        <i class="fas fa-trophy ${rank === 1 ? 'text-warning' : rank === 2 ? 'text-secondary' : 'text-dark'}"></i>` : `
+                                                        <span class="badge bg-light text-dark">${rank}</span>`;
+        return `
+                                        <tr style="background-color: white;">
+                                            <td class="px-4 py-3">
+                                                <div class="d-flex align-items-center">${rankBadge}
+                                                </div>
+                                            </td>
+                                            <td class="px-4 py-3">
+                                                <h6 class="mb-0">${escapeHtml(result.student_name)}</h6>
+                                            </td>
+                                            <td class="px-4 py-3">${escapeHtml(result.student_id)}</td>
+                                            <td class="px-4 py-3">
+                                                <span class="fw-bold fs-5">${result.score.toFixed(1)}%</span>
+                                            </td>
+                                            <td class="px-4 py-3">
+                                                <div class="progress" style="width: 100px; height: 8px;">
+                                                    <div class="progress-bar ${performanceBarClass(result.score)}" style="width: ${result.score}%"></div>
+                                                </div>
+                                            </td>
+                                            <td class="px-4 py-3">${result.date_display}</td>
+                                            <td class="px-4 py-3">
+                                                <a href="${result.view_url}" class="btn btn-sm btn-outline-info">
+                                                    <i class="fas fa-eye me-1"></i>View
+                                                </a>
+                                            </td>
+                                        </tr>`;
+    }
+
+    // Generic keyset list: fetches the next page and appends its rows
+    function createPagedList(options) {
+        let nextCursor = options.initialCursor || null;
+        let loading = false;
+
+        function setCursor(cursor) {
+            nextCursor = cursor;
+            options.loadMoreContainer.classList.toggle('d-none', !nextCursor);
+        }
+
+        function load(reset) {
+            if (loading || (!reset && !nextCursor)) return;
+            loading = true;
+
+            const params = new URLSearchParams(options.params());
+            if (adminListConfig.sectionId) params.set('section_id', adminListConfig.sectionId);
+            params.set('limit', pageSize);
+            if (!reset && nextCursor) params.set('cursor', nextCursor);
+
+            fetch(`${options.url}?${params.toString()}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (reset) options.body.innerHTML = '';
+                    data.items.forEach(item => {
+                        options.body.insertAdjacentHTML('beforeend', options.render(item, options.body.rows.length + 1));
+                    });
+                    setCursor(data.next_cursor);
+                })
+                .catch(error => console.error('Failed to load list:', error))
+                .finally(() => { loading = false; });
+        }
+
+        setCursor(nextCursor);
+        options.loadMoreButton.addEventListener('click', () => load(false));
+        return { reload: () => load(true), loadMore: () => load(false) };
+    }
+
+    function debounce(fn, delay) {
+        let timeout;
+        return function() {
+            clearTimeout(timeout);
+            timeout = setTimeout(fn, delay);
+        };
+    }
+
+    function sortParams(select) {
+        const [sort, order] = select.value.split(':');
+        return { sort: sort, order: order };
+    }
+
+    // Users
+    const usersSearch = document.getElementById('usersSearch');
+    const usersRoleFilter = document.getElementById('usersRoleFilter');
+    const usersSort = document.getElementById('usersSort');
+    const usersList = createPagedList({
+        url: adminListConfig.usersUrl,
+        body: document.getElementById('usersTableBody'),
+        loadMoreButton: document.getElementById('usersLoadMore'),
+        loadMoreContainer: document.getElementById('usersLoadMoreContainer'),
+        initialCursor: document.getElementById('usersLoadMore').dataset.nextCursor,
+        render: renderUserRow,
+        params: () => Object.assign({ q: usersSearch.value.trim(), role: usersRoleFilter.value }, sortParams(usersSort))
+    });
+    usersSearch.addEventListener('input', debounce(usersList.reload, 300));
+    usersRoleFilter.addEventListener('change', usersList.reload);
+    usersSort.addEventListener('change', usersList.reload);
+
+    // Results
+    const resultsSearch = document.getElementById('resultsSearch');
+    const resultsTestFilter = document.getElementById('resultsTestFilter');
+    const resultsSort = document.getElementById('resultsSort');
+    const resultsList = createPagedList({
+        url: adminListConfig.resultsUrl,
+        body: document.getElementById('resultsTableBody'),
+        loadMoreButton: document.getElementById('resultsLoadMore'),
+        loadMoreContainer: document.getElementById('resultsLoadMoreContainer'),
+        initialCursor: document.getElementById('resultsLoadMore').dataset.nextCursor,
+        render: renderResultRow,
+        params: () => Object.assign({ q: resultsSearch.value.trim(), test_id: resultsTestFilter.value }, sortParams(resultsSort))
+    });
+    resultsSearch.addEventListener('input', debounce(resultsList.reload, 300));
+    resultsTestFilter.addEventListener('change', resultsList.reload);
+    resultsSort.addEventListener('change', resultsList.reload);
+
+    // Per-test rankings are fetched the first time an insights modal opens
+    document.querySelectorAll('.insights-results').forEach(body => {
+        const modal = body.closest('.modal');
+        const container = modal.querySelector('.insights-load-more-container');
+        const list = createPagedList({
+            url: adminListConfig.resultsUrl,
+            body: body,
+            loadMoreButton: container.querySelector('.insights-load-more'),
+            loadMoreContainer: container,
+            render: renderInsightRow,
+            params: () => ({ test_id: body.dataset.testId, sort: 'score', order: 'desc' })
+        });
+        modal.addEventListener('show.bs.modal', function() {
+            if (!body.dataset.loaded) {
+                body.dataset.loaded = '1';
+                list.reload();
+            }
+        });
+    });
+
+    // Shared delete confirmation modal
+    const deleteUserModal = document.getElementById('deleteUserModal');
+    deleteUserModal.addEventListener('show.bs.modal', function(event) {
+        const button = event.relatedTarget;
+        document.getElementById('deleteUserName').textContent = button.dataset.userName;
+        document.getElementById('deleteUserForm').action = button.dataset.deleteUrl;
+    });
+});
@@ -0,0 +1,53 @@
+// Resource search
+document.addEventListener('DOMContentLoaded', function() {
+    const searchInput = document.getElementById('resourceSearch');
+    const resultsList = document.getElementById('resourceSearchResults');
+    const moreContainer = document.getElementById('resourceSearchMoreContainer');
+    const moreButton = document.getElementById('resourceSearchMore');
+    let searchTimeout;
+    let currentPage = 1;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value;
+        return div.innerHTML;
+    }
+
+    function runSearch(page) {
+        const query = searchInput.value.trim();
+        if (!query) {
+            resultsList.innerHTML = '';
+            resultsList.classList.add('d-none');
+            moreContainer.classList.add('d-none');
+            return;
+        }
+
+        fetch(`${resourceSearchUrl}?q=${encodeURIComponent(query)}&page=${page}`)
+            .then(response => response.json())
+            .then(data => {
+                if (page === 1) resultsList.innerHTML = '';
+                currentPage = page;
+
+                if (page === 1 && data.items.length === 0) {
+                    resultsList.innerHTML = '<div class="list-group-item text-muted">No matching resources</div>';
+                }
+                data.items.forEach(item => {
+                    // Snippets are escaped on the server apart from <mark> highlights
+                    resultsList.insertAdjacentHTML('beforeend', `
+                        <a href="${item.view_url}" class="list-group-item list-group-item-action">
+                            <h6 class="mb-1">${escapeHtml(item.title)}</h6>
+                            <small class="text-muted">${item.snippet}</small>
+                        </a>`);
+                });
+                resultsList.classList.remove('d-none');
+                moreContainer.classList.toggle('d-none', !data.has_more);
+            })
+            .catch(error => console.error('Resource search failed:', error));
+    }
+
+    searchInput.addEventListener('input', function() {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(() => runSearch(1), 250);
+    });
+    moreButton.addEventListener('click', () => runSearch(currentPage + 1));
+});
@@ -0,0 +1,672 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const testId = examConfig.testId;
+    // Remaining time comes from the server-side attempt, so reloading the page never resets it
+    let endTime = new Date(new Date().getTime() + examConfig.remainingSeconds * 1000);
+    const savedAnswers = examConfig.savedAnswers;
+    let autosaveTimeout;
+    const timerElement = document.getElementById('timer');
+    const mobileTimerElement = document.getElementById('mobile-timer');
+    const timerCard = document.getElementById('timer-card');
+    const mobileTimerCard = document.getElementById('mobile-timer-card');
+    const testForm = document.getElementById('test-form');
+
+    // Security state tracking
+    let securityViolations = 0;
+    let isTestActive = true;
+    let heartbeatInterval;
+    let securityCheckInterval;
+    let lastHeartbeat = Date.now();
+    let tabSwitchCount = 0;
+    let fullscreenExitCount = 0;
+
+    // Exam channel: one WebSocket for heartbeats, autosaves and violations, over
+    // which the server also sends the remaining time and the admin's commands.
+    // The HTTP endpoints are used whenever it is not open.
+    let channel = null;
+    let channelRetries = 0;
+    let sentAnswers = Object.assign({}, savedAnswers);  // What the server has, so only changes are sent
+    let autosaveSeq = 0;
+
+    // Security status elements
+    const securityIndicator = document.getElementById('security-indicator');
+    const securityText = document.getElementById('security-text');
+    const heartbeatStatus = document.getElementById('heartbeat-status');
+    const mobileSecurityStatus = document.getElementById('mobile-security-status');
+    const mobileSecurityText = document.getElementById('mobile-security-text');
+    const mobileHeartbeatStatus = document.getElementById('mobile-heartbeat-status');
+    const fullscreenOverlay = document.getElementById('fullscreen-overlay');
+    const returnFullscreenBtn = document.getElementById('return-fullscreen');
+
+    // Restore answers autosaved earlier in this attempt
+    restoreSavedAnswers();
+
+    // Initialize security
+    initializeSecurity();
+
+    // Autosave answers shortly after every change
+    testForm.addEventListener('change', scheduleAutosave);
+    testForm.addEventListener('input', scheduleAutosave);
+
+    function restoreSavedAnswers() {
+        Object.entries(savedAnswers).forEach(([questionId, value]) => {
+            const inputs = testForm.querySelectorAll(`[name="answer_${questionId}"]`);
+            inputs.forEach(input => {
+                if (input.type === 'radio') {
+                    if (input.value === value) {
+                        input.checked = true;
+                        const card = input.closest('.choice-card');
+                        if (card) card.classList.add('border-primary', 'bg-light');
+                    }
+                } else {
+                    input.value = value;
+                }
+            });
+        });
+    }
+
+    function collectAnswers() {
+        const answers = {};
+        new FormData(testForm).forEach((value, name) => {
+            if (name.startsWith('answer_')) {
+                answers[name.replace('answer_', '')] = value;
+            }
+        });
+        return answers;
+    }
+
+    function scheduleAutosave() {
+        clearTimeout(autosaveTimeout);
+        autosaveTimeout = setTimeout(autosaveAnswers, 1500);
+    }
+
+    function autosaveAnswers() {
+        if (!isTestActive) return;
+
+        if (channel) {
+            const changes = {};
+            Object.entries(collectAnswers()).forEach(([questionId, value]) => {
+                if (sentAnswers[questionId] !== value) changes[questionId] = value;
+            });
+            if (Object.keys(changes).length === 0) return;
+            channel.send(JSON.stringify({type: 'autosave', seq: ++autosaveSeq, answers: changes, sent_at: Date.now()}));
+            Object.assign(sentAnswers, changes);
+            return;
+        }
+
+        fetch('/autosave_answers', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                test_id: testId,
+                answers: collectAnswers()
+            })
+        }).then(response => response.json())
+          .then(data => syncRemainingTime(data.remaining_seconds))
+          .catch(error => {
+            console.error('Autosave failed:', error);
+        });
+    }
+
+    function syncRemainingTime(remainingSeconds, sentAt) {
+        if (typeof remainingSeconds === 'number') {
+            // The server measured the time half a round trip ago
+            const halfTrip = typeof sentAt === 'number' ? Math.max(0, Date.now() - sentAt) / 2 : 0;
+            endTime = new Date(new Date().getTime() + remainingSeconds * 1000 - halfTrip);
+        }
+    }
+
+    function openChannel() {
+        if (!examConfig.channelUrl || !('WebSocket' in window) || channelRetries >= 5) return;
+
+        // The path only: behind a proxy the page's own host and scheme are the ones that reach us
+        const protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+        const socket = new WebSocket(protocol + window.location.host + new URL(examConfig.channelUrl).pathname);
+        socket.onopen = () => {
+            channel = socket;
+            channelRetries = 0;
+            sentAnswers = {};  // Answers sent before a disconnect may never have arrived
+            sendHeartbeat();
+            autosaveAnswers();
+        };
+        socket.onmessage = event => handleChannelMessage(JSON.parse(event.data));
+        socket.onclose = () => {
+            if (channel === socket) channel = null;
+            if (isTestActive) {
+                channelRetries++;
+                setTimeout(openChannel, 1000 * 2 ** channelRetries);
+            }
+        };
+    }
+
+    function handleChannelMessage(message) {
+        switch (message.type) {
+            case 'time':
+            case 'saved':
+                lastHeartbeat = Date.now();
+                updateHeartbeatStatus('active');
+                syncRemainingTime(message.remaining_seconds, message.sent_at);
+                break;
+            case 'sync':
+                sendHeartbeat();
+                break;
+            case 'extend':
+                showSecurityAlert(message.message, 'Time Extended', '#198754');
+                sendHeartbeat();
+                break;
+            case 'message':
+                showSecurityAlert(message.message, 'Message from your teacher', '#0d6efd');
+                break;
+            case 'end':
+                submitNow(message.message);
+                break;
+            case 'ended':
+                submitNow('This test has already been submitted.');
+                break;
+            case 'error':
+                syncRemainingTime(message.remaining_seconds);
+                console.error('Exam channel error:', message.error);
+                break;
+        }
+    }
+
+    function initializeSecurity() {
+        // Force fullscreen mode on desktop
+        if (window.innerWidth > 768) {
+            requestFullscreen();
+        }
+
+        // Open the exam channel; until it is open the HTTP endpoints are used
+        openChannel();
+
+        // Start heartbeat
+        startHeartbeat();
+
+        // Start security monitoring
+        startSecurityMonitoring();
+
+        // Prevent all navigation
+        preventNavigation();
+
+        // Monitor page visibility
+        monitorPageVisibility();
+
+        // Monitor fullscreen state
+        monitorFullscreen();
+    }
+
+    function requestFullscreen() {
+        const elem = document.documentElement;
+        if (elem.requestFullscreen) {
+            elem.requestFullscreen().catch(err => {
+                console.log('Fullscreen not supported or denied');
+                updateSecurityStatus('warning', 'Fullscreen Recommended');
+            });
+        } else if (elem.webkitRequestFullscreen) {
+            elem.webkitRequestFullscreen();
+        } else if (elem.msRequestFullscreen) {
+            elem.msRequestFullscreen();
+        }
+    }
+
+    function startHeartbeat() {
+        // Send heartbeat every 30 seconds
+        heartbeatInterval = setInterval(() => {
+            sendHeartbeat();
+        }, 30000);
+
+        // Send initial heartbeat
+        sendHeartbeat();
+    }
+
+    function sendHeartbeat() {
+        if (!isTestActive) return;
+
+        if (channel) {
+            channel.send(JSON.stringify({
+                type: 'heartbeat',
+                sent_at: Date.now(),
+                security_violations: securityViolations,
+                tab_switches: tabSwitchCount,
+                fullscreen_exits: fullscreenExitCount
+            }));
+            return;
+        }
+
+        fetch('/test_heartbeat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                test_id: testId,
+                timestamp: Date.now(),
+                security_violations: securityViolations,
+                tab_switches: tabSwitchCount,
+                fullscreen_exits: fullscreenExitCount
+            })
+        }).then(response => {
+            if (response.ok) {
+                lastHeartbeat = Date.now();
+                updateHeartbeatStatus('active');
+                return response.json().then(data => syncRemainingTime(data.remaining_seconds));
+            } else {
+                updateHeartbeatStatus('warning');
+            }
+        }).catch(error => {
+            console.error('Heartbeat failed:', error);
+            updateHeartbeatStatus('danger');
+        });
+    }
+
+    function startSecurityMonitoring() {
+        securityCheckInterval = setInterval(() => {
+            // Check if heartbeat is stale
+            if (Date.now() - lastHeartbeat > 60000) {
+                updateHeartbeatStatus('danger');
+            }
+        }, 10000);
+    }
+
+    function preventNavigation() {
+        // Enhanced beforeunload handler
+        window.addEventListener('beforeunload', function(e) {
+            if (isTestActive) {
+                recordSecurityViolation('attempted_exit');
+                const message = 'WARNING: Leaving this page will abandon your test and may result in a zero score. Are you sure you want to leave?';
+                e.preventDefault();
+                e.returnValue = message;
+                return message;
+            }
+        });
+
+        // Prevent back/forward navigation
+        window.addEventListener('popstate', function(event) {
+            if (isTestActive) {
+                recordSecurityViolation('navigation_attempt');
+                window.history.pushState(null, null, window.location.pathname);
+                showSecurityAlert('Navigation is disabled during the test!');
+            }
+        });
+
+        // Add multiple history entries to make back button ineffective
+        for (let i = 0; i < 10; i++) {
+            window.history.pushState(null, null, window.location.pathname);
+        }
+
+        // Comprehensive keyboard blocking
+        document.addEventListener('keydown', function(e) {
+            if (!isTestActive) return;
+
+            const blockedKeys = [
+                // Navigation keys
+                { key: 'F5', code: 116, message: 'Page refresh is disabled' },
+                { key: 'Ctrl+R', ctrl: true, code: 82, message: 'Page refresh is disabled' },
+                { key: 'Ctrl+F5', ctrl: true, code: 116, message: 'Hard refresh is disabled' },
+                { key: 'Alt+Left', alt: true, code: 37, message: 'Navigation is disabled' },
+                { key: 'Alt+Right', alt: true, code: 39, message: 'Navigation is disabled' },
+                { key: 'Ctrl+W', ctrl: true, code: 87, message: 'Closing tab is disabled' },
+                { key: 'Ctrl+T', ctrl: true, code: 84, message: 'New tab is disabled' },
+                { key: 'Ctrl+N', ctrl: true, code: 78, message: 'New window is disabled' },
+                { key: 'Ctrl+Shift+N', ctrl: true, shift: true, code: 78, message: 'Incognito mode is disabled' },
+                { key: 'Ctrl+Shift+T', ctrl: true, shift: true, code: 84, message: 'Reopening tabs is disabled' },
+                { key: 'Ctrl+L', ctrl: true, code: 76, message: 'Address bar access is disabled' },
+                { key: 'Ctrl+D', ctrl: true, code: 68, message: 'Bookmarking is disabled' },
+                { key: 'F11', code: 122, message: 'Fullscreen toggle is disabled' },
+                { key: 'Escape', code: 27, message: 'Escape key is disabled' },
+                { key: 'Alt+Tab', alt: true, code: 9, message: 'Task switching is disabled' },
+                { key: 'Ctrl+Alt+Del', ctrl: true, alt: true, code: 46, message: 'System commands are disabled' },
+                { key: 'Ctrl+Shift+Esc', ctrl: true, shift: true, code: 27, message: 'Task manager is disabled' },
+                // Developer tools
+                { key: 'F12', code: 123, message: 'Developer tools are disabled' },
+                { key: 'Ctrl+Shift+I', ctrl: true, shift: true, code: 73, message: 'Developer tools are disabled' },
+                { key: 'Ctrl+Shift+J', ctrl: true, shift: true, code: 74, message: 'Console is disabled' },
+                { key: 'Ctrl+U', ctrl: true, code: 85, message: 'View source is disabled' },
+            ];
+
+            for (let blocked of blockedKeys) {
+                if (e.keyCode === blocked.code || e.which === blocked.code) {
+                    if ((!blocked.ctrl || e.ctrlKey) && 
+                        (!blocked.alt || e.altKey) && 
+                        (!blocked.shift || e.shiftKey)) {
+                        e.preventDefault();
+                        e.stopPropagation();
+                        recordSecurityViolation(`keyboard_${blocked.key}`);
+                        showSecurityAlert(blocked.message);
+                        return false;
+                    }
+                }
+            }
+        });
+
+        // Block mouse actions
+        document.addEventListener('contextmenu', function(e) {
+            e.preventDefault();
+            recordSecurityViolation('right_click');
+            showSecurityAlert('Right-click is disabled during the test');
+            return false;
+        });
+
+        // Block drag and drop
+        document.addEventListener('dragstart', function(e) {
+            e.preventDefault();
+            return false;
+        });
+
+        // Block text selection on non-form elements
+        document.addEventListener('selectstart', function(e) {
+            if (!e.target.matches('input, textarea')) {
+                e.preventDefault();
+                return false;
+            }
+        });
+    }
+
+    function monitorPageVisibility() {
+        let tabSwitchStart = null;
+
+        document.addEventListener('visibilitychange', function() {
+            if (!isTestActive) return;
+
+            if (document.hidden) {
+                tabSwitchStart = Date.now();
+                tabSwitchCount++;
+                recordSecurityViolation('tab_switch');
+                updateSecurityStatus('danger', 'Tab Switch Detected');
+            } else {
+                if (tabSwitchStart) {
+                    const switchDuration = Date.now() - tabSwitchStart;
+                    console.log(`Tab was hidden for ${switchDuration}ms`);
+
+                    showSecurityAlert(`WARNING: Tab switching detected! This may affect your test score. Switch count: ${tabSwitchCount}`);
+
+                    // Reset to warning after 5 seconds
+                    setTimeout(() => {
+                        updateSecurityStatus('warning', 'Security Alert');
+                    }, 5000);
+                }
+            }
+        });
+
+        // Window focus/blur events
+        window.addEventListener('blur', function() {
+            if (!isTestActive) return;
+            recordSecurityViolation('window_blur');
+            updateSecurityStatus('warning', 'Focus Lost');
+        });
+
+        window.addEventListener('focus', function() {
+            if (!isTestActive) return;
+            setTimeout(() => {
+                updateSecurityStatus('active', 'Secure Mode');
+            }, 2000);
+        });
+    }
+
+    function monitorFullscreen() {
+        document.addEventListener('fullscreenchange', function() {
+            if (!isTestActive) return;
+
+            if (!document.fullscreenElement) {
+                fullscreenExitCount++;
+                recordSecurityViolation('fullscreen_exit');
+
+                if (window.innerWidth > 768) {
+                    // Show overlay to force return to fullscreen
+                    fullscreenOverlay.style.display = 'flex';
+                    updateSecurityStatus('danger', 'Fullscreen Required');
+                }
+            } else {
+                fullscreenOverlay.style.display = 'none';
+                updateSecurityStatus('active', 'Secure Mode');
+            }
+        });
+    }
+
+    function recordSecurityViolation(type) {
+        securityViolations++;
+        console.log(`Security violation: ${type} (Total: ${securityViolations})`);
+
+        // Send violation to server
+        if (channel) {
+            channel.send(JSON.stringify({
+                type: 'violation',
+                violation_type: type,
+                timestamp: Date.now(),
+                total_violations: securityViolations
+            }));
+            return;
+        }
+
+        fetch('/record_security_violation', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                test_id: testId,
+                violation_type: type,
+                timestamp: Date.now(),
+                total_violations: securityViolations
+            })
+        }).catch(error => {
+            console.error('Failed to record violation:', error);
+        });
+    }
+
+    function showSecurityAlert(message, title = 'Security Alert', background = '#dc3545') {
+        // Create a custom alert that can't be easily dismissed
+        const alertDiv = document.createElement('div');
+        alertDiv.style.cssText = `
+            position: fixed;
+            top: 50%;
+            left: 50%;
+            transform: translate(-50%, -50%);
+            background: ${background};
+            color: white;
+            padding: 20px;
+            border-radius: 8px;
+            z-index: 10000;
+            max-width: 400px;
+            text-align: center;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.3);
+        `;
+        alertDiv.innerHTML = `
+            <i class="fas fa-exclamation-triangle fa-2x mb-2"></i>
+            <h5></h5>
+            <p></p>
+            <button onclick="this.parentElement.remove()" class="btn btn-light btn-sm">Acknowledge</button>
+        `;
+        alertDiv.querySelector('h5').textContent = title;
+        alertDiv.querySelector('p').textContent = message;
+        document.body.appendChild(alertDiv);
+
+        // Auto-remove after 5 seconds
+        setTimeout(() => {
+            if (alertDiv.parentElement) {
+                alertDiv.remove();
+            }
+        }, 5000);
+    }
+
+    function updateSecurityStatus(level, text) {
+        const statusClass = `security-${level}`;
+
+        // Desktop indicators
+        if (securityIndicator) {
+            securityIndicator.className = `security-indicator ${statusClass}`;
+            securityText.textContent = text;
+        }
+
+        // Mobile indicators
+        if (mobileSecurityStatus) {
+            mobileSecurityStatus.className = `security-indicator ${statusClass} text-center`;
+            mobileSecurityText.textContent = text.split(' ')[0]; // Shorter text for mobile
+        }
+    }
+
+    function updateHeartbeatStatus(level) {
+        const statusClass = `security-${level}`;
+        const statusText = level === 'active' ? 'Connected' : 
+                         level === 'warning' ? 'Weak' : 'Disconnected';
+
+        if (heartbeatStatus) {
+            heartbeatStatus.className = `security-indicator ${statusClass}`;
+            heartbeatStatus.querySelector('span').textContent = statusText;
+        }
+
+        if (mobileHeartbeatStatus) {
+            mobileHeartbeatStatus.className = `security-indicator ${statusClass} text-center`;
+            mobileHeartbeatStatus.querySelector('span').textContent = statusText;
+        }
+    }
+
+    // Return to fullscreen handler
+    returnFullscreenBtn.addEventListener('click', function() {
+        requestFullscreen();
+    });
+
+    // Timer functionality
+    function updateTimer() {
+        const now = new Date();
+        const timeLeft = endTime - now;
+
+        if (timeLeft <= 0) {
+            if (timerElement) timerElement.textContent = "00:00";
+            if (mobileTimerElement) mobileTimerElement.textContent = "00:00";
+
+            submitNow("Time's up! Your test will be submitted automatically.");
+            return;
+        }
+
+        const minutes = Math.floor(timeLeft / (60 * 1000));
+        const seconds = Math.floor((timeLeft % (60 * 1000)) / 1000);
+        const formattedTime = `${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
+
+        if (timerElement) timerElement.textContent = formattedTime;
+        if (mobileTimerElement) mobileTimerElement.textContent = formattedTime;
+
+        // Warning states
+        if (minutes < 5) {
+            if (timerCard) timerCard.classList.add('timer-warning');
+            if (mobileTimerCard) mobileTimerCard.classList.add('timer-warning');
+        }
+        if (minutes < 2) {
+            if (timerCard) {
+                timerCard.classList.remove('timer-warning');
+                timerCard.classList.add('timer-danger');
+            }
+            if (mobileTimerCard) {
+                mobileTimerCard.classList.remove('timer-warning');
+                mobileTimerCard.classList.add('timer-danger');
+            }
+        }
+    }
+
+    function submitNow(message) {
+        if (!isTestActive) return;
+        isTestActive = false;
+        clearInterval(timerInterval);
+        clearInterval(heartbeatInterval);
+        clearInterval(securityCheckInterval);
+        if (channel) channel.close();
+
+        alert(message);
+        testForm.submit();
+    }
+
+    updateTimer();
+    const timerInterval = setInterval(updateTimer, 1000);
+
+    // Form submission handler
+    testForm.addEventListener('submit', function(e) {
+        isTestActive = false;
+        clearInterval(timerInterval);
+        clearInterval(heartbeatInterval);
+        clearInterval(securityCheckInterval);
+        if (channel) channel.close();
+
+        // Remove event listeners to allow form submission
+        window.removeEventListener('beforeunload', arguments.callee);
+    });
+
+    // Page unload cleanup
+    window.addEventListener('unload', function() {
+        if (isTestActive) {
+            // Last-ditch effort to record abandonment
+            navigator.sendBeacon('/test_abandoned', JSON.stringify({
+                test_id: testId,
+                timestamp: Date.now(),
+                violations: securityViolations
+            }));
+        }
+    });
+});
+
+// Function to select image choice
+function selectImageChoice(questionId, choiceValue) {
+    console.log('Selecting choice:', choiceValue, 'for question:', questionId);
+
+    const radio = document.querySelector(`input[name="answer_${questionId}"][value="${choiceValue}"]`);
+    if (radio) {
+        radio.checked = true;
+
+        // Update visual feedback - remove selection from all cards for this question
+        const allCards = document.querySelectorAll(`input[name="answer_${questionId}"]`);
+        allCards.forEach(input => {
+            const card = input.closest('.choice-card');
+            if (card) {
+                card.classList.remove('border-primary', 'bg-light');
+                card.style.boxShadow = '';
+            }
+        });
+
+        // Add selection to current card
+        const selectedCard = radio.closest('.choice-card');
+        if (selectedCard) {
+            selectedCard.classList.add('border-primary', 'bg-light');
+            selectedCard.style.boxShadow = '0 4px 12px rgba(0,123,255,0.3)';
+        }
+    } else {
+        console.error('Radio button not found for choice:', choiceValue);
+    }
+}
+
+// Add visual feedback for image choices
+document.addEventListener('DOMContentLoaded', function() {
+    const choiceCards = document.querySelectorAll('.choice-card');
+    choiceCards.forEach(card => {
+        // Add hover effects
+        card.addEventListener('mouseenter', function() {
+            if (!this.classList.contains('border-primary')) {
+                this.style.boxShadow = '0 2px 8px rgba(0,0,0,0.15)';
+                this.style.transform = 'translateY(-2px)';
+            }
+        });
+
+        card.addEventListener('mouseleave', function() {
+            if (!this.classList.contains('border-primary')) {
+                this.style.boxShadow = '';
+                this.style.transform = 'translateY(0)';
+            }
+        });
+
+        card.addEventListener('click', function() {
+            const radio = this.querySelector('input[type="radio"]');
+            if (radio) {
+                const questionName = radio.name;
+                const choiceValue = radio.value;
+
+                // Extract question ID from name (answer_X format)
+                const questionId = questionName.replace('answer_', '');
+
+                selectImageChoice(questionId, choiceValue);
+            }
+        });
+    });
+
+    // ...existing security code...
+});
+
+// ...existing code...
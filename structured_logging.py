@@ -0,0 +1,249 @@
+"""
+Structured Logging
+==================
+
+Log records are written as one JSON object per line (LOG_FORMAT = 'json'),
+so they can be loaded straight into jq, pandas or a log store:
+
+    {"ts": "2025-06-02T10:00:00.125Z", "level": "INFO", "logger": "app",
+     "message": "Test started", "event": "test_started", "request_id": "...",
+     "user_id": "42", "test_id": 3, "attempt_id": 118}
+
+- Every request gets an ID, taken from the X-Request-ID header when a proxy
+  sent a sane one and echoed back in the response. Records logged during
+  the request carry it, with the student (user_id) and the test and attempt
+  in their session; a call site's own extra= fields win over these.
+- Handlers never block the request thread: records go through a bounded
+  queue to a QueueListener thread that formats and writes them. When the
+  queue is full the record is dropped and counted (dropped_records), rather
+  than stalling an exam.
+- Each request is logged once as a 'request' record (method, path, status,
+  duration), replacing the dev server's access log. The exam pages'
+  heartbeats, autosaves and progress updates are most of the traffic, so
+  LOG_ACCESS_SAMPLE_RATES keeps only a fraction of their records, and
+  LOG_SAMPLE_RATES does the same for other events by name. Kept records
+  carry their sample_rate so counts can be scaled back up. Warnings,
+  errors and 5xx responses are always kept.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request, session
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'  # Flask's default
+
+_request_id_pattern = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+
+# Attributes every LogRecord has; anything else on a record came from extra= or ContextFilter
+_record_attributes = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    """The structured fields of a record: its extra= and context, without the empty ones"""
+    return {key: value for key, value in record.__dict__.items()
+            if value is not None and key not in _record_attributes}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; only the listener thread uses it"""
+
+    encoder = json.JSONEncoder(default=str, ensure_ascii=False)
+
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._second_text = None
+
+    def timestamp(self, created):
+        """ISO 8601 UTC with milliseconds; the seconds part is only formatted once per second"""
+        second = int(created)
+        if second != self._second:
+            self._second_text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = second
+        return f'{self._second_text}.{int((created - second) * 1000):03d}Z'
+
+    def format(self, record):
+        entry = {
+            'ts': self.timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return self.encoder.encode(entry)
+
+
+class TextFormatter(logging.Formatter):
+    """Flask's usual format, with the structured fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record):
+        fields = ' '.join(f'{key}={value}' for key, value in record_fields(record).items())
+        message = super().formatMessage(record)
+        return f'{message} [{fields}]' if fields else message
+
+
+class ContextFilter(logging.Filter):
+    """Adds the request ID, student, test and attempt of the current request"""
+
+    def filter(self, record):
+        # Set by start_request; until then the session may still be opening (and logging)
+        context = g.get('log_context') if has_request_context() else None
+        if context is not None:
+            request_id, data = context
+            fields = record.__dict__
+            fields.setdefault('request_id', request_id)
+            fields.setdefault('user_id', data.get('_user_id'))
+            fields.setdefault('test_id', data.get('active_test_id'))
+            fields.setdefault('attempt_id', data.get('attempt_id'))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records of high-volume events (the record's `event` extra)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to a QueueListener thread without ever waiting for it.
+
+    Only the message is merged in the calling thread (its arguments may
+    change once the call returns); formatting and writing happen in the
+    listener. A SimpleQueue takes a record without a lock; past maxsize
+    queued records new ones are dropped and counted instead.
+    """
+
+    def __init__(self, handlers, maxsize):
+        super().__init__(queue.SimpleQueue())
+        self.maxsize = maxsize
+        self.dropped_records = 0
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() < self.maxsize:
+            self.queue.put_nowait(record)
+        else:
+            self.dropped_records += 1
+
+    def close(self):
+        """Write out the records still queued and stop the listener"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+def output_handlers(app):
+    """The handlers the listener writes to: LOG_FILE if set, otherwise stderr"""
+    formatter = JSONFormatter() if app.config.get('LOG_FORMAT', 'json') == 'json' else TextFormatter()
+    if app.config.get('LOG_FILE'):
+        handler = RotatingFileHandler(app.config['LOG_FILE'], maxBytes=app.config.get('LOG_FILE_MAX_BYTES', 10485760),
+                                      backupCount=app.config.get('LOG_FILE_BACKUPS', 5), encoding='utf-8')
+    elif sys.stderr is not None:
+        handler = logging.StreamHandler(sys.stderr)
+    else:  # No console in the windowed PyInstaller build
+        handler = logging.NullHandler()
+    handler.setFormatter(formatter)
+    return [handler]
+
+
+def install_handler(logger, handler):
+    """Make handler the logger's only one, closing any this module installed before"""
+    for existing in list(logger.handlers):
+        if existing is default_handler or isinstance(existing, NonBlockingQueueHandler):
+            logger.removeHandler(existing)
+            if existing is not default_handler:
+                existing.close()
+    logger.addHandler(handler)
+
+
+def start_request():
+    """Give the request its ID; its records read the rest from the session when they're made"""
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    if not _request_id_pattern.fullmatch(request_id):
+        request_id = os.urandom(8).hex()
+    g.log_context = (request_id, session._get_current_object())
+    g.request_started = time.perf_counter()
+
+
+def finish_request(app, access_rates):
+    logger = app.logger
+    log_access = app.config.get('LOG_ACCESS', True)
+
+    def finish(response):
+        context = g.get('log_context')
+        if context is None:
+            return response
+        response.headers[REQUEST_ID_HEADER] = context[0]
+        if log_access:
+            current_request = request._get_current_object()
+            status = response.status_code
+            rate = access_rates.get(current_request.endpoint)
+            # Decided before the record exists, so a skipped heartbeat costs next to nothing
+            if rate is None or status >= 500 or random.random() < rate:
+                logger.info('%s %s %s', current_request.method, current_request.path, status, extra={
+                    'event': 'request',
+                    'method': current_request.method,
+                    'path': current_request.path,
+                    'endpoint': current_request.endpoint,
+                    'status': status,
+                    'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 2),
+                    'remote_addr': current_request.remote_addr,
+                    'sample_rate': rate if status < 500 else None,
+                })
+        return response
+    return finish
+
+
+def init_structured_logging(app):
+    """Route app.logger and werkzeug's logger through the queue; register before other extensions"""
+    handler = NonBlockingQueueHandler(output_handlers(app), app.config.get('LOG_QUEUE_SIZE', 10000))
+    handler.addFilter(ContextFilter())
+    if app.config.get('LOG_SAMPLE_RATES'):
+        handler.addFilter(SamplingFilter(app.config['LOG_SAMPLE_RATES']))
+
+    install_handler(app.logger, handler)
+    app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+
+    # The dev server's errors go through the queue too; its access log is replaced by ours
+    werkzeug_logger = logging.getLogger('werkzeug')
+    install_handler(werkzeug_logger, handler)
+    werkzeug_logger.setLevel(logging.WARNING if app.config.get('LOG_ACCESS', True) else logging.INFO)
+    werkzeug_logger.propagate = False
+
+    app.before_request(start_request)
+    app.after_request(finish_request(app, app.config.get('LOG_ACCESS_SAMPLE_RATES', {})))
+    app.extensions['structured_logging'] = handler
@@ -0,0 +1,120 @@
+"""
+Student Summaries
+=================
+
+The student records page and the adviser API show the same aggregates for a
+student: tests taken, average, highest and lowest score, and how many
+results fall in each grade band. They are kept in student_summary, one row
+per student, instead of being recomputed from every result on each view.
+
+As with the learning analytics (analytics.py), events only mark a summary
+stale: a new result (finalize_attempt) or results going away (deleting a
+test). summaries() recomputes the stale and missing rows it is asked for,
+with one grouped query over current and archived results, and reads the
+rest straight from the table. Archiving moves results without changing
+them, so it leaves summaries alone. A row is marked fresh before it is
+recomputed, so a result submitted meanwhile marks it stale again.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import case, func, select, union_all, update
+
+from backends import upsert
+from models import db, Result, ArchivedResult, StudentSummary
+
+
+def mark_students_stale(user_ids):
+    """Flag summaries for recomputation; part of the caller's transaction"""
+    user_ids = list(user_ids)
+    if user_ids:
+        db.session.execute(update(StudentSummary)
+                           .where(StudentSummary.user_id.in_(user_ids), StudentSummary.stale.is_(False))
+                           .values(stale=True)
+                           .execution_options(synchronize_session=False))
+
+
+def mark_test_students_stale(test_id):
+    """Flag every student with a result for the test (before the test is deleted)"""
+    takers = union_all(select(Result.user_id).where(Result.test_id == test_id),
+                       select(ArchivedResult.user_id).where(ArchivedResult.test_id == test_id))
+    db.session.execute(update(StudentSummary)
+                       .where(StudentSummary.user_id.in_(takers), StudentSummary.stale.is_(False))
+                       .values(stale=True)
+                       .execution_options(synchronize_session=False))
+
+
+def _claim(user_ids):
+    """Create missing rows and mark these summaries fresh before computing them"""
+    existing = {user_id for (user_id,) in db.session.query(StudentSummary.user_id)
+                .filter(StudentSummary.user_id.in_(user_ids))}
+    for user_id in user_ids:
+        if user_id not in existing:
+            db.session.execute(upsert(StudentSummary, {'user_id': user_id, 'stale': False}, ['user_id']))
+    db.session.execute(update(StudentSummary).where(StudentSummary.user_id.in_(user_ids)).values(stale=False)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def _compute(user_ids):
+    scores = union_all(
+        select(Result.user_id, Result.score, Result.date_taken).where(Result.user_id.in_(user_ids)),
+        select(ArchivedResult.user_id, ArchivedResult.score, ArchivedResult.date_taken)
+        .where(ArchivedResult.user_id.in_(user_ids))).subquery()
+    score = scores.c.score
+    rows = {user_id: {'user_id': user_id, 'tests_taken': 0, 'score_total': 0.0, 'highest_score': None,
+                      'lowest_score': None, 'excellent_count': 0, 'good_count': 0, 'fair_count': 0,
+                      'poor_count': 0, 'last_taken': None, 'computed_at': datetime.utcnow()}
+            for user_id in user_ids}
+    for row in db.session.execute(select(
+            scores.c.user_id,
+            func.count().label('tests_taken'),
+            func.sum(score).label('score_total'),
+            func.max(score).label('highest_score'),
+            func.min(score).label('lowest_score'),
+            func.sum(case((score >= 90, 1), else_=0)).label('excellent_count'),
+            func.sum(case(((score >= 70) & (score < 90), 1), else_=0)).label('good_count'),
+            func.sum(case(((score >= 50) & (score < 70), 1), else_=0)).label('fair_count'),
+            func.sum(case((score < 50, 1), else_=0)).label('poor_count'),
+            func.max(scores.c.date_taken).label('last_taken')).group_by(scores.c.user_id)):
+        rows[row.user_id].update(row._asdict())
+    db.session.execute(update(StudentSummary), list(rows.values()))
+
+
+def summaries(user_ids):
+    """{user_id: StudentSummary}, recomputing any that are stale or missing"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return {}
+    fresh = {user_id for (user_id,) in db.session.query(StudentSummary.user_id)
+             .filter(StudentSummary.user_id.in_(user_ids), StudentSummary.stale.is_(False))}
+    outdated = [user_id for user_id in user_ids if user_id not in fresh]
+    if outdated:
+        _claim(outdated)
+        try:
+            _compute(outdated)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            mark_students_stale(outdated)
+            db.session.commit()
+            raise
+    return {summary.user_id: summary for summary in
+            StudentSummary.query.filter(StudentSummary.user_id.in_(user_ids)).populate_existing()}
+
+
+def summary_statistics(summary, total_available_tests):
+    """The statistics dict the records page and the API show"""
+    return {
+        'total_tests_taken': summary.tests_taken,
+        'total_available_tests': total_available_tests,
+        'completion_rate': (summary.tests_taken / total_available_tests * 100) if total_available_tests > 0 else 0,
+        'average_score': summary.average_score,
+        'highest_score': summary.highest_score or 0,
+        'lowest_score': summary.lowest_score or 0,
+        'excellent_count': summary.excellent_count,
+        'good_count': summary.good_count,
+        'fair_count': summary.fair_count,
+        'poor_count': summary.poor_count,
+        'last_taken': summary.last_taken,
+    }
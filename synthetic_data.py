@@ -0,0 +1,324 @@
+"""
+Synthetic Data
+==============
+
+Fills a database with realistic volumes for scaling work
+(`python db_manage.py seed`, and the benchmarks):
+
+- students with a fixed ability each, all with the same password,
+- tests of multiple-choice and identification questions, some linked to a
+  learning resource,
+- one result per student for a share of the tests, graded by grade_answers
+  and stored with security counters and attempt info exactly as
+  finalize_attempt stores them (so raw_data compresses like the real thing),
+  dated across the last --days days, each with its submitted TestAttempt
+  and that attempt's SecurityEvent rows,
+- learning resources with their files and StudentProgress rows,
+- optionally, sections: students and tests are dealt out among them in
+  turn, and students only take their own section's tests.
+
+Rows are written with executemany inserts, committed every batch_size rows,
+so millions of results take minutes rather than hours. Resource files are
+only rows: nothing is written to the uploads folder.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from attempts import grade_answers, test_dictionary
+from compressed_columns import DictionaryText
+from models import (db, User, Test, Question, Result, LearningResource, ResourceFile, StudentProgress,
+                    Section, SectionMembership, SectionTest, TestAttempt, SecurityEvent)
+
+TOPICS = ('Cell Biology', 'Algebra', 'World History', 'Chemistry', 'Literature', 'Physics', 'Statistics',
+          'Geography', 'Economics', 'Computer Science', 'Anatomy', 'Philosophy')
+VIOLATIONS = ('tab_switch', 'fullscreen_exit', 'window_blur')
+RESOURCE_TYPES = (('video', 'video', 'video/mp4'), ('pdf', 'pdf', 'application/pdf'),
+                  ('document', 'document', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'))
+
+
+def _insert(model, rows, returning_ids=False):
+    """executemany INSERT; with returning_ids, the new ids in the order of rows"""
+    if not rows:
+        return []
+    table = model.__table__
+    if returning_ids:
+        return list(db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                                       rows).scalars())
+    db.session.execute(table.insert(), rows)
+
+
+def _flush_batch(model, rows, progress=None):
+    """Insert and commit the rows gathered so far; returns an empty batch"""
+    _insert(model, rows)
+    db.session.commit()
+    if progress:
+        progress(model.__tablename__, len(rows))
+    return []
+
+
+def _admin():
+    admin = User.query.filter_by(role='admin').order_by(User.id).first()
+    if admin is None:
+        admin = User(name='Admin', username='admin', role='admin', student_id='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+    return admin
+
+
+def seed_students(count, prefix, password, batch_size, progress=None):
+    """Create count students named {prefix}0, {prefix}1, ...; returns [(id, ability)]"""
+    template = User(username=prefix)
+    template.set_password(password)  # Hashing each password would dominate the run
+    students = []
+    for start in range(0, count, batch_size):
+        user_ids = _insert(User, [{'name': f'Student {prefix.upper()}{i}', 'username': f'{prefix}{i}',
+                                   'student_id': f'{prefix}{i}', 'password_hash': template.password_hash,
+                                   'role': 'student'} for i in range(start, min(count, start + batch_size))],
+                           returning_ids=True)
+        db.session.commit()
+        if progress:
+            progress('user', len(user_ids))
+        students.extend((user_id, random.betavariate(5, 2)) for user_id in user_ids)
+    return students
+
+
+def seed_sections(count, prefix, students, batch_size, progress=None):
+    """Create count sections; student i joins section i % count. Returns the section ids"""
+    now = datetime.utcnow()
+    section_ids = _insert(Section, [{'name': f'Section {prefix.upper()}{n}', 'created_at': now, 'updated_at': now}
+                                    for n in range(count)], returning_ids=True)
+    if progress:
+        progress('section', len(section_ids))
+    rows = []
+    for i, (user_id, _) in enumerate(students):
+        rows.append({'section_id': section_ids[i % count], 'user_id': user_id, 'role': 'student'})
+        if len(rows) >= batch_size:
+            rows = _flush_batch(SectionMembership, rows, progress)
+    _flush_batch(SectionMembership, rows, progress)
+    return section_ids
+
+
+def seed_resources(count, files_per_resource, created_by, days, batch_size, progress=None):
+    """Create count active learning resources with their files; returns their ids"""
+    now = datetime.utcnow()
+    resource_ids = []
+    for start in range(0, count, batch_size):
+        resources, files = [], []
+        for n in range(start, min(count, start + batch_size)):
+            resource_type, file_type, mime_type = random.choice(RESOURCE_TYPES)
+            topic = random.choice(TOPICS)
+            sizes = [random.randint(200_000, 400_000_000 if file_type == 'video' else 20_000_000)
+                     for _ in range(files_per_resource)]
+            duration = random.randint(120, 3600) if file_type == 'video' else None
+            created_at = now - timedelta(days=random.uniform(0, days))
+            resources.append({'title': f'{topic} lesson {n}',
+                              'description': f'Reading and lecture material for {topic.lower()}, part {n}.',
+                              'resource_type': resource_type if files_per_resource == 1 else 'mixed',
+                              'file_path': f'uploads/resources/seed-{n}-0.{file_type}',
+                              'file_size': sum(sizes), 'duration': duration, 'created_by': created_by,
+                              'created_at': created_at, 'updated_at': created_at, 'is_active': True})
+            files.append([{'filename': f'seed-{n}-{order}.{file_type}',
+                           'original_filename': f'{topic} part {order + 1}.{file_type}',
+                           'file_path': f'uploads/resources/seed-{n}-{order}.{file_type}',
+                           'file_type': file_type, 'file_size': size, 'mime_type': mime_type,
+                           'duration': duration, 'upload_order': order, 'created_at': created_at}
+                          for order, size in enumerate(sizes)])
+        ids = _insert(LearningResource, resources, returning_ids=True)
+        _flush_batch(ResourceFile, [dict(row, resource_id=resource_id)
+                                    for resource_id, rows in zip(ids, files) for row in rows], progress)
+        if progress:
+            progress('learning_resource', len(ids))
+        resource_ids.extend(ids)
+    return resource_ids
+
+
+def seed_progress(students, resource_ids, per_student, days, batch_size, progress=None):
+    """Give each student progress on per_student random resources"""
+    now = datetime.utcnow()
+    rows = []
+    for user_id, ability in students:
+        for resource_id in random.sample(resource_ids, min(per_student, len(resource_ids))):
+            percentage = min(100.0, round(random.uniform(0, 140) * ability, 1))
+            first_accessed = now - timedelta(days=random.uniform(0, days))
+            rows.append({'user_id': user_id, 'resource_id': resource_id, 'progress_percentage': percentage,
+                         'last_position': int(percentage * 18), 'completed': percentage >= 100,
+                         'time_spent': int(percentage * random.uniform(10, 40)), 'first_accessed': first_accessed,
+                         'last_accessed': first_accessed + timedelta(hours=random.uniform(0, 72))})
+            if len(rows) >= batch_size:
+                rows = _flush_batch(StudentProgress, rows, progress)
+    _flush_batch(StudentProgress, rows, progress)
+
+
+def seed_test(number, questions_per_test, resource_ids):
+    """Create one test and its questions; returns the Test"""
+    topic = TOPICS[number % len(TOPICS)]
+    test = Test(title=f'{topic} unit {number} assessment', time_limit=random.choice((20, 30, 45, 60)),
+                description=f'Covers the {topic.lower()} unit {number} reading and lectures.',
+                learning_resource_id=random.choice(resource_ids) if resource_ids and random.random() < 0.5 else None)
+    db.session.add(test)
+    db.session.flush()
+    questions = []
+    for q in range(questions_per_test):
+        if q % 4:
+            choices = [f'{topic} statement {letter} for question {q} of unit {number}'
+                       for letter in ('A', 'B', 'C', 'D')]
+            questions.append({'test_id': test.id, 'question_type': 'multiple_choice', 'choices': json.dumps(choices),
+                              'correct_answer': random.choice(choices),
+                              'question_text': f'{topic}, unit {number}, question {q}: '
+                                               'which of these statements about the reading is correct?'})
+        else:
+            questions.append({'test_id': test.id, 'question_type': 'identification',
+                              'correct_answer': f'{topic.split()[0].lower()} term {q}',
+                              'question_text': f'{topic}, unit {number}, question {q}: '
+                                               f'name the term defined in section {q} of the unit.'})
+    _insert(Question, questions)
+    db.session.commit()
+    return db.session.get(Test, test.id)
+
+
+def snapshot(test):
+    """A plain copy of a test and its questions for grade_answers.
+
+    Grading thousands of answer sheets against the ORM objects spends most
+    of its time in attribute instrumentation.
+    """
+    columns = ('id', 'question_text', 'question_type', 'choices', 'choice_images', 'correct_answer', 'image_path')
+    questions = []
+    for question in test.questions:
+        copy = SimpleNamespace(**{column: getattr(question, column) for column in columns})
+        copy.wrong_answers = [choice for choice in json.loads(question.choices) if choice != question.correct_answer] \
+            if question.choices else None
+        questions.append(copy)
+    return SimpleNamespace(id=test.id, time_limit=test.time_limit, questions=questions)
+
+
+def answer_sheet(test, ability):
+    """A student's answers to a snapshot: right with probability ability, otherwise a plausible wrong one"""
+    answers = {}
+    for question in test.questions:
+        if random.random() < ability:
+            answers[str(question.id)] = question.correct_answer
+        elif question.wrong_answers:
+            answers[str(question.id)] = random.choice(question.wrong_answers)
+        elif random.random() < 0.8:
+            answers[str(question.id)] = f'{question.correct_answer.rsplit(" ", 1)[0]} {random.randint(0, 99)}'
+    return answers
+
+
+def graded_result(test, dictionary, user_id, ability, taken):
+    """(Result row, TestAttempt row, SecurityEvent rows) as finalize_attempt would have left them.
+
+    The attempt still needs its result_id and the events their attempt_id.
+    """
+    score, result_data = grade_answers(test, answer_sheet(test, ability))
+    duration = random.uniform(5, test.time_limit) * 60
+    started = taken - timedelta(seconds=duration)
+    drawn = [(random.choice(VIOLATIONS), started + timedelta(seconds=random.uniform(0, duration)))
+             for _ in range(random.choices(range(8), weights=(50, 20, 10, 8, 5, 3, 2, 2))[0])]
+    events = sorted((at, event_type) for event_type, at in drawn)
+    counters = {
+        'violations': len(events),
+        'tab_switches': sum(1 for _, event_type in events if event_type == 'tab_switch'),
+        'fullscreen_exits': sum(1 for _, event_type in events if event_type == 'fullscreen_exit'),
+    }
+    result_data['security_info'] = counters
+    deadline = started + timedelta(minutes=test.time_limit)
+    auto_submitted = random.random() < 0.03
+    result_data['attempt_info'] = {
+        'started_at': started.isoformat(),
+        'deadline': deadline.isoformat(),
+        'submitted_at': taken.isoformat(),
+        'auto_submitted': auto_submitted,
+    }
+    result = {'user_id': user_id, 'test_id': test.id, 'score': score, 'date_taken': taken,
+              'raw_data': DictionaryText(json.dumps(result_data), *dictionary)}
+    attempt = {'user_id': user_id, 'test_id': test.id, 'started_at': started, 'deadline': deadline,
+               'status': 'expired' if auto_submitted else 'submitted', 'last_heartbeat': taken,
+               'security_violations': counters['violations'], 'tab_switches': counters['tab_switches'],
+               'fullscreen_exits': counters['fullscreen_exits'], 'submitted_at': taken}
+    security_events = [{'user_id': user_id, 'test_id': test.id, 'event_type': event_type, 'occurred_at': at,
+                        'client_time': at.isoformat() + 'Z', 'total_violations': number}
+                       for number, (at, event_type) in enumerate(events, 1)]
+    return result, attempt, security_events
+
+
+def _flush_results(graded, progress=None):
+    """Insert and commit graded results with their attempts and events; returns an empty batch"""
+    result_ids = _insert(Result, [result for result, _, _ in graded], returning_ids=True)
+    attempt_ids = _insert(TestAttempt, [dict(attempt, result_id=result_id)
+                                        for result_id, (_, attempt, _) in zip(result_ids, graded)],
+                          returning_ids=True)
+    events = [dict(event, attempt_id=attempt_id)
+              for attempt_id, (_, _, attempt_events) in zip(attempt_ids, graded) for event in attempt_events]
+    _insert(SecurityEvent, events)
+    db.session.commit()
+    if progress:
+        progress(Result.__tablename__, len(graded))
+    return []
+
+
+def seed(students=1000, tests=50, questions_per_test=30, results_per_student=20, resources=200,
+         files_per_resource=2, progress_per_student=10, days=365, prefix='s', password='student',
+         sections=0, batch_size=2000, random_seed=None, progress=None):
+    """Generate a full data set; returns {table: rows created}.
+
+    progress(table, rows) is called after every committed batch.
+    """
+    if random_seed is not None:
+        random.seed(random_seed)
+    if User.query.filter_by(username=f'{prefix}0').first():
+        raise ValueError(f'Students named "{prefix}0", "{prefix}1", ... already exist; choose another prefix')
+    results_per_student = min(results_per_student, tests)
+
+    admin = _admin()
+    student_rows = seed_students(students, prefix, password, batch_size, progress)
+    section_ids = seed_sections(sections, prefix, student_rows, batch_size, progress) if sections else []
+    resource_ids = seed_resources(resources, files_per_resource, admin.id, days, batch_size, progress)
+    seed_progress(student_rows, resource_ids, progress_per_student, days, batch_size, progress)
+
+    # Every student takes results_per_student of the tests; build one test's results at a time
+    # so only its questions are in memory
+    # With sections, student i and test n belong to sections i % sections and n % sections
+    def own_tests(i):
+        return range(i % sections, tests, sections) if sections else range(tests)
+    taken = {user_id: set(random.sample(own_tests(i), min(results_per_student, len(own_tests(i)))))
+             for i, (user_id, _) in enumerate(student_rows)}
+    now = datetime.utcnow()
+    created_results = created_events = 0
+    for number in range(tests):
+        test = seed_test(number, questions_per_test, resource_ids)
+        dictionary = test_dictionary(test)
+        if section_ids:
+            db.session.add(SectionTest(section_id=section_ids[number % sections], test_id=test.id))
+        db.session.commit()
+        test = snapshot(test)
+        rows = []
+        for user_id, ability in student_rows:
+            if number in taken[user_id]:
+                rows.append(graded_result(test, dictionary, user_id, ability,
+                                          now - timedelta(days=random.uniform(0, days))))
+                if len(rows) >= batch_size:
+                    created_results += len(rows)
+                    created_events += sum(len(events) for _, _, events in rows)
+                    rows = _flush_results(rows, progress)
+        created_results += len(rows)
+        created_events += sum(len(events) for _, _, events in rows)
+        _flush_results(rows, progress)
+        db.session.expunge_all()  # Drop the test's questions before the next one
+
+    return {
+        'user': len(student_rows),
+        'test': tests,
+        'question': tests * questions_per_test,
+        'result': created_results,
+        'test_attempt': created_results,
+        'security_event': created_events,
+        'learning_resource': len(resource_ids),
+        'resource_file': len(resource_ids) * files_per_resource,
+        'student_progress': len(student_rows) * min(progress_per_student, len(resource_ids)),
+        'section': len(section_ids),
+    }
@@ -0,0 +1,271 @@
+"""
+Exam Telemetry
+==============
+
+Heartbeats, security violations and learning-progress updates arrive far
+more often than anything else, and each used to cost a transaction (and,
+for heartbeats, a session rewrite). They are now only validated in the
+request and handed to a TelemetryBuffer, which coalesces them in memory:
+
+- heartbeats keep the latest counters per attempt,
+- security violations become SecurityEvent rows (see security_events.py)
+  and update their attempt's counter,
+- progress keeps the latest values per (student, resource).
+
+A writer thread flushes the buffer every TELEMETRY_FLUSH_INTERVAL seconds,
+or as soon as TELEMETRY_BATCH_SIZE items are pending, in one transaction:
+one executemany UPDATE for the attempts, one executemany INSERT for the
+security events and one upsert per progress row, so a classroom of
+heartbeats and violations costs a single commit instead of one each.
+Without a writer (tests, `flask run`) every record is flushed immediately.
+
+Anything that grades an attempt flushes first (submit_test and the attempt
+sweeper), so results never miss the telemetry that was still buffered. A
+crash loses at most one interval of heartbeats and progress.
+
+One student's record must never cost the others theirs: the endpoints turn
+what the page sent into numbers with heartbeat_counters and progress_values
+(rejecting anything else), rows for attempts, students or resources deleted
+since they were buffered are left out, and a batch that still fails is
+written again item by item, dropping only the items that fail on their own.
+"""
+
+import math
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, update
+
+from analytics import mark_resource_stale
+from backends import upsert
+from models import db, TestAttempt, SecurityEvent, StudentProgress, User, LearningResource
+from security_events import new_event
+
+PROGRESS_COLUMNS = ['progress_percentage', 'last_position', 'time_spent', 'completed', 'last_accessed']
+MAX_COUNT = 2 ** 31 - 1  # Integer columns
+
+
+def _number(value, name):
+    """A finite number from JSON (or a numeric string); ValueError for anything else"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f'Invalid {name}')
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}')
+    if not math.isfinite(number):
+        raise ValueError(f'Invalid {name}')
+    return number
+
+
+def _count(value, name):
+    number = int(_number(value, name))
+    if not 0 <= number <= MAX_COUNT:
+        raise ValueError(f'Invalid {name}')
+    return number
+
+
+def heartbeat_counters(data):
+    """(security_violations, tab_switches, fullscreen_exits) from a heartbeat; ValueError if one is not a count"""
+    return tuple(_count(data.get(name, 0), name) for name in ('security_violations', 'tab_switches', 'fullscreen_exits'))
+
+
+def progress_values(data):
+    """The StudentProgress columns from a progress update; ValueError for values that are not numbers"""
+    completed = data.get('completed', False)
+    if completed not in (True, False):  # Also 1 and 0
+        raise ValueError('Invalid completed')
+    return {
+        'progress_percentage': min(max(_number(data.get('progress', 0), 'progress'), 0.0), 100.0),
+        'last_position': _count(data.get('position', 0), 'position'),
+        'time_spent': _count(data.get('time_spent', 0), 'time_spent'),
+        'completed': bool(completed),
+        'last_accessed': datetime.utcnow()
+    }
+
+
+class TelemetryBuffer:
+    """Telemetry waiting to be written, coalesced per attempt and per progress row"""
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config.get('TELEMETRY_BATCH_SIZE', 500)
+        self.writer = None  # Set by start_telemetry_writer; records are flushed inline without one
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._attempts = {}  # attempt_id -> {column: value}
+        self._events = []  # SecurityEvent rows
+        self._progress = {}  # (user_id, resource_id) -> {column: value}
+
+    def heartbeat(self, attempt_id, security_violations, tab_switches, fullscreen_exits):
+        with self._lock:
+            self._attempts.setdefault(attempt_id, {}).update(
+                last_heartbeat=datetime.utcnow(),
+                security_violations=security_violations,
+                tab_switches=tab_switches,
+                fullscreen_exits=fullscreen_exits)
+        self._written()
+
+    def violation(self, attempt_id, user_id, test_id, event_type, client_time=None, total_violations=None):
+        event = new_event(attempt_id, user_id, test_id, event_type, client_time, total_violations)
+        with self._lock:
+            if event['total_violations'] is not None:
+                self._attempts.setdefault(attempt_id, {})['security_violations'] = event['total_violations']
+            self._events.append(event)
+        self._written()
+
+    def progress(self, user_id, resource_id, values):
+        with self._lock:
+            self._progress[user_id, resource_id] = values
+        self._written()
+
+    def pending(self):
+        return len(self._attempts) + len(self._events) + len(self._progress)
+
+    def _written(self):
+        if self.writer is None:
+            self.flush()
+        elif self.pending() >= self.batch_size:
+            self.writer.wake()
+
+    def flush(self):
+        """Write everything buffered so far in one transaction; needs an application context.
+
+        Returns the number of items written. If the batch fails it is written
+        again one item per transaction, and only the items that fail alone
+        are dropped (and logged).
+        """
+        with self._flush_lock:
+            with self._lock:
+                attempts, self._attempts = self._attempts, {}
+                events, self._events = self._events, []
+                progress, self._progress = self._progress, {}
+            if not (attempts or events or progress):
+                return 0
+            try:
+                written = self._write(attempts, events, progress)
+                db.session.commit()
+                return written
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning('Telemetry batch failed, writing it item by item', extra={
+                    'event': 'telemetry_batch_failed', 'error': str(e)})
+            return self._write_each(attempts, events, progress)
+
+    def _write_each(self, attempts, events, progress):
+        # (what the item is, for the log, and the _write arguments that write only it)
+        items = [({'kind': 'heartbeat', 'attempt_id': attempt_id}, ({attempt_id: values}, [], {}))
+                 for attempt_id, values in attempts.items()]
+        items += [({'kind': 'security_event', 'attempt_id': event['attempt_id']}, ({}, [event], {}))
+                  for event in events]
+        items += [({'kind': 'progress', 'user_id': key[0], 'resource_id': key[1]}, ({}, [], {key: values}))
+                  for key, values in progress.items()]
+        written = dropped = 0
+        for fields, item in items:
+            try:
+                written += self._write(*item)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                dropped += 1
+                self.app.logger.error('Telemetry item dropped', extra={
+                    'event': 'telemetry_item_dropped', **fields, 'error': str(e)})
+        if dropped:
+            self.app.logger.error('Telemetry items dropped', extra={'event': 'telemetry_items_dropped',
+                                                                    'dropped': dropped})
+        return written
+
+    def _write(self, attempts, events, progress):
+        """Execute (without committing) the statements for a batch; returns the number of items in them"""
+        # Rows for attempts, students or resources deleted meanwhile would fail the whole batch
+        attempt_ids = set(attempts) | {event['attempt_id'] for event in events}
+        if attempt_ids:
+            existing = {attempt_id for (attempt_id,) in
+                        db.session.query(TestAttempt.id).filter(TestAttempt.id.in_(attempt_ids))}
+            attempts = {attempt_id: values for attempt_id, values in attempts.items() if attempt_id in existing}
+            events = [event for event in events if event['attempt_id'] in existing]
+        if progress:
+            users = {user_id for (user_id,) in
+                     db.session.query(User.id).filter(User.id.in_({user_id for user_id, _ in progress}))}
+            resources = {resource_id for (resource_id,) in db.session.query(LearningResource.id)
+                         .filter(LearningResource.id.in_({resource_id for _, resource_id in progress}))}
+            progress = {key: values for key, values in progress.items() if key[0] in users and key[1] in resources}
+
+        # Grouped by the columns they set, as executemany needs
+        by_columns = {}
+        for attempt_id, values in attempts.items():
+            by_columns.setdefault(tuple(sorted(values)), []).append(dict(values, id=attempt_id))
+        for rows in by_columns.values():
+            db.session.execute(update(TestAttempt), rows)
+        if events:
+            db.session.execute(insert(SecurityEvent), events)
+        for (user_id, resource_id), values in progress.items():
+            db.session.execute(upsert(StudentProgress, dict(values, user_id=user_id, resource_id=resource_id),
+                                      ['user_id', 'resource_id'], update_columns=PROGRESS_COLUMNS))
+        for resource_id in {resource_id for _, resource_id in progress}:
+            mark_resource_stale(resource_id)
+        return len(attempts) + len(events) + len(progress)
+
+
+def init_telemetry(app):
+    app.extensions['telemetry'] = TelemetryBuffer(app)
+
+
+def telemetry():
+    return current_app.extensions['telemetry']
+
+
+class TelemetryWriter:
+    """Daemon thread that flushes the telemetry buffer on a short interval"""
+
+    def __init__(self, app):
+        self.app = app
+        self.buffer = app.extensions['telemetry']
+        self.interval = app.config.get('TELEMETRY_FLUSH_INTERVAL', 1)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self._thread.start()
+        self.buffer.writer = self
+
+    def stop(self):
+        """Stop after one last flush; later records are flushed inline again"""
+        self.buffer.writer = None
+        self._stopping = True
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def tick(self):
+        with self.app.app_context():
+            try:
+                return self.buffer.flush()
+            except Exception as e:
+                self.app.logger.error('Telemetry writer failed', extra={'event': 'telemetry_writer_error',
+                                                                        'error': str(e)})
+                return 0
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.tick()
+
+
+def start_telemetry_writer(app):
+    """Start the telemetry writer once per application"""
+    writer = app.extensions.get('telemetry_writer')
+    if writer is None:
+        writer = TelemetryWriter(app)
+        app.extensions['telemetry_writer'] = writer
+    writer.start()
+    return writer
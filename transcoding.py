@@ -0,0 +1,378 @@
+"""
+Video Transcoding
+=================
+
+Lecture videos used to be served exactly as uploaded: one large file at
+one bitrate, and AVI, WMV or FLV that browsers cannot play at all. Each
+video ResourceFile is now transcoded in the background into HLS:
+
+- a ladder of H.264/AAC renditions (TRANSCODE_RENDITIONS, none above the
+  source's own height), cut into TRANSCODE_SEGMENT_SECONDS segments with a
+  keyframe at every segment start,
+- a master playlist listing them, so the player starts on a small rendition
+  and switches up or down with the bandwidth it measures.
+
+Every stream is written to its own new directory under
+LEARNING_RESOURCES_FOLDER/streams and never changes afterwards, so
+resource_stream serves its files as immutable. Until a video's stream is
+ready (or when it failed) view_resource.html plays the uploaded file.
+
+The encoder is a local ffmpeg (TRANSCODE_FFMPEG, otherwise the one on the
+PATH) and nothing else, so it works offline. ffmpeg runs at low priority on
+TRANSCODE_THREADS threads, leaving the other cores to the exam server.
+
+A video moves from 'pending' (set on upload) to 'processing' when
+TranscodeWorker claims it, then to 'ready' or 'failed'. Admins can queue a
+failed one again, and `python db_manage.py transcode-videos` works through
+the pending ones in the foreground.
+
+A claim is a lease: the claiming process renews stream_claimed_at while
+ffmpeg runs, and a video is only taken over (and its half-written output
+removed) once its lease is TRANSCODE_LEASE seconds old, so several server
+processes and the command can transcode side by side.
+"""
+
+import os
+import re
+import secrets
+import shutil
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, or_, update
+
+from models import db, LearningResource, ResourceFile
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+STREAMS_DIR = 'streams'  # Under LEARNING_RESOURCES_FOLDER
+MASTER_PLAYLIST = 'master.m3u8'
+MIMETYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',  # MPEG transport stream; many systems map .ts to TypeScript or Qt Linguist
+}
+
+Probe = namedtuple('Probe', 'width height duration has_audio')
+Rendition = namedtuple('Rendition', 'height video_kbps audio_kbps')
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def find_encoder(app):
+    """Path of the ffmpeg to use, or None if there is none"""
+    configured = app.config.get('TRANSCODE_FFMPEG')
+    if configured:
+        return configured if os.path.isfile(configured) else shutil.which(configured)
+    return shutil.which('ffmpeg')
+
+
+def streams_folder(app):
+    return os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], STREAMS_DIR)
+
+
+def stream_owner(filename):
+    """(ResourceFile id, 'streams/<directory>/') for a file path inside a stream directory, or None"""
+    match = re.match(r'((\d+)-[0-9a-f]+)/', filename)
+    return (int(match.group(2)), f'{STREAMS_DIR}/{match.group(1)}/') if match else None
+
+
+def probe(ffmpeg, path):
+    """Size, duration and audio of a video, from the stream summary ffmpeg prints for its input"""
+    completed = subprocess.run([ffmpeg, '-hide_banner', '-nostdin', '-i', path],
+                               capture_output=True, text=True, errors='replace', timeout=60)
+    info = completed.stderr  # ffmpeg exits 1 here since no output was given
+    size = re.search(r'Stream #\d+:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})', info)
+    if size is None:
+        raise TranscodeError('No video stream found')
+    width, height = int(size.group(1)), int(size.group(2))
+    if re.search(r'rotation of -?(90|270)(\.0+)? degrees', info):
+        width, height = height, width  # Portrait phone videos; ffmpeg rotates them when decoding
+    duration = re.search(r'Duration: (\d+):(\d\d):(\d\d(?:\.\d+)?)', info)
+    seconds = (int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))) if duration else None
+    has_audio = re.search(r'Stream #\d+:\d+.*?: Audio: ', info) is not None
+    return Probe(width, height, seconds, has_audio)
+
+
+def renditions_for(source, renditions):
+    """The configured renditions no taller than the source, lowest first; at least one"""
+    ladder = sorted(Rendition(*rendition) for rendition in renditions)
+    chosen = [rendition for rendition in ladder if rendition.height <= source.height]
+    if not chosen:
+        # Smaller than the whole ladder: one rendition at the source's (even) height
+        chosen = [ladder[0]._replace(height=max(2, source.height - source.height % 2))]
+    return chosen
+
+
+def ffmpeg_command(ffmpeg, source_path, output_dir, source, renditions, segment_seconds=4,
+                   preset='veryfast', threads=2):
+    """One ffmpeg run that decodes the source once and encodes every rendition"""
+    count = len(renditions)
+    split = ''.join(f'[v{i}]' for i in range(count))
+    scales = ';'.join(f'[v{i}]scale=-2:{rendition.height}[out{i}]' for i, rendition in enumerate(renditions))
+    command = [ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-i', source_path,
+               '-filter_complex', f'[0:v]split={count}{split};{scales}']
+    for i in range(count):
+        command += ['-map', f'[out{i}]']
+        if source.has_audio:
+            command += ['-map', '0:a:0']
+
+    command += ['-c:v', 'libx264', '-preset', preset, '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+                # A keyframe at every segment start, so renditions can be switched at any segment
+                '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})', '-sc_threshold', '0',
+                '-threads', str(threads)]
+    for i, rendition in enumerate(renditions):
+        command += [f'-b:v:{i}', f'{rendition.video_kbps}k',
+                    f'-maxrate:v:{i}', f'{rendition.video_kbps * 107 // 100}k',
+                    f'-bufsize:v:{i}', f'{rendition.video_kbps * 3 // 2}k']
+    if source.has_audio:
+        command += ['-c:a', 'aac', '-ac', '2']
+        for i, rendition in enumerate(renditions):
+            command += [f'-b:a:{i}', f'{rendition.audio_kbps}k']
+
+    stream_map = ' '.join(f'v:{i},a:{i},name:{rendition.height}p' if source.has_audio
+                          else f'v:{i},name:{rendition.height}p' for i, rendition in enumerate(renditions))
+    command += ['-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+                '-hls_flags', 'independent_segments',
+                '-hls_segment_filename', os.path.join(output_dir, '%v', '%05d.ts'),
+                '-master_pl_name', MASTER_PLAYLIST, '-var_stream_map', stream_map,
+                os.path.join(output_dir, '%v', 'index.m3u8')]
+    return command
+
+
+def low_priority(command):
+    """(command, Popen options) that keep ffmpeg from competing with the server for the CPU"""
+    if sys.platform == 'win32':
+        return command, {'creationflags': subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    nice = shutil.which('nice')
+    return ([nice, '-n', '10', *command] if nice else command), {}
+
+
+def encode(app, source_path, output_dir):
+    """Write the HLS renditions of source_path into output_dir; returns the Probe of the source.
+
+    Raises TranscodeError when there is no encoder or it fails.
+    """
+    ffmpeg = find_encoder(app)
+    if ffmpeg is None:
+        raise TranscodeError('ffmpeg not found (set TRANSCODE_FFMPEG)')
+    source = probe(ffmpeg, source_path)
+    renditions = renditions_for(source, app.config.get('TRANSCODE_RENDITIONS', ((360, 800, 96),)))
+    command = ffmpeg_command(ffmpeg, source_path, output_dir, source, renditions,
+                             segment_seconds=app.config.get('TRANSCODE_SEGMENT_SECONDS', 4),
+                             preset=app.config.get('TRANSCODE_PRESET', 'veryfast'),
+                             threads=app.config.get('TRANSCODE_THREADS', 2))
+    command, options = low_priority(command)
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, errors='replace',
+                                   timeout=app.config.get('TRANSCODE_TIMEOUT', 4 * 3600), **options)
+    except subprocess.TimeoutExpired:
+        raise TranscodeError('ffmpeg timed out')
+    if completed.returncode != 0 or not os.path.isfile(os.path.join(output_dir, MASTER_PLAYLIST)):
+        message = completed.stderr.strip().splitlines()
+        raise TranscodeError(message[-1] if message else f'ffmpeg exited with {completed.returncode}')
+    return source
+
+
+def claim_next():
+    """Move the oldest pending video to processing; returns its id, or None.
+
+    The conditional UPDATE makes the claim safe against another worker
+    process claiming the same video. The claim is the name of the stream
+    directory the video will be written to.
+    """
+    while True:
+        file_id = db.session.query(ResourceFile.id).filter(ResourceFile.stream_status == PENDING) \
+            .order_by(ResourceFile.id).limit(1).scalar()
+        if file_id is None:
+            return None
+        claimed = db.session.execute(update(ResourceFile)
+                                     .where(ResourceFile.id == file_id, ResourceFile.stream_status == PENDING)
+                                     .values(stream_status=PROCESSING, stream_error=None,
+                                             stream_claim=f'{file_id}-{secrets.token_hex(4)}',
+                                             stream_claimed_at=datetime.utcnow(),
+                                             updated_at=datetime.utcnow())).rowcount
+        db.session.commit()
+        if claimed:
+            return file_id
+
+
+def reclaim_expired(app):
+    """Queue again the videos whose worker stopped renewing its claim; returns how many"""
+    expired_before = datetime.utcnow() - timedelta(seconds=app.config.get('TRANSCODE_LEASE', 300))
+    expired = db.session.query(ResourceFile.id, ResourceFile.stream_claim) \
+        .filter(ResourceFile.stream_status == PROCESSING,
+                or_(ResourceFile.stream_claimed_at.is_(None), ResourceFile.stream_claimed_at < expired_before)).all()
+    reclaimed = 0
+    for file_id, claim in expired:
+        # Conditional, in case the worker renewed or finished in the meantime
+        reclaimed_one = db.session.execute(update(ResourceFile)
+                                           .where(ResourceFile.id == file_id, ResourceFile.stream_status == PROCESSING,
+                                                  ResourceFile.stream_claim == claim)
+                                           .values(stream_status=PENDING, stream_claim=None,
+                                                   stream_claimed_at=None)).rowcount
+        db.session.commit()
+        if reclaimed_one and claim:
+            # Its half-written output
+            shutil.rmtree(os.path.join(streams_folder(app), f'.{claim}.tmp'), ignore_errors=True)
+        reclaimed += reclaimed_one
+    return reclaimed
+
+
+def renew_claim(app, file_id, claim, stop):
+    """Keep a claim's lease fresh until stop is set; runs on its own thread"""
+    interval = app.config.get('TRANSCODE_LEASE', 300) / 3
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                db.session.execute(update(ResourceFile)
+                                   .where(ResourceFile.id == file_id, ResourceFile.stream_claim == claim)
+                                   .values(stream_claimed_at=datetime.utcnow()))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Transcode lease renewal error: {str(e)}')
+            finally:
+                db.session.remove()
+
+
+def transcode_file(app, file_id):
+    """Transcode one claimed video and record the outcome; needs an application context.
+
+    No transaction is held while ffmpeg runs, which can take minutes.
+    """
+    resource_file = db.session.get(ResourceFile, file_id)
+    if resource_file is None or resource_file.stream_claim is None:
+        return None
+    source_path = os.path.join(app.config['LEARNING_RESOURCES_FOLDER'], resource_file.filename)
+    name = resource_file.stream_claim
+    db.session.commit()
+    ours = (ResourceFile.id == file_id, ResourceFile.stream_status == PROCESSING, ResourceFile.stream_claim == name)
+
+    # Written under a temporary name and renamed when complete, so a stream is only ever seen whole
+    working_dir = os.path.join(streams_folder(app), f'.{name}.tmp')
+    stop_renewing = threading.Event()
+    threading.Thread(target=renew_claim, args=(app, file_id, name, stop_renewing),
+                     name=f'transcode-lease-{file_id}', daemon=True).start()
+    try:
+        source = encode(app, source_path, working_dir)
+        os.replace(working_dir, os.path.join(streams_folder(app), name))
+    except Exception as e:
+        shutil.rmtree(working_dir, ignore_errors=True)
+        app.logger.error(f'Transcoding failed for resource file {file_id}: {str(e)}')
+        db.session.execute(update(ResourceFile).where(*ours)
+                           .values(stream_status=FAILED, stream_error=str(e)[:500], stream_claim=None,
+                                   stream_claimed_at=None, updated_at=datetime.utcnow()))
+        db.session.commit()
+        return FAILED
+    finally:
+        stop_renewing.set()
+
+    values = {'stream_status': READY, 'stream_path': f'{STREAMS_DIR}/{name}/{MASTER_PLAYLIST}',
+              'stream_claim': None, 'stream_claimed_at': None, 'updated_at': datetime.utcnow()}
+    if source.duration:
+        values['duration'] = round(source.duration)
+    updated = db.session.execute(update(ResourceFile).where(*ours).values(**values)).rowcount
+    if updated:
+        # The resource's length is its videos' total
+        resource_id = resource_file.resource_id
+        total = db.session.query(func.sum(ResourceFile.duration)) \
+            .filter(ResourceFile.resource_id == resource_id, ResourceFile.file_type == 'video').scalar()
+        db.session.execute(update(LearningResource).where(LearningResource.id == resource_id)
+                           .values(duration=total))
+    db.session.commit()
+    if not updated:
+        # Deleted, queued again or taken over while encoding
+        shutil.rmtree(os.path.join(streams_folder(app), name), ignore_errors=True)
+        return None
+    app.logger.info('Video transcoded', extra={'event': 'video_transcoded', 'resource_file_id': file_id,
+                                                'duration': values.get('duration')})
+    return READY
+
+
+def queue_again(file_id):
+    """Queue a failed video again; returns whether it was failed. The caller commits"""
+    return db.session.execute(update(ResourceFile)
+                              .where(ResourceFile.id == file_id, ResourceFile.stream_status == FAILED)
+                              .values(stream_status=PENDING, stream_error=None,
+                                      updated_at=datetime.utcnow())).rowcount == 1
+
+
+def wake_transcoder():
+    """Start on newly queued videos now instead of at the next poll"""
+    worker = current_app.extensions.get('transcode_worker')
+    if worker is not None:
+        worker.wake()
+
+
+class TranscodeWorker:
+    """Daemon thread that transcodes pending videos one at a time"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('TRANSCODE_POLL_INTERVAL', 60)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='transcode-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop after the video being transcoded, if any"""
+        self._stopping = True
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def tick(self):
+        """Transcode pending videos until none are left; returns how many were attempted"""
+        done = 0
+        with self.app.app_context():
+            try:
+                if find_encoder(self.app) is None:
+                    return 0  # Videos stay pending and play as uploaded
+                reclaim_expired(self.app)
+                while not self._stopping:
+                    file_id = claim_next()
+                    if file_id is None:
+                        break
+                    transcode_file(self.app, file_id)
+                    done += 1
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f'Transcode worker error: {str(e)}')
+            finally:
+                db.session.remove()
+        return done
+
+    def _run(self):
+        while not self._stopping:
+            self.tick()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def start_transcode_worker(app):
+    """Start the transcode worker once per application, if enabled"""
+    if not app.config.get('TRANSCODE_ENABLED', True):
+        return None
+    worker = app.extensions.get('transcode_worker')
+    if worker is None:
+        worker = TranscodeWorker(app)
+        app.extensions['transcode_worker'] = worker
+    worker.start()
+    return worker